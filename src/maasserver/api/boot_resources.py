@@ -18,8 +18,10 @@ from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from maasserver.api.support import (
     admin_method,
+    conditional,
     operation,
     OperationsHandler,
+    summarise_rows,
 )
 from maasserver.api.utils import get_optional_param
 from maasserver.bootresources import (
@@ -137,12 +139,21 @@ def json_object(obj, request):
     return stream
 
 
+def summarise_boot_resources(handler):
+    """Summarise everything that goes into listing boot resources.
+
+    This is used to validate conditional requests; see `conditional`.
+    """
+    return summarise_rows([BootResource.objects.all()])
+
+
 class BootResourcesHandler(OperationsHandler):
     """Manage the boot resources."""
     api_doc_section_name = "Boot resources"
 
     update = delete = None
 
+    @conditional(summarise_boot_resources)
     def read(self, request):
         """List all boot resources.
 
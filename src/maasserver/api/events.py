@@ -9,12 +9,15 @@ import urllib.error
 import urllib.parse
 import urllib.request
 
+from django.contrib.auth.models import User
 from django.db.models import Q
 from formencode.validators import Int
 from maasserver.api.nodes import filtered_nodes_list_from_request
 from maasserver.api.support import (
+    conditional,
     operation,
     OperationsHandler,
+    summarise_rows,
 )
 from maasserver.api.utils import (
     get_optional_param,
@@ -22,7 +25,11 @@ from maasserver.api.utils import (
 )
 from maasserver.enum import NODE_TYPE
 from maasserver.exceptions import MAASAPIBadRequest
-from maasserver.models import Event
+from maasserver.models import (
+    Event,
+    EventType,
+    Node,
+)
 from maasserver.models.eventtype import (
     LOGGING_LEVELS,
     LOGGING_LEVELS_BY_NAME,
@@ -54,6 +61,16 @@ def event_to_dict(event):
     )
 
 
+def summarise_events(handler):
+    """Summarise everything that goes into querying events.
+
+    This is used to validate conditional requests; see `conditional`.
+    """
+    return summarise_rows(
+        [Node.objects.all(), EventType.objects.all(), User.objects.all()],
+        appended=[Event.objects.all()])
+
+
 class EventsHandler(OperationsHandler):
     """Retrieve filtered node events.
 
@@ -85,6 +102,7 @@ class EventsHandler(OperationsHandler):
         return ('events_handler', [])
 
     @operation(idempotent=True)
+    @conditional(summarise_events)
     def query(self, request):
         """List Node events, optionally filtered by various criteria via
         URL query parameters.
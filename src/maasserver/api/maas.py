@@ -25,6 +25,7 @@ from maasserver.forms.settings import (
     get_config_form,
     validate_config_name,
 )
+from maasserver.handlerstats import handler_stats
 from maasserver.models import (
     Config,
     PackageRepository,
@@ -118,6 +119,35 @@ class MaasHandler(OperationsHandler):
     # about the available configuration items.
     get_config.__doc__ %= get_config_doc(indentation=8)
 
+    @admin_method
+    @operation(idempotent=True)
+    def handler_stats(self, request):
+        """Get statistics for websocket methods and API operations.
+
+        For each method and operation called, this returns the number of
+        calls, how many of them failed, the time taken, the number of
+        database queries made and the time spent in them, and the total size
+        of the responses.
+
+        Statistics are only recorded when `debug_handler_stats` is enabled in
+        regiond.conf. Each region process keeps its own, so these are the
+        statistics of the process that handles this request.
+        """
+        return HttpResponse(
+            json.dumps(handler_stats.snapshot()),
+            content_type='application/json')
+
+    @admin_method
+    @operation(idempotent=True)
+    def handler_metrics(self, request):
+        """Get the handler statistics in Prometheus' text format.
+
+        See `handler_stats`.
+        """
+        return HttpResponse(
+            handler_stats.render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
+
     @classmethod
     def resource_uri(cls, *args, **kwargs):
         return ('maas_handler', [])
@@ -79,6 +79,10 @@ from maasserver.models import (
     VirtualBlockDevice,
 )
 from maasserver.models.node import RELEASABLE_STATUSES
+from maasserver.node_action import (
+    compile_bulk_node_action,
+    execute_bulk_node_action,
+)
 from maasserver.node_constraint_filter_forms import (
     AcquireNodeForm,
     nodes_by_storage,
@@ -1400,6 +1404,46 @@ class MachinesHandler(NodesHandler, PowersMixin):
                 % ', '.join(failed))
         return released_ids
 
+    @operation(idempotent=False)
+    def bulk_action(self, request):
+        """Perform an action on multiple machines.
+
+        The action is performed on each of the machines on which it is
+        available; a failure for one machine does not prevent it from being
+        performed on the others. Power changes are made for several machines
+        at once, once the changes to all of the machines have been saved;
+        failures to change the power of a machine are logged, and are not
+        part of the result.
+
+        :param machines: system_ids of the machines on which to perform the
+            action.
+        :param action: The name of the action, as shown in the UI, e.g. "on",
+            "off", "commission", "deploy", or "release".
+        :type action: unicode
+        :return: A dict mapping the system_id of each machine to null if the
+            action was performed, or to the reason why it was not.
+
+        Any other parameters are passed to the action for every machine.
+
+        Returns 400 if any of the machines cannot be found.
+        """
+        system_ids = set(request.POST.getlist('machines'))
+        action_name = get_mandatory_param(request.POST, 'action')
+        extra = {
+            key: request.POST[key]
+            for key in request.POST
+            if key not in ('op', 'machines', 'action')
+        }
+        # Check the existence of these nodes first.
+        self._check_system_ids_exist(system_ids)
+        machines = self.base_model.objects.get_nodes(
+            request.user, perm=NODE_PERMISSION.VIEW, ids=system_ids)
+        actions, errors = compile_bulk_node_action(
+            machines, request.user, action_name, request=request)
+        results = execute_bulk_node_action(actions, extra)
+        results.update(errors)
+        return results
+
     @operation(idempotent=True)
     def list_allocated(self, request):
         """Fetch Machines that were allocated to the User/oauth token."""
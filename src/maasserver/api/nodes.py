@@ -13,14 +13,18 @@ from itertools import chain
 import json
 
 import bson
+from django.contrib.auth.models import User
 from django.db.models import Prefetch
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from maasserver.api.support import (
     admin_method,
     AnonymousOperationsHandler,
+    conditional,
     operation,
     OperationsHandler,
+    stream_json_list,
+    summarise_rows,
 )
 from maasserver.api.utils import (
     get_mandatory_param,
@@ -46,13 +50,32 @@ from maasserver.fields import MAC_RE
 from maasserver.forms import BulkNodeActionForm
 from maasserver.forms.ephemeral import TestForm
 from maasserver.models import (
+    BlockDevice,
+    BMC,
+    CacheSet,
+    ControllerInfo,
+    Domain,
+    Event,
+    Fabric,
     Filesystem,
+    FilesystemGroup,
     Interface,
     ISCSIBlockDevice,
     Node,
+    NodeMetadata,
     OwnerData,
+    Partition,
+    PartitionTable,
     PhysicalBlockDevice,
+    ResourcePool,
+    Service,
+    Space,
+    StaticIPAddress,
+    Subnet,
+    Tag,
     VirtualBlockDevice,
+    VLAN,
+    Zone,
 )
 from maasserver.models.nodeprobeddetails import get_single_probed_details
 from maasserver.utils.orm import prefetch_queryset
@@ -62,7 +85,12 @@ from metadataserver.enum import (
     SCRIPT_STATUS,
     SCRIPT_STATUS_CHOICES,
 )
+from metadataserver.models import (
+    ScriptResult,
+    ScriptSet,
+)
 from metadataserver.models.scriptset import get_status_from_qs
+from piston3.handler import typemapper
 from piston3.utils import rc
 from provisioningserver.drivers.power import UNKNOWN_POWER_TYPE
 
@@ -74,6 +102,10 @@ NODES_SELECT_RELATED = (
     'zone',
 )
 
+# The number of nodes fetched and rendered at a time when listing nodes.
+# Listings longer than this are streamed to the client chunk by chunk.
+NODES_CHUNK_SIZE = 500
+
 NODES_PREFETCH = [
     'domain__dnsresource_set__ip_addresses',
     'domain__dnsresource_set__dnsdata_set',
@@ -251,6 +283,99 @@ def filtered_nodes_list_from_request(request, model=None):
     return nodes.order_by('id')
 
 
+def get_nodes_in_chunks(querysets, chunk_size):
+    """Yield lists of nodes from each of `querysets` in turn.
+
+    Nodes are fetched in order of id, `chunk_size` at a time, and with
+    `NODES_PREFETCH` applied to each fetch, so that memory use is bounded by
+    `chunk_size` rather than by the number of nodes. Every list yielded has
+    `chunk_size` nodes, except the last.
+    """
+    chunk = []
+    for queryset in querysets:
+        last_id = None
+        while True:
+            limit = chunk_size - len(chunk)
+            nodes = queryset
+            if last_id is not None:
+                nodes = nodes.filter(id__gt=last_id)
+            nodes = prefetch_queryset(nodes, NODES_PREFETCH)
+            nodes = list(nodes.order_by('id')[:limit])
+            # Set related node parents so no extra queries are needed.
+            for node in nodes:
+                for interface in node.interface_set.all():
+                    interface.node = node
+                for block_device in node.blockdevice_set.all():
+                    block_device.node = node
+            chunk.extend(nodes)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+            if len(nodes) < limit:
+                break
+            last_id = nodes[-1].id
+    if len(chunk) > 0:
+        yield chunk
+
+
+# Models that go into every listing of nodes.
+NODE_SUMMARISED_MODELS = (
+    Node, BMC, Domain, Zone, Interface, Interface.ip_addresses.through,
+    StaticIPAddress, Subnet, VLAN, Fabric, Space, NodeMetadata, ScriptSet,
+    ScriptResult,
+)
+
+# Models that go into a listing of nodes when it includes the given field.
+NODE_FIELD_SUMMARISED_MODELS = {
+    'owner': (User,),
+    'owner_data': (OwnerData,),
+    'tag_names': (Node.tags.through, Tag),
+    'pool': (ResourcePool,),
+    'service_set': (Service,),
+    'version': (ControllerInfo,),
+}
+NODE_FIELD_SUMMARISED_MODELS.update(dict.fromkeys((
+    'boot_disk', 'storage', 'blockdevice_set', 'iscsiblockdevice_set',
+    'physicalblockdevice_set', 'virtualblockdevice_set', 'volume_groups',
+    'raids', 'cache_sets', 'bcaches', 'special_filesystems'), (
+    BlockDevice, PartitionTable, Partition, Filesystem, FilesystemGroup,
+    CacheSet,
+)))
+
+
+def get_listed_fields(base_model):
+    """Return the names of the fields shown when listing `base_model`.
+
+    A listing of nodes can include nodes of several types, each shown with
+    the fields of the handler for its model.
+    """
+    names = set()
+    for handler, (model, anonymous) in typemapper.items():
+        if anonymous or not isinstance(model, type):
+            continue
+        if issubclass(model, base_model):
+            names.update(
+                field if isinstance(field, str) else field[0]
+                for field in handler.fields)
+    return names
+
+
+def summarise_nodes(handler):
+    """Summarise everything that goes into `handler`'s listing of nodes.
+
+    This is used to validate conditional requests for listings of nodes;
+    see `conditional`.
+    """
+    models = list(NODE_SUMMARISED_MODELS)
+    for name in sorted(get_listed_fields(handler.base_model)):
+        for model in NODE_FIELD_SUMMARISED_MODELS.get(name, ()):
+            if model not in models:
+                models.append(model)
+    return summarise_rows(
+        [model.objects.all() for model in models],
+        appended=[Event.objects.all()])
+
+
 def is_registered(request):
     """Used by both `NodesHandler` and `AnonNodesHandler`."""
     mac_address = get_mandatory_param(request.GET, 'mac_address')
@@ -571,6 +696,7 @@ class NodesHandler(OperationsHandler):
     anonymous = AnonNodesHandler
     base_model = Node
 
+    @conditional(summarise_nodes)
     def read(self, request):
         """List Nodes visible to the user, optionally filtered by criteria.
 
@@ -615,27 +741,29 @@ class NodesHandler(OperationsHandler):
             from maasserver.api.regioncontrollers import (
                 RegionControllersHandler
             )
-            racks = RackControllersHandler().read(request).order_by("id")
-            nodes = list(chain(
-                DevicesHandler().read(request).order_by("id"),
-                MachinesHandler().read(request).order_by("id"),
+            racks = RackControllersHandler()._get_nodes(request)
+            querysets = [
+                DevicesHandler()._get_nodes(request),
+                MachinesHandler()._get_nodes(request),
                 racks,
-                RegionControllersHandler().read(request).exclude(
-                    id__in=racks).order_by("id"),
-            ))
-            return nodes
+                RegionControllersHandler()._get_nodes(request).exclude(
+                    id__in=racks),
+            ]
         else:
-            nodes = filtered_nodes_list_from_request(request, self.base_model)
-            nodes = nodes.select_related(*NODES_SELECT_RELATED)
-            nodes = prefetch_queryset(
-                nodes, NODES_PREFETCH).order_by('id')
-            # Set related node parents so no extra queries are needed.
-            for node in nodes:
-                for interface in node.interface_set.all():
-                    interface.node = node
-                for block_device in node.blockdevice_set.all():
-                    block_device.node = node
+            querysets = [self._get_nodes(request)]
+        chunks = get_nodes_in_chunks(querysets, NODES_CHUNK_SIZE)
+        nodes = next(chunks, [])
+        if len(nodes) < NODES_CHUNK_SIZE:
             return nodes
+        else:
+            # There may be many more nodes; stream them to the client rather
+            # than holding them all in memory.
+            return stream_json_list(self, chain([nodes], chunks))
+
+    def _get_nodes(self, request):
+        """Return a query set of the nodes listed by `read`."""
+        nodes = filtered_nodes_list_from_request(request, self.base_model)
+        return nodes.select_related(*NODES_SELECT_RELATED)
 
     @operation(idempotent=True)
     def is_registered(self, request):
@@ -181,6 +181,25 @@ class RackControllersHandler(NodesHandler, PowersMixin):
             "Import of boot images started on all rack controllers",
             content_type=("text/plain; charset=%s" % settings.DEFAULT_CHARSET))
 
+    @admin_method
+    @operation(idempotent=False)
+    def refresh_boot_images(self, request):
+        """Refresh the region's cache of the boot images and operating
+        systems available on all rack controllers.
+
+        Rack controllers report these after importing boot images, and every
+        few minutes otherwise, so this is rarely necessary.
+        """
+        # Avoid circular import.
+        from maasserver.clusterrpc.boot_images import (
+            refresh_boot_images_cache,
+        )
+
+        post_commit_do(refresh_boot_images_cache)
+        return HttpResponse(
+            "Refresh of boot images started on all rack controllers",
+            content_type=("text/plain; charset=%s" % settings.DEFAULT_CHARSET))
+
     @admin_method
     @operation(idempotent=True)
     def describe_power_types(self, request):
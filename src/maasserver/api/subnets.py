@@ -6,16 +6,20 @@
 from formencode.validators import StringBool
 from maasserver.api.support import (
     admin_method,
+    conditional,
     operation,
     OperationsHandler,
+    summarise_rows,
 )
 from maasserver.api.utils import get_optional_param
 from maasserver.enum import NODE_PERMISSION
 from maasserver.exceptions import MAASAPIValidationError
 from maasserver.forms.subnet import SubnetForm
 from maasserver.models import (
+    Fabric,
     Space,
     Subnet,
+    VLAN,
 )
 from piston3.utils import rc
 from provisioningserver.utils.network import IPRangeStatistics
@@ -36,6 +40,16 @@ DISPLAYED_SUBNET_FIELDS = (
 )
 
 
+def summarise_subnets(handler):
+    """Summarise everything that goes into listing subnets.
+
+    This is used to validate conditional requests; see `conditional`.
+    """
+    return summarise_rows([
+        Subnet.objects.all(), VLAN.objects.all(), Fabric.objects.all(),
+        Space.objects.all()])
+
+
 class SubnetsHandler(OperationsHandler):
     """Manage subnets."""
     api_doc_section_name = "Subnets"
@@ -47,6 +61,7 @@ class SubnetsHandler(OperationsHandler):
         # See the comment in NodeHandler.resource_uri.
         return ('subnets_handler', [])
 
+    @conditional(summarise_subnets)
     def read(self, request):
         """List all subnets."""
         return Subnet.objects.all()
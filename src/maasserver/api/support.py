@@ -6,21 +6,43 @@
 __all__ = [
     'admin_method',
     'AnonymousOperationsHandler',
+    'conditional',
     'ModelCollectionOperationsHandler',
     'ModelOperationsHandler',
     'operation',
     'OperationsHandler',
+    'stream_json_list',
+    'summarise_rows',
     ]
 
 from abc import (
     ABCMeta,
     abstractproperty,
 )
+from contextlib import closing
 from functools import wraps
+import hashlib
+import http.client
+import json
 
 from django.core.exceptions import PermissionDenied
-from django.http import Http404
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import (
+    connection,
+    transaction,
+)
+from django.http import (
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.http.response import HttpResponseBase
 from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response,
+    quote_etag,
+)
+from maasserver import handlerstats
 from maasserver.api.doc import get_api_description_hash
 from maasserver.exceptions import (
     MAASAPIBadRequest,
@@ -28,11 +50,15 @@ from maasserver.exceptions import (
 )
 from maasserver.utils.orm import get_one
 from piston3.authentication import NoAuthentication
-from piston3.emitters import Emitter
+from piston3.emitters import (
+    Emitter,
+    JSONEmitter,
+)
 from piston3.handler import (
     AnonymousBaseHandler,
     BaseHandler,
     HandlerMetaClass,
+    typemapper,
 )
 from piston3.resource import Resource
 from piston3.utils import (
@@ -63,14 +89,53 @@ class OperationsResource(Resource):
         # the _base_content_is_iter attribute so there is no way to identify
         # the content inside of the response.) This means we never want Piston
         # to use its emitter on the contents inside of an HttpResponse.
+        if isinstance(result, StreamingHttpResponse):
+            # Piston does not know about streaming responses at all and would
+            # try to emit the response object itself, so bail out of Piston
+            # here and have `__call__` return the response as it is.
+            raise HttpStatusCode(result)
         return False
 
     def __call__(self, request, *args, **kwargs):
-        upcall = super(OperationsResource, self).__call__
-        response = upcall(request, *args, **kwargs)
+        if handlerstats.is_enabled():
+            response = self._call_with_stats(request, *args, **kwargs)
+        else:
+            response = self._call(request, *args, **kwargs)
         response["X-MAAS-API-Hash"] = get_api_description_hash()
         return response
 
+    def _call(self, request, *args, **kwargs):
+        upcall = super(OperationsResource, self).__call__
+        try:
+            return upcall(request, *args, **kwargs)
+        except HttpStatusCode as error:
+            return error.response
+
+    def _call_with_stats(self, request, *args, **kwargs):
+        """Call the handler, recording statistics about the call.
+
+        The call is named after the handler and the operation, or the CRUD
+        method when there's no operation. The size of streamed responses is
+        not known at this point so is not recorded.
+        """
+        stats = handlerstats.CallStats("api", None)
+        failed = True
+        try:
+            with stats.counting_queries():
+                response = self._call(request, *args, **kwargs)
+            failed = response.status_code >= 400
+            if not response.streaming:
+                stats.response_size = len(response.content)
+            return response
+        finally:
+            op = request.GET.get("op")
+            if op is None and request.method.upper() == "POST":
+                op = request.POST.get("op")
+            stats.name = "%s.%s" % (
+                type(self.handler).__name__,
+                self.crudmap.get(request.method.upper()) if op is None else op)
+            stats.record(failed=failed)
+
     def error_handler(self, e, request, meth, em_format):
         """
         Override piston's error_handler to fix bug #1228205 and generally
@@ -174,6 +239,138 @@ def admin_method(func):
     return wrapper
 
 
+def stream_json_list(handler, chunks):
+    """Return a response that streams `chunks` to the client as a JSON list.
+
+    Each chunk is a list of objects. They are rendered with the fields of
+    `handler`, as Piston's `JSONEmitter` would do, one chunk at a time so
+    that only one chunk is ever held in memory.
+
+    The body of a `StreamingHttpResponse` is iterated after the request's
+    transaction has ended, so each chunk is obtained and rendered within a
+    transaction of its own. Note that this means that the response as a
+    whole is not consistent with a single snapshot of the database.
+
+    :param handler: The handler whose fields are used for rendering.
+    :param chunks: An iterable of lists of objects. It is consumed lazily,
+        so it can be a generator that queries the database.
+    """
+    chunks = iter(chunks)
+
+    def render_next_chunk():
+        with transaction.atomic():
+            chunk = next(chunks, None)
+            if chunk is None:
+                return None
+            emitter = JSONEmitter(
+                chunk, typemapper, handler, handler.fields,
+                handler.is_anonymous)
+            return ",\n".join(
+                json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+                for data in emitter.construct())
+
+    def render():
+        yield "["
+        separator = "\n"
+        for content in iter(render_next_chunk, None):
+            if len(content) > 0:
+                yield separator + content
+                separator = ",\n"
+        yield "\n]"
+
+    return StreamingHttpResponse(
+        render(), content_type="application/json; charset=utf-8")
+
+
+def summarise_rows(querysets, appended=()):
+    """Summarise the rows of each of `querysets`, in a single query.
+
+    Each summary is a tuple of strings that changes whenever a row is added
+    to, removed from, or changed in the query set. For models with an
+    `updated` timestamp it's made from the number of rows, the sum of their
+    primary keys, and the sum of their `updated` timestamps; the latter,
+    unlike the latest `updated` timestamp, also changes when a transaction
+    that began before the latest change commits after it. Other models are
+    summarised from the number of rows and a hash of the text of each row.
+
+    :param querysets: A sequence of query sets to summarise.
+    :param appended: A sequence of query sets of rows that are only ever
+        appended or deleted, never changed, such as events. These are
+        summarised by their first and last ids only, which is cheap because
+        it uses the primary key's index.
+    :return: A list of summaries, one for each of `querysets` followed by
+        one for each of `appended`.
+    """
+    selects, params = [], []
+    for queryset in querysets:
+        queryset = queryset.order_by()
+        meta = queryset.model._meta
+        field_names = {field.name for field in meta.fields}
+        if "updated" in field_names:
+            queryset = queryset.values_list(meta.pk.name, "updated")
+            summary = (
+                "COUNT(*)", "SUM(%s)" % meta.pk.column,
+                "SUM((EXTRACT(EPOCH FROM updated) * 1000000)::bigint)")
+        else:
+            summary = ("COUNT(*)", "SUM(hashtext(summarised::text))")
+        sql, sql_params = queryset.query.sql_with_params()
+        selects.append((summary, sql))
+        params.extend(sql_params)
+    for queryset in appended:
+        queryset = queryset.order_by().values_list("id")
+        sql, sql_params = queryset.query.sql_with_params()
+        selects.append((("MIN(id)", "MAX(id)"), sql))
+        params.extend(sql_params)
+    if len(selects) == 0:
+        return []
+    query = " UNION ALL ".join(
+        "SELECT %d AS index, ARRAY[%s] AS summary FROM (%s) AS summarised" % (
+            index, ", ".join(
+                "(%s)::text" % expression for expression in summary), sql)
+        for index, (summary, sql) in enumerate(selects))
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            "SELECT summary FROM (%s) AS summaries ORDER BY index" % query,
+            params)
+        return [tuple(summary) for summary, in cursor.fetchall()]
+
+
+def conditional(get_validators):
+    """Decorator to support conditional GETs of an operation.
+
+    An ETag is made from the values returned by `get_validators`, which is
+    called with the handler, together with the requesting user and the
+    request's path and query string. If that ETag matches one in the
+    request's If-None-Match header a 304 (Not Modified) response is returned
+    without calling the operation at all. Otherwise the operation's result
+    is rendered as JSON and returned with the ETag.
+
+    The values returned by `get_validators` must change whenever the
+    operation's result could; `summarise_rows` computes suitable values
+    cheaply. This is handled by `OperationsHandlerMixin.dispatch`, so calling
+    the operation directly is not affected.
+    """
+
+    def _decorator(func):
+        func.validators = get_validators
+        return func
+
+    return _decorator
+
+
+def make_etag(request, validators):
+    """Return a quoted ETag for `request` from `validators`.
+
+    The API description hash is included too, so that an upgrade that changes
+    how results are rendered makes cached results stale.
+    """
+    validators = (
+        get_api_description_hash(), request.user.id,
+        request.user.is_superuser, request.get_full_path(), validators)
+    return quote_etag(
+        hashlib.sha1(repr(validators).encode("utf-8")).hexdigest())
+
+
 class OperationsHandlerType(HandlerMetaClass):
     """Type for handlers that dispatch operations.
 
@@ -306,8 +503,32 @@ class OperationsHandlerMixin:
         if function is None:
             raise MAASAPIBadRequest(
                 "Unrecognised signature: method=%s op=%s" % signature)
-        else:
+        elif getattr(function, "validators", None) is None:
             return function(self, request, *args, **kwargs)
+        else:
+            return self._dispatch_conditionally(
+                function, request, *args, **kwargs)
+
+    def _dispatch_conditionally(self, function, request, *args, **kwargs):
+        """Call `function`, unless the client's copy is up to date.
+
+        See `conditional`.
+        """
+        etag = make_etag(request, function.validators(self))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            result = function(self, request, *args, **kwargs)
+            if isinstance(result, HttpResponseBase):
+                response = result
+            else:
+                emitter = JSONEmitter(
+                    result, typemapper, self, self.fields, self.is_anonymous)
+                response = HttpResponse(
+                    emitter.render(request),
+                    content_type="application/json; charset=utf-8")
+        if response.status_code in (http.client.OK, http.client.NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
 
     @classmethod
     def decorate(cls, func):
@@ -11,6 +11,7 @@ from operator import itemgetter
 
 from django.conf import settings
 from maasserver.forms.settings import CONFIG_ITEMS_KEYS
+from maasserver.handlerstats import handler_stats
 from maasserver.models import PackageRepository
 from maasserver.models.config import (
     Config,
@@ -23,6 +24,7 @@ from maasserver.testing.osystems import (
     make_usable_osystem,
     patch_usable_osystems,
 )
+from maasserver.utils.converters import json_load_bytes
 from maasserver.utils.django_urls import reverse
 from maastesting.matchers import DocTestMatches
 from maastesting.testcase import MAASTestCase
@@ -30,10 +32,13 @@ from testtools.content import text_content
 from testtools.matchers import (
     AfterPreprocessing,
     Equals,
+    GreaterThan,
+    IsInstance,
     MatchesAll,
     MatchesDict,
     MatchesListwise,
     MatchesStructure,
+    StartsWith,
 )
 
 # Names forbidden for use via the Web API.
@@ -305,3 +310,63 @@ class MAASHandlerAPITest(APITestCase.ForUser):
             })
         self.assertEqual(http.client.OK, response.status_code)
         self.assertTrue(Config.objects.get_config("prefer_v4_proxy"))
+
+
+class MAASHandlerStatsAPITest(APITestCase.ForUser):
+
+    def setUp(self):
+        super(MAASHandlerStatsAPITest, self).setUp()
+        self.addCleanup(handler_stats.reset)
+
+    def test_handler_stats_requires_admin(self):
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "handler_stats"})
+        self.assertEqual(
+            http.client.FORBIDDEN, response.status_code, response.content)
+
+    def test_handler_stats_returns_nothing_when_disabled(self):
+        self.become_admin()
+        self.client.get(reverse('maas_handler'), {
+            "op": "get_config", "name": "maas_name"})
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "handler_stats"})
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        self.assertEqual([], json_load_bytes(response.content))
+
+    def test_handler_stats_returns_api_operations(self):
+        self.become_admin()
+        self.patch(settings, "DEBUG_HANDLER_STATS", True)
+        self.client.get(reverse('maas_handler'), {
+            "op": "get_config", "name": "maas_name"})
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "handler_stats"})
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        [stats] = json_load_bytes(response.content)
+        self.assertThat(stats, MatchesDict({
+            "kind": Equals("api"),
+            "name": Equals("MaasHandler.get_config"),
+            "calls": Equals(1),
+            "errors": Equals(0),
+            "seconds": IsInstance(float),
+            "queries": GreaterThan(0),
+            "query_seconds": IsInstance(float),
+            "response_bytes": GreaterThan(0),
+        }))
+
+    def test_handler_metrics_returns_prometheus_text(self):
+        self.become_admin()
+        self.patch(settings, "DEBUG_HANDLER_STATS", True)
+        self.client.get(reverse('maas_handler'), {
+            "op": "get_config", "name": "maas_name"})
+        response = self.client.get(
+            reverse('maas_handler'), {"op": "handler_metrics"})
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        self.assertThat(
+            response["Content-Type"], StartsWith("text/plain"))
+        self.assertIn(
+            'maas_handler_calls_total{kind="api",'
+            'name="MaasHandler.get_config"} 1',
+            response.content.decode("utf-8").splitlines())
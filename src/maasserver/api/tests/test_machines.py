@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from functools import partial
 import http.client
 import json
 import random
@@ -340,10 +341,27 @@ class TestMachinesAPI(APITestCase.ForUser):
         # `default_gateways`, `health_status`, 'special_filesystems' and
         # 'resource_pool' the number of queries is not the same but it is
         # proportional to the number of machines.
-        DEFAULT_NUM = 61
+        DEFAULT_NUM = 62
         self.assertEqual(DEFAULT_NUM + (10 * 6), num_queries1)
         self.assertEqual(DEFAULT_NUM + (20 * 6), num_queries2)
 
+    def test_GET_machines_query_budget(self):
+        # MachinesHandler.read is NodesHandler.read. Each machine costs a
+        # fixed number of queries for the fields listed in the comment above;
+        # anything beyond that is a new N+1 query.
+        self.patch(
+            middleware.ExternalComponentsMiddleware,
+            '_check_rack_controller_connectivity')
+
+        def populate(count):
+            for _ in range(count):
+                node = factory.make_Node_with_Interface_on_Subnet()
+                factory.make_VirtualBlockDevice(node=node)
+
+        self.assertQueryBudget(
+            populate, partial(self.client.get, reverse('machines_handler')),
+            per_item=6)
+
     def test_GET_without_machines_returns_empty_list(self):
         # If there are no machines to list, the "read" op still works but
         # returns an empty list.
@@ -2662,6 +2680,56 @@ class TestMachinesAPI(APITestCase.ForUser):
                 self.user.username, 'virsh', hostname, None, None,
                 False, None, None, None, None, None))
 
+    def test_POST_bulk_action_performs_action(self):
+        self.become_admin()
+        machines = [
+            factory.make_Node(status=NODE_STATUS.DEPLOYED)
+            for _ in range(3)
+        ]
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'bulk_action',
+                'action': 'lock',
+                'machines': [machine.system_id for machine in machines],
+            })
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        self.assertEqual(
+            {machine.system_id: None for machine in machines},
+            json.loads(
+                response.content.decode(settings.DEFAULT_CHARSET)))
+        for machine in machines:
+            self.assertTrue(reload_object(machine).locked)
+
+    def test_POST_bulk_action_reports_machines_it_is_not_available_for(self):
+        self.become_admin()
+        deployed = factory.make_Node(status=NODE_STATUS.DEPLOYED)
+        new = factory.make_Node(status=NODE_STATUS.NEW)
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'bulk_action',
+                'action': 'lock',
+                'machines': [deployed.system_id, new.system_id],
+            })
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual({
+            deployed.system_id: None,
+            new.system_id: "lock action is not available for this node.",
+        }, parsed_result)
+        self.assertFalse(reload_object(new).locked)
+
+    def test_POST_bulk_action_fails_if_machines_do_not_exist(self):
+        response = self.client.post(
+            reverse('machines_handler'), {
+                'op': 'bulk_action',
+                'action': 'lock',
+                'machines': [factory.make_name("system_id")],
+            })
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
+
 
 class TestPowerState(APITransactionTestCase.ForUser):
 
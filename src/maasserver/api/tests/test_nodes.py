@@ -11,6 +11,7 @@ import random
 
 from django.conf import settings
 from django.http import QueryDict
+from maasserver import urls_api
 from maasserver.api import nodes as nodes_module
 from maasserver.api.utils import get_overridden_query_dict
 from maasserver.enum import (
@@ -20,13 +21,41 @@ from maasserver.enum import (
     NODE_TYPE_CHOICES,
 )
 from maasserver.exceptions import MAASAPIValidationError
+from maasserver.models import (
+    Device,
+    Machine,
+    Node,
+    RackController,
+)
 from maasserver.testing.api import APITestCase
 from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils import ignore_unused
 from maasserver.utils.django_urls import reverse
 from maasserver.utils.orm import reload_object
 
 
+class TestGetListedFields(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestGetListedFields, self).setUp()
+        # Handlers are registered when they're imported, as they all are by
+        # the API's URLs.
+        ignore_unused(urls_api)
+
+    def test__includes_fields_of_handlers_for_the_model(self):
+        fields = nodes_module.get_listed_fields(RackController)
+        self.assertIn("service_set", fields)
+        self.assertIn("version", fields)
+        self.assertNotIn("owner", fields)
+
+    def test__includes_fields_of_handlers_for_all_node_types(self):
+        fields = nodes_module.get_listed_fields(Node)
+        self.assertIn("service_set", fields)
+        self.assertIn("owner", fields)
+        self.assertIn("parent", fields)
+
+
 class TestIsRegisteredAPI(APITestCase.ForAnonymousAndUserAndAdmin):
 
     def test_is_registered_returns_True_if_node_registered(self):
@@ -591,6 +620,35 @@ class TestNodesAPI(APITestCase.ForUser):
             [node.system_id for node in nodes],
             extract_system_ids(parsed_result))
 
+    def test_GET_streams_nodes_when_there_are_more_than_a_chunk(self):
+        self.patch(nodes_module, "NODES_CHUNK_SIZE", 2)
+        nodes = [factory.make_Node() for _ in range(5)]
+        response = self.client.get(reverse('nodes_handler'))
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertTrue(response.streaming)
+        parsed_result = json.loads(
+            b"".join(response.streaming_content).decode(
+                settings.DEFAULT_CHARSET))
+        self.assertSequenceEqual(
+            [node.system_id for node in nodes],
+            extract_system_ids(parsed_result))
+
+    def test_GET_streams_the_same_nodes_as_are_otherwise_listed(self):
+        for _ in range(3):
+            factory.make_Node_with_Interface_on_Subnet()
+        factory.make_Node(node_type=NODE_TYPE.DEVICE, owner=self.user)
+        response = self.client.get(reverse('nodes_handler'))
+        self.assertFalse(response.streaming)
+        expected = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.patch(nodes_module, "NODES_CHUNK_SIZE", 2)
+        response = self.client.get(reverse('nodes_handler'))
+        self.assertTrue(response.streaming)
+        observed = json.loads(
+            b"".join(response.streaming_content).decode(
+                settings.DEFAULT_CHARSET))
+        self.assertEqual(expected, observed)
+
     def test_POST_set_zone_sets_zone_on_nodes(self):
         self.become_admin()
         node = factory.make_Node()
@@ -650,6 +708,30 @@ class TestNodesAPI(APITestCase.ForUser):
             http.client.METHOD_NOT_ALLOWED, response.status_code)
 
 
+class TestGetNodesInChunks(MAASServerTestCase):
+    """Tests for `get_nodes_in_chunks`."""
+
+    def test__yields_chunks_across_querysets(self):
+        machines = [factory.make_Machine() for _ in range(3)]
+        devices = [factory.make_Device() for _ in range(2)]
+        chunks = nodes_module.get_nodes_in_chunks(
+            [Machine.objects.all(), Device.objects.all()], 2)
+        self.assertEqual(
+            [machines[:2], [machines[2], devices[0]], devices[1:]],
+            list(chunks))
+
+    def test__yields_nothing_when_there_are_no_nodes(self):
+        chunks = nodes_module.get_nodes_in_chunks([Machine.objects.all()], 2)
+        self.assertEqual([], list(chunks))
+
+    def test__sets_node_on_interfaces(self):
+        node = factory.make_Node_with_Interface_on_Subnet()
+        [[node]] = nodes_module.get_nodes_in_chunks(
+            [Node.objects.filter(id=node.id)], 2)
+        [interface] = node.interface_set.all()
+        self.assertIs(node, interface.node)
+
+
 class TestPowersMixin(APITestCase.ForUser):
     """Test the powers mixin."""
 
@@ -6,6 +6,11 @@
 import http.client
 
 from maasserver.api import rackcontrollers
+from maasserver.enum import SERVICE_STATUS
+from maasserver.models import (
+    ControllerInfo,
+    Service,
+)
 from maasserver.testing.api import (
     APITestCase,
     explain_unexpected_response,
@@ -153,6 +158,30 @@ class TestRackControllersAPI(APITestCase.ForUser):
             ],
             list(parsed_result[0]))
 
+    def test_read_ETag_changes_when_service_status_changes(self):
+        rack = factory.make_RackController()
+        service = factory.make_Service(rack)
+        response = self.client.get(self.get_rack_uri())
+        etag = response["ETag"]
+        Service.objects.update_service_for(
+            rack, service.name,
+            factory.pick_enum(SERVICE_STATUS, but_not=[service.status]))
+        response = self.client.get(
+            self.get_rack_uri(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_read_ETag_changes_when_version_changes(self):
+        rack = factory.make_RackController()
+        ControllerInfo.objects.set_version(rack, "2.4.0")
+        response = self.client.get(self.get_rack_uri())
+        etag = response["ETag"]
+        ControllerInfo.objects.set_version(rack, "2.5.0")
+        response = self.client.get(
+            self.get_rack_uri(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
     def test_POST_import_boot_images_import_to_rack_controllers(self):
         from maasserver.clusterrpc import boot_images
         self.patch(boot_images, "RackControllersImporter")
@@ -175,6 +204,25 @@ class TestRackControllersAPI(APITestCase.ForUser):
             http.client.FORBIDDEN, response.status_code,
             explain_unexpected_response(http.client.FORBIDDEN, response))
 
+    def test_POST_refresh_boot_images_refreshes_cache(self):
+        from maasserver.clusterrpc import boot_images
+        self.patch(boot_images, "refresh_boot_images_cache")
+        self.become_admin()
+        response = self.client.post(
+            self.get_rack_uri(), {'op': 'refresh_boot_images'})
+        self.assertEqual(
+            http.client.OK, response.status_code,
+            explain_unexpected_response(http.client.OK, response))
+        self.assertThat(
+            boot_images.refresh_boot_images_cache, MockCalledOnceWith())
+
+    def test_POST_refresh_boot_images_denied_if_not_admin(self):
+        response = self.client.post(
+            self.get_rack_uri(), {'op': 'refresh_boot_images'})
+        self.assertEqual(
+            http.client.FORBIDDEN, response.status_code,
+            explain_unexpected_response(http.client.FORBIDDEN, response))
+
     def test_GET_describe_power_types(self):
         get_all_power_types = self.patch(
             rackcontrollers, "get_all_power_types")
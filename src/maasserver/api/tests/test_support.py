@@ -8,20 +8,35 @@ __all__ = []
 
 from collections import namedtuple
 import http.client
+import json
 from unittest.mock import (
     call,
     Mock,
     sentinel,
 )
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.test.client import RequestFactory
+from maasserver.api import support
 from maasserver.api.doc import get_api_description_hash
+from maasserver.api.subnets import SubnetsHandler
 from maasserver.api.support import (
     admin_method,
     AdminRestrictedResource,
+    make_etag,
     OperationsHandlerMixin,
     OperationsResource,
     RestrictedResource,
+    stream_json_list,
+    summarise_rows,
+)
+from maasserver.api.zones import ZonesHandler
+from maasserver.models import (
+    ControllerInfo,
+    Event,
+    OwnerData,
+    Zone,
 )
 from maasserver.models.config import (
     Config,
@@ -31,11 +46,14 @@ from maasserver.testing.api import APITestCase
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.django_urls import reverse
+from maastesting.matchers import MockNotCalled
 from maastesting.testcase import MAASTestCase
 from piston3.authentication import NoAuthentication
 from testtools.matchers import (
     Equals,
+    HasLength,
     Is,
+    StartsWith,
 )
 
 
@@ -191,3 +209,199 @@ class TestOperationsHandlerMixin(MAASTestCase):
         handler.decorate(lambda thing: str(thing).upper())
         self.assertEqual({"foo": "SENTINEL.FOO"}, handler.exports)
         self.assertEqual({"bar": "SENTINEL.BAR"}, handler.anonymous.exports)
+
+
+class TestStreamJSONList(MAASServerTestCase):
+    """Tests for :py:func:`maasserver.api.support.stream_json_list`."""
+
+    def read_streamed_json(self, response):
+        return json.loads(
+            b"".join(response.streaming_content).decode(
+                settings.DEFAULT_CHARSET))
+
+    def test__renders_chunks_as_one_list(self):
+        zones = [factory.make_Zone() for _ in range(3)]
+        response = stream_json_list(
+            ZonesHandler(), [zones[:2], [], zones[2:]])
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            "application/json; charset=utf-8", response["Content-Type"])
+        self.assertEqual(
+            [zone.name for zone in zones],
+            [data["name"] for data in self.read_streamed_json(response)])
+
+    def test__renders_no_chunks_as_empty_list(self):
+        response = stream_json_list(ZonesHandler(), [])
+        self.assertEqual([], self.read_streamed_json(response))
+
+    def test__consumes_chunks_lazily(self):
+        chunks = iter([[factory.make_Zone()]])
+        stream_json_list(ZonesHandler(), chunks)
+        self.assertThat(list(chunks), HasLength(1))
+
+
+class TestSummariseRows(MAASServerTestCase):
+    """Tests for :py:func:`maasserver.api.support.summarise_rows`."""
+
+    def test__returns_nothing_for_no_query_sets(self):
+        self.assertEqual([], summarise_rows([]))
+
+    def test__returns_one_summary_per_query_set(self):
+        summaries = summarise_rows(
+            [Zone.objects.all(), OwnerData.objects.all()],
+            appended=[Event.objects.all()])
+        self.assertThat(summaries, HasLength(3))
+
+    def test__summary_changes_when_rows_are_added_changed_or_removed(self):
+        zone = factory.make_Zone()
+        summaries = [summarise_rows([Zone.objects.all()])]
+        zone.description = factory.make_name("description")
+        zone.save()
+        summaries.append(summarise_rows([Zone.objects.all()]))
+        other_zone = factory.make_Zone()
+        summaries.append(summarise_rows([Zone.objects.all()]))
+        other_zone.delete()
+        summaries.append(summarise_rows([Zone.objects.all()]))
+        # Removing the added row restores the earlier rows, and their summary.
+        self.assertEqual(
+            [True, True, True, False],
+            [summaries[i] != summaries[i + 1] for i in range(3)] +
+            [summaries[1] != summaries[3]])
+
+    def test__summary_is_stable(self):
+        factory.make_Zone()
+        self.assertEqual(
+            summarise_rows([Zone.objects.all()]),
+            summarise_rows([Zone.objects.all()]))
+
+    def test__summary_changes_when_untimestamped_rows_change(self):
+        node = factory.make_Node()
+        OwnerData.objects.set_owner_data(node, {"key": "value"})
+        before = summarise_rows([OwnerData.objects.all()])
+        OwnerData.objects.set_owner_data(node, {"key": "other"})
+        after = summarise_rows([OwnerData.objects.all()])
+        self.assertNotEqual(before, after)
+
+    def test__summarises_rows_keyed_by_other_than_id(self):
+        # ControllerInfo's primary key is its node, not an `id` column.
+        rack = factory.make_RackController()
+        ControllerInfo.objects.set_version(rack, "2.4.0")
+        before = summarise_rows([ControllerInfo.objects.all()])
+        ControllerInfo.objects.set_version(rack, "2.5.0")
+        after = summarise_rows([ControllerInfo.objects.all()])
+        self.assertNotEqual(before, after)
+
+    def test__summarises_appended_rows_by_first_and_last_id(self):
+        events = [factory.make_Event() for _ in range(3)]
+        self.assertEqual(
+            [(str(events[0].id), str(events[-1].id))],
+            summarise_rows([], appended=[Event.objects.all()]))
+
+    def test__summarises_filtered_query_sets(self):
+        zone = factory.make_Zone()
+        factory.make_Zone()
+        self.assertEqual(
+            summarise_rows([Zone.objects.filter(id=zone.id)]),
+            summarise_rows([Zone.objects.filter(name=zone.name)]))
+
+
+class TestConditional(APITestCase.ForUser):
+    """Tests for conditional GETs; see `conditional`."""
+
+    def test_GET_returns_ETag(self):
+        response = self.client.get(reverse('subnets_handler'))
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertThat(response["ETag"], StartsWith('"'))
+
+    def test_GET_returns_not_modified_for_matching_ETag(self):
+        factory.make_Subnet()
+        response = self.client.get(reverse('subnets_handler'))
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse('subnets_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+        self.assertEqual(b"", response.content)
+        self.assertEqual(etag, response["ETag"])
+
+    def test_dispatch_does_not_call_operation_for_matching_ETag(self):
+        function = Mock(validators=lambda handler: [sentinel.validator])
+        request = RequestFactory().get(reverse('subnets_handler'))
+        request.user = self.user
+        request.META["HTTP_IF_NONE_MATCH"] = make_etag(
+            request, [sentinel.validator])
+        response = SubnetsHandler()._dispatch_conditionally(function, request)
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+        self.assertThat(function, MockNotCalled())
+
+    def test_GET_returns_content_when_changed(self):
+        response = self.client.get(reverse('subnets_handler'))
+        etag = response["ETag"]
+        subnet = factory.make_Subnet()
+        response = self.client.get(
+            reverse('subnets_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+        self.assertEqual(
+            [subnet.id],
+            [data["id"] for data in json.loads(
+                response.content.decode(settings.DEFAULT_CHARSET))])
+
+    def test_ETag_depends_on_query_string(self):
+        response = self.client.get(reverse('machines_handler'))
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse('machines_handler'), {"hostname": "foo"},
+            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_ETag_changes_when_owner_is_renamed(self):
+        owner = factory.make_User()
+        factory.make_Node(owner=owner)
+        response = self.client.get(reverse('machines_handler'))
+        etag = response["ETag"]
+        owner.username = factory.make_name("owner")
+        owner.save()
+        response = self.client.get(
+            reverse('machines_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_ETag_changes_when_space_is_renamed(self):
+        space = factory.make_Space()
+        factory.make_Node_with_Interface_on_Subnet(
+            subnet=factory.make_Subnet(space=space))
+        response = self.client.get(reverse('machines_handler'))
+        etag = response["ETag"]
+        space.name = factory.make_name("space")
+        space.save()
+        response = self.client.get(
+            reverse('machines_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_ETag_depends_on_API_description(self):
+        response = self.client.get(reverse('subnets_handler'))
+        etag = response["ETag"]
+        self.patch(
+            support, "get_api_description_hash").return_value = (
+                factory.make_name("hash"))
+        response = self.client.get(
+            reverse('subnets_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response["ETag"])
+
+    def test_ETag_depends_on_user(self):
+        response = self.client.get(reverse('subnets_handler'))
+        etag = response["ETag"]
+        self.become_admin()
+        response = self.client.get(
+            reverse('subnets_handler'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+
+    def test_operations_called_directly_are_not_affected(self):
+        subnet = factory.make_Subnet()
+        request = RequestFactory().get(reverse('subnets_handler'))
+        request.user = self.user
+        self.assertItemsEqual(
+            [subnet], SubnetsHandler().read(request))
@@ -10,9 +10,11 @@ __all__ = [
     "get_boot_images_for",
     "get_common_available_boot_images",
     "is_import_boot_images_running",
+    "refresh_boot_images_cache",
 ]
 
 from collections import Sequence
+from datetime import timedelta
 from functools import partial
 from urllib.parse import (
     ParseResult,
@@ -21,8 +23,10 @@ from urllib.parse import (
 
 from maasserver.models import (
     BootResource,
+    ControllerInfo,
     RackController,
 )
+from maasserver.models.timestampedmodel import now
 from maasserver.rpc import (
     getAllClients,
     getClientFor,
@@ -36,6 +40,7 @@ from provisioningserver.rpc.cluster import (
     IsImportBootImagesRunning,
     ListBootImages,
     ListBootImagesV2,
+    ListOperatingSystems,
 )
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.utils import flatten
@@ -47,6 +52,7 @@ from twisted.internet import reactor
 from twisted.internet.defer import (
     DeferredList,
     DeferredSemaphore,
+    inlineCallbacks,
 )
 from twisted.protocols.amp import UnhandledCommand
 from twisted.python.failure import Failure
@@ -54,6 +60,11 @@ from twisted.python.failure import Failure
 
 log = LegacyLogger()
 
+# The boot images and operating systems that rack controllers report are
+# used instead of asking them until the reports are this old. Rack
+# controllers report after every import, and every five minutes otherwise.
+BOOT_IMAGES_CACHE_MAX_AGE = timedelta(minutes=15)
+
 
 def suppress_failures(responses):
     """Suppress failures returning from an async/gather operation.
@@ -101,12 +112,40 @@ def get_boot_images(rack_controller):
         return call.wait(30).get("images")
 
 
+@synchronous
+def get_cached_boot_images(system_ids):
+    """Obtain the boot images and operating systems recently reported by the
+    given rack controllers.
+
+    :return: A dict mapping the system ID of each rack controller that has
+        reported within `BOOT_IMAGES_CACHE_MAX_AGE` to a `(boot_images,
+        osystems, updated)` tuple. Rack controllers that have not are stale.
+    """
+    return ControllerInfo.objects.get_boot_images(
+        system_ids, since=now() - BOOT_IMAGES_CACHE_MAX_AGE)
+
+
 @synchronous
 def _get_available_boot_images():
-    """Obtain boot images available on connected rack controllers."""
+    """Obtain boot images available on connected rack controllers.
+
+    Rack controllers that have recently reported their boot images are not
+    asked for them again.
+    """
     listimages_v1 = lambda client: partial(client, ListBootImages)
     listimages_v2 = lambda client: partial(client, ListBootImagesV2)
-    clients_v2 = getAllClients()
+    clients = getAllClients()
+    cached = get_cached_boot_images([client.ident for client in clients])
+    for images, _, _ in cached.values():
+        # Convert each image to a frozenset of its items.
+        yield frozenset(
+            frozenset(image.items())
+            for image in images
+        )
+    clients_v2 = [
+        client for client in clients
+        if client.ident not in cached
+    ]
     responses_v2 = async.gather(map(listimages_v2, clients_v2))
     clients_v1 = []
     for i, response in enumerate(responses_v2):
@@ -193,6 +232,45 @@ def get_boot_images_for(
     return matching_images
 
 
+@asynchronous
+@inlineCallbacks
+def refresh_boot_images_cache():
+    """Ask every connected rack controller for its boot images and operating
+    systems, and cache them, as if each had reported them itself."""
+    clients = getAllClients()
+    responses = yield DeferredList(
+        (DeferredList(
+            [client(ListBootImagesV2), client(ListOperatingSystems)],
+            fireOnOneErrback=True, consumeErrors=True)
+         for client in clients),
+        consumeErrors=True)
+    reports = []
+    for client, (success, result) in zip(clients, responses):
+        if success:
+            (_, images), (_, osystems) = result
+            reports.append(
+                (client.ident, images["images"], osystems["osystems"]))
+        else:
+            log.err(
+                result.value.subFailure, "Rack controller (%s) did not "
+                "report its boot images." % client.ident)
+    yield deferToDatabase(_cache_boot_images, reports)
+
+
+@transactional
+def _cache_boot_images(reports):
+    """Cache `(system_id, images, osystems)` reports of rack controllers."""
+    racks = {
+        rack.system_id: rack
+        for rack in RackController.objects.filter(
+            system_id__in=[system_id for system_id, _, _ in reports])
+    }
+    for system_id, images, osystems in reports:
+        if system_id in racks:
+            ControllerInfo.objects.set_boot_images(
+                racks[system_id], images, osystems)
+
+
 undefined = object()
 
 
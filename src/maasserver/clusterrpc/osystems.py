@@ -11,8 +11,10 @@ __all__ = [
 
 from collections import defaultdict
 from functools import partial
+from itertools import chain
 from urllib.parse import urlparse
 
+from maasserver.clusterrpc.boot_images import get_cached_boot_images
 from maasserver.enum import BOOT_RESOURCE_TYPE
 from maasserver.models import BootResource
 from maasserver.rpc import (
@@ -66,12 +68,28 @@ def gen_all_known_operating_systems():
     Each item yielded takes the same form as the ``osystems`` value from
     the :py:class:`provisioningserver.rpc.cluster.ListOperatingSystems`
     RPC command. Exactly matching duplicates are suppressed.
+
+    The operating systems that rack controllers have recently reported are
+    used in preference to asking them.
     """
     seen = defaultdict(list)
+    clients = getAllClients()
+    cached = get_cached_boot_images([client.ident for client in clients])
+    # Rack controllers that have recently reported their operating systems
+    # are not asked for them again.
+    cached = {
+        system_id: osystems
+        for system_id, (_, osystems, _) in cached.items()
+        if osystems
+    }
     responses = async.gather(
         partial(client, ListOperatingSystems)
-        for client in getAllClients())
-    for response in suppress_failures(responses):
+        for client in clients
+        if client.ident not in cached)
+    responses = chain(
+        ({"osystems": osystems} for osystems in cached.values()),
+        suppress_failures(responses))
+    for response in responses:
         for osystem in response["osystems"]:
             name = osystem["name"]
             if osystem not in seen[name]:
@@ -5,7 +5,9 @@
 
 __all__ = [
     "power_off_node",
+    "power_off_nodes",
     "power_on_node",
+    "power_on_nodes",
 ]
 
 from functools import partial
@@ -21,7 +23,9 @@ from provisioningserver.rpc.cluster import (
     PowerCycle,
     PowerDriverCheck,
     PowerOff,
+    PowerOffMany,
     PowerOn,
+    PowerOnMany,
     PowerQuery,
 )
 from provisioningserver.rpc.exceptions import PowerActionAlreadyInProgress
@@ -31,7 +35,10 @@ from provisioningserver.utils.twisted import (
     FOREVER,
 )
 from twisted.internet import reactor
-from twisted.internet.defer import DeferredList
+from twisted.internet.defer import (
+    DeferredList,
+    maybeDeferred,
+)
 from twisted.protocols.amp import UnhandledCommand
 
 
@@ -86,6 +93,115 @@ power_off_node = partial(power_node, PowerOff)
 power_on_node = partial(power_node, PowerOn)
 
 
+# The commands that power-on/off many nodes with one call.
+POWER_MANY_COMMANDS = {
+    PowerOff: PowerOffMany,
+    PowerOn: PowerOnMany,
+}
+
+
+# The most nodes powered on/off with one call to a rack controller. This
+# keeps each call well within the limit on the size of an AMP value.
+POWER_MANY_BATCH_SIZE = 100
+
+
+def _power_many(command, client, nodes):
+    """Power-on/off `nodes` with one call to `client`.
+
+    See `power_nodes`.
+    """
+    d = client(POWER_MANY_COMMANDS[command], nodes=[
+        {
+            "system_id": system_id,
+            "hostname": hostname,
+            "power_type": power_info.power_type,
+            "context": power_info.power_parameters,
+        }
+        for system_id, hostname, power_info in nodes
+    ])
+
+    def cb_failures(response):
+        results = dict.fromkeys(system_id for system_id, _, _ in nodes)
+        for failure in response["failures"]:
+            # As in `power_node`, only a power action that is already in
+            # progress is a problem here; other failures are reported by
+            # the rack controller.
+            if failure["error"] == "PowerActionAlreadyInProgress":
+                results[failure["system_id"]] = PowerProblem(
+                    failure["message"])
+        return results
+
+    def eb_unhandled_command(failure):
+        failure.trap(UnhandledCommand)
+        # The rack controller hasn't been upgraded to support this command
+        # yet, so power on/off each node in turn.
+        ds = [
+            maybeDeferred(power_node, command, client, *node)
+            for node in nodes
+        ]
+        d = DeferredList(ds, consumeErrors=True)
+        d.addCallback(lambda results: {
+            system_id: (None if success else result.value)
+            for (system_id, _, _), (success, result) in zip(nodes, results)
+        })
+        return d
+
+    d.addCallbacks(cb_failures, eb_unhandled_command)
+    return d
+
+
+@asynchronous(timeout=15)
+def power_nodes(command, client, nodes):
+    """Power-on/off the given nodes with as few calls to `client` as possible.
+
+    The nodes are sent to the rack controller up to `POWER_MANY_BATCH_SIZE`
+    at a time. If the rack controller does not know the command for many
+    nodes, each node is powered on/off with its own call instead.
+
+    :param command: The `amp.Command` to call for each node; the power
+        of all the nodes is changed with the corresponding command from
+        `POWER_MANY_COMMANDS`.
+    :param client: The `rpc.common.Client` of the rack controller to perform
+        the power action.
+    :param nodes: A list of ``(system_id, hostname, power_info)`` tuples.
+    :return: A :py:class:`twisted.internet.defer.Deferred` that will fire
+        with a dict mapping the system_id of each node to `None`, or to the
+        exception that `power_node` would have failed with for that node.
+        When a call fails outright, each of the nodes sent in that call is
+        mapped to the exception it failed with.
+    """
+    log.debug(
+        "Asking rack controller to power on/off {count} nodes.",
+        count=len(nodes))
+    batches = [
+        nodes[index:index + POWER_MANY_BATCH_SIZE]
+        for index in range(0, len(nodes), POWER_MANY_BATCH_SIZE)
+    ]
+    ds = [
+        maybeDeferred(_power_many, command, client, batch)
+        for batch in batches
+    ]
+
+    def cb_merge(results):
+        merged = {}
+        for batch, (success, result) in zip(batches, results):
+            if success:
+                merged.update(result)
+            else:
+                merged.update(
+                    (system_id, result.value)
+                    for system_id, _, _ in batch)
+        return merged
+
+    d = DeferredList(ds, consumeErrors=True)
+    d.addCallback(cb_merge)
+    return d
+
+
+power_off_nodes = partial(power_nodes, PowerOff)
+power_on_nodes = partial(power_nodes, PowerOn)
+
+
 @asynchronous(timeout=30)
 def power_cycle(client, system_id, hostname, power_info):
     """Power cycle the node.
@@ -15,6 +15,7 @@ from unittest.mock import (
 )
 from urllib.parse import urlparse
 
+from django.db import transaction
 from maasserver.bootresources import get_simplestream_endpoint
 from maasserver.clusterrpc import boot_images as boot_images_module
 from maasserver.clusterrpc.boot_images import (
@@ -24,11 +25,15 @@ from maasserver.clusterrpc.boot_images import (
     get_common_available_boot_images,
     is_import_boot_images_running,
     RackControllersImporter,
+    refresh_boot_images_cache,
 )
 from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.clusterrpc.testing.osystems import make_rpc_osystem
 from maasserver.enum import BOOT_RESOURCE_TYPE
+from maasserver.models import ControllerInfo
 from maasserver.models.config import Config
 from maasserver.models.signals import bootsources
+from maasserver.models.timestampedmodel import now
 from maasserver.rpc import getAllClients
 from maasserver.rpc.testing.fixtures import (
     MockLiveRegionToClusterRPCFixture,
@@ -56,6 +61,7 @@ from provisioningserver.rpc.cluster import (
     ImportBootImages,
     ListBootImages,
     ListBootImagesV2,
+    ListOperatingSystems,
 )
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.testing.boot_images import (
@@ -334,6 +340,64 @@ class TestGetAvailableBootImages(MAASTransactionServerTestCase):
 
         self.assertItemsEqual([], self.get())
 
+    def test_uses_boot_images_reported_by_clusters(self):
+        rack = factory.make_RackController()
+        images = [make_rpc_boot_image() for _ in range(3)]
+        with transaction.atomic():
+            ControllerInfo.objects.set_boot_images(rack, images)
+        self.useFixture(RunningClusterRPCFixture())
+
+        clients = getAllClients()
+        callRemote = self.patch(clients[0]._conn, "callRemote")
+
+        self.assertItemsEqual(images, self.get())
+        self.assertThat(callRemote, MockNotCalled())
+
+    def test_asks_clusters_when_reported_boot_images_are_stale(self):
+        rack = factory.make_RackController()
+        with transaction.atomic():
+            ControllerInfo.objects.set_boot_images(
+                rack, [make_rpc_boot_image()])
+            ControllerInfo.objects.filter(node=rack).update(
+                boot_images_updated=(
+                    now() - boot_images_module.BOOT_IMAGES_CACHE_MAX_AGE))
+        self.useFixture(RunningClusterRPCFixture())
+
+        images = [make_rpc_boot_image() for _ in range(3)]
+        clients = getAllClients()
+        callRemote = self.patch(clients[0]._conn, "callRemote")
+        callRemote.return_value = succeed({'images': images})
+
+        self.assertItemsEqual(images, self.get())
+
+
+class TestRefreshBootImagesCache(MAASTransactionServerTestCase):
+    """Tests for `refresh_boot_images_cache`."""
+
+    def test_caches_boot_images_and_osystems_of_clusters(self):
+        rack = factory.make_RackController()
+        images = [make_rpc_boot_image() for _ in range(3)]
+        osystems = [make_rpc_osystem()]
+
+        self.useFixture(RegionEventLoopFixture("rpc"))
+        self.useFixture(RunningEventLoopFixture())
+        rpc = self.useFixture(MockLiveRegionToClusterRPCFixture())
+        cluster = rpc.makeCluster(
+            rack, ListBootImagesV2, ListOperatingSystems)
+        cluster.ListBootImagesV2.return_value = succeed({'images': images})
+        cluster.ListOperatingSystems.return_value = succeed(
+            {'osystems': osystems})
+
+        refresh_boot_images_cache().wait(10)
+
+        with transaction.atomic():
+            cached = ControllerInfo.objects.get_boot_images([rack.system_id])
+        self.assertEqual([rack.system_id], list(cached))
+        cached_images, cached_osystems, updated = cached[rack.system_id]
+        self.assertItemsEqual(images, cached_images)
+        self.assertEqual(osystems, cached_osystems)
+        self.assertIsNotNone(updated)
+
 
 class TestGetBootImagesFor(MAASTransactionServerTestCase):
     """Tests for `get_boot_images_for`."""
@@ -16,15 +16,18 @@ from maasserver.clusterrpc.osystems import (
     get_preseed_data,
     validate_license_key,
 )
+from maasserver.clusterrpc.testing.osystems import make_rpc_osystem
 from maasserver.enum import (
     BOOT_RESOURCE_TYPE,
     PRESEED_TYPE,
 )
+from maasserver.models import ControllerInfo
 from maasserver.rpc import getAllClients
 from maasserver.rpc.testing.fixtures import RunningClusterRPCFixture
 from maasserver.testing.architecture import make_usable_architecture
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import MockNotCalled
 from metadataserver.models import NodeKey
 from provisioningserver.rpc.exceptions import NoSuchOperatingSystem
 from testtools.matchers import (
@@ -98,6 +101,16 @@ class TestGenAllKnownOperatingSystems(MAASServerTestCase):
         self.assertItemsEqual(
             example["osystems"], gen_all_known_operating_systems())
 
+    def test_uses_oses_reported_by_clusters(self):
+        rack = factory.make_RackController()
+        osystems = [make_rpc_osystem()]
+        ControllerInfo.objects.set_boot_images(rack, [], osystems)
+        self.useFixture(RunningClusterRPCFixture())
+        callRemote = self.patch(getAllClients()[0]._conn, "callRemote")
+
+        self.assertItemsEqual(osystems, gen_all_known_operating_systems())
+        self.assertThat(callRemote, MockNotCalled())
+
     def test_ignores_failures_when_talking_to_clusters(self):
         factory.make_RackController()
         factory.make_RackController()
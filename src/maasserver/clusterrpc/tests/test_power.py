@@ -15,12 +15,15 @@ from maasserver.clusterrpc.power import (
     power_cycle,
     power_driver_check,
     power_off_node,
+    power_off_nodes,
     power_on_node,
+    power_on_nodes,
     power_query,
     power_query_all,
 )
 from maasserver.enum import POWER_STATE
 from maasserver.exceptions import PowerProblem
+from maasserver.models.node import PowerInfo
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import (
     MAASServerTestCase,
@@ -33,7 +36,9 @@ from provisioningserver.rpc.cluster import (
     PowerCycle,
     PowerDriverCheck,
     PowerOff,
+    PowerOffMany,
     PowerOn,
+    PowerOnMany,
     PowerQuery,
 )
 from provisioningserver.rpc.exceptions import PowerActionAlreadyInProgress
@@ -45,6 +50,7 @@ from twisted.internet.defer import (
     succeed,
 )
 from twisted.internet.task import deferLater
+from twisted.protocols.amp import UnhandledCommand
 
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -87,6 +93,150 @@ class TestPowerNode(MAASServerTestCase):
                 node.get_effective_power_info())
 
 
+class TestPowerNodes(MAASServerTestCase):
+    """Tests for `power_on_nodes` and `power_off_nodes`."""
+
+    scenarios = (
+        ("PowerOn", {
+            "power_func": power_on_nodes,
+            "command": PowerOn,
+            "many_command": PowerOnMany,
+        }),
+        ("PowerOff", {
+            "power_func": power_off_nodes,
+            "command": PowerOff,
+            "many_command": PowerOffMany,
+        }),
+    )
+
+    def make_nodes(self, count=2):
+        return [
+            (node.system_id, node.hostname, node.get_effective_power_info())
+            for node in (factory.make_Node() for _ in range(count))
+        ]
+
+    def test__powers_all_nodes_with_one_call(self):
+        nodes = self.make_nodes()
+        client = Mock()
+        client.return_value = succeed({"failures": []})
+
+        results = wait_for_reactor(self.power_func)(client, nodes)
+
+        self.assertEqual(
+            {system_id: None for system_id, _, _ in nodes}, results)
+        self.assertThat(
+            client,
+            MockCalledOnceWith(self.many_command, nodes=[
+                {
+                    "system_id": system_id,
+                    "hostname": hostname,
+                    "power_type": power_info.power_type,
+                    "context": power_info.power_parameters,
+                }
+                for system_id, hostname, power_info in nodes
+            ]))
+
+    def test__returns_power_problem_for_action_in_progress(self):
+        nodes = self.make_nodes()
+        (in_progress, _, _), (failed, _, _) = nodes
+        client = Mock()
+        client.return_value = succeed({"failures": [
+            {
+                "system_id": in_progress,
+                "error": "PowerActionAlreadyInProgress",
+                "message": "Houston, we have a problem.",
+            },
+            {
+                "system_id": failed,
+                "error": "PowerActionFail",
+                "message": "Reported by the rack controller.",
+            },
+        ]})
+
+        results = wait_for_reactor(self.power_func)(client, nodes)
+
+        self.assertIsInstance(results[in_progress], PowerProblem)
+        self.assertEqual(
+            "Houston, we have a problem.", str(results[in_progress]))
+        self.assertIsNone(results[failed])
+
+    def test__powers_each_node_if_command_is_unhandled(self):
+        nodes = self.make_nodes()
+        (in_progress, _, _), (succeeded, _, _) = nodes
+
+        def call(command, **kwargs):
+            if command is self.many_command:
+                return fail(UnhandledCommand())
+            elif kwargs["system_id"] == in_progress:
+                return fail(PowerActionAlreadyInProgress("In progress."))
+            else:
+                return succeed({})
+
+        client = Mock(side_effect=call)
+
+        results = wait_for_reactor(self.power_func)(client, nodes)
+
+        self.assertIsInstance(results[in_progress], PowerProblem)
+        self.assertIsNone(results[succeeded])
+        self.assertEqual(3, client.call_count)
+
+    def make_ipmi_nodes(self, count):
+        # These are not saved; there are too many for that to be quick.
+        return [
+            (
+                factory.make_name("system_id"),
+                factory.make_name("hostname"),
+                PowerInfo(
+                    True, True, True, "ipmi", {
+                        "power_address": factory.make_ipv4_address(),
+                        "power_user": factory.make_name("user"),
+                        "power_pass": factory.make_name("pass"),
+                        "power_driver": "LAN_2_0",
+                        "mac_address": factory.make_mac_address(),
+                    }),
+            )
+            for _ in range(count)
+        ]
+
+    def test__powers_a_few_hundred_nodes_in_batches(self):
+        nodes = self.make_ipmi_nodes(250)
+        client = Mock()
+        client.side_effect = lambda command, nodes: succeed({"failures": []})
+
+        results = wait_for_reactor(self.power_func)(client, nodes)
+
+        self.assertEqual(
+            {system_id: None for system_id, _, _ in nodes}, results)
+        self.assertEqual(
+            [
+                [system_id for system_id, _, _ in nodes[:100]],
+                [system_id for system_id, _, _ in nodes[100:200]],
+                [system_id for system_id, _, _ in nodes[200:]],
+            ],
+            [
+                [node["system_id"] for node in call[1]["nodes"]]
+                for call in client.call_args_list
+            ])
+        for call in client.call_args_list:
+            # Each batch fits into one AMP call.
+            arguments = self.many_command.makeArguments(call[1], None)
+            self.assertIsInstance(arguments.serialize(), bytes)
+
+    def test__fails_only_the_nodes_of_a_failed_batch(self):
+        nodes = self.make_ipmi_nodes(150)
+        exception = factory.make_exception()
+        client = Mock()
+        client.side_effect = [fail(exception), succeed({"failures": []})]
+
+        results = wait_for_reactor(self.power_func)(client, nodes)
+
+        self.assertEqual(
+            dict(
+                {system_id: exception for system_id, _, _ in nodes[:100]},
+                **{system_id: None for system_id, _, _ in nodes[100:]}),
+            results)
+
+
 class TestPowerCycle(MAASServerTestCase):
     """Tests for `power_cycle`."""
 
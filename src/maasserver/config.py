@@ -78,3 +78,9 @@ class RegionConfiguration(Configuration, metaclass=RegionConfigurationMeta):
         "debug_http",
         "Enable HTTP debugging. Logs all HTTP requests and HTTP responses.",
         StringBool(if_missing=False))
+    debug_handler_stats = ConfigurationOption(
+        "debug_handler_stats",
+        "Record the number of calls, time taken, number of queries and time "
+        "spent in queries, and response size for each websocket method and "
+        "API operation.",
+        StringBool(if_missing=False))
@@ -51,6 +51,8 @@ DEBUG = True
 DEBUG_QUERIES = os.environ.get("MAAS_DEBUG_QUERIES", "0") == "1"
 DEBUG_QUERIES_LOG_ALL = (
     os.environ.get("MAAS_DEBUG_QUERIES_LOG_ALL", "0") == "1")
+DEBUG_HANDLER_STATS = (
+    os.environ.get("MAAS_DEBUG_HANDLER_STATS", "0") == "1")
 
 # Invalid strings should be visible.
 TEMPLATES[0]['OPTIONS']['string_if_invalid'] = '#### INVALID STRING ####'
@@ -44,10 +44,12 @@ def _get_local_timezone(tzfilename='/etc/timezone'):
 ENABLE_HA = True if int(os.environ.get('ENABLE_HA', 0)) == 1 else False
 
 # Debugging: Detailed error reporting, log all query counts and time
-# when enabled, and optional log all HTTP requests and responses.
+# when enabled, and optional log all HTTP requests and responses. Handler
+# statistics can be recorded without enabling debug mode.
 DEBUG = False
 DEBUG_QUERIES = False
 DEBUG_HTTP = False
+DEBUG_HANDLER_STATS = False
 
 ADMINS = (
     # ('Your Name', 'your_email@example.com'),
@@ -116,6 +118,7 @@ try:
         DEBUG = config.debug
         DEBUG_QUERIES = config.debug_queries
         DEBUG_HTTP = config.debug_http
+        DEBUG_HANDLER_STATS = config.debug_handler_stats
         if DEBUG_QUERIES and not DEBUG:
             # For debug queries to work debug most also be on, so Django will
             # track the queries made.
@@ -91,6 +91,11 @@ def make_NonceCleanupService():
     return nonces_cleanup.NonceCleanupService()
 
 
+def make_EventCleanupService():
+    from maasserver import events_cleanup
+    return events_cleanup.EventCleanupService()
+
+
 def make_DNSPublicationGarbageService():
     from maasserver.dns import publication
     return publication.DNSPublicationGarbageService()
@@ -256,6 +261,11 @@ class RegionEventLoop:
             "factory": make_NonceCleanupService,
             "requires": [],
         },
+        "event-cleanup": {
+            "only_on_master": True,
+            "factory": make_EventCleanupService,
+            "requires": [],
+        },
         "dns-publication-cleanup": {
             "only_on_master": True,
             "factory": make_DNSPublicationGarbageService,
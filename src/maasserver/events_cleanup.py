@@ -0,0 +1,77 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Events cleanup utilities."""
+
+__all__ = [
+    'cleanup_old_events',
+    'EventCleanupService',
+    ]
+
+from datetime import timedelta
+
+from maasserver.models import (
+    Config,
+    Event,
+)
+from maasserver.models.timestampedmodel import now
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.utils.twisted import synchronous
+from twisted.application.internet import TimerService
+
+# The number of events deleted in each transaction. Keeping this bounded
+# stops the cleanup from holding locks on millions of rows at once.
+BATCH_SIZE = 10000
+
+
+@transactional
+def get_cutoff():
+    """Return the time before which events should be deleted.
+
+    Returns None if events are to be kept forever, i.e. the
+    `max_event_age` configuration is 0.
+    """
+    days = Config.objects.get_config('max_event_age')
+    if days is None or days <= 0:
+        return None
+    return now() - timedelta(days=days)
+
+
+@transactional
+def delete_old_events(cutoff, batch_size):
+    """Delete one batch of events created before `cutoff`."""
+    return Event.objects.delete_older_than(cutoff, batch_size)
+
+
+@synchronous
+def cleanup_old_events(batch_size=BATCH_SIZE):
+    """Delete events older than the configured `max_event_age`.
+
+    Events are deleted in batches of `batch_size`, each in its own
+    transaction, until no old events remain.
+
+    :return: The number of events deleted.
+    """
+    cutoff = get_cutoff()
+    if cutoff is None:
+        return 0
+    deleted = 0
+    while True:
+        count = delete_old_events(cutoff, batch_size)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+class EventCleanupService(TimerService, object):
+    """Service to periodically clean-up old events.
+
+    This will run immediately when it's started, then once again each
+    hour, though the interval can be overridden by passing it to the
+    constructor.
+    """
+
+    def __init__(self, interval=(60 * 60)):
+        super(EventCleanupService, self).__init__(
+            interval, deferToDatabase, cleanup_old_events)
@@ -0,0 +1,199 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Call statistics for websocket handler methods and API operations.
+
+This is opt-in: set `debug_handler_stats` in regiond.conf. When it's off
+the only cost is a check of the setting for each call.
+
+Statistics are kept in memory by each region process, so each request for
+them reports only the calls handled by the process that answered it.
+"""
+
+__all__ = [
+    "CallStats",
+    "handler_stats",
+    "is_enabled",
+]
+
+from contextlib import contextmanager
+from functools import partial
+import threading
+import time
+
+from django.conf import settings
+from django.db import (
+    connections,
+    DEFAULT_DB_ALIAS,
+)
+from django.db.backends.utils import CursorWrapper
+
+
+def is_enabled():
+    """Are handler statistics being recorded?"""
+    return getattr(settings, "DEBUG_HANDLER_STATS", False)
+
+
+class QueryTally:
+    """A count of queries and the total time they took."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.time += seconds
+
+
+class TallyingCursor(CursorWrapper):
+    """Cursor that adds each query it executes to a `QueryTally`.
+
+    Django's debug cursor records the time of each query rounded to the
+    millisecond, so most queries would seem to take no time at all.
+    """
+
+    def __init__(self, cursor, db, tally):
+        super(TallyingCursor, self).__init__(cursor, db)
+        self.tally = tally
+
+    def execute(self, sql, params=None):
+        started = time.perf_counter()
+        try:
+            return super(TallyingCursor, self).execute(sql, params)
+        finally:
+            self.tally.add(time.perf_counter() - started)
+
+    def executemany(self, sql, param_list):
+        started = time.perf_counter()
+        try:
+            return super(TallyingCursor, self).executemany(sql, param_list)
+        finally:
+            self.tally.add(time.perf_counter() - started)
+
+
+class CallStats:
+    """Statistics for a single call of a handler method or API operation.
+
+    :ivar kind: "websocket" or "api".
+    :ivar name: The name of the method or operation called.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.started = time.monotonic()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.response_size = 0
+
+    @contextmanager
+    def counting_queries(self):
+        """Count the queries made by this thread's database connection.
+
+        This forces the connection to make debug cursors, and makes them
+        `TallyingCursor`s in place of Django's own.
+        """
+        db = connections[DEFAULT_DB_ALIAS]
+        saved_make_debug_cursor = vars(db).get("make_debug_cursor")
+        saved_force_debug_cursor = db.force_debug_cursor
+        tally = QueryTally()
+        db.make_debug_cursor = partial(TallyingCursor, db=db, tally=tally)
+        db.force_debug_cursor = True
+        try:
+            yield
+        finally:
+            db.force_debug_cursor = saved_force_debug_cursor
+            if saved_make_debug_cursor is None:
+                del db.make_debug_cursor
+            else:
+                db.make_debug_cursor = saved_make_debug_cursor
+            self.query_count += tally.count
+            self.query_time += tally.time
+
+    def wrap(self, func):
+        """Return `func` wrapped so that its queries are counted."""
+        def counting(*args, **kwargs):
+            with self.counting_queries():
+                return func(*args, **kwargs)
+        return counting
+
+    def record(self, failed=False):
+        """Add this call to the `handler_stats`."""
+        handler_stats.add(self, time.monotonic() - self.started, failed)
+
+
+class HandlerStats:
+    """Accumulated statistics for each handler method and API operation."""
+
+    # (metric, help, field) for each statistic, in Prometheus terms.
+    metrics = (
+        ("maas_handler_calls_total",
+         "Number of calls.", "calls"),
+        ("maas_handler_errors_total",
+         "Number of calls that failed.", "errors"),
+        ("maas_handler_seconds_total",
+         "Wall time spent handling calls.", "seconds"),
+        ("maas_handler_queries_total",
+         "Number of database queries made.", "queries"),
+        ("maas_handler_query_seconds_total",
+         "Time spent in database queries.", "query_seconds"),
+        ("maas_handler_response_bytes_total",
+         "Size of the serialized responses.", "response_bytes"),
+    )
+
+    def __init__(self):
+        super(HandlerStats, self).__init__()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, call, seconds, failed=False):
+        """Add the statistics for `call`, which took `seconds`."""
+        with self._lock:
+            key = call.kind, call.name
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = dict.fromkeys(
+                    (field for _, _, field in self.metrics), 0)
+            stats["calls"] += 1
+            stats["errors"] += 1 if failed else 0
+            stats["seconds"] += seconds
+            stats["queries"] += call.query_count
+            stats["query_seconds"] += call.query_time
+            stats["response_bytes"] += call.response_size
+
+    def reset(self):
+        """Forget all statistics."""
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        """Return the statistics as a list of dicts, sorted by name."""
+        with self._lock:
+            return [
+                dict(stats, kind=kind, name=name)
+                for (kind, name), stats in sorted(self._stats.items())
+            ]
+
+    def render_prometheus(self):
+        """Render the statistics in Prometheus' text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for metric, help, field in self.metrics:
+            lines.append("# HELP %s %s" % (metric, help))
+            lines.append("# TYPE %s counter" % metric)
+            for stats in snapshot:
+                lines.append('%s{kind="%s",name="%s"} %s' % (
+                    metric, stats["kind"], _escape(stats["name"]),
+                    stats[field]))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label):
+    """Escape `label` for use as a Prometheus label value."""
+    return label.replace(
+        "\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Singleton.
+handler_stats = HandlerStats()
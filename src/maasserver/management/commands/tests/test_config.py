@@ -120,7 +120,9 @@ class TestConfigurationSet(MAASTestCase):
             value = random.randint(0, 60)
         elif self.option == "num_workers":
             value = random.randint(1, 16)
-        elif self.option in ["debug", "debug_queries", "debug_http"]:
+        elif self.option in [
+                "debug", "debug_queries", "debug_http",
+                "debug_handler_stats"]:
             value = random.choice(['true', 'false'])
         else:
             value = factory.make_name("foobar")
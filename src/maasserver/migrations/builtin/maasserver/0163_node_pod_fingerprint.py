@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2018-06-04 10:12
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    models,
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0162_storage_pools_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='pod_fingerprint',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=64, null=True),
+        ),
+    ]
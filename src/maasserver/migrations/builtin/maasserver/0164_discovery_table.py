@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import maasserver.fields
+
+# The `Discovery` model was backed by a view that joined every neighbour with
+# everything else on every read. It is now backed by a table that is kept up
+# to date by the triggers in maasserver.triggers.discovery, which also fill
+# the table when they are registered at the end of the upgrade. The columns
+# must be in the same order as in `DISCOVERY_SOURCE` there.
+discovery_create = """\
+DROP VIEW IF EXISTS maasserver_discovery;
+CREATE TABLE maasserver_discovery (
+    id integer NOT NULL PRIMARY KEY,
+    discovery_id text,
+    neighbour_id integer NOT NULL,
+    ip inet,
+    mac_address macaddr,
+    vid integer,
+    first_seen timestamp with time zone NOT NULL,
+    last_seen timestamp with time zone NOT NULL,
+    mdns_id integer,
+    hostname character varying(256),
+    observer_id integer NOT NULL,
+    observer_system_id character varying(41) NOT NULL,
+    observer_hostname character varying(255),
+    observer_interface_id integer NOT NULL,
+    observer_interface_name character varying(255),
+    fabric_id integer NOT NULL,
+    fabric_name character varying(256),
+    vlan_id integer NOT NULL,
+    is_external_dhcp boolean,
+    subnet_id integer,
+    subnet_cidr cidr,
+    subnet_prefixlen integer
+);
+CREATE UNIQUE INDEX maasserver_discovery_mac_address_ip_uniq
+    ON maasserver_discovery (mac_address, ip);
+CREATE INDEX maasserver_discovery_ip_idx
+    ON maasserver_discovery (ip);
+CREATE INDEX maasserver_discovery_discovery_id_idx
+    ON maasserver_discovery (discovery_id);
+CREATE INDEX maasserver_discovery_last_seen_idx
+    ON maasserver_discovery (last_seen);
+"""
+
+discovery_drop = (
+    "DROP TABLE IF EXISTS maasserver_discovery"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0163_node_pod_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mdns',
+            name='ip',
+            field=maasserver.fields.MAASIPAddressField(blank=True, db_index=True, default=None, editable=False, null=True, verbose_name='IP'),
+        ),
+        migrations.AlterField(
+            model_name='neighbour',
+            name='ip',
+            field=maasserver.fields.MAASIPAddressField(blank=True, db_index=True, default=None, editable=False, null=True, verbose_name='IP'),
+        ),
+        migrations.RunSQL(discovery_create, discovery_drop),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import (
+    migrations,
+    models,
+)
+import maasserver.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0164_discovery_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='controllerinfo',
+            name='boot_images',
+            field=maasserver.fields.JSONObjectField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='controllerinfo',
+            name='osystems',
+            field=maasserver.fields.JSONObjectField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='controllerinfo',
+            name='boot_images_updated',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
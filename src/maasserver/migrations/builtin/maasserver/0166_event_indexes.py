@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0165_controllerinfo_boot_images'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='event',
+            index_together=set([
+                ('node', 'id'),
+                ('type', 'id'),
+                ('created', 'id'),
+            ]),
+        ),
+    ]
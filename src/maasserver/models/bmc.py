@@ -29,7 +29,10 @@ from django.db.models import (
     SET_NULL,
     TextField,
 )
-from django.db.models.query import QuerySet
+from django.db.models.query import (
+    prefetch_related_objects,
+    QuerySet,
+)
 from maasserver import DefaultMeta
 from maasserver.clusterrpc.pods import decompose_machine
 from maasserver.enum import (
@@ -679,6 +682,7 @@ class Pod(BMC):
             zone=zone, **kwargs)
         machine.bmc = self
         machine.instance_power_parameters = discovered_machine.power_parameters
+        machine.pod_fingerprint = discovered_machine.fingerprint
         if not machine.hostname:
             machine.set_random_hostname()
         machine.save()
@@ -765,6 +769,7 @@ class Pod(BMC):
         existing_machine.power_state = discovered_machine.power_state
         existing_machine.instance_power_parameters = (
             discovered_machine.power_parameters)
+        existing_machine.pod_fingerprint = discovered_machine.fingerprint
 
         # If this machine is pre-existing or manually composed then we skip
         # syncing all the remaining information because MAAS commissioning
@@ -919,8 +924,20 @@ class Pod(BMC):
         existing_interface.tags = discovered_nic.tags
         existing_interface.save()
 
+    def _is_machine_unchanged(self, discovered_machine, existing_machine):
+        """Whether `discovered_machine` is the same as when `existing_machine`
+        was last synced from this pod, going by its fingerprint."""
+        return (
+            discovered_machine.fingerprint is not None and
+            existing_machine.bmc_id == self.id and
+            existing_machine.pod_fingerprint == discovered_machine.fingerprint)
+
     def sync_machines(self, discovered_machines, commissioning_user):
-        """Sync the machines on this pod from `discovered_machines`."""
+        """Sync the machines on this pod from `discovered_machines`.
+
+        Machines whose fingerprint is unchanged since the last sync are
+        skipped, so only the rows of changed machines are touched.
+        """
         all_macs = [
             interface.mac_address
             for machine in discovered_machines
@@ -930,8 +947,6 @@ class Pod(BMC):
             Node.objects.filter(
                 interface__mac_address__in=all_macs)
             .prefetch_related("interface_set")
-            .prefetch_related('blockdevice_set__physicalblockdevice')
-            .prefetch_related('blockdevice_set__virtualblockdevice')
             .distinct())
         machines = {
             machine.id: machine
@@ -942,6 +957,7 @@ class Pod(BMC):
             for machine in existing_machines
             for interface in machine.interface_set.all()
         }
+        changed_machines = []
         for discovered_machine in discovered_machines:
             existing_machine = self._find_existing_machine(
                 discovered_machine, mac_machine_map)
@@ -952,9 +968,18 @@ class Pod(BMC):
                     "%s: discovered new machine: %s" % (
                         self.name, new_machine.hostname))
             else:
-                self._sync_machine(discovered_machine, existing_machine)
-                existing_machines.remove(existing_machine)
+                if not self._is_machine_unchanged(
+                        discovered_machine, existing_machine):
+                    changed_machines.append(
+                        (discovered_machine, existing_machine))
                 machines.pop(existing_machine.id, None)
+        # Only load the block devices of the machines that need syncing.
+        prefetch_related_objects(
+            [existing_machine for _, existing_machine in changed_machines],
+            'blockdevice_set__physicalblockdevice',
+            'blockdevice_set__virtualblockdevice')
+        for discovered_machine, existing_machine in changed_machines:
+            self._sync_machine(discovered_machine, existing_machine)
         for _, remove_machine in machines.items():
             remove_machine.delete()
             podlog.warning(
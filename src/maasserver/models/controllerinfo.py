@@ -12,6 +12,7 @@ from collections import namedtuple
 from django.db.models import (
     CASCADE,
     CharField,
+    DateTimeField,
     Manager,
     OneToOneField,
 )
@@ -20,7 +21,10 @@ from maasserver.enum import NODE_TYPE
 from maasserver.fields import JSONObjectField
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.node import Node
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils.version import get_version_tuple
 
@@ -84,9 +88,41 @@ class ControllerInfoManager(Manager):
 
     def set_interface_update_info(self, controller, interfaces, hints):
         self.update_or_create(
-            defaults=dict(interfaces=interfaces, interface_update_hints=hints),
+            defaults=dict(
+                interfaces=interfaces,
+                interface_update_hints='' if hints is None else hints),
+            node=controller)
+
+    def set_boot_images(self, controller, images, osystems=None):
+        """Record the boot images and operating systems reported by the
+        given rack controller, and when they were reported."""
+        self.update_or_create(
+            defaults=dict(
+                boot_images=images,
+                osystems='' if osystems is None else osystems,
+                boot_images_updated=now()),
             node=controller)
 
+    def get_boot_images(self, system_ids, since=None):
+        """Return the boot images and operating systems last reported by the
+        given rack controllers.
+
+        :param system_ids: The system IDs of the rack controllers.
+        :param since: Ignore reports made before this time.
+        :return: A dict mapping each system ID that has reported boot images
+            to a `(boot_images, osystems, boot_images_updated)` tuple.
+        """
+        infos = self.filter(
+            node__system_id__in=system_ids, boot_images_updated__isnull=False)
+        if since is not None:
+            infos = infos.filter(boot_images_updated__gte=since)
+        return {
+            system_id: (images, osystems, updated)
+            for system_id, images, osystems, updated in infos.values_list(
+                'node__system_id', 'boot_images', 'osystems',
+                'boot_images_updated')
+        }
+
     def get_controller_version_info(self):
         versions = list(self.select_related('node').filter(
             node__node_type__in=(
@@ -206,6 +242,10 @@ class ControllerInfo(CleanSave, TimestampedModel):
     :ivar interfaces: Interfaces JSON last sent by the controller.
     :ivar interface_udpate_hints: Topology hints last sent by the controller
         during a call to update_interfaces().
+    :ivar boot_images: Boot images last reported by the rack controller.
+    :ivar osystems: Operating systems last reported by the rack controller.
+    :ivar boot_images_updated: When the rack controller last reported its
+        boot images, or `None` if it never has.
     """
 
     class Meta(DefaultMeta):
@@ -223,5 +263,11 @@ class ControllerInfo(CleanSave, TimestampedModel):
     interface_update_hints = JSONObjectField(
         max_length=(2 ** 15), blank=True, default='')
 
+    boot_images = JSONObjectField(blank=True, default='')
+
+    osystems = JSONObjectField(blank=True, default='')
+
+    boot_images_updated = DateTimeField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return "%s (%s)" % (self.__class__.__name__, self.node.hostname)
@@ -144,14 +144,16 @@ class Discovery(CleanSave, ViewModel):
     """A `Discovery` object represents the combined data for a network entity
     that MAAS believes has been discovered.
 
-    Note that this class is backed by the `maasserver_discovery` view. Any
-    updates to this model must be reflected in `maasserver/dbviews.py` under
-    the `maasserver_discovery` view.
+    Note that this class is backed by the `maasserver_discovery` table, which
+    is kept up to date by triggers rather than by Django. Any updates to this
+    model must be reflected in `maasserver/triggers/discovery.py`, and in the
+    table with a migration.
     """
 
     class Meta(DefaultViewMeta):
         # When managed is False, Django will not create a migration for this
-        # model class. This is required for model classes based on views.
+        # model class. This is required since the table is maintained by
+        # triggers in the database.
         verbose_name = "Discovery"
         verbose_name_plural = "Discoveries"
 
@@ -77,6 +77,22 @@ class EventManager(Manager):
             system_id=get_maas_id(), event_type=event_type,
             event_description=event_description, user=user)
 
+    def delete_older_than(self, cutoff, limit):
+        """Delete up to `limit` of the oldest events created before `cutoff`.
+
+        Events are deleted oldest first, by id, so that repeated calls each
+        remove a bounded slice of the table without holding locks on all
+        the old events at once.
+
+        :return: The number of events deleted.
+        """
+        ids = list(
+            self.filter(created__lt=cutoff).order_by(
+                'id').values_list('id', flat=True)[:limit])
+        if len(ids) > 0:
+            self.filter(id__in=ids).delete()
+        return len(ids)
+
 
 class Event(CleanSave, TimestampedModel):
     """An `Event` represents a MAAS event.
@@ -130,6 +146,8 @@ class Event(CleanSave, TimestampedModel):
         verbose_name = "Event record"
         index_together = (
             ("node", "id"),
+            ("type", "id"),
+            ("created", "id"),
         )
 
     @property
@@ -7,18 +7,24 @@ __all__ = [
     'MDNS',
 ]
 
+from collections import defaultdict
 
 from django.db.models import (
     CASCADE,
     CharField,
+    F,
     ForeignKey,
     IntegerField,
     Manager,
+    Q,
 )
 from maasserver import DefaultMeta
 from maasserver.fields import MAASIPAddressField
 from maasserver.models.cleansave import CleanSave
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from maasserver.utils.orm import (
     get_one,
     UniqueViolation,
@@ -84,6 +90,97 @@ class MDNSManager(Manager):
         # a UniqueViolation so this operation can be retried.
         return get_one(query, exception_class=UniqueViolation)
 
+    def update_mdns_entries(self, observations):
+        """Updates the mDNS data from a batch of observations.
+
+        This has the same outcome, and logs the same messages, as calling
+        `Interface.update_mdns_entry` for each observation in turn, but
+        fetches the existing entries in one query and deletes, updates, and
+        creates entries in bulk.
+
+        :param observations: A list of `(interface, avahi_json)` tuples, where
+            `avahi_json` is the mDNS JSON from the controller.
+        """
+        observations = [
+            (interface, entry)
+            for interface, entry in observations
+            if interface.mdns_discovery_state is not False
+        ]
+        if len(observations) == 0:
+            return
+        # Entries are tracked per interface. Entries loaded from the database
+        # count the observations since; new entries have no `id`.
+        entries = defaultdict(list)
+        existing = self.filter(
+            Q(hostname__in={entry['hostname'] for _, entry in observations}) |
+            Q(ip__in={entry['address'] for _, entry in observations}),
+            interface_id__in={interface.id for interface, _ in observations})
+        for entry in existing:
+            entries[entry.interface_id].append({
+                'id': entry.id, 'ip': IPAddress(entry.ip),
+                'hostname': entry.hostname, 'count': 0,
+            })
+        obsolete = set()
+        for interface, entry in observations:
+            ip = IPAddress(entry['address'])
+            hostname = entry['hostname']
+            current = entries[interface.id]
+            deleted = False
+            for binding in list(current):
+                if binding['hostname'] == hostname and binding['ip'] != ip:
+                    if ip.version != binding['ip'].version:
+                        # Don't move hostnames between address families.
+                        continue
+                    maaslog.info("%s: Hostname '%s' moved from %s to %s." % (
+                        interface.get_log_string(), hostname, binding['ip'],
+                        entry['address']))
+                elif binding['ip'] == ip and binding['hostname'] != hostname:
+                    maaslog.info(
+                        "%s: Hostname for %s updated from '%s' to '%s'." % (
+                            interface.get_log_string(), entry['address'],
+                            binding['hostname'], hostname))
+                else:
+                    continue
+                current.remove(binding)
+                if binding['id'] is not None:
+                    obsolete.add(binding['id'])
+                deleted = True
+            for binding in current:
+                if binding['ip'] == ip and binding['hostname'] == hostname:
+                    binding['count'] += 1
+                    break
+            else:
+                current.append({
+                    'id': None, 'ip': ip, 'hostname': hostname, 'count': 1,
+                })
+                # If we deleted a previous mDNS entry, then we have already
+                # generated a log statement about this mDNS entry.
+                if not deleted:
+                    maaslog.info(
+                        "%s: New mDNS entry resolved: '%s' on %s." % (
+                            interface.get_log_string(), hostname,
+                            entry['address']))
+        # Group the entries seen again by how many times they were seen, so
+        # that each group is updated in one query; usually there is just one.
+        updated, created = defaultdict(set), []
+        timestamp = now()
+        for interface_id, current in entries.items():
+            for binding in current:
+                if binding['id'] is None:
+                    created.append(self.model(
+                        interface_id=interface_id, ip=str(binding['ip']),
+                        hostname=binding['hostname'], count=binding['count'],
+                        created=timestamp, updated=timestamp))
+                elif binding['count'] > 0:
+                    updated[binding['count']].add(binding['id'])
+        if len(obsolete) > 0:
+            self.filter(id__in=obsolete).delete()
+        for count, ids in updated.items():
+            self.filter(id__in=ids).update(
+                count=F('count') + count, updated=timestamp)
+        if len(created) > 0:
+            self.bulk_create(created)
+
 
 class MDNS(CleanSave, TimestampedModel):
     """Represents data gathered from mDNS-browse for a particular IP address.
@@ -103,7 +200,7 @@ class MDNS(CleanSave, TimestampedModel):
     # Observed IP address.
     ip = MAASIPAddressField(
         unique=False, null=True, editable=False, blank=True, default=None,
-        verbose_name='IP')
+        verbose_name='IP', db_index=True)
 
     # Hostname observed from mDNS-browse.
     hostname = CharField(
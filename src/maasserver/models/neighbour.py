@@ -7,6 +7,9 @@ __all__ = [
     'Neighbour',
 ]
 
+from collections import defaultdict
+
+from django.db import connection
 from django.db.models import (
     CASCADE,
     ForeignKey,
@@ -21,12 +24,19 @@ from maasserver.fields import (
 )
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.interface import Interface
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from maasserver.utils.orm import (
     get_one,
     MAASQueriesMixin,
     UniqueViolation,
 )
+from netaddr import (
+    EUI,
+    IPAddress,
+)
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils.network import get_mac_organization
 
@@ -132,6 +142,131 @@ class NeighbourManager(Manager, NeighbourQueriesMixin):
         # a UniqueViolation so this operation can be retried.
         return get_one(query, exception_class=UniqueViolation)
 
+    def update_neighbours(self, observations):
+        """Updates the neighbour table from a batch of observations.
+
+        This has the same outcome, and logs the same messages, as calling
+        `Interface.update_neighbour` for each observation in turn, but
+        applies the whole batch with a fixed number of queries: one to fetch
+        the existing bindings, one to delete obsolete bindings, one to update
+        the bindings seen again, and one to insert the new bindings.
+
+        :param observations: A list of `(interface, neighbour_json)` tuples,
+            where `neighbour_json` is the neighbour JSON from the controller.
+        """
+        observations = [
+            (interface, neighbour)
+            for interface, neighbour in observations
+            if interface.neighbour_discovery_state is not False
+        ]
+        if len(observations) == 0:
+            return
+        # Bindings are tracked per (interface, IP, VID), each holding a dict
+        # of {MAC: binding}. Bindings loaded from the database have an `id`
+        # and count the observations since; new bindings have no `id`.
+        bindings = defaultdict(dict)
+        existing = self.filter(
+            interface_id__in={interface.id for interface, _ in observations},
+            ip__in={neighbour['ip'] for _, neighbour in observations})
+        for neighbour in existing:
+            key = (
+                neighbour.interface_id, IPAddress(neighbour.ip),
+                neighbour.vid)
+            bindings[key][EUI(str(neighbour.mac_address))] = {
+                'id': neighbour.id, 'mac': neighbour.mac_address,
+                'time': neighbour.time, 'count': 0,
+            }
+        obsolete = set()
+        for interface, neighbour in observations:
+            ip = neighbour['ip']
+            mac = neighbour['mac']
+            vid = neighbour.get('vid', None)
+            current = bindings[interface.id, IPAddress(ip), vid]
+            deleted = False
+            for other_mac in [key for key in current if key != EUI(mac)]:
+                binding = current.pop(other_mac)
+                maaslog.info("%s: IP address %s%s moved from %s to %s" % (
+                    interface.get_log_string(), ip,
+                    self.get_vid_log_snippet(vid), binding['mac'], mac))
+                if binding['id'] is not None:
+                    obsolete.add(binding['id'])
+                deleted = True
+            binding = current.get(EUI(mac))
+            if binding is None:
+                current[EUI(mac)] = {
+                    'id': None, 'mac': mac, 'time': neighbour['time'],
+                    'count': 1,
+                }
+                # If we deleted a previous neighbour, then we have already
+                # generated a log statement about this neighbour.
+                if not deleted:
+                    maaslog.info(
+                        "%s: New MAC, IP binding observed%s: %s, %s" % (
+                            interface.get_log_string(),
+                            self.get_vid_log_snippet(vid), mac, ip))
+            else:
+                binding['time'] = neighbour['time']
+                binding['count'] += 1
+        updated, created = [], []
+        for (interface_id, ip, vid), current in bindings.items():
+            for binding in current.values():
+                if binding['id'] is None:
+                    created.append((
+                        interface_id, str(ip), vid, str(binding['mac']),
+                        binding['time'], binding['count']))
+                elif binding['count'] > 0:
+                    updated.append(
+                        (binding['id'], binding['time'], binding['count']))
+        if len(obsolete) > 0:
+            self.filter(id__in=obsolete).delete()
+        if len(updated) > 0:
+            self._update_bindings(updated)
+        if len(created) > 0:
+            self._create_bindings(created)
+
+    def _update_bindings(self, updated):
+        """Updates the time and count of existing bindings in one query.
+
+        :param updated: A list of `(id, time, count)` tuples; `count` is the
+            number of times the binding was observed again.
+        """
+        values = ", ".join(["(%s, %s, %s)"] * len(updated))
+        with connection.cursor() as cursor:
+            cursor.execute("""\
+                UPDATE maasserver_neighbour AS neighbour
+                SET time = observed.time,
+                    count = neighbour.count + observed.count,
+                    updated = %s
+                FROM (VALUES """ + values + """) AS observed(id, time, count)
+                WHERE neighbour.id = observed.id
+                """, [now()] + [value for row in updated for value in row])
+
+    def _create_bindings(self, created):
+        """Inserts new bindings in one query.
+
+        A binding inserted concurrently by another region process since it
+        was looked for is updated instead. (This cannot help bindings without
+        a VID, because NULLs never conflict in a unique index.)
+
+        :param created: A list of `(interface_id, ip, vid, mac, time, count)`
+            tuples.
+        """
+        timestamp = now()
+        values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(created))
+        with connection.cursor() as cursor:
+            cursor.execute("""\
+                INSERT INTO maasserver_neighbour (
+                    created, updated, interface_id, ip, vid, mac_address,
+                    time, count)
+                VALUES """ + values + """
+                ON CONFLICT (interface_id, vid, mac_address, ip) DO UPDATE
+                SET time = EXCLUDED.time,
+                    count = maasserver_neighbour.count + EXCLUDED.count,
+                    updated = EXCLUDED.updated
+                """, [
+                value for row in created
+                for value in (timestamp, timestamp) + row])
+
     def get_by_updated_with_related_nodes(self):
         """Returns a `QuerySet` of neighbours, while also selecting related
         interfaces and nodes.
@@ -164,7 +299,7 @@ class Neighbour(CleanSave, TimestampedModel):
     # Observed IP address.
     ip = MAASIPAddressField(
         unique=False, null=True, editable=False, blank=True,
-        default=None, verbose_name='IP')
+        default=None, verbose_name='IP', db_index=True)
 
     # Time the observation occurred in seconds since the epoch, as seen from
     # the rack controller.
@@ -17,14 +17,17 @@ from collections import (
     namedtuple,
     OrderedDict,
 )
+from contextlib import contextmanager
 from datetime import timedelta
 from functools import partial
 from itertools import count
+import json
 from operator import attrgetter
 import random
 import re
 import socket
 from socket import gethostname
+import threading
 from typing import List
 from urllib.parse import urlparse
 import uuid
@@ -67,7 +70,9 @@ from maasserver.clusterrpc.power import (
     power_cycle,
     power_driver_check,
     power_off_node,
+    power_off_nodes,
     power_on_node,
+    power_on_nodes,
     power_query,
     power_query_all,
 )
@@ -118,6 +123,8 @@ from maasserver.models.interface import (
 )
 from maasserver.models.iscsiblockdevice import ISCSIBlockDevice
 from maasserver.models.licensekey import LicenseKey
+from maasserver.models.mdns import MDNS
+from maasserver.models.neighbour import Neighbour
 from maasserver.models.ownerdata import OwnerData
 from maasserver.models.partitiontable import PartitionTable
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
@@ -233,6 +240,7 @@ from provisioningserver.utils.twisted import (
 )
 from twisted.internet.defer import (
     Deferred,
+    DeferredList,
     inlineCallbacks,
     succeed,
 )
@@ -828,6 +836,167 @@ RELEASABLE_STATUSES = frozenset([
 ])
 
 
+# The power methods whose calls can be batched by `PowerControlBatch`, and
+# the methods that power on/off many nodes with one call to a rack controller.
+BATCHED_POWER_METHODS = {
+    power_off_node: power_off_nodes,
+    power_on_node: power_on_nodes,
+}
+
+
+PowerControlEntry = namedtuple(
+    "PowerControlEntry", ("node", "power_method", "power_info", "result"))
+
+
+class PowerControlBatch:
+    """Nodes whose power is to be changed together, after commit.
+
+    Use `batched_power_control` rather than using this directly.
+    """
+
+    # The batch in progress in each thread, if any.
+    current = threading.local()
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.execution = None
+
+    @classmethod
+    def get_current(cls):
+        """Return the batch in progress in this thread, or `None`."""
+        return getattr(cls.current, "batch", None)
+
+    def add(self, node, hook, power_method, power_info):
+        """Add the power change of `node` to this batch.
+
+        The power of every node in the batch is changed when the first of
+        their hooks fires. A hook that fails before then, because it was
+        cancelled when its savepoint was rolled back, leaves the batch.
+
+        :param hook: The post-commit hook for the power change of `node`.
+        :return: `hook`, having arranged for it to wait for the result of
+            the power change of `node`.
+        """
+        entry = PowerControlEntry(node, power_method, power_info, Deferred())
+        self.entries[hook] = entry
+
+        def cb_wait_for_batch(_):
+            if self.execution is None:
+                entries = list(self.entries.values())
+                self.execution = self.execute(entries)
+                self.execution.addErrback(self._fail_unfinished, entries)
+            return entry.result
+
+        def eb_leave_batch(failure):
+            del self.entries[hook]
+            return failure
+
+        return hook.addCallbacks(cb_wait_for_batch, eb_leave_batch)
+
+    @transactional
+    def _get_routes(self, entries):
+        """Group `entries` by the rack controllers that can access the BMC.
+
+        The rack controllers for each BMC are found once for the whole batch.
+        Entries whose BMC is not known to be accessible are grouped with no
+        rack controllers; they are powered on/off by each node's own
+        `_power_control_node`, which finds them or falls back.
+        """
+        client_idents = {}
+        routes = OrderedDict()
+        for entry in entries:
+            bmc_id = entry.node.bmc_id
+            if bmc_id not in client_idents:
+                bmc = entry.node.bmc
+                if bmc is None or not bmc.is_accessible():
+                    client_idents[bmc_id] = ()
+                else:
+                    client_idents[bmc_id] = tuple(
+                        bmc.get_client_identifiers())
+            key = client_idents[bmc_id], entry.power_method
+            routes.setdefault(key, []).append(entry)
+        return routes
+
+    def _power_each(self, entries):
+        """Power on/off each of `entries` with their own calls."""
+        ds = []
+        for entry in entries:
+            d = entry.node._power_control_node(
+                succeed(None), entry.power_method, entry.power_info)
+            ds.append(d.chainDeferred(entry.result))
+        return DeferredList(ds)
+
+    @inlineCallbacks
+    def _power_many(self, client_idents, power_method, entries):
+        """Power on/off all of `entries` with one call to a rack controller.
+
+        If none of the rack controllers in `client_idents` are connected,
+        each node is powered on/off with its own calls, which may fall back
+        to the rack controllers that the node boots from.
+        """
+        try:
+            client = yield getClientFromIdentifiers(client_idents)
+        except NoConnectionsAvailable:
+            yield self._power_each(entries)
+            return
+        power_types = {entry.power_info.power_type for entry in entries}
+        for power_type in sorted(power_types):
+            yield Node.confirm_power_driver_operable(
+                client, power_type, client.ident)
+        results = yield BATCHED_POWER_METHODS[power_method](client, [
+            (entry.node.system_id, entry.node.hostname, entry.power_info)
+            for entry in entries
+        ])
+        for entry in entries:
+            error = results.get(entry.node.system_id)
+            if error is None:
+                entry.result.callback(None)
+            else:
+                entry.result.errback(error)
+
+    def _fail_unfinished(self, failure, entries):
+        """Fail the result of each of `entries` that is not yet known."""
+        for entry in entries:
+            if not entry.result.called:
+                entry.result.errback(failure)
+
+    @inlineCallbacks
+    def execute(self, entries):
+        """Change the power of the nodes of `entries`, in the reactor."""
+        routes = yield deferToDatabase(self._get_routes, entries)
+        ds = []
+        for (client_idents, power_method), group in routes.items():
+            if len(client_idents) == 0:
+                d = self._power_each(group)
+            else:
+                d = self._power_many(client_idents, power_method, group)
+                d.addErrback(self._fail_unfinished, group)
+            ds.append(d)
+        yield DeferredList(ds)
+
+
+@contextmanager
+def batched_power_control():
+    """Batch the power changes of the nodes started or stopped within.
+
+    After commit, the rack controllers that can access the BMCs of all of
+    these nodes are found at once, and each rack controller is asked to power
+    on/off all of its nodes with one call, rather than one call per node.
+
+    Nested uses share the outermost batch.
+    """
+    batch = PowerControlBatch.get_current()
+    if batch is not None:
+        yield batch
+    else:
+        batch = PowerControlBatch()
+        PowerControlBatch.current.batch = batch
+        try:
+            yield batch
+        finally:
+            PowerControlBatch.current.batch = None
+
+
 class Node(CleanSave, TimestampedModel):
     """A `Node` represents a physical machine used by the MAAS Server.
 
@@ -996,6 +1165,12 @@ class Node(CleanSave, TimestampedModel):
     creation_type = IntegerField(
         null=False, blank=False, default=NODE_CREATION_TYPE.PRE_EXISTING)
 
+    # Only used by Machine. Fingerprint of what the pod driver discovered
+    # about the machine when its pod was last refreshed. The machine is not
+    # synced again until the fingerprint changes.
+    pod_fingerprint = CharField(
+        max_length=64, null=True, blank=True, default=None, editable=False)
+
     tags = ManyToManyField(Tag)
 
     # Record the Interface the node last booted from.
@@ -4030,6 +4205,12 @@ class Node(CleanSave, TimestampedModel):
         return d
 
     def _power_control_node(self, defer, power_method, power_info):
+        # Within `batched_power_control`, powering on/off is left to the
+        # batch, which powers on/off many nodes with one call per rack.
+        batch = PowerControlBatch.get_current()
+        if batch is not None and power_method in BATCHED_POWER_METHODS:
+            return batch.add(self, defer, power_method, power_info)
+
         # Check if the BMC is accessible. If not we need to do some work to
         # make sure we can determine which rack controller can power
         # control this node.
@@ -4948,13 +5129,19 @@ class Controller(Node):
         interface_set = {neighbour['interface'] for neighbour in neighbours}
         interfaces = Interface.objects.get_interface_dict_for_node(
             self, names=interface_set, fetch_fabric_vlan=True)
-        for neighbour in neighbours:
-            interface = interfaces.get(neighbour['interface'], None)
-            if interface is not None:
-                interface.update_neighbour(neighbour)
-                vid = neighbour.get("vid", None)
-                if vid is not None:
-                    interface.report_vid(vid)
+        observations = [
+            (interfaces[neighbour['interface']], neighbour)
+            for neighbour in neighbours
+            if neighbour['interface'] in interfaces
+        ]
+        Neighbour.objects.update_neighbours(observations)
+        # Report each VID once per interface, however often it was seen.
+        reported_vids = set()
+        for interface, neighbour in observations:
+            vid = neighbour.get("vid", None)
+            if vid is not None and (interface.id, vid) not in reported_vids:
+                reported_vids.add((interface.id, vid))
+                interface.report_vid(vid)
 
     def report_mdns_entries(self, entries):
         """Update the mDNS entries on this controller.
@@ -4967,10 +5154,11 @@ class Controller(Node):
         interface_set = {entry['interface'] for entry in entries}
         interfaces = Interface.objects.get_interface_dict_for_node(
             self, names=interface_set)
-        for entry in entries:
-            interface = interfaces.get(entry['interface'], None)
-            if interface is not None:
-                interface.update_mdns_entry(entry)
+        MDNS.objects.update_mdns_entries([
+            (interfaces[entry['interface']], entry)
+            for entry in entries
+            if entry['interface'] in interfaces
+        ])
 
     def get_discovery_state(self):
         """Returns the interface monitoring state for this Controller.
@@ -4984,6 +5172,77 @@ class Controller(Node):
             for interface in interfaces
         }
 
+    def _get_unchanged_interfaces(
+            self, interfaces, topology_hints, create_fabrics, process_order,
+            current_interfaces):
+        """Return the interfaces that have not changed since last recorded.
+
+        The controller sends a "hash" of each interface definition. An
+        interface is unchanged if its hash is the same as when the interfaces
+        were last recorded, its parents are unchanged, and it still exists.
+        Nothing is unchanged if the topology hints are different, or if
+        fabrics are not to be created.
+
+        :return: dict of {<interface-name>: <Interface>}.
+        """
+        if not create_fabrics:
+            return {}
+        # Read these afresh; self.controllerinfo may be out of date.
+        from maasserver.models import ControllerInfo
+        recorded, recorded_hints = ControllerInfo.objects.filter(
+            node=self).values_list(
+                'interfaces', 'interface_update_hints').first() or (None, None)
+        if not isinstance(recorded, dict) or len(recorded) == 0:
+            return {}
+        if (self._normalise_topology_hints(recorded_hints) !=
+                self._normalise_topology_hints(topology_hints)):
+            return {}
+        existing = {
+            interface.name: interface
+            for interface in current_interfaces.values()
+        }
+        unchanged = {}
+        for name in flatten(process_order):
+            settings = interfaces[name]
+            interface_hash = settings.get("hash")
+            if interface_hash is None or name not in existing:
+                continue
+            if recorded.get(name, {}).get("hash") != interface_hash:
+                continue
+            if all(parent in unchanged for parent in settings["parents"]):
+                unchanged[name] = existing[name]
+        return unchanged
+
+    @staticmethod
+    def _normalise_topology_hints(hints):
+        """Return `hints` in a form that can be compared regardless of order.
+        """
+        return sorted(
+            json.dumps(hint, sort_keys=True) for hint in (hints or []))
+
+    def _update_unchanged_interface(
+            self, interface, settings, discovery_mode, extra_info):
+        """Update the few things that can change for an unchanged interface.
+
+        Only saves the interface if its discovery state, or information from
+        lshw, is not up to date.
+        """
+        if settings.get('monitored', False):
+            neighbour_discovery_state = discovery_mode.passive
+        else:
+            neighbour_discovery_state = False
+        if (interface.neighbour_discovery_state != neighbour_discovery_state or
+                interface.mdns_discovery_state != discovery_mode.passive):
+            interface.update_discovery_state(discovery_mode, settings)
+        stale_info = {
+            k: v for k, v in extra_info.items()
+            if getattr(interface, k, v) != v
+        }
+        if len(stale_info) != 0:
+            for k, v in stale_info.items():
+                setattr(interface, k, v)
+            interface.save()
+
     @synchronous
     @with_connection
     @synchronised(locks.startup)
@@ -4999,6 +5258,9 @@ class Controller(Node):
         :param create_fabrics: If True, creates fabrics associated with each
             VLAN. Otherwise, creates the interfaces but does not create any
             links or VLANs.
+
+        Interfaces sent with the same "hash" as when they were last recorded
+        are not updated; see `_get_unchanged_interfaces`.
         """
         # Avoid circular imports
         from metadataserver.builtin_scripts.hooks import parse_lshw_nic_info
@@ -5029,8 +5291,18 @@ class Controller(Node):
         # every interface on this Controller.
         discovery_mode = Config.objects.get_network_discovery_config()
         extended_nic_info = parse_lshw_nic_info(self)
+        unchanged = self._get_unchanged_interfaces(
+            interfaces, topology_hints, create_fabrics, process_order,
+            current_interfaces)
         for name in flatten(process_order):
             settings = interfaces[name]
+            extra_info = extended_nic_info.get(settings.get('mac_address'), {})
+            if name in unchanged:
+                interface = unchanged[name]
+                self._update_unchanged_interface(
+                    interface, settings, discovery_mode, extra_info)
+                del current_interfaces[interface.id]
+                continue
             # Note: the interface that comes back from this call may be None,
             # if we decided not to model an interface based on what the rack
             # sent.
@@ -5041,7 +5313,6 @@ class Controller(Node):
                 interface.update_discovery_state(discovery_mode, settings)
             if interface is not None and interface.id in current_interfaces:
                 del current_interfaces[interface.id]
-            extra_info = extended_nic_info.get(settings.get('mac_address'), {})
             if interface is not None:
                 for k, v in extra_info.items():
                     if getattr(interface, k, v) != v:
@@ -5053,6 +5324,15 @@ class Controller(Node):
             # so don't delete interfaces during this phase.
             return
 
+        # Remember the hash of each interface, so that interfaces that have
+        # not changed by next time can be skipped.
+        from maasserver.models import ControllerInfo
+        ControllerInfo.objects.set_interface_update_info(self, {
+            name: {"hash": settings["hash"]}
+            for name, settings in interfaces.items()
+            if "hash" in settings
+        }, topology_hints)
+
         # Remove all the interfaces that no longer exist. We do this in reverse
         # order so the child is deleted before the parent.
         deletion_order = {}
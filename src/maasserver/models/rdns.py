@@ -9,7 +9,11 @@ __all__ = [
 ]
 
 
-from typing import List
+from typing import (
+    Dict,
+    Iterable,
+    List,
+)
 
 from django.db.models import (
     CASCADE,
@@ -23,7 +27,10 @@ from maasserver.fields import (
     MAASIPAddressField,
 )
 from maasserver.models.cleansave import CleanSave
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.timestampedmodel import (
+    now,
+    TimestampedModel,
+)
 from provisioningserver.logger import LegacyLogger
 
 
@@ -57,6 +64,23 @@ class RDNSManager(Manager):
                     ('%r' % hostname for hostname in entry.hostnames)))
             entry.delete()
 
+    def delete_current_entries(self, ips: Iterable[str], observer):
+        """Deletes the current reverse DNS entries for each of `ips`.
+
+        IP addresses without an entry are ignored.
+
+        :param ips: The IP addresses whose PTR records were looked up.
+        :param observer: The RegionController that made the observation.
+        """
+        entries = list(self.filter(ip__in=list(ips), observer=observer))
+        for entry in entries:
+            log.debug(
+                "Deleted reverse DNS entry: '{ip}' (resolved to {res}).",
+                ip=entry.ip, res=", ".join(
+                    ('%r' % hostname for hostname in entry.hostnames)))
+        if len(entries) > 0:
+            self.filter(id__in=[entry.id for entry in entries]).delete()
+
     def set_current_entry(self, ip: str, results: List[str], observer):
         """Sets the current reverse DNS entry for the specified `ip`.
 
@@ -75,28 +99,72 @@ class RDNSManager(Manager):
                 ip=ip, hostname=preferred_hostname, hostnames=results,
                 observer=observer)
             rdns.save()
-            log.debug(
-                "New reverse DNS entry: '{ip}' resolves to {res}.",
-                ip=ip, res=", ".join(('%r' % result for result in results)))
+            self._log_new_entry(ip, results)
         else:
-            # Always update the 'updated' date, so we know when the last time
-            # we saw this hostname was.
-            updated = ['updated']
-            # Update existing entry, being careful to note the fields that
-            # have changed.
-            if entry.hostname != preferred_hostname:
-                entry.hostname = preferred_hostname
-                updated.append("hostname")
-            if entry.hostnames != results:
-                entry.hostnames = results
-                updated.append("hostnames")
-            # If something significant changed, log it.
-            if len(updated) > 1:
-                log.debug(
-                    "Reverse DNS entry updated: '{ip}' resolves to {res}.",
-                    ip=ip, res=", ".join(
-                        ('%r' % result for result in results)))
-            entry.save(update_fields=updated)
+            self._update_entry(entry, results)
+
+    def set_current_entries(self, entries: Dict[str, List[str]], observer):
+        """Sets the current reverse DNS entries for many IP addresses at once.
+
+        This does the same as calling `set_current_entry` for each address,
+        but new entries are created, and entries that have not changed are
+        marked as seen, in one query each.
+
+        :param entries: A dict mapping each IP address whose PTR records were
+            looked up to its (non-empty) list of reverse hostnames.
+        :param observer: The RegionController that made the observation.
+        """
+        existing = {
+            entry.ip: entry
+            for entry in self.filter(ip__in=list(entries), observer=observer)
+        }
+        created, unchanged = [], []
+        timestamp = now()
+        for ip, results in entries.items():
+            assert len(results) > 0, (
+                "Results must be non-empty to set RDNS entry.")
+            entry = existing.get(ip)
+            if entry is None:
+                created.append(RDNS(
+                    ip=ip, hostname=results[0], hostnames=results,
+                    observer=observer, created=timestamp, updated=timestamp))
+                self._log_new_entry(ip, results)
+            elif entry.hostname == results[0] and entry.hostnames == results:
+                unchanged.append(entry.id)
+            else:
+                self._update_entry(entry, results)
+        if len(unchanged) > 0:
+            self.filter(id__in=unchanged).update(updated=timestamp)
+        if len(created) > 0:
+            self.bulk_create(created)
+
+    def _log_new_entry(self, ip: str, results: List[str]):
+        log.debug(
+            "New reverse DNS entry: '{ip}' resolves to {res}.",
+            ip=ip, res=", ".join(('%r' % result for result in results)))
+
+    def _update_entry(self, entry, results: List[str]):
+        """Update an existing reverse DNS `entry` with `results`."""
+        # By convention, the first item in the list is considered the "best".
+        preferred_hostname = results[0]
+        # Always update the 'updated' date, so we know when the last time
+        # we saw this hostname was.
+        updated = ['updated']
+        # Update existing entry, being careful to note the fields that
+        # have changed.
+        if entry.hostname != preferred_hostname:
+            entry.hostname = preferred_hostname
+            updated.append("hostname")
+        if entry.hostnames != results:
+            entry.hostnames = results
+            updated.append("hostnames")
+        # If something significant changed, log it.
+        if len(updated) > 1:
+            log.debug(
+                "Reverse DNS entry updated: '{ip}' resolves to {res}.",
+                ip=entry.ip, res=", ".join(
+                    ('%r' % result for result in results)))
+        entry.save(update_fields=updated)
 
 
 class RDNS(CleanSave, TimestampedModel):
@@ -47,7 +47,10 @@ from maasserver.testing.testcase import (
 )
 from maasserver.utils.orm import reload_object
 from maasserver.utils.threads import deferToDatabase
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
 from provisioningserver.drivers.pod import (
     BlockDeviceType,
     DiscoveredMachine,
@@ -1218,6 +1221,78 @@ class TestPod(MAASServerTestCase):
             ]),
         ))
 
+    def make_machine_in_pod(self, pod, pod_fingerprint=None):
+        machine = factory.make_Node(
+            interface=True, creation_type=NODE_CREATION_TYPE.DYNAMIC)
+        machine.bmc = pod
+        machine.pod_fingerprint = pod_fingerprint
+        machine.save()
+        discovered_interface = self.make_discovered_interface(
+            mac_address=machine.interface_set.first().mac_address)
+        discovered_machine = self.make_discovered_machine(
+            interfaces=[discovered_interface])
+        discovered_machine.fingerprint = (
+            discovered_machine.compute_fingerprint())
+        return machine, discovered_machine
+
+    def test_sync_stores_machine_fingerprint(self):
+        pod = factory.make_Pod()
+        machine, discovered_machine = self.make_machine_in_pod(pod)
+        discovered_pod = self.make_discovered_pod(
+            machines=[discovered_machine])
+        pod.sync(discovered_pod, factory.make_User())
+        self.assertEqual(
+            discovered_machine.fingerprint,
+            reload_object(machine).pod_fingerprint)
+
+    def test_sync_stores_fingerprint_of_new_machine(self):
+        pod = factory.make_Pod()
+        discovered_machine = self.make_discovered_machine()
+        discovered_machine.fingerprint = (
+            discovered_machine.compute_fingerprint())
+        discovered_pod = self.make_discovered_pod(
+            machines=[discovered_machine])
+        pod.sync(discovered_pod, factory.make_User())
+        machine = Machine.objects.get(
+            interface__mac_address=(
+                discovered_machine.interfaces[0].mac_address))
+        self.assertEqual(
+            discovered_machine.fingerprint, machine.pod_fingerprint)
+
+    def test_sync_skips_unchanged_machine(self):
+        pod = factory.make_Pod()
+        machine, discovered_machine = self.make_machine_in_pod(pod)
+        machine.pod_fingerprint = discovered_machine.fingerprint
+        machine.save()
+        sync_machine = self.patch(pod, '_sync_machine')
+        discovered_pod = self.make_discovered_pod(
+            machines=[discovered_machine])
+        pod.sync(discovered_pod, factory.make_User())
+        self.assertThat(sync_machine, MockNotCalled())
+        self.assertIsNotNone(reload_object(machine))
+
+    def test_sync_syncs_changed_machine(self):
+        pod = factory.make_Pod()
+        machine, discovered_machine = self.make_machine_in_pod(
+            pod, pod_fingerprint=factory.make_name('fingerprint'))
+        sync_machine = self.patch(pod, '_sync_machine')
+        discovered_pod = self.make_discovered_pod(
+            machines=[discovered_machine])
+        pod.sync(discovered_pod, factory.make_User())
+        self.assertThat(
+            sync_machine, MockCalledOnceWith(discovered_machine, machine))
+
+    def test_sync_syncs_machine_without_fingerprint(self):
+        pod = factory.make_Pod()
+        machine, discovered_machine = self.make_machine_in_pod(pod)
+        discovered_machine.fingerprint = None
+        sync_machine = self.patch(pod, '_sync_machine')
+        discovered_pod = self.make_discovered_pod(
+            machines=[discovered_machine])
+        pod.sync(discovered_pod, factory.make_User())
+        self.assertThat(
+            sync_machine, MockCalledOnceWith(discovered_machine, machine))
+
     def test_sync_updates_machine_bmc_deletes_old_bmc(self):
         pod = factory.make_Pod()
         machine = factory.make_Node(interface=True)
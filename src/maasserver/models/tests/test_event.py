@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from datetime import timedelta
 import logging
 import random
 
@@ -14,8 +15,10 @@ from maasserver.models import (
     event as event_module,
     EventType,
 )
+from maasserver.models.timestampedmodel import now
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import reload_object
 from provisioningserver.events import EVENT_TYPES
 
 
@@ -160,3 +163,37 @@ class EventTest(MAASServerTestCase):
         event_type = EventType.objects.get(name=type_name)
         self.assertIsNotNone(event_type)
         self.assertEqual(2, Event.objects.filter(node=node).count())
+
+
+class TestDeleteOlderThan(MAASServerTestCase):
+
+    def make_Event(self, age):
+        event = factory.make_Event()
+        Event.objects.filter(id=event.id).update(
+            created=now() - timedelta(days=age))
+        return event
+
+    def test_deletes_events_created_before_cutoff(self):
+        old_events = [self.make_Event(age=10) for _ in range(3)]
+        new_events = [self.make_Event(age=1) for _ in range(3)]
+        deleted = Event.objects.delete_older_than(
+            now() - timedelta(days=5), 10)
+        self.assertEqual(len(old_events), deleted)
+        self.assertItemsEqual(new_events, Event.objects.all())
+        # The nodes of deleted events are left alone.
+        for event in old_events:
+            self.assertIsNotNone(reload_object(event.node))
+
+    def test_deletes_at_most_limit_oldest_first(self):
+        old_events = [self.make_Event(age=10) for _ in range(5)]
+        deleted = Event.objects.delete_older_than(
+            now() - timedelta(days=5), 2)
+        self.assertEqual(2, deleted)
+        self.assertItemsEqual(old_events[2:], Event.objects.all())
+
+    def test_returns_zero_when_nothing_to_delete(self):
+        event = self.make_Event(age=1)
+        deleted = Event.objects.delete_older_than(
+            now() - timedelta(days=5), 10)
+        self.assertEqual(0, deleted)
+        self.assertItemsEqual([event], Event.objects.all())
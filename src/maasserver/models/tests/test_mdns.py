@@ -5,8 +5,12 @@
 
 __all__ = []
 
+from fixtures import FakeLogger
+from maasserver.enum import INTERFACE_TYPE
+from maasserver.models import MDNS
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
 from testtools.matchers import Equals
 
 
@@ -16,3 +20,116 @@ class TestMDNSModel(MAASServerTestCase):
         mdns = factory.make_MDNS(hostname="Living room")
         # Expect no exception.
         self.assertThat(mdns.hostname, Equals("Living room"))
+
+
+class TestMDNSManagerUpdateMDNSEntries(MAASServerTestCase):
+    """Tests for `MDNSManager.update_mdns_entries`."""
+
+    def make_interface(self, mdns_discovery_state=True):
+        iface = factory.make_Interface(INTERFACE_TYPE.PHYSICAL)
+        iface.mdns_discovery_state = mdns_discovery_state
+        return iface
+
+    def make_mdns_entry_json(self, ip=None, hostname=None):
+        if ip is None:
+            ip = factory.make_ip_address(ipv6=False)
+        if hostname is None:
+            hostname = factory.make_hostname()
+        return {
+            'address': ip,
+            'hostname': hostname,
+        }
+
+    def get_entries(self):
+        return {
+            (entry.interface_id, entry.ip, entry.hostname): entry.count
+            for entry in MDNS.objects.all()
+        }
+
+    def test__ignores_interfaces_with_mdns_discovery_disabled(self):
+        iface = self.make_interface(mdns_discovery_state=False)
+        MDNS.objects.update_mdns_entries(
+            [(iface, self.make_mdns_entry_json())])
+        self.assertThat(MDNS.objects.count(), Equals(0))
+
+    def test__creates_and_updates_entries(self):
+        iface = self.make_interface()
+        entries = [self.make_mdns_entry_json() for _ in range(2)]
+        MDNS.objects.update_mdns_entries([(iface, entries[0])])
+        MDNS.objects.update_mdns_entries(
+            [(iface, entry) for entry in entries] + [(iface, entries[0])])
+        self.assertEqual({
+            (iface.id, entries[0]['address'], entries[0]['hostname']): 3,
+            (iface.id, entries[1]['address'], entries[1]['hostname']): 1,
+        }, self.get_entries())
+
+    def test__matches_updating_each_entry_in_turn(self):
+        iface = self.make_interface()
+        hostname = factory.make_hostname()
+        ips = [factory.make_ip_address(ipv6=False) for _ in range(2)]
+        ipv6 = factory.make_ip_address(ipv6=True)
+        setup = [
+            (iface, self.make_mdns_entry_json(ip=ips[0], hostname=hostname)),
+            (iface, self.make_mdns_entry_json(ip=ipv6, hostname=hostname)),
+        ]
+        # The hostname moves to another IPv4 address and back, and another
+        # hostname takes over the second IP address.
+        observations = [
+            (iface, self.make_mdns_entry_json(ip=ips[1], hostname=hostname)),
+            (iface, self.make_mdns_entry_json(ip=ips[0], hostname=hostname)),
+            (iface, self.make_mdns_entry_json(ip=ips[1])),
+            (iface, self.make_mdns_entry_json(ip=ips[0], hostname=hostname)),
+        ]
+        MDNS.objects.update_mdns_entries(setup)
+        MDNS.objects.update_mdns_entries(observations)
+        bulk_entries = self.get_entries()
+        MDNS.objects.all().delete()
+        MDNS.objects.update_mdns_entries(setup)
+        for interface, entry in observations:
+            interface.update_mdns_entry(entry)
+        self.assertEqual(bulk_entries, self.get_entries())
+        self.assertEqual(2, bulk_entries[iface.id, ips[0], hostname])
+        self.assertEqual(1, bulk_entries[iface.id, ipv6, hostname])
+
+    def test__logs_new_entry(self):
+        iface = self.make_interface()
+        with FakeLogger("maas.mDNS") as maaslog:
+            MDNS.objects.update_mdns_entries(
+                [(iface, self.make_mdns_entry_json())])
+        self.assertDocTestMatches(
+            "...: New mDNS entry resolved...", maaslog.output)
+
+    def test__logs_moved_and_updated_entries(self):
+        iface = self.make_interface()
+        entries = [self.make_mdns_entry_json() for _ in range(2)]
+        MDNS.objects.update_mdns_entries(
+            [(iface, entry) for entry in entries])
+        with FakeLogger("maas.mDNS") as maaslog:
+            MDNS.objects.update_mdns_entries([
+                (iface, self.make_mdns_entry_json(
+                    hostname=entries[0]['hostname'])),
+                (iface, self.make_mdns_entry_json(
+                    ip=entries[1]['address'])),
+            ])
+        self.assertDocTestMatches(
+            "...: Hostname...moved from...to...\n"
+            "...: Hostname for...updated from...to...",
+            maaslog.output)
+        self.assertNotIn("New mDNS entry resolved", maaslog.output)
+
+    def test__query_count_does_not_depend_on_batch_size(self):
+        iface = self.make_interface()
+        entries = [self.make_mdns_entry_json() for _ in range(10)]
+        MDNS.objects.update_mdns_entries(
+            [(iface, entry) for entry in entries])
+        observations = [
+            (iface, self.make_mdns_entry_json(hostname=entry['hostname']))
+            for entry in entries[:3]
+        ] + [
+            (iface, entry) for entry in entries[3:]
+        ] + [
+            (iface, self.make_mdns_entry_json()) for _ in range(10)
+        ]
+        queries, _ = count_queries(
+            MDNS.objects.update_mdns_entries, observations)
+        self.assertThat(queries, Equals(4))
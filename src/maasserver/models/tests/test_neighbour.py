@@ -5,9 +5,16 @@
 
 __all__ = []
 
+import random
+
+from fixtures import FakeLogger
+from maasserver.enum import INTERFACE_TYPE
+from maasserver.models import Neighbour
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import IsNonEmptyString
+from testtools.matchers import Equals
 
 
 class TestNeighbourModel(MAASServerTestCase):
@@ -15,3 +22,157 @@ class TestNeighbourModel(MAASServerTestCase):
     def test_mac_organization(self):
         neighbour = factory.make_Neighbour(mac_address="48:51:b7:00:00:00")
         self.assertThat(neighbour.mac_organization, IsNonEmptyString)
+
+
+class TestNeighbourManagerUpdateNeighbours(MAASServerTestCase):
+    """Tests for `NeighbourManager.update_neighbours`."""
+
+    def make_interface(self, neighbour_discovery_state=True):
+        iface = factory.make_Interface(INTERFACE_TYPE.PHYSICAL)
+        iface.neighbour_discovery_state = neighbour_discovery_state
+        return iface
+
+    def make_neighbour_json(self, ip=None, mac=None, vid=None):
+        if ip is None:
+            ip = factory.make_ip_address(ipv6=False)
+        if mac is None:
+            mac = factory.make_mac_address()
+        return {
+            'ip': ip,
+            'mac': mac,
+            'time': random.randint(0, 200000000),
+            'vid': vid,
+        }
+
+    def get_bindings(self):
+        return {
+            (neighbour.interface_id, neighbour.ip, neighbour.vid,
+             str(neighbour.mac_address)): (neighbour.time, neighbour.count)
+            for neighbour in Neighbour.objects.all()
+        }
+
+    def test__ignores_interfaces_with_neighbour_discovery_disabled(self):
+        iface = self.make_interface(neighbour_discovery_state=False)
+        Neighbour.objects.update_neighbours(
+            [(iface, self.make_neighbour_json())])
+        self.assertThat(Neighbour.objects.count(), Equals(0))
+
+    def test__creates_new_bindings(self):
+        iface = self.make_interface()
+        neighbours = [
+            self.make_neighbour_json(),
+            self.make_neighbour_json(vid=random.randint(1, 4094)),
+        ]
+        Neighbour.objects.update_neighbours(
+            [(iface, neighbour) for neighbour in neighbours])
+        self.assertEqual({
+            (iface.id, neighbour['ip'], neighbour['vid'], neighbour['mac']):
+            (neighbour['time'], 1)
+            for neighbour in neighbours
+        }, self.get_bindings())
+
+    def test__updates_existing_bindings(self):
+        iface = self.make_interface()
+        neighbours = [
+            self.make_neighbour_json(),
+            self.make_neighbour_json(vid=random.randint(1, 4094)),
+        ]
+        Neighbour.objects.update_neighbours(
+            [(iface, neighbour) for neighbour in neighbours])
+        for neighbour in neighbours:
+            neighbour['time'] += 1
+        # The second binding is seen twice in this batch.
+        Neighbour.objects.update_neighbours(
+            [(iface, neighbour) for neighbour in neighbours] +
+            [(iface, neighbours[1])])
+        self.assertEqual({
+            (iface.id, neighbours[0]['ip'], neighbours[0]['vid'],
+             neighbours[0]['mac']): (neighbours[0]['time'], 2),
+            (iface.id, neighbours[1]['ip'], neighbours[1]['vid'],
+             neighbours[1]['mac']): (neighbours[1]['time'], 3),
+        }, self.get_bindings())
+
+    def test__replaces_obsolete_bindings(self):
+        iface = self.make_interface()
+        old = self.make_neighbour_json()
+        Neighbour.objects.update_neighbours([(iface, old)])
+        # Have a different MAC address claim ownership of the IP.
+        new = self.make_neighbour_json(ip=old['ip'])
+        Neighbour.objects.update_neighbours([(iface, new)])
+        self.assertEqual({
+            (iface.id, new['ip'], None, new['mac']): (new['time'], 1),
+        }, self.get_bindings())
+
+    def test__matches_updating_each_neighbour_in_turn(self):
+        iface = self.make_interface()
+        other_iface = self.make_interface()
+        ip = factory.make_ip_address(ipv6=False)
+        macs = [factory.make_mac_address() for _ in range(3)]
+        Neighbour.objects.update_neighbours([
+            (iface, self.make_neighbour_json(ip=ip, mac=macs[0])),
+            (other_iface, self.make_neighbour_json(ip=ip, mac=macs[0])),
+        ])
+        # The IP moves between MAC addresses, and back, within one batch.
+        observations = [
+            (iface, self.make_neighbour_json(ip=ip, mac=mac))
+            for mac in (macs[1], macs[2], macs[1], macs[1])
+        ] + [(iface, self.make_neighbour_json())]
+        Neighbour.objects.update_neighbours(observations)
+        bulk_bindings = self.get_bindings()
+        Neighbour.objects.all().delete()
+        Neighbour.objects.update_neighbours([
+            (iface, self.make_neighbour_json(ip=ip, mac=macs[0])),
+            (other_iface, self.make_neighbour_json(ip=ip, mac=macs[0])),
+        ])
+        for interface, neighbour in observations:
+            interface.update_neighbour(neighbour)
+        bulk_bindings = {
+            key: count for key, (time, count) in bulk_bindings.items()}
+        self.assertEqual(bulk_bindings, {
+            key: count for key, (time, count) in self.get_bindings().items()})
+        self.assertEqual(2, bulk_bindings[iface.id, ip, None, macs[1]])
+
+    def test__does_not_duplicate_bindings_without_vid(self):
+        iface = self.make_interface()
+        neighbour = self.make_neighbour_json(vid=None)
+        Neighbour.objects.update_neighbours([(iface, neighbour)])
+        Neighbour.objects.update_neighbours([(iface, neighbour)])
+        self.assertThat(Neighbour.objects.count(), Equals(1))
+        self.assertThat(Neighbour.objects.get().count, Equals(2))
+
+    def test__logs_new_binding(self):
+        iface = self.make_interface()
+        with FakeLogger("maas.neighbour") as maaslog:
+            Neighbour.objects.update_neighbours(
+                [(iface, self.make_neighbour_json())])
+        self.assertDocTestMatches(
+            "...: New MAC, IP binding observed...", maaslog.output)
+
+    def test__logs_moved_binding(self):
+        iface = self.make_interface()
+        old = self.make_neighbour_json()
+        Neighbour.objects.update_neighbours([(iface, old)])
+        new = self.make_neighbour_json(ip=old['ip'])
+        with FakeLogger("maas.neighbour") as maaslog:
+            Neighbour.objects.update_neighbours([(iface, new)])
+        self.assertDocTestMatches(
+            "...: IP address...moved from...to...", maaslog.output)
+        self.assertNotIn("New MAC, IP binding observed", maaslog.output)
+
+    def test__query_count_does_not_depend_on_batch_size(self):
+        iface = self.make_interface()
+        # Every kind of change: moved, seen again, and new bindings.
+        neighbours = [self.make_neighbour_json() for _ in range(10)]
+        Neighbour.objects.update_neighbours(
+            [(iface, neighbour) for neighbour in neighbours])
+        observations = [
+            (iface, self.make_neighbour_json(ip=neighbour['ip']))
+            for neighbour in neighbours[:3]
+        ] + [
+            (iface, neighbour) for neighbour in neighbours[3:]
+        ] + [
+            (iface, self.make_neighbour_json()) for _ in range(10)
+        ]
+        queries, _ = count_queries(
+            Neighbour.objects.update_neighbours, observations)
+        self.assertThat(queries, Equals(4))
@@ -42,6 +42,7 @@ from maasserver.clusterrpc.driver_parameters import get_driver_types
 from maasserver.clusterrpc.power import (
     power_cycle,
     power_off_node,
+    power_on_node,
     power_query,
 )
 from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
@@ -80,6 +81,8 @@ from maasserver.models import (
     Interface,
     LicenseKey,
     Machine,
+    MDNS,
+    Neighbour,
     Node,
     node as node_module,
     OwnerData,
@@ -101,9 +104,11 @@ from maasserver.models.config import NetworkDiscoveryConfig
 from maasserver.models.event import Event
 import maasserver.models.interface as interface_module
 from maasserver.models.node import (
+    batched_power_control,
     DefaultGateways,
     GatewayDefinition,
     generate_node_system_id,
+    PowerControlBatch,
     PowerInfo,
 )
 from maasserver.models.resourcepool import ResourcePool
@@ -209,6 +214,7 @@ from provisioningserver.utils.enum import (
 )
 from provisioningserver.utils.env import get_maas_id
 from provisioningserver.utils.fs import NamedLock
+from provisioningserver.utils.network import annotate_with_interface_hashes
 from provisioningserver.utils.testing import MAASIDFixture
 from testscenarios import multiply_scenarios
 from testtools import ExpectedException
@@ -7029,6 +7035,153 @@ class TestNode_PostCommit_PowerControl(MAASTransactionServerTestCase):
             routable_racks, none_routable_racks)
 
 
+class TestPowerControlBatch(MAASTransactionServerTestCase):
+    """Tests for `PowerControlBatch` and `batched_power_control`."""
+
+    @transactional
+    def make_node(self, layer2_rack=None):
+        node = factory.make_Node_with_Interface_on_Subnet(
+            status=NODE_STATUS.READY, power_type="virsh",
+            bmc_connected_to=layer2_rack)
+        return node, node.get_effective_power_info()
+
+    @transactional
+    def make_rack_controller(self):
+        return factory.make_RackController()
+
+    def patch_rack_client(self, rack):
+        client = Mock()
+        client.ident = rack.system_id
+        self.patch(node_module, "getClientFromIdentifiers").return_value = (
+            defer.succeed(client))
+        self.patch(node_module, "getAllClients").return_value = [client]
+        self.patch(Node, "confirm_power_driver_operable").return_value = (
+            defer.succeed(None))
+        return client
+
+    def patch_power_nodes(self):
+        power_nodes = Mock()
+        power_nodes.side_effect = lambda client, nodes: defer.succeed(
+            dict.fromkeys(system_id for system_id, _, _ in nodes))
+        self.patch(
+            node_module, "BATCHED_POWER_METHODS",
+            {power_on_node: power_nodes})
+        return power_nodes
+
+    def test__power_control_node_adds_node_to_batch(self):
+        node, power_info = self.make_node()
+        hook = defer.Deferred()
+        with batched_power_control() as batch:
+            node._power_control_node(hook, power_on_node, power_info)
+        self.assertEqual(
+            [(node, power_on_node, power_info)],
+            [entry[:3] for entry in batch.entries.values()])
+        self.assertIsNone(PowerControlBatch.get_current())
+
+    def test__nested_contexts_share_batch(self):
+        with batched_power_control() as batch:
+            with batched_power_control() as nested:
+                self.assertIs(batch, nested)
+            self.assertIs(batch, PowerControlBatch.get_current())
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test__powers_nodes_with_one_call_per_rack(self):
+        rack = yield deferToDatabase(self.make_rack_controller)
+        nodes = []
+        for _ in range(3):
+            node, power_info = yield deferToDatabase(
+                self.make_node, layer2_rack=rack)
+            self.patch(node.bmc, "is_accessible").return_value = True
+            nodes.append((node, power_info))
+        client = self.patch_rack_client(rack)
+        power_nodes = self.patch_power_nodes()
+
+        batch = PowerControlBatch()
+        hooks = [defer.Deferred() for _ in nodes]
+        for hook, (node, power_info) in zip(hooks, nodes):
+            batch.add(node, hook, power_on_node, power_info)
+        for hook in hooks:
+            hook.callback(None)
+        yield defer.DeferredList(hooks, fireOnOneErrback=True)
+
+        self.assertThat(
+            power_nodes, MockCalledOnceWith(client, [
+                (node.system_id, node.hostname, power_info)
+                for node, power_info in nodes
+            ]))
+        self.assertThat(
+            Node.confirm_power_driver_operable,
+            MockCalledOnceWith(client, "virsh", client.ident))
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test__fails_hook_of_node_that_failed(self):
+        rack = yield deferToDatabase(self.make_rack_controller)
+        node, power_info = yield deferToDatabase(
+            self.make_node, layer2_rack=rack)
+        self.patch(node.bmc, "is_accessible").return_value = True
+        self.patch_rack_client(rack)
+        power_nodes = self.patch_power_nodes()
+        power_nodes.side_effect = lambda client, nodes: defer.succeed(
+            {node.system_id: PowerProblem("In progress.")})
+
+        batch = PowerControlBatch()
+        hook = batch.add(
+            node, defer.Deferred(), power_on_node, power_info)
+        hook.callback(None)
+        with ExpectedException(PowerProblem, "In progress."):
+            yield hook
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test__powers_each_node_whose_bmc_is_not_accessible(self):
+        node, power_info = yield deferToDatabase(self.make_node)
+        self.patch(node.bmc, "is_accessible").return_value = False
+        power_control_node = self.patch(node, "_power_control_node")
+        power_control_node.return_value = defer.succeed(None)
+        power_nodes = self.patch_power_nodes()
+
+        batch = PowerControlBatch()
+        hook = batch.add(
+            node, defer.Deferred(), power_on_node, power_info)
+        hook.callback(None)
+        yield hook
+
+        self.assertThat(
+            power_control_node,
+            MockCalledOnceWith(ANY, power_on_node, power_info))
+        self.assertThat(power_nodes, MockNotCalled())
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test__skips_nodes_whose_hook_was_cancelled(self):
+        rack = yield deferToDatabase(self.make_rack_controller)
+        nodes = []
+        for _ in range(2):
+            node, power_info = yield deferToDatabase(
+                self.make_node, layer2_rack=rack)
+            self.patch(node.bmc, "is_accessible").return_value = True
+            nodes.append((node, power_info))
+        client = self.patch_rack_client(rack)
+        power_nodes = self.patch_power_nodes()
+
+        batch = PowerControlBatch()
+        (cancelled, _), (powered, power_info) = nodes
+        cancelled_hook = batch.add(
+            cancelled, defer.Deferred(), power_on_node, power_info)
+        cancelled_hook.addErrback(lambda failure: None)
+        cancelled_hook.cancel()
+        hook = batch.add(powered, defer.Deferred(), power_on_node, power_info)
+        hook.callback(None)
+        yield hook
+
+        self.assertThat(
+            power_nodes, MockCalledOnceWith(client, [
+                (powered.system_id, powered.hostname, power_info),
+            ]))
+
+
 class TestNode_Delete_With_Transactional_Events(MAASTransactionServerTestCase):
     """
     Test deleting a node where the releated `Event`'s do not get deleted.
@@ -7107,30 +7260,35 @@ class TestControllerUpdateDiscoveryState(MAASServerTestCase):
 class TestReportNeighbours(MAASServerTestCase):
     """Tests for `Controller.report_neighbours()."""
 
-    def test__calls_update_neighbour_for_each_neighbour(self):
+    def test__updates_neighbours_in_one_batch(self):
         rack = factory.make_RackController()
-        factory.make_Interface(name='eth0', node=rack)
-        factory.make_Interface(name='eth1', node=rack)
-        update_neighbour = self.patch(
-            interface_module.Interface, 'update_neighbour')
+        eth0 = factory.make_Interface(name='eth0', node=rack)
+        eth1 = factory.make_Interface(name='eth1', node=rack)
+        update_neighbours = self.patch(
+            Neighbour.objects, 'update_neighbours')
         neighbours = [
             {'interface': 'eth0', 'mac': factory.make_mac_address()},
             {'interface': 'eth1', 'mac': factory.make_mac_address()},
+            {'interface': 'eth2', 'mac': factory.make_mac_address()},
         ]
         rack.report_neighbours(neighbours)
-        self.assertThat(update_neighbour, MockCallsMatch(
-            *[call(neighbour) for neighbour in neighbours]
-        ))
+        self.assertThat(update_neighbours, MockCalledOnceWith(ANY))
+        [observations], _ = update_neighbours.call_args
+        self.assertEqual(
+            [(eth0.id, neighbours[0]), (eth1.id, neighbours[1])],
+            [(interface.id, neighbour)
+             for interface, neighbour in observations])
 
-    def test__calls_report_vid_for_each_vid(self):
+    def test__calls_report_vid_once_for_each_vid(self):
         rack = factory.make_RackController()
         factory.make_Interface(name='eth0', node=rack)
         factory.make_Interface(name='eth1', node=rack)
         # Just make this a no-op for simplicity.
-        self.patch(interface_module.Interface, 'update_neighbour')
+        self.patch(Neighbour.objects, 'update_neighbours')
         report_vid = self.patch(
             interface_module.Interface, 'report_vid')
         neighbours = [
+            {'interface': 'eth0', 'mac': factory.make_mac_address(), 'vid': 3},
             {'interface': 'eth0', 'mac': factory.make_mac_address(), 'vid': 3},
             {'interface': 'eth1', 'mac': factory.make_mac_address(), 'vid': 7},
         ]
@@ -7141,20 +7299,23 @@ class TestReportNeighbours(MAASServerTestCase):
 class TestReportMDNSEntries(MAASServerTestCase):
     """Tests for `Controller.report_mdns_entries()."""
 
-    def test__calls_update_mdns_entry_for_each_entry(self):
+    def test__updates_mdns_entries_in_one_batch(self):
         rack = factory.make_RackController()
-        factory.make_Interface(name='eth0', node=rack)
-        factory.make_Interface(name='eth1', node=rack)
-        update_mdns_entry = self.patch(
-            interface_module.Interface, 'update_mdns_entry')
+        eth0 = factory.make_Interface(name='eth0', node=rack)
+        eth1 = factory.make_Interface(name='eth1', node=rack)
+        update_mdns_entries = self.patch(
+            MDNS.objects, 'update_mdns_entries')
         entries = [
             {'interface': 'eth0', 'hostname': factory.make_name('eth0')},
             {'interface': 'eth1', 'hostname': factory.make_name('eth1')},
+            {'interface': 'eth2', 'hostname': factory.make_name('eth2')},
         ]
         rack.report_mdns_entries(entries)
-        self.assertThat(update_mdns_entry, MockCallsMatch(
-            *[call(entry) for entry in entries]
-        ))
+        self.assertThat(update_mdns_entries, MockCalledOnceWith(ANY))
+        [observations], _ = update_mdns_entries.call_args
+        self.assertEqual(
+            [(eth0.id, entries[0]), (eth1.id, entries[1])],
+            [(interface.id, entry) for interface, entry in observations])
 
 
 class UpdateInterfacesMixin:
@@ -9860,6 +10021,124 @@ class TestUpdateInterfaces(MAASServerTestCase, UpdateInterfacesMixin):
         self.assertThat(alice_eth0.vlan, Equals(bob_eth0.vlan))
 
 
+class TestUpdateInterfacesSkipsUnchangedInterfaces(MAASServerTestCase):
+
+    def make_interfaces(self):
+        return {
+            "eth0": {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [{"mode": "static", "address": "192.168.0.2/24"}],
+                "enabled": True,
+            },
+            "eth1": {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [],
+                "enabled": True,
+            },
+            "eth1.10": {
+                "type": "vlan",
+                "vid": 10,
+                "parents": ["eth1"],
+                "links": [],
+                "enabled": True,
+            },
+        }
+
+    def update_interfaces(self, controller, interfaces, topology_hints=None):
+        """Update `controller` with hashed `interfaces`.
+
+        :return: The names of the interfaces that were updated in full.
+        """
+        update_interface = self.patch(
+            controller, "_update_interface",
+            Mock(wraps=controller._update_interface))
+        controller.update_interfaces(
+            annotate_with_interface_hashes(interfaces), topology_hints)
+        return {
+            args[0] for args, _ in update_interface.call_args_list
+        }
+
+    def test__updates_all_interfaces_the_first_time(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        self.assertThat(
+            self.update_interfaces(controller, interfaces),
+            Equals(set(interfaces)))
+
+    def test__skips_unchanged_interfaces(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        self.update_interfaces(controller, interfaces)
+        self.assertThat(
+            self.update_interfaces(controller, interfaces), Equals(set()))
+        self.assertThat(
+            {nic.name for nic in controller.interface_set.all()},
+            Equals(set(interfaces)))
+
+    def test__updates_changed_interface_and_its_children(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        self.update_interfaces(controller, interfaces)
+        interfaces["eth1"]["enabled"] = False
+        self.assertThat(
+            self.update_interfaces(controller, interfaces),
+            Equals({"eth1", "eth1.10"}))
+        eth1 = controller.interface_set.get(name="eth1")
+        self.assertFalse(eth1.enabled)
+
+    def test__removes_missing_interfaces(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        self.update_interfaces(controller, interfaces)
+        del interfaces["eth1.10"]
+        self.assertThat(
+            self.update_interfaces(controller, interfaces), Equals(set()))
+        self.assertThat(
+            {nic.name for nic in controller.interface_set.all()},
+            Equals({"eth0", "eth1"}))
+
+    def test__updates_all_interfaces_if_hints_change(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        self.update_interfaces(controller, interfaces)
+        hints = [{
+            "hint": "on_remote_network",
+            "ifname": "eth0",
+            "related_ifname": "eth0",
+            "related_mac": factory.make_mac_address(),
+        }]
+        self.assertThat(
+            self.update_interfaces(controller, interfaces, hints),
+            Equals(set(interfaces)))
+
+    def test__updates_all_interfaces_without_hashes(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        update_interface = self.patch(
+            controller, "_update_interface",
+            Mock(wraps=controller._update_interface))
+        controller.update_interfaces(interfaces)
+        self.assertThat(update_interface.call_count, Equals(len(interfaces)))
+
+    def test__updates_discovery_state_of_unchanged_interfaces(self):
+        controller = factory.make_RackController()
+        interfaces = self.make_interfaces()
+        interfaces["eth0"]["monitored"] = True
+        Config.objects.set_config("network_discovery", "enabled")
+        self.update_interfaces(controller, interfaces)
+        controller.interface_set.filter(name="eth0").update(
+            neighbour_discovery_state=False)
+        self.assertThat(
+            self.update_interfaces(controller, interfaces), Equals(set()))
+        eth0 = controller.interface_set.get(name="eth0")
+        self.assertTrue(eth0.neighbour_discovery_state)
+
+
 class TestUpdateInterfacesWithHints(
         MAASTransactionServerTestCase, UpdateInterfacesMixin):
 
@@ -14,12 +14,14 @@ from django.core.exceptions import ValidationError
 from maasserver.models import RDNS
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import DocTestMatches
 from maastesting.twisted import TwistedLoggerFixture
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
     GreaterThan,
+    HasLength,
     Is,
     Not,
 )
@@ -146,3 +148,58 @@ class TestRDNSManager(MAASServerTestCase):
         self.assertThat(
             logger.output, DocTestMatches(
                 "Deleted reverse DNS entry...resolved to..."))
+
+    def test__set_current_entries_creates_and_updates_entries(self):
+        region = factory.make_RegionController()
+        yesterday = datetime.now() - timedelta(days=1)
+        unchanged = factory.make_RDNS(
+            "10.0.0.1", "unchanged.maas", region, updated=yesterday)
+        changed = factory.make_RDNS("10.0.0.2", "old.maas", region)
+        with TwistedLoggerFixture() as logger:
+            RDNS.objects.set_current_entries({
+                "10.0.0.1": ["unchanged.maas"],
+                "10.0.0.2": ["new.maas", "other.maas"],
+                "10.0.0.3": ["created.maas"],
+            }, region)
+        entries = {
+            entry.ip: entry for entry in RDNS.objects.filter(observer=region)
+        }
+        self.assertThat(entries, HasLength(3))
+        self.assertThat(entries["10.0.0.1"].id, Equals(unchanged.id))
+        self.assertThat(entries["10.0.0.1"].updated, GreaterThan(yesterday))
+        self.assertThat(entries["10.0.0.2"].id, Equals(changed.id))
+        self.assertThat(entries["10.0.0.2"].hostname, Equals("new.maas"))
+        self.assertThat(
+            entries["10.0.0.2"].hostnames,
+            Equals(["new.maas", "other.maas"]))
+        self.assertThat(entries["10.0.0.3"].hostname, Equals("created.maas"))
+        self.assertThat(
+            logger.output, DocTestMatches(
+                "...Reverse DNS entry updated: '10.0.0.2'..."
+                "New reverse DNS entry: '10.0.0.3'..."))
+
+    def test__set_current_entries_uses_constant_number_of_queries(self):
+        region = factory.make_RegionController()
+        ips = [factory.make_ip_address(ipv6=False) for _ in range(5)]
+        for ip in ips[:2]:
+            factory.make_RDNS(ip, "host.maas", region)
+        entries = {ip: ["host.maas"] for ip in ips}
+        queries, _ = count_queries(
+            RDNS.objects.set_current_entries, entries, region)
+        # One to find existing entries, one to mark unchanged entries as
+        # seen, and one to create the new entries.
+        self.assertThat(queries, Equals(3))
+
+    def test__delete_current_entries_deletes_entries(self):
+        region = factory.make_RegionController()
+        factory.make_RDNS("10.0.0.1", "one.maas", region)
+        factory.make_RDNS("10.0.0.2", "two.maas", region)
+        factory.make_RDNS("10.0.0.3", "three.maas", region)
+        with TwistedLoggerFixture() as logger:
+            RDNS.objects.delete_current_entries(
+                ["10.0.0.1", "10.0.0.3", "10.0.0.4"], region)
+        self.assertThat(
+            [entry.ip for entry in RDNS.objects.all()], Equals(["10.0.0.2"]))
+        self.assertThat(
+            logger.output, DocTestMatches(
+                "...Deleted reverse DNS entry...resolved to..."))
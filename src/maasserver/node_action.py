@@ -13,7 +13,9 @@ order as they do in `ACTION_CLASSES`.
 """
 
 __all__ = [
+    'compile_bulk_node_action',
     'compile_node_actions',
+    'execute_bulk_node_action',
 ]
 
 from abc import (
@@ -21,10 +23,18 @@ from abc import (
     abstractmethod,
     abstractproperty,
 )
-from collections import OrderedDict
+from collections import (
+    deque,
+    OrderedDict,
+)
+from functools import partial
 
 from crochet import TimeoutError
-from django.core.exceptions import ValidationError
+from django.core.exceptions import (
+    PermissionDenied,
+    ValidationError,
+)
+from django.db import transaction
 from maasserver import locks
 from maasserver.clusterrpc.boot_images import RackControllersImporter
 from maasserver.enum import (
@@ -36,6 +46,7 @@ from maasserver.enum import (
     POWER_STATE,
 )
 from maasserver.exceptions import (
+    MAASAPIException,
     NodeActionError,
     StaticIPAddressExhaustion,
 )
@@ -43,23 +54,40 @@ from maasserver.models import (
     ResourcePool,
     Zone,
 )
+from maasserver.models.node import batched_power_control
 from maasserver.node_status import (
     is_failed_status,
     NON_MONITORED_STATUSES,
 )
 from maasserver.preseed import get_curtin_config
-from maasserver.utils.orm import post_commit_do
+from maasserver.utils.orm import (
+    post_commit_do,
+    post_commit_hooks,
+)
 from maasserver.utils.osystems import (
     validate_hwe_kernel,
     validate_osystem_and_distro_series,
 )
 from metadataserver.enum import SCRIPT_STATUS
+from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
     PowerActionAlreadyInProgress,
 )
 from provisioningserver.utils.enum import map_enum
 from provisioningserver.utils.shell import ExternalProcessError
+from provisioningserver.utils.twisted import (
+    gatherWithConcurrency,
+    suppress,
+)
+from twisted.internet.defer import (
+    CancelledError,
+    inlineCallbacks,
+)
+from twisted.python.failure import Failure
+
+
+log = LegacyLogger()
 
 # All node statuses.
 ALL_STATUSES = set(NODE_STATUS_CHOICES_DICT.keys())
@@ -73,6 +101,22 @@ RPC_EXCEPTIONS = (
     TimeoutError,
 )
 
+# The errors that performing a node action may raise that are reported for
+# that node in a bulk action, rather than failing the whole bulk action.
+BULK_ACTION_ERRORS = (
+    MAASAPIException,
+    NodeActionError,
+    PermissionDenied,
+    ValidationError,
+)
+
+# The number of nodes that a bulk action is performed on in each transaction.
+BULK_ACTION_BATCH_SIZE = 50
+
+# The number of nodes for which a bulk action runs post-commit tasks, like
+# powering on or off via a rack controller, concurrently.
+BULK_ACTION_CONCURRENCY = 10
+
 
 class NodeAction(metaclass=ABCMeta):
     """Base class for node actions."""
@@ -706,3 +750,117 @@ def compile_node_actions(node, user, request=None, classes=ACTION_CLASSES):
         (action.name, action)
         for action in applicable_actions
         if action.is_permitted())
+
+
+def compile_bulk_node_action(nodes, user, action_name, request=None):
+    """Provide the named :class:`NodeAction` for each of the given nodes.
+
+    Only the named action is compiled for each node, rather than all of the
+    actions in `ACTION_CLASSES`.
+
+    :param nodes: The :class:`Node`s that the request pertains to.
+    :param user: The :class:`User` making the request.
+    :param action_name: The name of the action to perform.
+    :param request: The :class:`HttpRequest` being serviced.
+    :return: A ``(actions, errors)`` tuple. ``actions`` is an
+        :class:`OrderedDict` mapping the system ID of each node that the
+        action can be performed on to its :class:`NodeAction` instance, in
+        the order of `nodes`. ``errors`` maps the system ID of every other
+        node to the reason why not.
+    """
+    actions = OrderedDict()
+    errors = {}
+    action_class = ACTIONS_DICT.get(action_name)
+    for node in nodes:
+        if action_class is None:
+            compiled = {}
+        else:
+            compiled = compile_node_actions(
+                node, user, request, classes=[action_class])
+        if action_name in compiled:
+            actions[node.system_id] = compiled[action_name]
+        else:
+            errors[node.system_id] = (
+                "%s action is not available for this node." % action_name)
+    return actions, errors
+
+
+def _get_error_message(error):
+    """Return a message for an error raised when performing an action."""
+    if isinstance(error, ValidationError):
+        return " ".join(error.messages)
+    else:
+        return str(error)
+
+
+def execute_bulk_node_action(
+        actions, extra=None, concurrency=BULK_ACTION_CONCURRENCY):
+    """Perform each of the given actions within the current transaction.
+
+    Each action is performed within its own savepoint, so that one that fails
+    does not prevent the others from being performed.
+
+    The post-commit tasks of each action are run once the transaction has
+    been committed, for at most `concurrency` nodes at a time. A failure is
+    recorded for the node whose task failed; it does not prevent the tasks
+    of other nodes from running. Nodes are powered on or off with one call
+    per rack controller; see `batched_power_control`.
+
+    :param actions: An :class:`OrderedDict` mapping system IDs to
+        :class:`NodeAction` instances, as from `compile_bulk_node_action`.
+    :param extra: A dict of extra parameters to pass to each action.
+    :return: A dict mapping each system ID to `None` if its action succeeded,
+        or to the reason why it failed. Failures of post-commit tasks are
+        recorded in this dict once the transaction has been committed.
+    """
+    if extra is None:
+        extra = {}
+    results = {}
+    tasks = []
+    with batched_power_control():
+        for system_id, action in actions.items():
+            try:
+                with post_commit_hooks.capture() as hooks:
+                    with transaction.atomic():
+                        action.execute(**extra)
+            except BULK_ACTION_ERRORS as error:
+                results[system_id] = _get_error_message(error)
+            else:
+                results[system_id] = None
+                if len(hooks) > 0:
+                    tasks.append((action, hooks))
+    if len(tasks) > 0:
+        post_commit_do(
+            _run_bulk_node_action_tasks, tasks, results, concurrency)
+    return results
+
+
+def _run_bulk_node_action_tasks(tasks, results, concurrency):
+    """Run the post-commit tasks of a bulk action, in the reactor.
+
+    The tasks of each node are run in sequence, as `DeferredHooks.fire`
+    does, but the tasks of at most `concurrency` nodes run at once. If a task
+    fails, the remaining tasks for that node are cancelled and its failure
+    is recorded in `results`.
+    """
+
+    @inlineCallbacks
+    def run_tasks(action, hooks):
+        hooks = deque(hooks)
+        try:
+            while len(hooks) > 0:
+                hook = hooks.popleft()
+                hook.callback(None)
+                yield hook
+        except Exception:
+            failure = Failure()
+            log.err(failure, "Failed to perform action '%s' on %s." % (
+                action.name, action.node.hostname))
+            results[action.node.system_id] = failure.getErrorMessage()
+            for hook in hooks:
+                hook.addErrback(suppress, CancelledError)
+                hook.cancel()
+
+    return gatherWithConcurrency(
+        (partial(run_tasks, action, hooks) for action, hooks in tasks),
+        concurrency)
@@ -10,6 +10,7 @@ __all__ = [
 from maasserver.models.node import RegionController
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
+from provisioningserver.utils.network import annotate_with_interface_hashes
 from provisioningserver.utils.services import NetworksMonitoringService
 
 
@@ -26,7 +27,8 @@ class RegionNetworksMonitoringService(NetworksMonitoringService):
     def recordInterfaces(self, interfaces, hints=None):
         """Record the interfaces information."""
         return deferToDatabase(
-            self.recordInterfacesIntoDatabase, interfaces, hints)
+            self.recordInterfacesIntoDatabase,
+            annotate_with_interface_hashes(interfaces), hints)
 
     def reportNeighbours(self, neighbours):
         """Record the specified list of neighbours."""
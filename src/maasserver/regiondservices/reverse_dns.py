@@ -7,47 +7,151 @@ __all__ = [
     "ReverseDNSService"
 ]
 
-from typing import List
+from collections import OrderedDict
+from datetime import timedelta
+from functools import partial
+from typing import (
+    Dict,
+    List,
+)
 
 from maasserver.listener import PostgresListenerService
 from maasserver.models import (
     RDNS,
     RegionController,
 )
+from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.network import reverseResolve
-from provisioningserver.utils.twisted import suppress
+from provisioningserver.utils.twisted import (
+    gatherWithConcurrency,
+    suppress,
+)
 from twisted.application.service import Service
-from twisted.internet import defer
+from twisted.internet import (
+    defer,
+    reactor,
+)
+from twisted.internet.task import LoopingCall
+from twisted.python.failure import Failure
 
 
 log = LegacyLogger()
 
 
+# Look up no more than this many addresses at the same time.
+REVERSE_DNS_CONCURRENCY = 16
+
+# Look up, and write the results for, this many addresses at a time.
+REVERSE_DNS_BATCH_SIZE = 200
+
+# How long to remember that an address did not reverse-resolve, in seconds.
+# Neighbours are updated each time they are observed, so without this every
+# observation of a host without a PTR record would mean another lookup.
+REVERSE_DNS_NEGATIVE_TTL = timedelta(minutes=10).total_seconds()
+
+# How often to log statistics about the lookups done, in seconds.
+REVERSE_DNS_STATISTICS_INTERVAL = timedelta(minutes=10).total_seconds()
+
+
 class ReverseDNSService(Service):
-    """Service to resolve and cache reverse DNS names for neighbour entries."""
+    """Service to resolve and cache reverse DNS names for neighbour entries.
+
+    Addresses to look up are queued as neighbours are observed, and looked up
+    in batches, with bounded concurrency. The results for each batch are
+    written to the database in one transaction. Statistics about the lookups
+    are logged periodically while there is any activity.
+    """
 
-    def __init__(self, postgresListener: PostgresListenerService=None):
+    def __init__(
+            self, postgresListener: PostgresListenerService=None,
+            clock=reactor, concurrency=REVERSE_DNS_CONCURRENCY,
+            batch_size=REVERSE_DNS_BATCH_SIZE,
+            negative_ttl=REVERSE_DNS_NEGATIVE_TTL,
+            statistics_interval=REVERSE_DNS_STATISTICS_INTERVAL):
         super().__init__()
         self.listener = postgresListener
+        self.clock = clock
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.negative_ttl = negative_ttl
+        self.statistics_interval = statistics_interval
         # We will cache a reference to the region model object so we don't
         # need to look it up every time a DNS entry changes.
         self.region = None
+        # Maps each queued IP address to the action to take for it, and the
+        # Deferreds to fire once that is done. Queueing an address again
+        # before it is processed replaces the action.
+        self._queue = OrderedDict()
+        self._processing = False
+        # Maps IP addresses that did not resolve to when to try them again,
+        # in the order in which they expire.
+        self._unresolvable = OrderedDict()
+        # Statistics about the lookups done so far.
+        self.lookups = 0
+        self.lookup_time = 0.0
+        self.max_lookup_time = 0.0
+        self._lookups_logged = 0
+        self._statistics = LoopingCall(self.logStatistics)
+        self._statistics.clock = clock
 
     @defer.inlineCallbacks
     def startService(self):
         super().startService()
+        self._statistics.start(self.statistics_interval, now=False)
         self.region = yield deferToDatabase(
             RegionController.objects.get_running_controller)
         if self.listener is not None:
-            self.listener.register('neighbour', self.consumeNeighbourEvent)
+            self.listener.register('neighbour', self.queueNeighbourEvent)
 
     def stopService(self):
+        if self._statistics.running:
+            self._statistics.stop()
         if self.listener is not None:
-            self.listener.unregister('neighbour', self.consumeNeighbourEvent)
+            self.listener.unregister('neighbour', self.queueNeighbourEvent)
         return super().stopService()
 
+    @property
+    def queue_length(self):
+        """The number of IP addresses waiting to be processed."""
+        return len(self._queue)
+
+    def getStatistics(self):
+        """Return statistics about reverse-DNS resolution, as a dict.
+
+        :return: The number of IP addresses waiting to be processed, the
+            number looked up so far, the average and maximum time taken to
+            look up each one (in seconds), and the number remembered as
+            not reverse-resolving.
+        """
+        average = self.lookup_time / self.lookups if self.lookups else 0.0
+        return {
+            "queue_length": self.queue_length,
+            "lookups": self.lookups,
+            "average_lookup_time": average,
+            "max_lookup_time": self.max_lookup_time,
+            "unresolvable": len(self._unresolvable),
+        }
+
+    def logStatistics(self):
+        """Log statistics about reverse-DNS resolution.
+
+        Nothing is logged if no addresses have been looked up since the last
+        time, and none are waiting to be.
+        """
+        statistics = self.getStatistics()
+        if (statistics["lookups"] == self._lookups_logged and
+                statistics["queue_length"] == 0):
+            return
+        self._lookups_logged = statistics["lookups"]
+        log.info(
+            "Reverse-DNS: {lookups} lookup(s) so far, taking "
+            "{average_lookup_time:.3f}s on average and "
+            "{max_lookup_time:.3f}s at most; {queue_length} address(es) "
+            "queued; {unresolvable} address(es) unresolvable.",
+            **statistics)
+
     def set_rdns_entry(self, ip: str, results: List[str]):
         """Set the reverse-DNS entry for the specified IP address.
 
@@ -68,7 +172,32 @@ class ReverseDNSService(Service):
         """
         RDNS.objects.delete_current_entry(ip, self.region)
 
-    @defer.inlineCallbacks
+    @transactional
+    def update_rdns_entries(
+            self, entries: Dict[str, List[str]], deleted: List[str]):
+        """Set and delete many reverse-DNS entries in one transaction.
+
+        Must run in a thread where database access is permitted.
+
+        :param entries: a dict mapping IP addresses to update to non-empty
+            lists of hostnames, in "preferred" order.
+        :param deleted: the IP addresses to delete.
+        """
+        if len(entries) > 0:
+            RDNS.objects.set_current_entries(entries, self.region)
+        if len(deleted) > 0:
+            RDNS.objects.delete_current_entries(deleted, self.region)
+
+    def queueNeighbourEvent(self, action: str=None, cidr: str=None):
+        """Queue an event from the postgresListener, without waiting for it.
+
+        The listener handles one notification at a time, so waiting for each
+        lookup to complete would prevent lookups from being batched.
+        """
+        d = self.consumeNeighbourEvent(action, cidr)
+        d.addErrback(
+            log.err, "Failed to process reverse-DNS for %r." % (cidr, ))
+
     def consumeNeighbourEvent(self, action: str=None, cidr: str=None):
         """Given an event from the postgresListener, resolve RDNS for an IP.
 
@@ -78,27 +207,112 @@ class ReverseDNSService(Service):
         :param cidr: the 'ip' field in the neighbour table, after PostgreSQL
             casts it to a string. It will end up looking like "x.x.x.x/32"
             or "yyyy:yyyy::yyyy/128".
+        :return: a `Deferred` that fires once the event has been processed.
         """
         ip = cidr.split('/')[0]  # Strip off the "/<prefixlen>".
         if action in ('create', 'update'):
-            # XXX mpontillo 2016-10-19: We might consider throttling this on
-            # a per-IP-address basis, both because multiple racks can observe
-            # the same IP address, and because an IP address might repeatedly
-            # go back-and-forth between two MACs in the case of a duplicate IP
-            # address.
-            results = yield reverseResolve(ip).addErrback(
-                suppress, defer.TimeoutError, instead=None)
-            if results is not None:
-                if len(results) > 0:
-                    yield deferToDatabase(self.set_rdns_entry, ip, results)
-                else:
-                    yield deferToDatabase(self.delete_rdns_entry, ip)
-            else:
-                # A return of 'None' indicates a timeout or other possibly-
-                # temporary failure, so take no action.
-                pass
+            # Multiple racks can observe the same IP address, and an IP
+            # address might repeatedly go back-and-forth between two MACs in
+            # the case of a duplicate IP address, so don't look up addresses
+            # again soon after they failed to resolve.
+            if self._isUnresolvable(ip):
+                return defer.succeed(None)
         elif action == 'delete':
-            yield deferToDatabase(self.delete_rdns_entry, ip)
+            self._unresolvable.pop(ip, None)
         else:
             log.msg("Unsupported event from listener: action=%r, cidr=%r" % (
                 action, cidr), system="reverse-dns")
+            return defer.succeed(None)
+        _, waiters = self._queue.pop(ip, (None, []))
+        d = defer.Deferred()
+        waiters.append(d)
+        self._queue[ip] = action, waiters
+        if not self._processing:
+            self._processing = True
+            self._processQueue()
+        return d
+
+    def _isUnresolvable(self, ip: str):
+        """Return True if `ip` failed to resolve less than a TTL ago."""
+        current_time = self.clock.seconds()
+        while len(self._unresolvable) > 0:
+            expiry = next(iter(self._unresolvable.values()))
+            if expiry > current_time:
+                break
+            self._unresolvable.popitem(last=False)
+        return ip in self._unresolvable
+
+    @defer.inlineCallbacks
+    def _processQueue(self):
+        """Process batches of queued events until the queue is empty."""
+        try:
+            while len(self._queue) > 0:
+                batch = []
+                while len(self._queue) > 0 and len(batch) < self.batch_size:
+                    batch.append(self._queue.popitem(last=False))
+                try:
+                    yield self._processBatch(
+                        [(ip, action) for ip, (action, _) in batch])
+                except Exception:
+                    failure = Failure()
+                    for _, (_, waiters) in batch:
+                        for waiter in waiters:
+                            waiter.errback(failure)
+                else:
+                    for _, (_, waiters) in batch:
+                        for waiter in waiters:
+                            waiter.callback(None)
+        finally:
+            self._processing = False
+
+    @defer.inlineCallbacks
+    def _processBatch(self, batch):
+        """Look up and write the results for `batch` of events.
+
+        :param batch: a list of (ip, action) tuples.
+        """
+        lookups = [ip for ip, action in batch if action != 'delete']
+        results = yield gatherWithConcurrency(
+            (partial(self._resolve, ip) for ip in lookups), self.concurrency)
+        entries = {}
+        deleted = [ip for ip, action in batch if action == 'delete']
+        for ip, result in zip(lookups, results):
+            if result is None:
+                # A return of 'None' indicates a timeout or other possibly-
+                # temporary failure, so take no action.
+                continue
+            elif len(result) > 0:
+                entries[ip] = result
+            else:
+                deleted.append(ip)
+                self._unresolvable.pop(ip, None)
+                self._unresolvable[ip] = (
+                    self.clock.seconds() + self.negative_ttl)
+        if len(entries) > 0 or len(deleted) > 0:
+            yield deferToDatabase(self.update_rdns_entries, entries, deleted)
+        if len(lookups) > 0:
+            log.debug(
+                "Resolved {count} of {lookups} address(es); {queued} queued.",
+                count=len(entries), lookups=len(lookups),
+                queued=self.queue_length)
+
+    @defer.inlineCallbacks
+    def _resolve(self, ip: str):
+        """Reverse-resolve `ip`, keeping track of how long it took.
+
+        :return: A list of hostnames, or `None` if the lookup failed in a way
+            that might be temporary, or unexpectedly; such failures must not
+            affect the other lookups in the same batch.
+        """
+        started = self.clock.seconds()
+        try:
+            results = yield reverseResolve(ip).addErrback(
+                suppress, defer.TimeoutError, instead=None)
+        except Exception:
+            log.err(None, "Failed to reverse-resolve %s." % ip)
+            results = None
+        elapsed = self.clock.seconds() - started
+        self.lookups += 1
+        self.lookup_time += elapsed
+        self.max_lookup_time = max(self.max_lookup_time, elapsed)
+        return results
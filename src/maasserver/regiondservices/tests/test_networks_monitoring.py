@@ -13,9 +13,11 @@ from maasserver.regiondservices.networks_monitoring import (
 )
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASTransactionServerTestCase
+from maasserver.utils.orm import reload_object
 from maasserver.utils.threads import deferToDatabase
 from maastesting.matchers import DocTestMatches
 from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.utils.network import annotate_with_interface_hashes
 from provisioningserver.utils.testing import MAASIDFixture
 from testtools.matchers import (
     Contains,
@@ -78,6 +80,38 @@ class TestRegionNetworksMonitoringService(MAASTransactionServerTestCase):
             interface_observed.mac_address.raw,
             Equals(interface_expected["mac_address"]))
 
+    @wait_for(30)
+    @inlineCallbacks
+    def test_records_interfaces_with_hashes(self):
+        region = yield deferToDatabase(factory.make_RegionController)
+        region.owner = yield deferToDatabase(factory.make_admin)
+        yield deferToDatabase(region.save)
+        # Declare this region controller as the one running here.
+        self.useFixture(MAASIDFixture(region.system_id))
+
+        interfaces = {
+            factory.make_name("eth"): {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [],
+                "enabled": True,
+            }
+        }
+
+        service = RegionNetworksMonitoringService(
+            reactor, enable_beaconing=False)
+        service.getInterfaces = lambda: succeed(interfaces)
+        service.startService()
+        yield service.stopService()
+
+        def get_recorded_interfaces():
+            return reload_object(region).interfaces
+
+        recorded = yield deferToDatabase(get_recorded_interfaces)
+        self.assertThat(
+            recorded, Equals(annotate_with_interface_hashes(interfaces)))
+
     @wait_for(30)
     @inlineCallbacks
     def test_logs_error_when_running_region_controller_cannot_be_found(self):
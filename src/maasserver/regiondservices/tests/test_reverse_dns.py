@@ -5,26 +5,41 @@
 
 __all__ = []
 
-from unittest.mock import Mock
+from textwrap import dedent
+from unittest.mock import (
+    call,
+    Mock,
+)
 
 from crochet import wait_for
 from maasserver.models import RDNS
 from maasserver.regiondservices import reverse_dns as reverse_dns_module
-from maasserver.regiondservices.reverse_dns import ReverseDNSService
+from maasserver.regiondservices.reverse_dns import (
+    REVERSE_DNS_NEGATIVE_TTL,
+    REVERSE_DNS_STATISTICS_INTERVAL,
+    ReverseDNSService,
+)
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASTransactionServerTestCase
 from maasserver.utils.threads import deferToDatabase
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    DocTestMatches,
+    MockCalledOnceWith,
+    MockCallsMatch,
+)
+from maastesting.twisted import TwistedLoggerFixture
 from provisioningserver.utils.testing import callWithServiceRunning
 from provisioningserver.utils.tests.test_network import (
     TestReverseResolveMixIn,
 )
 from testtools.matchers import (
+    ContainsDict,
     Equals,
     Is,
 )
 from twisted.internet import defer
 from twisted.internet.defer import inlineCallbacks
+from twisted.internet.task import Clock
 
 
 class TestReverseDNSService(
@@ -105,11 +120,11 @@ class TestReverseDNSService(
         service = ReverseDNSService(postgresListener=listener)
         yield service.startService()
         self.assertThat(listener.register, MockCalledOnceWith(
-            'neighbour', service.consumeNeighbourEvent
+            'neighbour', service.queueNeighbourEvent
         ))
         service.stopService()
         self.assertThat(listener.unregister, MockCalledOnceWith(
-            'neighbour', service.consumeNeighbourEvent
+            'neighbour', service.queueNeighbourEvent
         ))
 
     @wait_for(30)
@@ -125,3 +140,112 @@ class TestReverseDNSService(
         self.assertThat(reverseResolve, MockCalledOnceWith(ip))
         result = yield deferToDatabase(RDNS.objects.first)
         self.assertThat(result, Is(None))
+
+    @wait_for(30)
+    @inlineCallbacks
+    def test__looks_up_and_writes_queued_addresses_in_batches(self):
+        reverseResolve = self.patch(reverse_dns_module, "reverseResolve")
+        reverseResolve.side_effect = lambda ip: defer.succeed(
+            ["%s.example.com" % ip.replace(".", "-")])
+        service = ReverseDNSService(batch_size=2)
+        update_rdns_entries = self.patch(
+            service, "update_rdns_entries",
+            Mock(side_effect=service.update_rdns_entries))
+        yield service.startService()
+        ips = [factory.make_ip_address(ipv6=False) for _ in range(5)]
+        yield defer.DeferredList([
+            service.consumeNeighbourEvent("create", "%s/32" % ip)
+            for ip in ips
+        ], fireOnOneErrback=True)
+        service.stopService()
+        # The first address is looked up right away; the others are queued
+        # while its result is written, and then processed two at a time.
+        self.assertThat(update_rdns_entries.call_count, Equals(3))
+        entries = yield deferToDatabase(
+            lambda: {rdns.ip: rdns.hostname for rdns in RDNS.objects.all()})
+        self.assertThat(entries, Equals({
+            ip: "%s.example.com" % ip.replace(".", "-") for ip in ips
+        }))
+        self.assertThat(service.getStatistics(), ContainsDict({
+            "queue_length": Equals(0),
+            "lookups": Equals(5),
+        }))
+
+    @wait_for(30)
+    @inlineCallbacks
+    def test__does_not_look_up_unresolvable_addresses_again_until_ttl(self):
+        reverseResolve = self.patch(reverse_dns_module, "reverseResolve")
+        reverseResolve.side_effect = lambda ip: defer.succeed([])
+        clock = Clock()
+        service = ReverseDNSService(clock=clock)
+        ip = factory.make_ip_address(ipv6=False)
+        yield callWithServiceRunning(
+            service, service.consumeNeighbourEvent, "create", "%s/32" % ip)
+        yield service.consumeNeighbourEvent("update", "%s/32" % ip)
+        self.assertThat(reverseResolve, MockCalledOnceWith(ip))
+        self.assertThat(
+            service.getStatistics()["unresolvable"], Equals(1))
+        clock.advance(REVERSE_DNS_NEGATIVE_TTL)
+        yield service.consumeNeighbourEvent("update", "%s/32" % ip)
+        self.assertThat(reverseResolve, MockCallsMatch(call(ip), call(ip)))
+
+    @wait_for(30)
+    @inlineCallbacks
+    def test__unexpected_lookup_failure_does_not_affect_batch(self):
+        failing, resolving = (
+            factory.make_ip_address(ipv6=False) for _ in range(2))
+        reverseResolve = self.patch(reverse_dns_module, "reverseResolve")
+        reverseResolve.side_effect = lambda ip: (
+            defer.fail(UnicodeError("label empty or too long"))
+            if ip == failing else defer.succeed(["resolving.example.com"]))
+        service = ReverseDNSService()
+        yield service.startService()
+        with TwistedLoggerFixture() as logger:
+            yield service._processBatch(
+                [(failing, "create"), (resolving, "create")])
+        service.stopService()
+        entries = yield deferToDatabase(
+            lambda: {rdns.ip: rdns.hostname for rdns in RDNS.objects.all()})
+        self.assertThat(entries, Equals({resolving: "resolving.example.com"}))
+        self.assertThat(
+            logger.output, DocTestMatches(dedent("""\
+                Failed to reverse-resolve %s.
+                Traceback (most recent call last):
+                ...
+                builtins.UnicodeError: label empty or too long
+                ...""") % failing))
+
+    @wait_for(30)
+    @inlineCallbacks
+    def test__logs_statistics_while_active(self):
+        reverseResolve = self.patch(reverse_dns_module, "reverseResolve")
+        reverseResolve.side_effect = lambda ip: defer.succeed([])
+        clock = Clock()
+        service = ReverseDNSService(clock=clock)
+        yield service.startService()
+        with TwistedLoggerFixture() as logger:
+            clock.advance(REVERSE_DNS_STATISTICS_INTERVAL)
+            ip = factory.make_ip_address(ipv6=False)
+            yield service.consumeNeighbourEvent("create", "%s/32" % ip)
+            clock.advance(REVERSE_DNS_STATISTICS_INTERVAL)
+            clock.advance(REVERSE_DNS_STATISTICS_INTERVAL)
+        service.stopService()
+        statistics = [
+            message for message in logger.messages
+            if message.startswith("Reverse-DNS:")
+        ]
+        self.assertThat(statistics, Equals([
+            "Reverse-DNS: 1 lookup(s) so far, taking 0.000s on average and "
+            "0.000s at most; 0 address(es) queued; 1 address(es) "
+            "unresolvable.",
+        ]))
+
+    def test__queueNeighbourEvent_does_not_wait_for_event(self):
+        service = ReverseDNSService()
+        consumeNeighbourEvent = self.patch(service, "consumeNeighbourEvent")
+        consumeNeighbourEvent.return_value = defer.Deferred()
+        ip = factory.make_ip_address(ipv6=False)
+        self.assertThat(
+            service.queueNeighbourEvent("create", "%s/32" % ip), Is(None))
+        self.assertThat(
+            consumeNeighbourEvent, MockCalledOnceWith("create", "%s/32" % ip))
@@ -7,6 +7,7 @@ __all__ = [
     "register_event_type",
     "send_event",
     "send_event_mac_address",
+    "send_events",
 ]
 
 from maasserver.enum import INTERFACE_TYPE
@@ -17,6 +18,10 @@ from maasserver.models import (
     Node,
 )
 from maasserver.utils.orm import transactional
+from netaddr import (
+    AddrFormatError,
+    EUI,
+)
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import NoSuchEventType
 from provisioningserver.utils.twisted import synchronous
@@ -93,3 +98,75 @@ def send_event_mac_address(mac_address, type_name, description, timestamp):
         Event.objects.create(
             node=interface.node, type=event_type, description=description,
             created=timestamp)
+
+
+def _parse_mac(mac_address):
+    """Return `mac_address` as an `EUI`, or `None` if it's not valid."""
+    try:
+        return EUI(mac_address)
+    except (AddrFormatError, TypeError, ValueError):
+        return None
+
+
+@synchronous
+@transactional
+def send_events(events, timestamp):
+    """Send a batch of events.
+
+    Each event is a dict with `type_name` and `description`, and either a
+    `system_id` or a `mac_address` identifying the node. The event types
+    and nodes for the whole batch are looked up together and the events
+    are then inserted with a single multi-row insert.
+
+    Events of unknown types, or for unknown nodes, are dropped; see
+    `send_event` and `send_event_mac_address`.
+
+    for :py:class:`~provisioningserver.rpc.region.SendEvents`.
+    """
+    event_types = {
+        event_type.name: event_type
+        for event_type in EventType.objects.filter(
+            name__in={event["type_name"] for event in events})
+    }
+    system_ids = {
+        event["system_id"] for event in events
+        if event.get("system_id") is not None}
+    nodes_by_system_id = dict(
+        Node.objects.filter(system_id__in=system_ids).values_list(
+            "system_id", "id"))
+    macs = {
+        _parse_mac(event["mac_address"]) for event in events
+        if event.get("system_id") is None}
+    macs.discard(None)
+    nodes_by_mac = {
+        EUI(str(mac_address)): node_id
+        for mac_address, node_id in Interface.objects.filter(
+            type=INTERFACE_TYPE.PHYSICAL,
+            mac_address__in=[str(mac) for mac in macs]).values_list(
+                "mac_address", "node_id")
+    }
+
+    new_events = []
+    for event in events:
+        type_name = event["type_name"]
+        description = event["description"]
+        event_type = event_types.get(type_name)
+        if event_type is None:
+            log.debug(
+                "Event '{type}: {description}' sent with unknown type.",
+                type=type_name, description=description)
+            continue
+        if event.get("system_id") is not None:
+            node_id = nodes_by_system_id.get(event["system_id"])
+        else:
+            node_id = nodes_by_mac.get(_parse_mac(event["mac_address"]))
+        if node_id is None:
+            log.debug(
+                "Event '{type}: {description}' sent for non-existent "
+                "node '{node}'.", type=type_name, description=description,
+                node=event.get("system_id") or event.get("mac_address"))
+            continue
+        new_events.append(Event(
+            node_id=node_id, type=event_type, description=description,
+            created=timestamp, updated=timestamp))
+    Event.objects.bulk_create(new_events)
@@ -6,6 +6,7 @@
 __all__ = [
     "handle_upgrade",
     "register",
+    "report_boot_images",
     "update_interfaces",
     "update_last_image_sync",
 ]
@@ -264,3 +265,19 @@ def update_last_image_sync(system_id):
     """
     RackController.objects.filter(
         system_id=system_id).update(last_image_sync=now())
+
+
+@synchronous
+@transactional
+def report_boot_images(system_id, images, osystems=None):
+    """Cache the boot images and operating systems of the rack controller.
+
+    for :py:class:`~provisioningserver.rpc.region.ReportBootImages`.
+    """
+    try:
+        rack_controller = RackController.objects.get(system_id=system_id)
+    except RackController.DoesNotExist:
+        raise NoSuchNode.from_system_id(system_id)
+    else:
+        ControllerInfo.objects.set_boot_images(
+            rack_controller, images, osystems)
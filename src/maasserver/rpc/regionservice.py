@@ -30,6 +30,7 @@ from maasserver.rpc import (
     packagerepository,
     rackcontrollers,
 )
+from maasserver.rpc.events import send_events
 from maasserver.rpc.nodes import (
     commission_node,
     create_node,
@@ -117,13 +118,16 @@ class Region(RPCProtocol):
         return d.addCallback(got_secret)
 
     @region.ReportBootImages.responder
-    def report_boot_images(self, uuid, images):
-        """report_boot_images(uuid, images)
+    def report_boot_images(self, uuid, images, osystems=None):
+        """report_boot_images(uuid, images, osystems)
 
         Implementation of
         :py:class:`~provisioningserver.rpc.region.ReportBootImages`.
         """
-        return {}
+        d = deferToDatabase(
+            rackcontrollers.report_boot_images, uuid, images, osystems)
+        d.addCallback(lambda args: {})
+        return d
 
     @region.UpdateLease.responder
     def update_lease(
@@ -320,6 +324,19 @@ class Region(RPCProtocol):
         # Don't wait for the record to be written.
         return succeed({})
 
+    @region.SendEvents.responder
+    def send_events(self, events):
+        """send_events()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.SendEvents`.
+        """
+        timestamp = datetime.now()
+        dbtasks = eventloop.services.getServiceNamed("database-tasks")
+        dbtasks.addTask(send_events, events, timestamp)
+        # Don't wait for the records to be written.
+        return succeed({})
+
     @region.ReportForeignDHCPServer.responder
     def report_foreign_dhcp_server(
             self, system_id, interface_name, dhcp_ip=None):
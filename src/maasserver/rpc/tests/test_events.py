@@ -14,6 +14,7 @@ from maasserver.models.eventtype import EventType
 from maasserver.rpc import events
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
 from provisioningserver.rpc.exceptions import NoSuchEventType
 
 
@@ -92,3 +93,65 @@ class TestSendEventMACAddress(MAASServerTestCase):
         Event.objects.get(
             node=node, type=event_type, description=description,
             created=timestamp)
+
+
+class TestSendEvents(MAASServerTestCase):
+
+    def test__creates_events_for_nodes(self):
+        event_type = factory.make_EventType()
+        node = factory.make_Node(interface=True)
+        mac_address = node.interface_set.first().mac_address
+        timestamp = datetime.datetime.utcnow()
+        events.send_events([
+            {"system_id": node.system_id, "mac_address": None,
+             "type_name": event_type.name, "description": "by id"},
+            {"system_id": None, "mac_address": str(mac_address).upper(),
+             "type_name": event_type.name, "description": "by mac"},
+        ], timestamp)
+        self.assertItemsEqual(
+            [("by id", timestamp), ("by mac", timestamp)],
+            Event.objects.filter(node=node, type=event_type).values_list(
+                "description", "created"))
+
+    def test__drops_events_of_unknown_types_or_nodes(self):
+        event_type = factory.make_EventType()
+        node = factory.make_Node()
+        events.send_events([
+            {"system_id": node.system_id, "mac_address": None,
+             "type_name": factory.make_name("type"), "description": ""},
+            {"system_id": factory.make_name("system_id"),
+             "mac_address": None, "type_name": event_type.name,
+             "description": ""},
+            {"system_id": None, "mac_address": factory.make_mac_address(),
+             "type_name": event_type.name, "description": ""},
+            {"system_id": None, "mac_address": "not-a-mac",
+             "type_name": event_type.name, "description": ""},
+            {"system_id": node.system_id, "mac_address": None,
+             "type_name": event_type.name, "description": "kept"},
+        ], datetime.datetime.utcnow())
+        self.assertItemsEqual(
+            ["kept"], Event.objects.values_list("description", flat=True))
+
+    def test__inserts_batch_in_constant_queries(self):
+        event_type = factory.make_EventType()
+        nodes = [factory.make_Node(interface=True) for _ in range(3)]
+
+        def make_batch():
+            return [
+                {"system_id": node.system_id, "mac_address": None,
+                 "type_name": event_type.name, "description": ""}
+                for node in nodes
+            ] + [
+                {"system_id": None, "type_name": event_type.name,
+                 "mac_address": str(node.interface_set.first().mac_address),
+                 "description": ""}
+                for node in nodes
+            ]
+
+        count_one, _ = count_queries(
+            events.send_events, make_batch()[:1],
+            datetime.datetime.utcnow())
+        count_all, _ = count_queries(
+            events.send_events, make_batch(), datetime.datetime.utcnow())
+        self.assertEqual(count_one + 1, count_all)
+        self.assertEqual(7, Event.objects.count())
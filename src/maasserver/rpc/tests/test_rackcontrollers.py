@@ -14,12 +14,15 @@ from maasserver import (
     locks,
     worker_user,
 )
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.clusterrpc.testing.osystems import make_rpc_osystem
 from maasserver.enum import (
     INTERFACE_TYPE,
     IPADDRESS_TYPE,
     NODE_TYPE,
 )
 from maasserver.models import (
+    ControllerInfo,
     Node,
     NodeGroupToRackController,
     RackController,
@@ -31,6 +34,7 @@ from maasserver.rpc import rackcontrollers
 from maasserver.rpc.rackcontrollers import (
     handle_upgrade,
     register,
+    report_boot_images,
     report_neighbours,
     update_foreign_dhcp,
     update_interfaces,
@@ -43,6 +47,7 @@ from maastesting.matchers import (
     DocTestMatches,
     MockCalledOnceWith,
 )
+from provisioningserver.rpc.exceptions import NoSuchNode
 from testtools.matchers import (
     IsInstance,
     MatchesAll,
@@ -509,3 +514,23 @@ class TestUpdateLastImageSync(MAASServerTestCase):
 
         self.assertNotEqual(
             previous_sync, reload_object(rack).last_image_sync)
+
+
+class TestReportBootImages(MAASServerTestCase):
+
+    def test__caches_boot_images_and_osystems(self):
+        rack = factory.make_RackController()
+        images = [make_rpc_boot_image()]
+        osystems = [make_rpc_osystem()]
+
+        report_boot_images(rack.system_id, images, osystems)
+
+        info = ControllerInfo.objects.get(node=rack)
+        self.assertEqual(images, info.boot_images)
+        self.assertEqual(osystems, info.osystems)
+        self.assertIsNotNone(info.boot_images_updated)
+
+    def test__raises_NoSuchNode_for_unknown_rack_controller(self):
+        self.assertRaises(
+            NoSuchNode, report_boot_images,
+            factory.make_name("system_id"), [], [])
@@ -11,9 +11,7 @@ from datetime import (
 )
 from hashlib import sha256
 from hmac import HMAC
-from itertools import product
 from json import dumps
-import os.path
 import random
 from random import randint
 import time
@@ -23,6 +21,8 @@ from urllib.parse import urlparse
 from crochet import wait_for
 from maasserver import eventloop
 from maasserver.bootresources import get_simplestream_endpoint
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.clusterrpc.testing.osystems import make_rpc_osystem
 from maasserver.enum import (
     INTERFACE_TYPE,
     NODE_STATUS,
@@ -93,6 +93,7 @@ from provisioningserver.rpc.region import (
     RequestRackRefresh,
     SendEvent,
     SendEventMACAddress,
+    SendEvents,
     UpdateInterfaces,
     UpdateLease,
     UpdateNodePowerState,
@@ -102,7 +103,6 @@ from provisioningserver.rpc.testing import (
     are_valid_tls_parameters,
     call_responder,
 )
-from provisioningserver.testing.config import ClusterConfigurationFixture
 from testtools.deferredruntest import assert_fails_with
 from testtools.matchers import (
     ContainsAll,
@@ -205,59 +205,41 @@ class TestRegionProtocol_ReportBootImages(MAASTestCase):
         self.assertIsNotNone(responder)
 
     @wait_for_reactor
-    def test_report_boot_images_can_be_called(self):
-        uuid = factory.make_name("uuid")
-        images = [
-            {"architecture": factory.make_name("architecture"),
-             "subarchitecture": factory.make_name("subarchitecture"),
-             "release": factory.make_name("release"),
-             "purpose": factory.make_name("purpose")},
-        ]
-
-        d = call_responder(Region(), ReportBootImages, {
-            "uuid": uuid, "images": images,
-        })
+    @inlineCallbacks
+    def test_calls_report_boot_images_function(self):
+        report_boot_images = self.patch(
+            regionservice.rackcontrollers, 'report_boot_images')
 
-        def check(response):
-            self.assertEqual({}, response)
+        params = {
+            "uuid": factory.make_name("system_id"),
+            "images": [make_rpc_boot_image()],
+            "osystems": [make_rpc_osystem()],
+        }
 
-        return d.addCallback(check)
+        response = yield call_responder(
+            Region(), ReportBootImages, params)
+        self.assertEqual({}, response)
+
+        self.assertThat(
+            report_boot_images,
+            MockCalledOnceWith(
+                params["uuid"], params["images"], params["osystems"]))
 
     @wait_for_reactor
-    def test_report_boot_images_with_real_things_to_report(self):
-        # tftppath.report_boot_images()'s return value matches the
-        # arguments schema that ReportBootImages declares, and is
-        # serialised correctly.
-
-        # Example boot image definitions.
-        archs = "i386", "amd64"
-        subarchs = "generic", "special"
-        releases = "precise", "trusty"
-        purposes = "commission", "install"
-
-        # Create a TFTP file tree with a variety of subdirectories.
-        tftpdir = self.make_dir()
-        for options in product(archs, subarchs, releases, purposes):
-            os.makedirs(os.path.join(tftpdir, *options))
-
-        # Ensure that report_boot_images() uses the above TFTP file tree.
-        self.useFixture(ClusterConfigurationFixture(tftp_root=tftpdir))
-
-        images = [
-            {"architecture": arch, "subarchitecture": subarch,
-             "release": release, "purpose": purpose}
-            for arch, subarch, release, purpose in product(
-                archs, subarchs, releases, purposes)
-        ]
-
-        d = call_responder(Region(), ReportBootImages, {
-            "uuid": factory.make_name("uuid"), "images": images,
-        })
+    @inlineCallbacks
+    def test_report_boot_images_without_osystems(self):
+        report_boot_images = self.patch(
+            regionservice.rackcontrollers, 'report_boot_images')
 
-        def check(response):
-            self.assertEqual({}, response)
+        system_id = factory.make_name("system_id")
+        images = [make_rpc_boot_image() for _ in range(3)]
+        response = yield call_responder(Region(), ReportBootImages, {
+            "uuid": system_id, "images": images,
+        })
+        self.assertEqual({}, response)
 
-        return d.addCallback(check)
+        self.assertThat(
+            report_boot_images, MockCalledOnceWith(system_id, images, None))
 
 
 class TestRegionProtocol_UpdateLease(MAASTransactionServerTestCase):
@@ -1001,6 +983,63 @@ class TestRegionProtocol_SendEventMACAddress(MAASTransactionServerTestCase):
                 type=name, description=event_description, mac=mac_address))
 
 
+class TestRegionProtocol_SendEvents(MAASTransactionServerTestCase):
+
+    def setUp(self):
+        super(TestRegionProtocol_SendEvents, self).setUp()
+        self.useFixture(RegionEventLoopFixture("database-tasks"))
+
+    def test_send_events_is_registered(self):
+        protocol = Region()
+        responder = protocol.locateResponder(SendEvents.commandName)
+        self.assertIsNotNone(responder)
+
+    @transactional
+    def get_events(self, type_name):
+        return set(Event.objects.filter(type__name=type_name).values_list(
+            'node__system_id', 'description', 'created'))
+
+    @transactional
+    def create_event_type(self, name):
+        EventType.objects.create(name=name, description="", level=0)
+
+    @transactional
+    def make_interface(self):
+        interface = factory.make_Interface(INTERFACE_TYPE.PHYSICAL)
+        return interface.node.system_id, str(interface.mac_address)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_send_events_stores_events_with_timestamp_received(self):
+        timestamp = datetime.now() - timedelta(seconds=randint(99, 99999))
+        self.patch(regionservice, "datetime").now.return_value = timestamp
+
+        event_type = factory.make_name('type_name')
+        yield deferToDatabase(self.create_event_type, event_type)
+        system_id, mac_address = yield deferToDatabase(self.make_interface)
+
+        yield eventloop.start()
+        try:
+            response = yield call_responder(
+                Region(), SendEvents, {
+                    'events': [
+                        {'system_id': system_id, 'type_name': event_type,
+                         'description': 'by id'},
+                        {'mac_address': mac_address, 'type_name': event_type,
+                         'description': 'by mac'},
+                    ],
+                })
+        finally:
+            yield eventloop.reset()
+
+        self.assertEqual({}, response)
+        stored = yield deferToDatabase(self.get_events, event_type)
+        self.assertEqual({
+            (system_id, 'by id', timestamp),
+            (system_id, 'by mac', timestamp),
+        }, stored)
+
+
 class TestRegionProtocol_UpdateServices(MAASTransactionServerTestCase):
 
     def setUp(self):
@@ -39,8 +39,10 @@ from maasserver.utils.orm import (
     is_unique_violation,
 )
 from maastesting.djangotestcase import (
+    check_query_budget,
     DjangoTestCase,
     DjangoTransactionTestCase,
+    record_queries,
 )
 from maastesting.testcase import MAASTestCase
 
@@ -97,6 +99,29 @@ class MAASRegionTestCaseBase(PostCommitHooksTestMixin):
         self.assertFalse(connection.in_atomic_block, (
             "Default connection is engaged in a transaction."))
 
+    def assertQueryBudget(self, populate, func, sizes=(1, 10), per_item=0):
+        """Assert that the number of queries `func` makes scales as expected.
+
+        For each of `sizes`, in ascending order, `populate` is called with
+        the number of objects to create to bring the total up to that size,
+        then the queries made by calling `func` are recorded. The counts must
+        grow by no more than `per_item` for each additional object; by
+        default they must not grow at all.
+
+        On failure the queries whose count changed with N are shown in their
+        normalised form, with those repeated at least N times flagged as
+        likely N+1 queries.
+        """
+        recordings = {}
+        total = 0
+        for size in sorted(sizes):
+            populate(size - total)
+            total = size
+            recordings[size], _ = record_queries(func)
+        message = check_query_budget(recordings, per_item)
+        if message is not None:
+            self.fail(message)
+
 
 class MAASLegacyServerTestCase(
         MAASRegionTestCaseBase, DjangoTestCase):
@@ -17,6 +17,7 @@ from django.db import connections
 from maasserver import (
     bootresources,
     eventloop,
+    events_cleanup,
     ipc,
     nonces_cleanup,
     rack_controller,
@@ -355,6 +356,17 @@ class TestFactories(MAASTestCase):
         self.assertTrue(
             eventloop.loop.factories["nonce-cleanup"]["only_on_master"])
 
+    def test_make_EventCleanupService(self):
+        service = eventloop.make_EventCleanupService()
+        self.assertThat(service, IsInstance(
+            events_cleanup.EventCleanupService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_EventCleanupService,
+            eventloop.loop.factories["event-cleanup"]["factory"])
+        self.assertTrue(
+            eventloop.loop.factories["event-cleanup"]["only_on_master"])
+
     def test_make_StatusMonitorService(self):
         service = eventloop.make_StatusMonitorService()
         self.assertThat(service, IsInstance(
@@ -0,0 +1,101 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the events cleanup module."""
+
+__all__ = []
+
+from datetime import timedelta
+from unittest.mock import (
+    call,
+    Mock,
+)
+
+from maasserver import events_cleanup
+from maasserver.events_cleanup import (
+    cleanup_old_events,
+    EventCleanupService,
+    get_cutoff,
+)
+from maasserver.models import (
+    Config,
+    Event,
+)
+from maasserver.models.timestampedmodel import now
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.task import Clock
+
+
+def make_old_event(age):
+    event = factory.make_Event()
+    Event.objects.filter(id=event.id).update(
+        created=now() - timedelta(days=age))
+    return event
+
+
+class TestGetCutoff(MAASServerTestCase):
+
+    def test_returns_None_by_default(self):
+        self.assertIsNone(get_cutoff())
+
+    def test_returns_max_event_age_days_ago(self):
+        Config.objects.set_config('max_event_age', 30)
+        current_time = now()
+        self.patch(events_cleanup, "now").return_value = current_time
+        self.assertEqual(current_time - timedelta(days=30), get_cutoff())
+
+
+class TestCleanupOldEvents(MAASServerTestCase):
+
+    def test_keeps_events_when_max_event_age_is_zero(self):
+        events = [make_old_event(age=1000) for _ in range(3)]
+        self.assertEqual(0, cleanup_old_events())
+        self.assertItemsEqual(events, Event.objects.all())
+
+    def test_deletes_old_events_in_batches(self):
+        Config.objects.set_config('max_event_age', 30)
+        [make_old_event(age=31) for _ in range(5)]
+        new_events = [make_old_event(age=29) for _ in range(2)]
+        delete_old_events = self.patch(
+            events_cleanup, "delete_old_events",
+            Mock(side_effect=events_cleanup.delete_old_events))
+        self.assertEqual(5, cleanup_old_events(batch_size=2))
+        self.assertItemsEqual(new_events, Event.objects.all())
+        # Batches of 2, 2 and 1 were deleted.
+        self.assertEqual(3, delete_old_events.call_count)
+
+
+class TestEventCleanupService(MAASServerTestCase):
+
+    def test_init_with_default_interval(self):
+        cleanup_old_events = self.patch(
+            events_cleanup, "cleanup_old_events")
+        # Making `deferToDatabase` use the current thread helps testing.
+        self.patch(events_cleanup, "deferToDatabase", maybeDeferred)
+
+        service = EventCleanupService()
+        # Use a deterministic clock instead of the reactor for testing.
+        service.clock = Clock()
+
+        interval = 60 * 60  # seconds.
+        self.assertEqual(service.step, interval)
+
+        self.assertThat(cleanup_old_events, MockNotCalled())
+        service.startService()
+        self.assertThat(cleanup_old_events, MockCalledOnceWith())
+        service.clock.advance(interval - 1)
+        self.assertThat(cleanup_old_events, MockCalledOnceWith())
+        service.clock.advance(1)
+        self.assertThat(cleanup_old_events, MockCallsMatch(call(), call()))
+
+    def test_interval_can_be_set(self):
+        interval = self.getUniqueInteger()
+        service = EventCleanupService(interval)
+        self.assertEqual(interval, service.step)
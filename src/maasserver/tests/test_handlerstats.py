@@ -0,0 +1,144 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.handlerstats`."""
+
+__all__ = []
+
+from django.conf import settings
+from django.db import (
+    connection,
+    connections,
+    DEFAULT_DB_ALIAS,
+)
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.utils import CursorWrapper
+from maasserver import handlerstats
+from maasserver.handlerstats import (
+    CallStats,
+    HandlerStats,
+    is_enabled,
+)
+from maasserver.models import Config
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.testcase import MAASTestCase
+from testtools.matchers import (
+    Contains,
+    Equals,
+    GreaterThan,
+    HasLength,
+    Not,
+)
+
+
+class TestIsEnabled(MAASTestCase):
+
+    def test_disabled_by_default(self):
+        self.assertFalse(is_enabled())
+
+    def test_enabled_by_setting(self):
+        self.patch(settings, "DEBUG_HANDLER_STATS", True)
+        self.assertTrue(is_enabled())
+
+
+class TestCallStats(MAASServerTestCase):
+
+    def test_counting_queries_counts_queries(self):
+        stats = CallStats("api", "Handler.op")
+        with stats.counting_queries():
+            Config.objects.count()
+            Config.objects.count()
+        self.assertThat(stats.query_count, Equals(2))
+        # Queries are timed more precisely than Django's debug cursor does,
+        # so even quick queries take some time.
+        self.assertThat(stats.query_time, GreaterThan(0))
+
+    def test_counting_queries_does_not_log_queries(self):
+        queries = len(connection.queries_log)
+        stats = CallStats("api", "Handler.op")
+        with stats.counting_queries():
+            Config.objects.count()
+        self.assertThat(connection.queries_log, HasLength(queries))
+
+    def test_counting_queries_counts_without_django_debug_cursor(self):
+        # When DEBUG is on outside of development, regiond patches Django
+        # not to use its debug cursor.
+        self.patch(
+            BaseDatabaseWrapper, "make_debug_cursor",
+            lambda self, cursor: CursorWrapper(cursor, self))
+        stats = CallStats("api", "Handler.op")
+        with stats.counting_queries():
+            Config.objects.count()
+        self.assertThat(stats.query_count, Equals(1))
+
+    def test_counting_queries_restores_connection(self):
+        force_debug_cursor = connection.force_debug_cursor
+        stats = CallStats("api", "Handler.op")
+        with stats.counting_queries():
+            Config.objects.count()
+        self.assertThat(
+            connection.force_debug_cursor, Equals(force_debug_cursor))
+        self.assertThat(
+            vars(connections[DEFAULT_DB_ALIAS]),
+            Not(Contains("make_debug_cursor")))
+
+    def test_wrap_counts_queries(self):
+        stats = CallStats("websocket", "handler.method")
+        count = stats.wrap(Config.objects.count)
+        self.assertThat(count(), Equals(Config.objects.count()))
+        self.assertThat(stats.query_count, Equals(1))
+
+    def test_record_adds_to_handler_stats(self):
+        self.patch(handlerstats, "handler_stats", HandlerStats())
+        stats = CallStats("websocket", "handler.method")
+        stats.query_count = 3
+        stats.response_size = 100
+        stats.record()
+        [snapshot] = handlerstats.handler_stats.snapshot()
+        self.assertThat(snapshot["calls"], Equals(1))
+        self.assertThat(snapshot["queries"], Equals(3))
+        self.assertThat(snapshot["response_bytes"], Equals(100))
+
+
+class TestHandlerStats(MAASTestCase):
+
+    def make_call(self, kind="api", name="Handler.op", queries=0, size=0):
+        call = CallStats(kind, name)
+        call.query_count = queries
+        call.query_time = queries / 1000
+        call.response_size = size
+        return call
+
+    def test_add_accumulates_by_kind_and_name(self):
+        stats = HandlerStats()
+        stats.add(self.make_call(queries=2, size=10), 0.5)
+        stats.add(self.make_call(queries=3, size=20), 0.25, failed=True)
+        stats.add(self.make_call(kind="websocket", name="machine.list"), 1.0)
+        self.assertThat(stats.snapshot(), Equals([
+            {"kind": "api", "name": "Handler.op", "calls": 2, "errors": 1,
+             "seconds": 0.75, "queries": 5, "query_seconds": 0.005,
+             "response_bytes": 30},
+            {"kind": "websocket", "name": "machine.list", "calls": 1,
+             "errors": 0, "seconds": 1.0, "queries": 0, "query_seconds": 0,
+             "response_bytes": 0},
+        ]))
+
+    def test_reset_forgets_everything(self):
+        stats = HandlerStats()
+        stats.add(self.make_call(), 0.5)
+        stats.reset()
+        self.assertThat(stats.snapshot(), Equals([]))
+
+    def test_render_prometheus(self):
+        stats = HandlerStats()
+        stats.add(self.make_call(name='odd"name', queries=2, size=10), 0.5)
+        lines = stats.render_prometheus().splitlines()
+        self.assertIn("# TYPE maas_handler_calls_total counter", lines)
+        self.assertIn(
+            'maas_handler_calls_total{kind="api",name="odd\\"name"} 1', lines)
+        self.assertIn(
+            'maas_handler_queries_total{kind="api",name="odd\\"name"} 2',
+            lines)
+        self.assertIn(
+            'maas_handler_response_bytes_total'
+            '{kind="api",name="odd\\"name"} 10', lines)
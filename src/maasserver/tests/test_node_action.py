@@ -6,7 +6,10 @@
 __all__ = []
 
 import random
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    sentinel,
+)
 
 from django.db import transaction
 from maasserver import locks
@@ -34,9 +37,11 @@ from maasserver.node_action import (
     Acquire,
     ACTION_CLASSES,
     Commission,
+    compile_bulk_node_action,
     compile_node_actions,
     Delete,
     Deploy,
+    execute_bulk_node_action,
     ExitRescueMode,
     ImportImages,
     Lock,
@@ -75,9 +80,11 @@ from maasserver.utils.orm import (
     reload_object,
 )
 from maastesting.matchers import (
+    IsFiredDeferred,
     MockCalledOnce,
     MockCalledOnceWith,
 )
+from maastesting.twisted import extract_result
 from metadataserver.enum import (
     RESULT_TYPE,
     SCRIPT_STATUS,
@@ -85,7 +92,10 @@ from metadataserver.enum import (
 )
 from netaddr import IPNetwork
 from provisioningserver.utils.shell import ExternalProcessError
-from testtools.matchers import Equals
+from testtools.matchers import (
+    Equals,
+    HasLength,
+)
 
 
 ALL_STATUSES = list(NODE_STATUS_CHOICES_DICT)
@@ -1325,3 +1335,118 @@ class TestActionsErrorHandling(MAASServerTestCase):
             get_error_message_for_exception(
                 action.node.stop_rescue_mode.side_effect),
             str(exception))
+
+
+class TestCompileBulkNodeAction(MAASServerTestCase):
+
+    def test__returns_action_for_each_actionable_node(self):
+        admin = factory.make_admin()
+        nodes = [
+            factory.make_Node(
+                interface=True, status=NODE_STATUS.DEPLOYED,
+                power_type='manual')
+            for _ in range(3)
+        ]
+        actions, errors = compile_bulk_node_action(nodes, admin, "on")
+        self.assertEqual({}, errors)
+        self.assertEqual(
+            [node.system_id for node in nodes], list(actions.keys()))
+        for node in nodes:
+            action = actions[node.system_id]
+            self.assertIsInstance(action, PowerOn)
+            self.assertEqual(node, action.node)
+
+    def test__returns_errors_for_nodes_that_are_not_actionable(self):
+        admin = factory.make_admin()
+        ready = factory.make_Node(
+            interface=True, status=NODE_STATUS.READY, power_type='manual')
+        new = factory.make_Node(status=NODE_STATUS.NEW)
+        actions, errors = compile_bulk_node_action(
+            [ready, new], admin, "release")
+        self.assertEqual({}, actions)
+        self.assertEqual({
+            ready.system_id: "release action is not available for this node.",
+            new.system_id: "release action is not available for this node.",
+        }, errors)
+
+    def test__returns_errors_for_unknown_action(self):
+        node = factory.make_Node()
+        action_name = factory.make_name("action")
+        actions, errors = compile_bulk_node_action(
+            [node], factory.make_admin(), action_name)
+        self.assertEqual({}, actions)
+        self.assertEqual({
+            node.system_id: (
+                "%s action is not available for this node." % action_name),
+        }, errors)
+
+
+class TestExecuteBulkNodeAction(MAASServerTestCase):
+
+    def make_actions(self, count=2):
+        admin = factory.make_admin()
+        nodes = [
+            factory.make_Node(
+                interface=True, status=NODE_STATUS.DEPLOYED,
+                power_type='manual')
+            for _ in range(count)
+        ]
+        actions, _ = compile_bulk_node_action(nodes, admin, "lock")
+        return actions
+
+    def test__performs_each_action(self):
+        actions = self.make_actions()
+        results = execute_bulk_node_action(actions)
+        self.assertEqual(dict.fromkeys(actions), results)
+        for action in actions.values():
+            self.assertTrue(reload_object(action.node).locked)
+
+    def test__records_error_and_rolls_back_failed_action(self):
+        actions = self.make_actions()
+        failed, succeeded = actions.values()
+
+        def lock_then_fail(user, comment=None):
+            failed.node.locked = True
+            failed.node.save()
+            raise NodeActionError("Broken.")
+
+        self.patch(failed.node, "lock").side_effect = lock_then_fail
+        results = execute_bulk_node_action(actions)
+        self.assertEqual({
+            failed.node.system_id: "Broken.",
+            succeeded.node.system_id: None,
+        }, results)
+        self.assertFalse(reload_object(failed.node).locked)
+        self.assertTrue(reload_object(succeeded.node).locked)
+
+    def test__passes_extra_parameters_to_actions(self):
+        actions = self.make_actions(count=1)
+        [action] = actions.values()
+        execute = self.patch(action, "execute")
+        execute_bulk_node_action(actions, {"comment": sentinel.comment})
+        self.assertThat(
+            execute, MockCalledOnceWith(comment=sentinel.comment))
+
+    def test__records_failures_of_post_commit_tasks(self):
+        actions = self.make_actions()
+        failed, succeeded = actions.values()
+        failed_hooks = []
+
+        def fail_after_commit():
+            post_commit().addCallback(lambda _: 0 / 0)
+            failed_hooks.append(post_commit())
+
+        self.patch(failed, "execute", fail_after_commit)
+        self.patch(succeeded, "execute", post_commit)
+        with post_commit_hooks:
+            results = execute_bulk_node_action(actions)
+            self.assertEqual(dict.fromkeys(actions), results)
+            self.assertThat(post_commit_hooks.hooks, HasLength(1))
+        self.assertEqual({
+            failed.node.system_id: "division by zero",
+            succeeded.node.system_id: None,
+        }, results)
+        # The task after the one that failed was cancelled.
+        [cancelled] = failed_hooks
+        self.assertThat(cancelled, IsFiredDeferred())
+        self.assertIsNone(extract_result(cancelled))
@@ -224,6 +224,7 @@ class TestRegionMasterServiceMaker(TestServiceMaker):
         expected_services = [
             "region-controller",
             "nonce-cleanup",
+            "event-cleanup",
             "dns-publication-cleanup",
             "service-monitor",
             "status-monitor",
@@ -318,6 +319,7 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
             # Master services.
             "region-controller",
             "nonce-cleanup",
+            "event-cleanup",
             "dns-publication-cleanup",
             "status-monitor",
             "stats",
@@ -166,7 +166,9 @@ def register_trigger(
 @transactional
 def register_all_triggers():
     """Register all triggers into the database."""
+    from maasserver.triggers.discovery import register_discovery_triggers
     from maasserver.triggers.system import register_system_triggers
     from maasserver.triggers.websocket import register_websocket_triggers
     register_system_triggers()
     register_websocket_triggers()
+    register_discovery_triggers()
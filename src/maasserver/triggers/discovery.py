@@ -0,0 +1,360 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""
+Discovery Triggers
+
+The `Discovery` model is backed by the `maasserver_discovery` table, which
+holds the result of joining neighbours with their mDNS and reverse-DNS
+hostnames, and the interfaces, VLANs, fabrics, and subnets they were observed
+on. These triggers keep that table up to date as the underlying rows change,
+so that reading discoveries does not need to join everything every time.
+
+Rows are refreshed a (MAC, IP) pair at a time, since each discovery is the
+most recently seen neighbour for its (MAC, IP) pair.
+"""
+
+__all__ = [
+    "register_discovery_triggers",
+    ]
+
+from contextlib import closing
+from textwrap import dedent
+
+from django.db import connection
+from maasserver.triggers import (
+    register_procedure,
+    register_trigger,
+)
+from maasserver.utils.orm import transactional
+
+# Note that the corresponding test module (test_discovery) tests both that
+# the triggers are registered and that the `Discovery` objects they maintain
+# match what is expected.
+
+# The discoveries for every neighbour. This was formerly the definition of
+# the `maasserver_discovery` view. The columns must be in the same order as
+# those of the `maasserver_discovery` table, and any changes to them must be
+# reflected in the `Discovery` model.
+DISCOVERY_SOURCE = dedent("""\
+    SELECT
+        DISTINCT ON (neigh.mac_address, neigh.ip)
+        neigh.id AS id, -- Django needs a primary key for the object.
+        -- The following will create a string like "<ip>,<mac>", convert
+        -- it to base64, and strip out any embedded linefeeds.
+        REPLACE(ENCODE(BYTEA(TRIM(TRAILING '/32' FROM neigh.ip::TEXT)
+            || ',' || neigh.mac_address::text), 'base64'), CHR(10), '')
+            AS discovery_id, -- This can be used as a surrogate key.
+        neigh.id AS neighbour_id,
+        neigh.ip AS ip,
+        neigh.mac_address AS mac_address,
+        neigh.vid AS vid,
+        neigh.created AS first_seen,
+        GREATEST(neigh.updated, mdns.updated) AS last_seen,
+        mdns.id AS mdns_id,
+        -- Trust reverse-DNS more than multicast DNS.
+        COALESCE(rdns.hostname, mdns.hostname) AS hostname,
+        node.id AS observer_id,
+        node.system_id AS observer_system_id,
+        node.hostname AS observer_hostname, -- This will be the rack hostname.
+        iface.id AS observer_interface_id,
+        iface.name AS observer_interface_name,
+        fabric.id AS fabric_id,
+        fabric.name AS fabric_name,
+        -- Note: This VLAN is associated with the physical interface, so the
+        -- actual observed VLAN is actually the 'vid' value on the 'fabric'.
+        -- (this may or may not have an associated VLAN interface on the rack;
+        -- we can sometimes see traffic from unconfigured VLANs.)
+        vlan.id AS vlan_id,
+        CASE
+            WHEN neigh.ip = vlan.external_dhcp THEN TRUE
+            ELSE FALSE
+        END AS is_external_dhcp,
+        subnet.id AS subnet_id,
+        subnet.cidr AS subnet_cidr,
+        MASKLEN(subnet.cidr) AS subnet_prefixlen
+    FROM maasserver_neighbour neigh
+    JOIN maasserver_interface iface ON neigh.interface_id = iface.id
+    JOIN maasserver_node node ON node.id = iface.node_id
+    JOIN maasserver_vlan vlan ON iface.vlan_id = vlan.id
+    JOIN maasserver_fabric fabric ON vlan.fabric_id = fabric.id
+    LEFT OUTER JOIN maasserver_mdns mdns ON mdns.ip = neigh.ip
+    LEFT OUTER JOIN maasserver_rdns rdns ON rdns.ip = neigh.ip
+    LEFT OUTER JOIN maasserver_subnet subnet ON (
+        vlan.id = subnet.vlan_id
+        -- This checks if the IP address is within a known subnet.
+        AND neigh.ip << subnet.cidr
+    )
+    ORDER BY
+        neigh.mac_address,
+        neigh.ip,
+        neigh.updated DESC, -- We want the most recently seen neighbour.
+        rdns.updated DESC, -- We want the most recently seen reverse DNS entry.
+        mdns.updated DESC, -- We want the most recently seen mDNS hostname.
+        subnet_prefixlen DESC -- We want the best-match CIDR.
+    """)
+
+# Recalculates the discovery for the given MAC and IP address. Constraining
+# the source on the DISTINCT ON columns lets PostgreSQL push the constraint
+# down to the neighbour table, so only that pair's neighbours are joined.
+DISCOVERY_REFRESH_MAC_IP = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_refresh_mac_ip(
+      mac macaddr, address inet)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery
+        WHERE mac_address = mac AND ip = address;
+      INSERT INTO maasserver_discovery
+        SELECT * FROM (%s) AS discovery
+        WHERE discovery.mac_address = mac AND discovery.ip = address;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % DISCOVERY_SOURCE
+
+# Recalculates the discoveries for the given IP address, e.g. when its mDNS
+# or reverse-DNS hostname changes.
+DISCOVERY_REFRESH_IP = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_refresh_ip(address inet)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery WHERE ip = address;
+      INSERT INTO maasserver_discovery
+        SELECT * FROM (%s) AS discovery
+        WHERE discovery.ip = address;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % DISCOVERY_SOURCE
+
+# Recalculates the discoveries for IP addresses in the given network, e.g.
+# when a subnet is created or deleted.
+DISCOVERY_REFRESH_CIDR = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_refresh_cidr(network cidr)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery WHERE ip << network;
+      INSERT INTO maasserver_discovery
+        SELECT * FROM (%s) AS discovery
+        WHERE discovery.ip << network;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % DISCOVERY_SOURCE
+
+# Recalculates the discoveries for neighbours observed on the given
+# interfaces.
+DISCOVERY_REFRESH_INTERFACES = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_refresh_interfaces(
+      interface_ids integer[])
+    RETURNS void as $$
+    DECLARE
+      pair RECORD;
+    BEGIN
+      FOR pair IN (
+        SELECT DISTINCT neigh.mac_address, neigh.ip
+        FROM maasserver_neighbour AS neigh
+        WHERE neigh.interface_id = ANY(interface_ids))
+      LOOP
+        PERFORM discovery_refresh_mac_ip(pair.mac_address, pair.ip);
+      END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Recalculates every discovery. This is done when the triggers are
+# registered, since neighbours may have changed while they were not.
+DISCOVERY_REFRESH_ALL = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_refresh_all()
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_discovery;
+      INSERT INTO maasserver_discovery %s;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % DISCOVERY_SOURCE
+
+# Triggered when a neighbour is updated. If its MAC or IP address changed,
+# the discovery for the old pair is refreshed first, since this neighbour
+# may have been the one it was based on.
+DISCOVERY_NEIGHBOUR_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_neighbour_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.mac_address IS DISTINCT FROM NEW.mac_address OR
+          OLD.ip IS DISTINCT FROM NEW.ip THEN
+        PERFORM discovery_refresh_mac_ip(OLD.mac_address, OLD.ip);
+      END IF;
+      PERFORM discovery_refresh_mac_ip(NEW.mac_address, NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a subnet's network or VLAN is updated.
+DISCOVERY_SUBNET_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_subnet_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM discovery_refresh_cidr(OLD.cidr);
+      IF NOT (NEW.cidr <<= OLD.cidr) THEN
+        PERFORM discovery_refresh_cidr(NEW.cidr);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a VLAN's fabric or external DHCP server is updated.
+DISCOVERY_VLAN_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_vlan_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM discovery_refresh_interfaces(ARRAY(
+        SELECT id FROM maasserver_interface WHERE vlan_id = NEW.id));
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a fabric is renamed.
+DISCOVERY_FABRIC_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_fabric_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+        SET fabric_name = NEW.name
+        WHERE fabric_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when a node is renamed.
+DISCOVERY_NODE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_node_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+        SET observer_hostname = NEW.hostname
+        WHERE observer_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Triggered when an interface is renamed, or moved to another VLAN or node.
+DISCOVERY_INTERFACE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION discovery_interface_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM discovery_refresh_interfaces(ARRAY[NEW.id]);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+def render_discovery_procedure(proc_name, refresh, on_delete=False):
+    """Render a database procedure with name `proc_name` that refreshes the
+    discoveries affected by a row change.
+
+    :param proc_name: Name of the procedure.
+    :param refresh: SQL to refresh the discoveries, with `{row}` in place of
+        the changed row (NEW or OLD).
+    :param on_delete: True when procedure will be used as a delete trigger.
+    """
+    row = 'OLD' if on_delete else 'NEW'
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          PERFORM %s;
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """ % (proc_name, refresh.format(row=row), row))
+
+
+def refresh_all_discoveries():
+    """Recalculate every discovery."""
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("SELECT discovery_refresh_all();")
+
+
+@transactional
+def register_discovery_triggers():
+    """Register all discovery triggers into the database, and recalculate
+    every discovery."""
+    register_procedure(DISCOVERY_REFRESH_MAC_IP)
+    register_procedure(DISCOVERY_REFRESH_IP)
+    register_procedure(DISCOVERY_REFRESH_CIDR)
+    register_procedure(DISCOVERY_REFRESH_INTERFACES)
+    register_procedure(DISCOVERY_REFRESH_ALL)
+
+    # - Neighbour
+    refresh_mac_ip = "discovery_refresh_mac_ip({row}.mac_address, {row}.ip)"
+    register_procedure(render_discovery_procedure(
+        "discovery_neighbour_insert", refresh_mac_ip))
+    register_trigger(
+        "maasserver_neighbour", "discovery_neighbour_insert", "insert")
+    register_procedure(DISCOVERY_NEIGHBOUR_UPDATE)
+    register_trigger(
+        "maasserver_neighbour", "discovery_neighbour_update", "update",
+        fields=[
+            "ip", "mac_address", "vid", "interface_id", "created",
+            "updated"])
+    register_procedure(render_discovery_procedure(
+        "discovery_neighbour_delete", refresh_mac_ip, on_delete=True))
+    register_trigger(
+        "maasserver_neighbour", "discovery_neighbour_delete", "delete")
+
+    # - MDNS and RDNS
+    refresh_ip = "discovery_refresh_ip({row}.ip)"
+    for table in ("mdns", "rdns"):
+        register_procedure(render_discovery_procedure(
+            "discovery_%s_insert" % table, refresh_ip))
+        register_trigger(
+            "maasserver_%s" % table, "discovery_%s_insert" % table, "insert")
+        register_procedure(render_discovery_procedure(
+            "discovery_%s_update" % table, refresh_ip))
+        register_trigger(
+            "maasserver_%s" % table, "discovery_%s_update" % table, "update",
+            fields=["ip", "hostname", "updated"])
+        register_procedure(render_discovery_procedure(
+            "discovery_%s_delete" % table, refresh_ip, on_delete=True))
+        register_trigger(
+            "maasserver_%s" % table, "discovery_%s_delete" % table, "delete")
+
+    # - Subnet
+    refresh_cidr = "discovery_refresh_cidr({row}.cidr)"
+    register_procedure(render_discovery_procedure(
+        "discovery_subnet_insert", refresh_cidr))
+    register_trigger(
+        "maasserver_subnet", "discovery_subnet_insert", "insert")
+    register_procedure(DISCOVERY_SUBNET_UPDATE)
+    register_trigger(
+        "maasserver_subnet", "discovery_subnet_update", "update",
+        fields=["cidr", "vlan_id"])
+    register_procedure(render_discovery_procedure(
+        "discovery_subnet_delete", refresh_cidr, on_delete=True))
+    register_trigger(
+        "maasserver_subnet", "discovery_subnet_delete", "delete")
+
+    # - VLAN, Fabric, Node, and Interface
+    register_procedure(DISCOVERY_VLAN_UPDATE)
+    register_trigger(
+        "maasserver_vlan", "discovery_vlan_update", "update",
+        fields=["fabric_id", "external_dhcp"])
+    register_procedure(DISCOVERY_FABRIC_UPDATE)
+    register_trigger(
+        "maasserver_fabric", "discovery_fabric_update", "update",
+        fields=["name"])
+    register_procedure(DISCOVERY_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "discovery_node_update", "update",
+        fields=["hostname"])
+    register_procedure(DISCOVERY_INTERFACE_UPDATE)
+    register_trigger(
+        "maasserver_interface", "discovery_interface_update", "update",
+        fields=["name", "vlan_id", "node_id"])
+
+    # Neighbours may have changed while the triggers were not registered,
+    # e.g. during migrations.
+    refresh_all_discoveries()
@@ -0,0 +1,160 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.triggers.discovery`."""
+
+__all__ = []
+
+from contextlib import closing
+
+from django.db import connection
+from maasserver.models import Discovery
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.triggers.discovery import (
+    DISCOVERY_SOURCE,
+    register_discovery_triggers,
+)
+from maasserver.utils.orm import psql_array
+from testtools.matchers import HasLength
+
+
+class TestTriggers(MAASServerTestCase):
+
+    def test_register_discovery_triggers(self):
+        register_discovery_triggers()
+        triggers = [
+            "neighbour_discovery_neighbour_insert",
+            "neighbour_discovery_neighbour_update",
+            "neighbour_discovery_neighbour_delete",
+            "mdns_discovery_mdns_insert",
+            "mdns_discovery_mdns_update",
+            "mdns_discovery_mdns_delete",
+            "rdns_discovery_rdns_insert",
+            "rdns_discovery_rdns_update",
+            "rdns_discovery_rdns_delete",
+            "subnet_discovery_subnet_insert",
+            "subnet_discovery_subnet_update",
+            "subnet_discovery_subnet_delete",
+            "vlan_discovery_vlan_update",
+            "fabric_discovery_fabric_update",
+            "node_discovery_node_update",
+            "interface_discovery_interface_update",
+            ]
+        sql, args = psql_array(triggers, sql_type="text")
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                "SELECT tgname::text FROM pg_trigger WHERE "
+                "tgname::text = ANY(%s)" % sql, args)
+            db_triggers = cursor.fetchall()
+
+        # Note: if this test fails, a trigger may have been added, but not
+        # added to the list of expected triggers.
+        triggers_found = [trigger[0] for trigger in db_triggers]
+        missing_triggers = [
+            trigger
+            for trigger in triggers
+            if trigger not in triggers_found
+        ]
+        self.assertEqual(
+            len(triggers), len(db_triggers),
+            "Missing %s triggers in the database. Triggers missing: %s" % (
+                len(triggers) - len(db_triggers), missing_triggers))
+
+    def test_register_discovery_triggers_refreshes_discoveries(self):
+        factory.make_Neighbour()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute("DELETE FROM maasserver_discovery")
+        register_discovery_triggers()
+        self.assertThat(Discovery.objects.all(), HasLength(1))
+
+
+class TestDiscoveryTriggers(MAASServerTestCase):
+    """Tests that the `maasserver_discovery` table is kept up to date."""
+
+    def assertDiscoveriesMatchSource(self):
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                "SELECT * FROM maasserver_discovery ORDER BY id")
+            discoveries = cursor.fetchall()
+            cursor.execute(
+                "SELECT * FROM (%s) AS discovery ORDER BY id" %
+                DISCOVERY_SOURCE)
+            expected = cursor.fetchall()
+        self.assertEqual(expected, discoveries)
+
+    def test_neighbour_insert_creates_discovery(self):
+        neighbour = factory.make_Neighbour()
+        discovery = Discovery.objects.get()
+        self.assertEqual(neighbour.id, discovery.neighbour_id)
+        self.assertEqual(neighbour.ip, discovery.ip)
+        self.assertEqual(neighbour.mac_address, discovery.mac_address)
+        self.assertDiscoveriesMatchSource()
+
+    def test_neighbour_insert_keeps_most_recent_neighbour(self):
+        neighbour = factory.make_Neighbour()
+        newer = factory.make_Neighbour(
+            ip=neighbour.ip, mac_address=neighbour.mac_address)
+        self.assertEqual(newer.id, Discovery.objects.get().neighbour_id)
+        self.assertDiscoveriesMatchSource()
+
+    def test_neighbour_update_refreshes_old_and_new_pair(self):
+        neighbour = factory.make_Neighbour()
+        neighbour.ip = factory.make_ipv4_address()
+        neighbour.save()
+        discovery = Discovery.objects.get()
+        self.assertEqual(neighbour.ip, discovery.ip)
+        self.assertDiscoveriesMatchSource()
+
+    def test_neighbour_delete_removes_discovery(self):
+        neighbour = factory.make_Neighbour()
+        neighbour.delete()
+        self.assertThat(Discovery.objects.all(), HasLength(0))
+
+    def test_mdns_sets_hostname(self):
+        neighbour = factory.make_Neighbour()
+        mdns = factory.make_MDNS(ip=neighbour.ip)
+        self.assertEqual(mdns.hostname, Discovery.objects.get().hostname)
+        mdns.delete()
+        self.assertIsNone(Discovery.objects.get().hostname)
+        self.assertDiscoveriesMatchSource()
+
+    def test_rdns_overrides_mdns_hostname(self):
+        neighbour = factory.make_Neighbour()
+        factory.make_MDNS(ip=neighbour.ip)
+        rdns = factory.make_RDNS(ip=neighbour.ip)
+        self.assertEqual(rdns.hostname, Discovery.objects.get().hostname)
+        self.assertDiscoveriesMatchSource()
+
+    def test_subnet_insert_and_delete_sets_subnet(self):
+        neighbour = factory.make_Neighbour(ip="10.0.0.1")
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", vlan=neighbour.interface.vlan)
+        self.assertEqual(subnet.id, Discovery.objects.get().subnet_id)
+        subnet.delete()
+        self.assertIsNone(Discovery.objects.get().subnet_id)
+        self.assertDiscoveriesMatchSource()
+
+    def test_fabric_update_sets_fabric_name(self):
+        neighbour = factory.make_Neighbour()
+        fabric = neighbour.interface.vlan.fabric
+        fabric.name = factory.make_name("fabric")
+        fabric.save()
+        self.assertEqual(fabric.name, Discovery.objects.get().fabric_name)
+
+    def test_node_update_sets_observer_hostname(self):
+        neighbour = factory.make_Neighbour()
+        node = neighbour.interface.node
+        node.hostname = factory.make_name("host")
+        node.save()
+        self.assertEqual(
+            node.hostname, Discovery.objects.get().observer_hostname)
+
+    def test_interface_update_sets_observer_interface_name(self):
+        neighbour = factory.make_Neighbour()
+        interface = neighbour.interface
+        interface.name = factory.make_name("eth")
+        interface.save()
+        self.assertEqual(
+            interface.name, Discovery.objects.get().observer_interface_name)
+        self.assertDiscoveriesMatchSource()
@@ -201,6 +201,30 @@ class DeferredHooks(threading.local):
         finally:
             self.hooks = saved
 
+    @contextmanager
+    def capture(self):
+        """Context manager that captures the hooks added within it.
+
+        The hooks added within the context are not added to the hook queue;
+        they are appended to the list yielded by this context manager instead,
+        and the caller becomes responsible for firing them.
+
+        If the context exits with an exception the newly added hooks are
+        cancelled, as with `savepoint`.
+        """
+        captured = []
+        saved = self.hooks
+        self.hooks = deque()
+        try:
+            yield captured
+        except:
+            self.reset()
+            raise
+        else:
+            captured.extend(self.hooks)
+        finally:
+            self.hooks = saved
+
     @synchronous
     def fire(self):
         """Fire all hooks in sequence, in the reactor.
@@ -341,3 +341,33 @@ class TestDeferredHooks(MAASTestCase, PostCommitHooksTestMixin):
                 raise exception_type()
 
         self.expectThat(list(dhooks.hooks), Equals([d1]))
+
+    def test__capture_returns_new_hooks_and_restores_hooks(self):
+        d1 = Deferred()
+        d2 = Deferred()
+        dhooks = DeferredHooks()
+        dhooks.add(d1)
+
+        with dhooks.capture() as captured:
+            dhooks.add(d2)
+            self.expectThat(list(dhooks.hooks), Equals([d2]))
+
+        self.expectThat(captured, Equals([d2]))
+        self.expectThat(list(dhooks.hooks), Equals([d1]))
+        self.expectThat(d2, IsUnfiredDeferred())
+
+    def test__capture_cancels_new_hooks_on_dirty_exit(self):
+        d1 = Deferred()
+        d2 = Deferred()
+        dhooks = DeferredHooks()
+        dhooks.add(d1)
+
+        exception_type = factory.make_exception_type()
+        with ExpectedException(exception_type):
+            with dhooks.capture() as captured:
+                dhooks.add(d2)
+                raise exception_type()
+
+        self.expectThat(captured, Equals([]))
+        self.expectThat(list(dhooks.hooks), Equals([d1]))
+        self.expectThat(d2, IsFiredDeferred())
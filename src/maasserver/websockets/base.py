@@ -157,15 +157,27 @@ class Handler(metaclass=HandlerMetaclass):
 
     """
 
-    def __init__(self, user, cache):
+    def __init__(self, user, cache, notify=None):
         self.user = user
         self.cache = cache
+        # Called with the handler name, an action, and data to send a notify
+        # message to the client that this handler is serving, if any.
+        self._notify = notify
         # Holds a set of all pks that the client has loaded and has on their
         # end of the connection. This is used to inform the client of the
         # correct notifications based on what items the client has.
         if "loaded_pks" not in self.cache:
             self.cache["loaded_pks"] = set()
 
+    def notify(self, action, data):
+        """Send a notify message for this handler to its client.
+
+        This does nothing if the handler has no client. It must be called in
+        the reactor.
+        """
+        if self._notify is not None:
+            self._notify(self._meta.handler_name, action, data)
+
     def full_dehydrate(self, obj, for_list=False):
         """Convert the given object into a dictionary.
 
@@ -314,11 +326,14 @@ class Handler(metaclass=HandlerMetaclass):
         return get_QueryDict(params)
 
     @asynchronous
-    def execute(self, method_name, params):
+    def execute(self, method_name, params, stats=None):
         """Execute the given method on the handler.
 
         Checks to make sure the method is valid and allowed perform executing
         the method.
+
+        :param stats: An optional `CallStats` in which to count the queries
+            made by the method.
         """
         if method_name in self._meta.allowed_methods:
             try:
@@ -335,8 +350,11 @@ class Handler(metaclass=HandlerMetaclass):
                 else:
                     # This is going to block and hold a database connection so
                     # we limit its concurrency.
+                    method = transactional(method)
+                    if stats is not None:
+                        method = stats.wrap(method)
                     return concurrency.webapp.run(
-                        deferToDatabase, transactional(method), params)
+                        deferToDatabase, method, params)
         else:
             raise HandlerNoSuchMethodError(method_name)
 
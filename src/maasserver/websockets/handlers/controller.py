@@ -68,6 +68,7 @@ class ControllerHandler(MachineHandler):
             "skip_networking",
             "skip_storage",
             "instance_power_parameters",
+            "pod_fingerprint",
             "address_ttl",
             "url",
             "dns_process",
@@ -88,6 +88,7 @@ class DeviceHandler(NodeHandler):
         exclude = [
             "bmc",
             "creation_type",
+            "pod_fingerprint",
             "type",
             "boot_interface",
             "boot_cluster_ip",
@@ -7,6 +7,7 @@ __all__ = [
     "MachineHandler",
 ]
 
+from collections import OrderedDict
 from functools import partial
 from operator import itemgetter
 
@@ -63,7 +64,12 @@ from maasserver.models.node import (
 )
 from maasserver.models.partition import Partition
 from maasserver.models.subnet import Subnet
-from maasserver.node_action import compile_node_actions
+from maasserver.node_action import (
+    BULK_ACTION_BATCH_SIZE,
+    compile_bulk_node_action,
+    compile_node_actions,
+    execute_bulk_node_action,
+)
 from maasserver.utils.orm import (
     reload_object,
     transactional,
@@ -86,6 +92,7 @@ from metadataserver.models.scriptset import get_status_from_qs
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import UnknownPowerType
 from provisioningserver.utils.twisted import asynchronous
+from twisted.internet.defer import inlineCallbacks
 
 
 log = LegacyLogger()
@@ -116,6 +123,7 @@ class MachineHandler(NodeHandler):
             'create',
             'update',
             'action',
+            'bulk_action',
             'set_active',
             'check_power',
             'create_physical',
@@ -149,6 +157,7 @@ class MachineHandler(NodeHandler):
         form = AdminMachineWithMACAddressesForm
         exclude = [
             "creation_type",
+            "pod_fingerprint",
             "status_expires",
             "previous_status",
             "parent",
@@ -747,6 +756,65 @@ class MachineHandler(NodeHandler):
         extra_params = params.get("extra", {})
         return action.execute(**extra_params)
 
+    @asynchronous
+    @inlineCallbacks
+    def bulk_action(self, params):
+        """Perform the action on many objects.
+
+        The action is checked for all of the objects first, then performed in
+        batches of `BULK_ACTION_BATCH_SIZE`, each in its own transaction, so
+        that the changes to each batch are sent to clients as it completes.
+
+        Progress is sent to the client as "bulk_action" notify messages, one
+        for the objects the action was not available for, then one for each
+        batch once it has been committed. Each has the name of the action and
+        the results for those objects, as returned.
+
+        :return: A dict mapping the system ID of each object to `None` if the
+            action was performed, or to the reason why it was not.
+        """
+        system_ids = list(OrderedDict.fromkeys(params.get("system_ids", [])))
+        action_name = params.get("action")
+        extra_params = params.get("extra", {})
+
+        @transactional
+        def check_action():
+            nodes = self.get_queryset().filter(system_id__in=system_ids)
+            actions, errors = compile_bulk_node_action(
+                nodes, self.user, action_name)
+            for system_id in system_ids:
+                if system_id not in actions and system_id not in errors:
+                    errors[system_id] = "Machine does not exist."
+            return [
+                system_id for system_id in system_ids
+                if system_id in actions
+            ], errors
+
+        @transactional
+        def perform_action(batch):
+            nodes = self.get_queryset().filter(system_id__in=batch)
+            actions, errors = compile_bulk_node_action(
+                nodes, self.user, action_name)
+            results = execute_bulk_node_action(actions, extra_params)
+            results.update(errors)
+            return results
+
+        def notify_progress(progress):
+            self.notify("bulk_action", {
+                "action": action_name,
+                "results": progress,
+            })
+
+        valid, results = yield deferToDatabase(check_action)
+        if len(results) > 0:
+            notify_progress(dict(results))
+        for start in range(0, len(valid), BULK_ACTION_BATCH_SIZE):
+            batch = valid[start:start + BULK_ACTION_BATCH_SIZE]
+            batch_results = yield deferToDatabase(perform_action, batch)
+            notify_progress(batch_results)
+            results.update(batch_results)
+        return results
+
     def _create_link_on_interface(self, interface, params):
         """Create a link on a new interface."""
         mode = params.get("mode", None)
@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from functools import partial
 from operator import itemgetter
 from unittest.mock import ANY
 
@@ -323,19 +324,15 @@ class TestDeviceHandler(MAASTransactionServerTestCase):
         owner = factory.make_User()
         handler = DeviceHandler(owner, {})
         ip_assignment = factory.pick_enum(DEVICE_IP_ASSIGNMENT_TYPE)
-        self.make_devices(10, owner=owner, ip_assignment=ip_assignment)
-        query_10_count, _ = count_queries(handler.list, {})
-        self.make_devices(10, owner=owner, ip_assignment=ip_assignment)
-        query_20_count, _ = count_queries(handler.list, {})
-
         # This check is to notify the developer that a change was made that
         # affects the number of queries performed when doing a node listing.
         # It is important to keep this number as low as possible. A larger
         # number means regiond has to do more work slowing down its process
         # and slowing down the client waiting for the response.
-        self.assertEqual(
-            query_10_count, query_20_count,
-            "Number of queries is not independent to the number of nodes.")
+        self.assertQueryBudget(
+            partial(
+                self.make_devices, owner=owner, ip_assignment=ip_assignment),
+            partial(handler.list, {}), sizes=(10, 20))
 
     @transactional
     def test_list_returns_devices_only_viewable_by_user(self):
@@ -10,7 +10,11 @@ import logging
 from operator import itemgetter
 import random
 import re
-from unittest.mock import ANY
+from unittest.mock import (
+    ANY,
+    call,
+    Mock,
+)
 
 from crochet import wait_for
 from django.core.exceptions import ValidationError
@@ -97,6 +101,7 @@ from maasserver.websockets.handlers.node import NODE_TYPE_TO_LINK_TYPE
 from maastesting.djangotestcase import count_queries
 from maastesting.matchers import (
     MockCalledOnceWith,
+    MockCallsMatch,
     MockNotCalled,
 )
 from metadataserver.enum import (
@@ -509,6 +514,21 @@ class TestMachineHandler(MAASServerTestCase):
             queries_total, 9,
             "Number of queries has changed; make sure this is expected.")
 
+    def test_list_query_budget(self):
+        owner = factory.make_User()
+
+        def populate(count):
+            for _ in range(count):
+                node = factory.make_Node(owner=owner)
+                node.current_commissioning_script_set = factory.make_ScriptSet(
+                    node=node, result_type=RESULT_TYPE.COMMISSIONING)
+                node.current_testing_script_set = factory.make_ScriptSet(
+                    node=node, result_type=RESULT_TYPE.TESTING)
+                node.save()
+
+        handler = MachineHandler(owner, {})
+        self.assertQueryBudget(populate, partial(handler.list, {}))
+
     def test_get_num_queries_is_the_expected_number(self):
         owner = factory.make_User()
         node = factory.make_Node(owner=owner)
@@ -3357,6 +3377,100 @@ class TestMachineHandlerCheckPower(MAASTransactionServerTestCase):
                 ANY, "Failed to update power state of machine."))
 
 
+class TestMachineHandlerBulkAction(MAASTransactionServerTestCase):
+
+    @transactional
+    def make_deployed_machines(self, count):
+        return [
+            factory.make_Node(status=NODE_STATUS.DEPLOYED).system_id
+            for _ in range(count)
+        ]
+
+    @transactional
+    def get_locked(self, system_ids):
+        return {
+            node.system_id: node.locked
+            for node in Node.objects.filter(system_id__in=system_ids)
+        }
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__performs_action_in_batches(self):
+        self.patch(machine_module, "BULK_ACTION_BATCH_SIZE", 2)
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        system_ids = yield deferToDatabase(self.make_deployed_machines, 3)
+        execute = self.patch_autospec(
+            machine_module, "execute_bulk_node_action")
+        execute.side_effect = lambda actions, extra: dict.fromkeys(actions)
+        handler = MachineHandler(admin, {})
+        results = yield handler.bulk_action(
+            {"system_ids": system_ids, "action": "lock"})
+        self.assertEqual(dict.fromkeys(system_ids), results)
+        self.assertEqual(
+            [sorted(system_ids[:2]), sorted(system_ids[2:])],
+            [sorted(call[0][0]) for call in execute.call_args_list])
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__notifies_progress_of_each_batch(self):
+        self.patch(machine_module, "BULK_ACTION_BATCH_SIZE", 2)
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        system_ids = yield deferToDatabase(self.make_deployed_machines, 3)
+        unknown = factory.make_name("system_id")
+        execute = self.patch_autospec(
+            machine_module, "execute_bulk_node_action")
+        execute.side_effect = lambda actions, extra: dict.fromkeys(actions)
+        notify = Mock()
+        handler = MachineHandler(admin, {}, notify=notify)
+        yield handler.bulk_action(
+            {"system_ids": system_ids + [unknown], "action": "lock"})
+        self.assertThat(notify, MockCallsMatch(
+            call("machine", "bulk_action", {
+                "action": "lock",
+                "results": {unknown: "Machine does not exist."},
+            }),
+            call("machine", "bulk_action", {
+                "action": "lock",
+                "results": dict.fromkeys(system_ids[:2]),
+            }),
+            call("machine", "bulk_action", {
+                "action": "lock",
+                "results": dict.fromkeys(system_ids[2:]),
+            }),
+        ))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__performs_action(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        system_ids = yield deferToDatabase(self.make_deployed_machines, 2)
+        handler = MachineHandler(admin, {})
+        results = yield handler.bulk_action(
+            {"system_ids": system_ids, "action": "lock"})
+        self.assertEqual(dict.fromkeys(system_ids), results)
+        locked = yield deferToDatabase(self.get_locked, system_ids)
+        self.assertEqual(dict.fromkeys(system_ids, True), locked)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__reports_unknown_and_unavailable_machines(self):
+        admin = yield deferToDatabase(transactional(factory.make_admin))
+        [deployed] = yield deferToDatabase(self.make_deployed_machines, 1)
+        new = yield deferToDatabase(
+            transactional(factory.make_Node), status=NODE_STATUS.NEW)
+        unknown = factory.make_name("system_id")
+        handler = MachineHandler(admin, {})
+        results = yield handler.bulk_action({
+            "system_ids": [deployed, new.system_id, unknown],
+            "action": "lock",
+        })
+        self.assertEqual({
+            deployed: None,
+            new.system_id: "lock action is not available for this node.",
+            unknown: "Machine does not exist.",
+        }, results)
+
+
 class TestMachineHandlerMountSpecial(MAASServerTestCase):
     """Tests for MachineHandler.mount_special."""
 
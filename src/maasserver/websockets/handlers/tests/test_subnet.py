@@ -5,6 +5,7 @@
 
 __all__ = []
 
+from functools import partial
 import re
 from unittest.mock import sentinel
 
@@ -88,6 +89,18 @@ class TestSubnetHandler(MAASServerTestCase):
             expected_subnets,
             handler.list({}))
 
+    def test_list_query_budget(self):
+        user = factory.make_User()
+        handler = SubnetHandler(user, {})
+
+        def populate(count):
+            for _ in range(count):
+                factory.make_Subnet()
+
+        # The statistics for each subnet look up its static routes, and its
+        # reserved and dynamic IP ranges.
+        self.assertQueryBudget(populate, partial(handler.list, {}), per_item=3)
+
 
 class TestSubnetHandlerDelete(MAASServerTestCase):
 
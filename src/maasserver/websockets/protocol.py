@@ -25,6 +25,7 @@ from django.contrib.auth import (
 )
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from maasserver import handlerstats
 from maasserver.eventloop import services
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
@@ -283,11 +284,16 @@ class WebSocketProtocol(Protocol):
                 "Handler %s does not exist." % handler_name)
             return None
 
+        if handlerstats.is_enabled():
+            stats = handlerstats.CallStats("websocket", msg_method)
+        else:
+            stats = None
+
         handler = self.buildHandler(handler_class)
-        d = handler.execute(method, message.get("params", {}))
+        d = handler.execute(method, message.get("params", {}), stats)
         d.addCallbacks(
-            partial(self.sendResult, request_id),
-            partial(self.sendError, request_id, handler, method))
+            partial(self.sendResult, request_id, stats=stats),
+            partial(self.sendError, request_id, handler, method, stats=stats))
         return d
 
     def _json_encode(self, obj):
@@ -299,7 +305,7 @@ class WebSocketProtocol(Protocol):
         else:
             raise TypeError("Could not convert object to JSON: %r" % obj)
 
-    def sendResult(self, request_id, result):
+    def sendResult(self, request_id, result, stats=None):
         """Send final result to client."""
         result_msg = {
             "type": MSG_TYPE.RESPONSE,
@@ -307,11 +313,15 @@ class WebSocketProtocol(Protocol):
             "rtype": RESPONSE_TYPE.SUCCESS,
             "result": result,
             }
-        self.transport.write(json.dumps(
-            result_msg, default=self._json_encode).encode("ascii"))
+        data = json.dumps(
+            result_msg, default=self._json_encode).encode("ascii")
+        self.transport.write(data)
+        if stats is not None:
+            stats.response_size = len(data)
+            stats.record()
         return result
 
-    def sendError(self, request_id, handler, method, failure):
+    def sendError(self, request_id, handler, method, failure, stats=None):
         """Log and send error to client."""
         if isinstance(failure.value, ValidationError):
             try:
@@ -335,6 +345,8 @@ class WebSocketProtocol(Protocol):
             }
         self.transport.write(
             json.dumps(error_msg, default=self._json_encode).encode("ascii"))
+        if stats is not None:
+            stats.record(failed=True)
         return None
 
     def sendNotify(self, name, action, data):
@@ -352,7 +364,8 @@ class WebSocketProtocol(Protocol):
         """Return an initialised instance of `handler_class`."""
         handler_name = handler_class._meta.handler_name
         handler_cache = self.cache.setdefault(handler_name, {})
-        return handler_class(self.user, handler_cache)
+        return handler_class(
+            self.user, handler_cache, notify=self.sendNotify)
 
 
 class WebSocketFactory(Factory):
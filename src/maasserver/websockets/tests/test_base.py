@@ -9,6 +9,7 @@ import random
 from unittest.mock import (
     ANY,
     MagicMock,
+    Mock,
     sentinel,
 )
 
@@ -138,6 +139,19 @@ class TestHandler(MAASServerTestCase):
         return object.__new__(
             type("MockNode", (object,), kwargs))
 
+    def test_notify_sends_notify_for_handler(self):
+        handler = self.make_nodes_handler()
+        notify = Mock()
+        handler.__init__(factory.make_User(), {}, notify=notify)
+        handler.notify(sentinel.action, sentinel.data)
+        self.assertThat(
+            notify, MockCalledOnceWith(
+                handler._meta.handler_name, sentinel.action, sentinel.data))
+
+    def test_notify_does_nothing_without_client(self):
+        handler = self.make_nodes_handler()
+        self.assertIsNone(handler.notify(sentinel.action, sentinel.data))
+
     def test_full_dehydrate_only_includes_allowed_fields(self):
         handler = self.make_nodes_handler(fields=["hostname", "cpu_count"])
         node = factory.make_Node()
@@ -14,8 +14,11 @@ from unittest.mock import (
 
 from apiclient.utils import ascii_url
 from crochet import wait_for
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from maasserver import handlerstats
 from maasserver.eventloop import services
+from maasserver.handlerstats import HandlerStats
 from maasserver.testing.factory import factory as maas_factory
 from maasserver.testing.listener import FakePostgresListenerService
 from maasserver.testing.testcase import MAASTransactionServerTestCase
@@ -46,6 +49,7 @@ from provisioningserver.utils.twisted import synchronous
 from testtools.matchers import (
     Equals,
     Is,
+    IsInstance,
 )
 from twisted.internet import defer
 from twisted.internet.defer import (
@@ -529,7 +533,8 @@ class TestWebSocketProtocol(MAASTransactionServerTestCase):
 
         self.assertThat(d, IsFiredDeferred())
         self.assertThat(handler_class, MockCalledOnceWith(
-            protocol.user, protocol.cache[handler_name]))
+            protocol.user, protocol.cache[handler_name],
+            notify=protocol.sendNotify))
         # The cache passed into the handler constructor *is* the one found in
         # the protocol's cache; they're not merely equal.
         self.assertIs(
@@ -648,6 +653,74 @@ class TestWebSocketProtocol(MAASTransactionServerTestCase):
         self.expectThat(sent_obj["rtype"], Equals(RESPONSE_TYPE.ERROR))
         self.expectThat(sent_obj["error"], Equals("error"))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_handleRequest_records_stats_when_enabled(self):
+        self.patch(settings, "DEBUG_HANDLER_STATS", True)
+        self.patch(handlerstats, "handler_stats", HandlerStats())
+        protocol, factory = self.make_protocol()
+        protocol.user = MagicMock()
+        execute = self.patch(Handler, "execute")
+        execute.return_value = succeed({"result": "ok"})
+
+        yield protocol.handleRequest({
+            "type": MSG_TYPE.REQUEST,
+            "request_id": 1,
+            "method": "machine.get",
+            "params": {},
+        })
+
+        [stats] = execute.call_args[0][2:]
+        self.assertThat(stats, IsInstance(handlerstats.CallStats))
+        [snapshot] = handlerstats.handler_stats.snapshot()
+        self.expectThat(snapshot["kind"], Equals("websocket"))
+        self.expectThat(snapshot["name"], Equals("machine.get"))
+        self.expectThat(snapshot["calls"], Equals(1))
+        self.expectThat(snapshot["errors"], Equals(0))
+        [data], _ = protocol.transport.write.call_args
+        self.expectThat(snapshot["response_bytes"], Equals(len(data)))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_handleRequest_records_errors_when_enabled(self):
+        self.patch(settings, "DEBUG_HANDLER_STATS", True)
+        self.patch(handlerstats, "handler_stats", HandlerStats())
+        protocol, factory = self.make_protocol()
+        protocol.user = MagicMock()
+        self.patch(Handler, "execute").return_value = fail(
+            maas_factory.make_exception("error"))
+
+        yield protocol.handleRequest({
+            "type": MSG_TYPE.REQUEST,
+            "request_id": 1,
+            "method": "machine.get",
+            "params": {},
+        })
+
+        [snapshot] = handlerstats.handler_stats.snapshot()
+        self.expectThat(snapshot["calls"], Equals(1))
+        self.expectThat(snapshot["errors"], Equals(1))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_handleRequest_does_not_record_stats_when_disabled(self):
+        self.patch(settings, "DEBUG_HANDLER_STATS", False)
+        self.patch(handlerstats, "handler_stats", HandlerStats())
+        protocol, factory = self.make_protocol()
+        protocol.user = MagicMock()
+        execute = self.patch(Handler, "execute")
+        execute.return_value = succeed({"result": "ok"})
+
+        yield protocol.handleRequest({
+            "type": MSG_TYPE.REQUEST,
+            "request_id": 1,
+            "method": "machine.get",
+            "params": {},
+        })
+
+        self.assertThat(execute.call_args[0][2], Is(None))
+        self.assertThat(handlerstats.handler_stats.snapshot(), Equals([]))
+
     def test_sendNotify_sends_correct_json(self):
         protocol, factory = self.make_protocol()
         name = maas_factory.make_name("name")
@@ -853,7 +926,8 @@ class TestWebSocketFactoryTransactional(
             handler_class, sentinel.channel, sentinel.action, sentinel.obj_id)
         self.assertThat(
             handler_class, MockCalledOnceWith(
-                user, protocol.cache[handler_class._meta.handler_name]))
+                user, protocol.cache[handler_class._meta.handler_name],
+                notify=protocol.sendNotify))
         # The cache passed into the handler constructor *is* the one found in
         # the protocol's cache; they're not merely equal.
         self.assertIs(
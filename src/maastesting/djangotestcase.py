@@ -4,11 +4,18 @@
 """Django-enabled test cases."""
 
 __all__ = [
+    'check_query_budget',
     'count_queries',
     'DjangoTestCase',
     'DjangoTransactionTestCase',
+    'find_repeated_queries',
+    'group_queries',
+    'normalise_query',
+    'record_queries',
     ]
 
+from collections import Counter
+import re
 from time import (
     sleep,
     time,
@@ -55,11 +62,13 @@ class CountQueries:
 
     :ivar num_queries: The number of database queries that were performed while
         this context was active.
+    :ivar queries: The SQL of each of those queries, in order.
     """
 
     def __init__(self):
         self.connection = connections[DEFAULT_DB_ALIAS]
         self.num_queries = 0
+        self.queries = []
 
     def __enter__(self):
         self.force_debug_cursor = self.connection.force_debug_cursor
@@ -72,8 +81,11 @@ class CountQueries:
         request_started.connect(reset_queries)
         if exc_type is not None:
             return
-        final_count = len(self.connection.queries)
-        self.num_queries = final_count - self.starting_count
+        self.queries = [
+            query["sql"] for query in
+            self.connection.queries[self.starting_count:]
+        ]
+        self.num_queries = len(self.queries)
 
 
 def count_queries(func, *args, **kwargs):
@@ -91,6 +103,109 @@ def count_queries(func, *args, **kwargs):
     return counter.num_queries, result
 
 
+def record_queries(func, *args, **kwargs):
+    """Execute `func`, and record the database queries performed.
+
+    :param func: Callable to be executed.
+    :param *args: Positional arguments to `func`.
+    :param **kwargs: Keyword arguments to `func`.
+    :return: A tuple of: a list of the SQL of each query performed while
+        `func` was executing, and the value it returned.
+    """
+    counter = CountQueries()
+    with counter:
+        result = func(*args, **kwargs)
+    return counter.queries, result
+
+
+_normalise_query_subs = (
+    # String literals, including those with escaped quotes.
+    (re.compile(r"(?:\b[EB])?'(?:[^']|'')*'"), "?"),
+    # Numeric literals, but not digits that are part of an identifier.
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),
+    # Lists of values, as in IN (...) or VALUES (...).
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    # Runs of whitespace.
+    (re.compile(r"\s+"), " "),
+)
+
+
+def normalise_query(sql):
+    """Return `sql` with its literal values replaced by placeholders.
+
+    Queries that differ only in the values they use -- like those issued
+    once for each row of an earlier query -- normalise to the same string.
+    """
+    for pattern, replacement in _normalise_query_subs:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def group_queries(queries):
+    """Count `queries` by their normalised SQL.
+
+    :return: A `Counter` mapping normalised SQL to the number of times it
+        appears in `queries`.
+    """
+    return Counter(normalise_query(sql) for sql in queries)
+
+
+def find_repeated_queries(queries, threshold=2):
+    """Find queries that were issued at least `threshold` times.
+
+    A query that's repeated once for each of N objects, with only the values
+    changing, is the signature of an N+1 problem.
+
+    :return: A list of ``(count, normalised_sql)`` tuples, most repeated
+        first.
+    """
+    return sorted(
+        ((count, sql) for sql, count in group_queries(queries).items()
+         if count >= threshold),
+        key=lambda item: (-item[0], item[1]))
+
+
+def check_query_budget(recordings, per_item=0):
+    """Check that the number of queries grows no faster than expected with N.
+
+    :param recordings: A mapping of N to the list of queries recorded when
+        performing an operation over N objects. See `record_queries`.
+    :param per_item: The most queries that each additional object is
+        allowed to cost. The default of zero means the number of queries
+        must not grow with N at all.
+    :return: None if the budget is met, otherwise a message showing the
+        queries whose counts changed with N, suitable for `TestCase.fail`.
+    """
+    sizes = sorted(recordings)
+    first = sizes[0]
+    base = len(recordings[first])
+    expected = {size: base + (per_item * (size - first)) for size in sizes}
+    if all(len(recordings[size]) <= expected[size] for size in sizes):
+        return None
+
+    groups = {size: group_queries(recordings[size]) for size in sizes}
+    changed = sorted(
+        sql for sql in set().union(*groups.values())
+        if len({groups[size][sql] for size in sizes}) > 1)
+    largest = sizes[-1]
+    lines = [
+        "Number of queries does not fit the budget of %d + %d per item:" % (
+            base, per_item),
+    ]
+    lines.extend(
+        "  N=%d: %d queries (expected at most %d)" % (
+            size, len(recordings[size]), expected[size])
+        for size in sizes)
+    lines.append("Queries whose count changed with N (%s):" % " -> ".join(
+        "N=%d" % size for size in sizes))
+    for sql in changed:
+        counts = [groups[size][sql] for size in sizes]
+        marker = "N+1" if counts[-1] >= largest else "   "
+        lines.append("  %s %s  %s" % (
+            marker, " -> ".join("%d" % count for count in counts), sql))
+    return "\n".join(lines)
+
+
 def get_rogue_database_activity():
     """Return details of rogue database activity.
 
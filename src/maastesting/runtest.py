@@ -299,7 +299,8 @@ class MAASCrochetRunTest(MAASRunTest):
 
     def _getThreadpools(self):
         """Get currently configured threadpools."""
-        for poolName in {"threadpool", "threadpoolForDatabase"}:
+        for poolName in {
+                "threadpool", "threadpoolForDatabase", "threadpoolForPower"}:
             pool = getattr(reactor, poolName, None)
             if pool is not None:
                 yield pool
@@ -0,0 +1,126 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maastesting.djangotestcase`."""
+
+__all__ = []
+
+from collections import Counter
+
+from maastesting.djangotestcase import (
+    check_query_budget,
+    find_repeated_queries,
+    group_queries,
+    normalise_query,
+)
+from maastesting.matchers import DocTestMatches
+from maastesting.testcase import MAASTestCase
+from testtools.matchers import (
+    Contains,
+    Equals,
+    Is,
+)
+
+
+class TestNormaliseQuery(MAASTestCase):
+
+    def test__replaces_numbers(self):
+        self.assertThat(
+            normalise_query('SELECT * FROM "t" WHERE "t"."id" = 123 LIMIT 21'),
+            Equals('SELECT * FROM "t" WHERE "t"."id" = ? LIMIT ?'))
+
+    def test__leaves_digits_in_identifiers(self):
+        self.assertThat(
+            normalise_query('SELECT "T3"."id" FROM "t" T3'),
+            Equals('SELECT "T3"."id" FROM "t" T3'))
+
+    def test__replaces_strings(self):
+        self.assertThat(
+            normalise_query(
+                "SELECT * FROM t WHERE name = 'it''s' OR x = E'y'"),
+            Equals("SELECT * FROM t WHERE name = ? OR x = ?"))
+
+    def test__collapses_lists_of_values(self):
+        self.assertThat(
+            normalise_query("SELECT * FROM t WHERE id IN (1, 2, 3)"),
+            Equals(normalise_query("SELECT * FROM t WHERE id IN (4)")))
+
+    def test__collapses_whitespace(self):
+        self.assertThat(
+            normalise_query("  SELECT *\n  FROM t\tWHERE x = 1 "),
+            Equals("SELECT * FROM t WHERE x = ?"))
+
+
+class TestGroupQueries(MAASTestCase):
+
+    def test__counts_by_normalised_query(self):
+        queries = [
+            "SELECT * FROM t WHERE id = 1",
+            "SELECT * FROM t WHERE id = 2",
+            "SELECT * FROM u",
+        ]
+        self.assertThat(group_queries(queries), Equals(Counter({
+            "SELECT * FROM t WHERE id = ?": 2,
+            "SELECT * FROM u": 1,
+        })))
+
+
+class TestFindRepeatedQueries(MAASTestCase):
+
+    def test__finds_queries_repeated_at_least_threshold_times(self):
+        queries = ["SELECT * FROM t WHERE id = %d" % i for i in range(3)]
+        queries += ["SELECT * FROM u WHERE id = %d" % i for i in range(2)]
+        queries += ["SELECT * FROM v"]
+        self.assertThat(find_repeated_queries(queries), Equals([
+            (3, "SELECT * FROM t WHERE id = ?"),
+            (2, "SELECT * FROM u WHERE id = ?"),
+        ]))
+        self.assertThat(find_repeated_queries(queries, 3), Equals([
+            (3, "SELECT * FROM t WHERE id = ?"),
+        ]))
+
+
+class TestCheckQueryBudget(MAASTestCase):
+
+    def make_recording(self, per_item, size):
+        return ["SELECT * FROM n"] + [
+            "SELECT * FROM t WHERE id = %d" % i
+            for i in range(per_item * size)
+        ]
+
+    def test__returns_None_when_constant(self):
+        recordings = {
+            size: self.make_recording(0, size) for size in (1, 10)}
+        self.assertThat(check_query_budget(recordings), Is(None))
+
+    def test__returns_None_when_within_budget(self):
+        recordings = {
+            size: self.make_recording(2, size) for size in (1, 5, 10)}
+        self.assertThat(
+            check_query_budget(recordings, per_item=2), Is(None))
+
+    def test__fails_when_over_budget(self):
+        recordings = {
+            size: self.make_recording(1, size) for size in (1, 10)}
+        self.assertThat(check_query_budget(recordings), DocTestMatches(
+            """\
+            Number of queries does not fit the budget of 2 + 0 per item:
+              N=1: 2 queries (expected at most 2)
+              N=10: 11 queries (expected at most 2)
+            Queries whose count changed with N (N=1 -> N=10):
+              N+1 1 -> 10  SELECT * FROM t WHERE id = ?
+            """))
+
+    def test__returns_None_when_under_budget(self):
+        recordings = {
+            size: self.make_recording(1, size) for size in (1, 10)}
+        self.assertThat(
+            check_query_budget(recordings, per_item=2), Is(None))
+
+    def test__fails_when_over_budget_at_any_size(self):
+        recordings = {
+            size: self.make_recording(1, size) for size in (1, 5, 10)}
+        recordings[5] += ["SELECT * FROM u"] * 5
+        self.assertThat(
+            check_query_budget(recordings, per_item=1),
+            Contains("N=5: 11 queries (expected at most 6)"))
@@ -0,0 +1,711 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Native IPMI 2.0 (RMCP+) LAN client.
+
+Only the commands MAAS needs to query and control chassis power are
+implemented, using cipher suite 3 (RAKP-HMAC-SHA1, HMAC-SHA1-96 and
+AES-CBC-128). Every session shares a single UDP socket, and established
+sessions are cached per BMC so that repeated queries skip the RAKP
+handshake.
+"""
+
+__all__ = [
+    'IPMIAuthError',
+    'IPMIError',
+    'IPMILanClient',
+    'IPMITimeout',
+    'ipmi_client',
+    ]
+
+from collections import namedtuple
+from hashlib import sha1
+import hmac
+import os
+import random
+import socket
+import struct
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import (
+    algorithms,
+    Cipher,
+    modes,
+)
+from provisioningserver.logger import get_maas_logger
+from provisioningserver.utils.twisted import asynchronous
+from twisted.internet import reactor as default_reactor
+from twisted.internet.defer import (
+    Deferred,
+    DeferredLock,
+    DeferredSemaphore,
+    inlineCallbacks,
+    returnValue,
+)
+from twisted.internet.protocol import DatagramProtocol
+from twisted.python.failure import Failure
+
+
+maaslog = get_maas_logger("drivers.ipmi")
+
+
+IPMI_PORT = 623
+
+# RMCP version 1.0, no RMCP ACK, class IPMI.
+RMCP_HEADER = b'\x06\x00\xff\x07'
+
+AUTH_TYPE_RMCP_PLUS = 0x06
+
+# Software ID of the remote console and slave address of the BMC.
+CONSOLE_ADDRESS = 0x81
+BMC_ADDRESS = 0x20
+
+
+class PAYLOAD:
+    IPMI = 0x00
+    OPEN_SESSION_REQUEST = 0x10
+    OPEN_SESSION_RESPONSE = 0x11
+    RAKP_1 = 0x12
+    RAKP_2 = 0x13
+    RAKP_3 = 0x14
+    RAKP_4 = 0x15
+
+
+PAYLOAD_ENCRYPTED = 0x80
+PAYLOAD_AUTHENTICATED = 0x40
+PAYLOAD_TYPE_MASK = 0x3f
+
+
+class NETFN:
+    CHASSIS = 0x00
+    APP = 0x06
+
+
+class COMMAND:
+    GET_CHASSIS_STATUS = 0x01
+    CHASSIS_CONTROL = 0x02
+    SET_SYSTEM_BOOT_OPTIONS = 0x08
+    GET_SYSTEM_BOOT_OPTIONS = 0x09
+    SET_SESSION_PRIVILEGE_LEVEL = 0x3b
+    CLOSE_SESSION = 0x3c
+
+
+class CHASSIS_CONTROL:
+    POWER_DOWN = 0x00
+    POWER_UP = 0x01
+    POWER_CYCLE = 0x02
+    SOFT_SHUTDOWN = 0x05
+
+
+# Chassis control and boot options need no more than operator privilege.
+PRIVILEGE_OPERATOR = 0x03
+
+# Look the user up by name only, like FreeIPMI and ipmitool do.
+PRIVILEGE_NAME_ONLY_LOOKUP = 0x10
+
+# Boot flags parameter of the system boot options.
+BOOT_FLAGS_PARAMETER = 0x05
+BOOT_FLAGS_VALID = 0x80
+BOOT_FLAGS_EFI = 0x20
+BOOT_DEVICE_PXE = 0x04
+
+# Cipher suite 3: RAKP-HMAC-SHA1, HMAC-SHA1-96 and AES-CBC-128.
+CIPHER_SUITE_3 = (
+    b'\x00\x00\x00\x08\x01\x00\x00\x00'
+    b'\x01\x00\x00\x08\x01\x00\x00\x00'
+    b'\x02\x00\x00\x08\x01\x00\x00\x00')
+
+# RMCP+ and RAKP message status codes that denote bad credentials. The
+# values match the keys of `IPMI_ERRORS` in the IPMI power driver.
+RAKP_AUTH_ERRORS = {
+    0x09: 'privilege level insufficient',
+    0x0a: 'privilege level insufficient',
+    0x0d: 'username invalid',
+    0x0f: 'password invalid',
+}
+
+# RMCP+ and RAKP message status codes that denote the cipher suite has
+# been refused.
+RAKP_CIPHER_ERRORS = {0x04, 0x05, 0x06, 0x07, 0x10, 0x11}
+
+# IPMI completion codes.
+COMPLETION_CODE_OK = 0x00
+COMPLETION_CODES = {
+    0xc0: 'BMC busy',
+    0xd4: 'privilege level insufficient',
+}
+
+# Completion codes that denote the user may not issue the command.
+COMPLETION_CODE_AUTH_ERRORS = {0xd4}
+
+
+class IPMIError(Exception):
+    """Failure talking to a BMC."""
+
+
+class IPMIAuthError(IPMIError):
+    """The BMC refused the credentials."""
+
+
+class IPMITimeout(IPMIError):
+    """The BMC did not reply in time."""
+
+
+class IPMIPacketError(IPMIError):
+    """A datagram was not a valid RMCP+ packet for the session."""
+
+
+IPMIMessage = namedtuple(
+    "IPMIMessage", ("netfn", "seq", "command", "data"))
+
+
+def checksum(data):
+    """Return the IPMI two's complement checksum of `data`."""
+    return -sum(data) & 0xff
+
+
+def pack_ipmi_message(target, netfn, source, seq, command, data=b''):
+    """Pack an IPMI LAN message.
+
+    Requests are sent from `CONSOLE_ADDRESS` to `BMC_ADDRESS`, responses
+    the other way around, but the layout is the same.
+    """
+    header = bytes((target, netfn << 2))
+    body = bytes((source, seq << 2, command)) + data
+    return (
+        header + bytes((checksum(header),)) +
+        body + bytes((checksum(body),)))
+
+
+def unpack_ipmi_message(message):
+    """Unpack an IPMI LAN message into an `IPMIMessage`."""
+    if len(message) < 7:
+        raise IPMIPacketError("IPMI message is too short.")
+    if checksum(message[:3]) != 0 or checksum(message[3:]) != 0:
+        raise IPMIPacketError("IPMI message checksum is invalid.")
+    return IPMIMessage(
+        message[1] >> 2, message[4] >> 2, message[5], message[6:-1])
+
+
+def hmac_sha1(key, *parts):
+    return hmac.new(key, b''.join(parts), sha1).digest()
+
+
+def encrypt_payload(k2, payload):
+    """Encrypt `payload` with AES-CBC-128 as RMCP+ requires."""
+    iv = os.urandom(16)
+    pad = -(len(payload) + 1) % 16
+    payload += bytes(range(1, pad + 1)) + bytes((pad,))
+    encryptor = Cipher(
+        algorithms.AES(k2[:16]), modes.CBC(iv),
+        backend=default_backend()).encryptor()
+    return iv + encryptor.update(payload) + encryptor.finalize()
+
+
+def decrypt_payload(k2, payload):
+    """Decrypt a payload encrypted with `encrypt_payload`."""
+    if len(payload) < 32 or len(payload) % 16 != 0:
+        raise IPMIPacketError("Encrypted payload has an invalid length.")
+    decryptor = Cipher(
+        algorithms.AES(k2[:16]), modes.CBC(payload[:16]),
+        backend=default_backend()).decryptor()
+    payload = decryptor.update(payload[16:]) + decryptor.finalize()
+    pad = payload[-1]
+    if pad >= len(payload):
+        raise IPMIPacketError("Encrypted payload has invalid padding.")
+    return payload[:-(pad + 1)]
+
+
+def pack_rmcp_plus(
+        payload_type, session_id, sequence, payload, k1=None, k2=None):
+    """Pack an RMCP+ datagram.
+
+    The payload is encrypted when `k2` is given and the datagram is signed
+    when `k1` is given.
+    """
+    if k2 is not None:
+        payload = encrypt_payload(k2, payload)
+        payload_type |= PAYLOAD_ENCRYPTED
+    if k1 is not None:
+        payload_type |= PAYLOAD_AUTHENTICATED
+    packet = struct.pack(
+        '<BBIIH', AUTH_TYPE_RMCP_PLUS, payload_type, session_id, sequence,
+        len(payload)) + payload
+    if k1 is not None:
+        pad = -(len(packet) + 2) % 4
+        packet += b'\xff' * pad + bytes((pad, 0x07))
+        packet += hmac_sha1(k1, packet)[:12]
+    return RMCP_HEADER + packet
+
+
+def unpack_rmcp_plus(datagram, k1=None, k2=None):
+    """Unpack an RMCP+ datagram.
+
+    :return: A ``(payload_type, session_id, sequence, payload)`` tuple.
+    """
+    if len(datagram) < 16 or datagram[:4] != RMCP_HEADER:
+        raise IPMIPacketError("Not an RMCP datagram.")
+    if datagram[4] != AUTH_TYPE_RMCP_PLUS:
+        raise IPMIPacketError("Not an RMCP+ datagram.")
+    payload_type, session_id, sequence, length = struct.unpack(
+        '<BIIH', datagram[5:16])
+    payload = datagram[16:16 + length]
+    if len(payload) != length:
+        raise IPMIPacketError("RMCP+ payload is truncated.")
+    if payload_type & PAYLOAD_AUTHENTICATED:
+        if k1 is None:
+            raise IPMIPacketError("Unexpected authenticated payload.")
+        signed, auth_code = datagram[4:-12], datagram[-12:]
+        if not hmac.compare_digest(hmac_sha1(k1, signed)[:12], auth_code):
+            raise IPMIPacketError("RMCP+ integrity check failed.")
+    elif k1 is not None:
+        raise IPMIPacketError("Expected an authenticated payload.")
+    if payload_type & PAYLOAD_ENCRYPTED:
+        if k2 is None:
+            raise IPMIPacketError("Unexpected encrypted payload.")
+        payload = decrypt_payload(k2, payload)
+    return payload_type & PAYLOAD_TYPE_MASK, session_id, sequence, payload
+
+
+def get_console_session_id(datagram):
+    """Return the remote console session ID a BMC's reply is meant for.
+
+    Replies to session set-up messages carry it in their payload, all
+    other replies in the RMCP+ session header.
+    """
+    if len(datagram) < 24 or datagram[:4] != RMCP_HEADER:
+        raise IPMIPacketError("Not an RMCP+ datagram.")
+    payload_type = datagram[5] & PAYLOAD_TYPE_MASK
+    if payload_type in (
+            PAYLOAD.OPEN_SESSION_RESPONSE, PAYLOAD.RAKP_2, PAYLOAD.RAKP_4):
+        return struct.unpack('<I', datagram[20:24])[0]
+    else:
+        return struct.unpack('<I', datagram[6:10])[0]
+
+
+def derive_session_keys(password, rm, rc, role, username):
+    """Derive the session integrity key, K1 and K2 of an RMCP+ session."""
+    sik = hmac_sha1(password, rm, rc, bytes((role, len(username))), username)
+    return sik, hmac_sha1(sik, b'\x01' * 20), hmac_sha1(sik, b'\x02' * 20)
+
+
+def make_rakp_error(status):
+    """Return the `IPMIError` for an RMCP+ or RAKP message `status`."""
+    if status in RAKP_AUTH_ERRORS:
+        return IPMIAuthError(RAKP_AUTH_ERRORS[status])
+    elif status in RAKP_CIPHER_ERRORS:
+        return IPMIError('cipher suite id unavailable')
+    else:
+        return IPMIError("RMCP+ session set-up failed: status 0x%02x" % status)
+
+
+class IPMIProtocol(DatagramProtocol):
+    """Shared UDP endpoint for all RMCP+ sessions.
+
+    Replies are routed to the session waiting for them using the remote
+    console session ID, which every RMCP+ reply carries.
+    """
+
+    def __init__(self):
+        super(IPMIProtocol, self).__init__()
+        self.waiting = {}
+
+    def datagramReceived(self, datagram, addr):
+        try:
+            console_id = get_console_session_id(datagram)
+        except IPMIPacketError:
+            return
+        receive = self.waiting.get(console_id)
+        if receive is not None:
+            receive(datagram, addr)
+
+
+class IPMISession:
+    """State of one RMCP+ session with a BMC."""
+
+    def __init__(self, address, port, username, password):
+        self.address = address
+        self.port = port
+        self.username = username
+        self.password = password
+        self.lock = DeferredLock()
+        self.console_id = None
+        self.managed_id = None
+        self.k1 = None
+        self.k2 = None
+        self.sequence = 0
+        self.rq_seq = 0
+        self.active = False
+        self.last_used = None
+
+    def next_sequence(self):
+        self.sequence = (self.sequence + 1) & 0xffffffff or 1
+        return self.sequence
+
+    def next_rq_seq(self):
+        self.rq_seq = (self.rq_seq + 1) & 0x3f
+        return self.rq_seq
+
+
+class IPMILanClient:
+    """Query and control chassis power over IPMI 2.0 LAN.
+
+    :param idle_timeout: Seconds an established session is kept for reuse;
+        shorter than the usual BMC session timeout of 60 seconds.
+    :param timeouts: Seconds to wait for a reply before each retransmit.
+    :param max_in_flight: Requests awaiting a reply at any one time; replies
+        to larger bursts would overflow the shared socket's receive buffer.
+    """
+
+    # Ask for a receive buffer this big; the kernel may cap it.
+    receive_buffer_size = 4 * 1024 * 1024
+
+    def __init__(
+            self, idle_timeout=20, timeouts=(1, 2, 4), max_in_flight=128,
+            reactor=None):
+        self.idle_timeout = idle_timeout
+        self.timeouts = timeouts
+        self.in_flight = DeferredSemaphore(max_in_flight)
+        self.reactor = default_reactor if reactor is None else reactor
+        self.sessions = {}
+        self.protocol = None
+        self.port = None
+        self._expiry = None
+
+    def _listen(self):
+        if self.port is None:
+            self.protocol = IPMIProtocol()
+            self.port = self.reactor.listenUDP(0, self.protocol)
+            self.port.socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF,
+                self.receive_buffer_size)
+        return self.protocol
+
+    @asynchronous
+    def stop(self):
+        """Forget all sessions and close the UDP socket."""
+        if self._expiry is not None and self._expiry.active():
+            self._expiry.cancel()
+        self._expiry = None
+        for session in self.sessions.values():
+            self._close(session)
+        self.sessions.clear()
+        if self.port is not None:
+            port, self.port, self.protocol = self.port, None, None
+            return port.stopListening()
+
+    @asynchronous
+    def get_power_state(self, host, username, password, port=IPMI_PORT):
+        """Return 'on' or 'off' for the chassis behind `host`."""
+        return self._run(host, port, username, password, self._power_state)
+
+    @asynchronous
+    def power_on(
+            self, host, username, password, port=IPMI_PORT, efi=None):
+        """Set the next boot to PXE, then power on or cycle the chassis.
+
+        :param efi: Boot in EFI mode when true, legacy mode when false, or
+            keep the BMC's current mode when `None`.
+        """
+        return self._run(host, port, username, password, self._power_on, efi)
+
+    @asynchronous
+    def power_off(
+            self, host, username, password, port=IPMI_PORT, soft=False):
+        """Power off the chassis, via an ACPI shutdown when `soft`."""
+        control = (
+            CHASSIS_CONTROL.SOFT_SHUTDOWN if soft
+            else CHASSIS_CONTROL.POWER_DOWN)
+        return self._run(
+            host, port, username, password, self._chassis_control, control)
+
+    @inlineCallbacks
+    def _power_state(self, session):
+        data = yield self._command(
+            session, NETFN.CHASSIS, COMMAND.GET_CHASSIS_STATUS)
+        returnValue('on' if data[0] & 0x01 else 'off')
+
+    @inlineCallbacks
+    def _power_on(self, session, efi):
+        try:
+            yield self._set_pxe_boot(session, efi)
+        except IPMIAuthError:
+            raise
+        except IPMIError as error:
+            # Some BMCs fail to set the boot device, yet still boot from
+            # the network. Carry on, like the FreeIPMI path does.
+            maaslog.warning(
+                "Failed to change the boot order to PXE %s: %s" % (
+                    session.address, error))
+        state = yield self._power_state(session)
+        control = (
+            CHASSIS_CONTROL.POWER_CYCLE if state == 'on'
+            else CHASSIS_CONTROL.POWER_UP)
+        yield self._chassis_control(session, control)
+
+    @inlineCallbacks
+    def _set_pxe_boot(self, session, efi):
+        if efi is None:
+            data = yield self._command(
+                session, NETFN.CHASSIS, COMMAND.GET_SYSTEM_BOOT_OPTIONS,
+                bytes((BOOT_FLAGS_PARAMETER, 0x00, 0x00)))
+            efi = len(data) > 2 and bool(data[2] & BOOT_FLAGS_EFI)
+        flags = BOOT_FLAGS_VALID | (BOOT_FLAGS_EFI if efi else 0x00)
+        yield self._command(
+            session, NETFN.CHASSIS, COMMAND.SET_SYSTEM_BOOT_OPTIONS,
+            bytes((BOOT_FLAGS_PARAMETER, flags, BOOT_DEVICE_PXE, 0, 0, 0)))
+
+    def _chassis_control(self, session, control):
+        return self._command(
+            session, NETFN.CHASSIS, COMMAND.CHASSIS_CONTROL, bytes((control,)))
+
+    @inlineCallbacks
+    def _resolve(self, host):
+        if ':' in host:
+            raise IPMIError("IPv6 BMCs are not supported natively.")
+        try:
+            address = yield self.reactor.resolve(host)
+        except Exception as error:
+            raise IPMIError("Failed to resolve %s: %s" % (host, error))
+        returnValue(address)
+
+    @inlineCallbacks
+    def _run(self, host, port, username, password, func, *args):
+        address = yield self._resolve(host)
+        username = (username or '').encode('utf-8')
+        password = (password or '').encode('utf-8')
+        if len(username) > 16 or len(password) > 20:
+            raise IPMIError("Credentials are too long for IPMI 2.0.")
+
+        key = (address, port, username, password)
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = IPMISession(
+                address, port, username, password)
+        yield session.lock.acquire()
+        try:
+            reused = session.active
+            if not reused:
+                yield self._activate(session)
+            try:
+                result = yield func(session, *args)
+            except IPMIAuthError:
+                raise
+            except IPMIError:
+                if not reused:
+                    raise
+                # The BMC may have dropped an idle session; start over.
+                self._close(session)
+                yield self._activate(session)
+                result = yield func(session, *args)
+        except:
+            self._close(session)
+            raise
+        else:
+            session.last_used = self.reactor.seconds()
+            self._schedule_expiry()
+            returnValue(result)
+        finally:
+            session.lock.release()
+
+    def _schedule_expiry(self):
+        if self._expiry is None or not self._expiry.active():
+            self._expiry = self.reactor.callLater(
+                self.idle_timeout, self.expire)
+
+    def expire(self):
+        """Close sessions that have been idle for `idle_timeout`."""
+        now = self.reactor.seconds()
+        for key, session in list(self.sessions.items()):
+            if session.lock.locked:
+                continue
+            if not session.active or (
+                    now - session.last_used >= self.idle_timeout):
+                self._close(session)
+                del self.sessions[key]
+        if len(self.sessions) > 0:
+            self._schedule_expiry()
+
+    def _close(self, session):
+        """Forget `session`, telling the BMC without waiting for a reply."""
+        if self.protocol is not None:
+            self.protocol.waiting.pop(session.console_id, None)
+        if session.active and self.protocol is not None:
+            message = pack_ipmi_message(
+                BMC_ADDRESS, NETFN.APP, CONSOLE_ADDRESS,
+                session.next_rq_seq(), COMMAND.CLOSE_SESSION,
+                struct.pack('<I', session.managed_id))
+            self.protocol.transport.write(
+                pack_rmcp_plus(
+                    PAYLOAD.IPMI, session.managed_id,
+                    session.next_sequence(), message, session.k1,
+                    session.k2),
+                (session.address, session.port))
+        session.active = False
+        session.k1 = session.k2 = None
+
+    def _exchange(self, session, make_datagram, parse):
+        """Send a datagram to the BMC and wait for the reply.
+
+        `make_datagram` is called for every (re)transmission. Replies that
+        `parse` rejects with `IPMIPacketError` are ignored; its result or
+        any other error is the result of the exchange.
+        """
+        return self.in_flight.run(
+            self._exchange_now, session, make_datagram, parse)
+
+    def _exchange_now(self, session, make_datagram, parse):
+        protocol = self._listen()
+        done = Deferred()
+        timeouts = iter(self.timeouts)
+        timer = None
+
+        def finish(result):
+            protocol.waiting.pop(session.console_id, None)
+            if timer is not None and timer.active():
+                timer.cancel()
+            if isinstance(result, Failure):
+                done.errback(result)
+            else:
+                done.callback(result)
+
+        def receive(datagram, addr):
+            if addr != (session.address, session.port):
+                return
+            try:
+                result = parse(datagram)
+            except IPMIPacketError:
+                return
+            except:
+                finish(Failure())
+            else:
+                finish(result)
+
+        def send():
+            nonlocal timer
+            try:
+                timeout = next(timeouts)
+            except StopIteration:
+                finish(Failure(IPMITimeout(
+                    'session timeout' if session.active
+                    else 'connection timeout')))
+            else:
+                protocol.transport.write(
+                    make_datagram(), (session.address, session.port))
+                timer = self.reactor.callLater(timeout, send)
+
+        protocol.waiting[session.console_id] = receive
+        send()
+        return done
+
+    def _setup_exchange(self, session, payload_type, payload, reply_type):
+        """Exchange an unauthenticated session set-up message."""
+
+        def parse(datagram):
+            received_type, _, _, payload = unpack_rmcp_plus(datagram)
+            if received_type != reply_type or len(payload) < 8:
+                raise IPMIPacketError("Unexpected session set-up reply.")
+            if payload[1] != 0:
+                raise make_rakp_error(payload[1])
+            return payload
+
+        datagram = pack_rmcp_plus(payload_type, 0, 0, payload)
+        return self._exchange(session, lambda: datagram, parse)
+
+    @inlineCallbacks
+    def _activate(self, session):
+        """Establish an RMCP+ session with the BMC."""
+        protocol = self._listen()
+        session.console_id = random.randint(1, 0xffffffff)
+        while session.console_id in protocol.waiting:
+            session.console_id = random.randint(1, 0xffffffff)
+        console_id = struct.pack('<I', session.console_id)
+
+        response = yield self._setup_exchange(
+            session, PAYLOAD.OPEN_SESSION_REQUEST,
+            struct.pack('<BBxx', 0, PRIVILEGE_OPERATOR) + console_id +
+            CIPHER_SUITE_3, PAYLOAD.OPEN_SESSION_RESPONSE)
+        if len(response) < 12:
+            raise IPMIError("Open session response is too short.")
+        managed_id = response[8:12]
+        session.managed_id = struct.unpack('<I', managed_id)[0]
+
+        username = session.username
+        role = PRIVILEGE_OPERATOR | PRIVILEGE_NAME_ONLY_LOOKUP
+        user_info = bytes((role, len(username))) + username
+        rm = os.urandom(16)
+        response = yield self._setup_exchange(
+            session, PAYLOAD.RAKP_1,
+            b'\x00\x00\x00\x00' + managed_id + rm +
+            bytes((role, 0, 0, len(username))) + username,
+            PAYLOAD.RAKP_2)
+        if len(response) < 60:
+            raise IPMIError("RAKP message 2 is too short.")
+        rc, guid, auth_code = response[8:24], response[24:40], response[40:60]
+        expected = hmac_sha1(
+            session.password, console_id, managed_id, rm, rc, guid, user_info)
+        if not hmac.compare_digest(auth_code, expected):
+            raise IPMIAuthError('password invalid')
+
+        sik, k1, k2 = derive_session_keys(
+            session.password, rm, rc, role, username)
+        response = yield self._setup_exchange(
+            session, PAYLOAD.RAKP_3,
+            b'\x00\x00\x00\x00' + managed_id + hmac_sha1(
+                session.password, rc, console_id, user_info),
+            PAYLOAD.RAKP_4)
+        if len(response) < 20:
+            raise IPMIError("RAKP message 4 is too short.")
+        expected = hmac_sha1(sik, rm, managed_id, guid)[:12]
+        if not hmac.compare_digest(response[8:20], expected):
+            raise IPMIError("RAKP message 4 integrity check failed.")
+
+        session.k1, session.k2 = k1, k2
+        session.sequence = 0
+        session.active = True
+        yield self._command(
+            session, NETFN.APP, COMMAND.SET_SESSION_PRIVILEGE_LEVEL,
+            bytes((PRIVILEGE_OPERATOR,)))
+
+    def _command(self, session, netfn, command, data=b''):
+        """Send an IPMI request within `session`.
+
+        :return: The response data, without the completion code.
+        """
+        rq_seq = session.next_rq_seq()
+        message = pack_ipmi_message(
+            BMC_ADDRESS, netfn, CONSOLE_ADDRESS, rq_seq, command, data)
+
+        def make_datagram():
+            return pack_rmcp_plus(
+                PAYLOAD.IPMI, session.managed_id, session.next_sequence(),
+                message, session.k1, session.k2)
+
+        def parse(datagram):
+            payload_type, _, _, payload = unpack_rmcp_plus(
+                datagram, session.k1, session.k2)
+            if payload_type != PAYLOAD.IPMI:
+                raise IPMIPacketError("Unexpected payload type.")
+            response = unpack_ipmi_message(payload)
+            if (response.netfn != netfn + 1 or response.seq != rq_seq or
+                    response.command != command):
+                raise IPMIPacketError("Response to a different request.")
+            if len(response.data) < 1:
+                raise IPMIPacketError("Response has no completion code.")
+            completion_code = response.data[0]
+            if completion_code == COMPLETION_CODE_OK:
+                return response.data[1:]
+            elif completion_code in COMPLETION_CODE_AUTH_ERRORS:
+                raise IPMIAuthError(COMPLETION_CODES[completion_code])
+            elif completion_code in COMPLETION_CODES:
+                raise IPMIError(COMPLETION_CODES[completion_code])
+            else:
+                raise IPMIError(
+                    "Command 0x%02x failed: completion code 0x%02x" % (
+                        command, completion_code))
+
+        return self._exchange(session, make_datagram, parse)
+
+
+# Shared by every IPMI power driver instance.
+ipmi_client = IPMILanClient()
@@ -0,0 +1,243 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.drivers.hardware.ipmi`."""
+
+__all__ = []
+
+import os
+from unittest.mock import ANY
+
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from provisioningserver.drivers.hardware.ipmi import (
+    BMC_ADDRESS,
+    CHASSIS_CONTROL,
+    COMMAND,
+    CONSOLE_ADDRESS,
+    decrypt_payload,
+    encrypt_payload,
+    get_console_session_id,
+    IPMIAuthError,
+    IPMIError,
+    IPMILanClient,
+    IPMIPacketError,
+    IPMITimeout,
+    NETFN,
+    pack_ipmi_message,
+    pack_rmcp_plus,
+    PAYLOAD,
+    unpack_ipmi_message,
+    unpack_rmcp_plus,
+)
+from provisioningserver.testing.ipmi import SimulatedBMC
+from testtools import ExpectedException
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.internet.protocol import DatagramProtocol
+from twisted.internet.task import deferLater
+
+
+class TestCodec(MAASTestCase):
+
+    def test_ipmi_message_round_trips(self):
+        data = os.urandom(5)
+        message = pack_ipmi_message(
+            BMC_ADDRESS, NETFN.CHASSIS, CONSOLE_ADDRESS, 7,
+            COMMAND.CHASSIS_CONTROL, data)
+        self.assertEqual(
+            (NETFN.CHASSIS, 7, COMMAND.CHASSIS_CONTROL, data),
+            unpack_ipmi_message(message))
+
+    def test_unpack_ipmi_message_rejects_bad_checksum(self):
+        message = bytearray(pack_ipmi_message(
+            BMC_ADDRESS, NETFN.APP, CONSOLE_ADDRESS, 1,
+            COMMAND.CLOSE_SESSION, b'\x00'))
+        message[-1] ^= 0xff
+        self.assertRaises(
+            IPMIPacketError, unpack_ipmi_message, bytes(message))
+
+    def test_payload_encryption_round_trips(self):
+        k2 = os.urandom(20)
+        for length in (0, 1, 15, 16, 17):
+            payload = os.urandom(length)
+            encrypted = encrypt_payload(k2, payload)
+            self.assertEqual(0, len(encrypted) % 16)
+            self.assertEqual(payload, decrypt_payload(k2, encrypted))
+
+    def test_rmcp_plus_round_trips_signed_and_encrypted(self):
+        k1, k2 = os.urandom(20), os.urandom(20)
+        payload = os.urandom(9)
+        datagram = pack_rmcp_plus(PAYLOAD.IPMI, 1234, 5, payload, k1, k2)
+        self.assertEqual(
+            (PAYLOAD.IPMI, 1234, 5, payload),
+            unpack_rmcp_plus(datagram, k1, k2))
+
+    def test_unpack_rmcp_plus_rejects_tampered_datagram(self):
+        k1, k2 = os.urandom(20), os.urandom(20)
+        datagram = bytearray(pack_rmcp_plus(
+            PAYLOAD.IPMI, 1234, 5, os.urandom(9), k1, k2))
+        datagram[20] ^= 0xff
+        self.assertRaises(
+            IPMIPacketError, unpack_rmcp_plus, bytes(datagram), k1, k2)
+
+    def test_unpack_rmcp_plus_rejects_unsigned_datagram_in_session(self):
+        datagram = pack_rmcp_plus(PAYLOAD.IPMI, 1234, 5, os.urandom(9))
+        self.assertRaises(
+            IPMIPacketError, unpack_rmcp_plus, datagram, os.urandom(20))
+
+    def test_get_console_session_id_from_session_header(self):
+        datagram = pack_rmcp_plus(
+            PAYLOAD.IPMI, 1234, 5, os.urandom(9), os.urandom(20))
+        self.assertEqual(1234, get_console_session_id(datagram))
+
+    def test_get_console_session_id_from_rakp_payload(self):
+        datagram = pack_rmcp_plus(
+            PAYLOAD.RAKP_2, 0, 0, b'\x00\x00\x00\x00\xd2\x04\x00\x00')
+        self.assertEqual(1234, get_console_session_id(datagram))
+
+
+class TestIPMILanClient(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=10)
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('timeouts', (0.5, 1))
+        client = IPMILanClient(**kwargs)
+        self.addCleanup(client.stop)
+        return client
+
+    def make_bmc(self, power_state='off'):
+        username = factory.make_name('user')
+        password = factory.make_name('pass')
+        bmc = SimulatedBMC(username, password, power_state)
+        port = reactor.listenUDP(0, bmc, interface='127.0.0.1')
+        self.addCleanup(port.stopListening)
+        return bmc, port.getHost().port, username, password
+
+    @inlineCallbacks
+    def test_get_power_state(self):
+        client = self.make_client()
+        for power_state in ('on', 'off'):
+            bmc, port, username, password = self.make_bmc(power_state)
+            state = yield client.get_power_state(
+                '127.0.0.1', username, password, port=port)
+            self.assertEqual(power_state, state)
+
+    @inlineCallbacks
+    def test_reuses_session(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc()
+        for _ in range(3):
+            yield client.get_power_state(
+                '127.0.0.1', username, password, port=port)
+        self.assertEqual(1, bmc.sessions_opened)
+        self.assertEqual(
+            3, bmc.commands[NETFN.CHASSIS, COMMAND.GET_CHASSIS_STATUS])
+
+    @inlineCallbacks
+    def test_reopens_session_dropped_by_bmc(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('on')
+        yield client.get_power_state(
+            '127.0.0.1', username, password, port=port)
+        bmc.sessions.clear()
+        state = yield client.get_power_state(
+            '127.0.0.1', username, password, port=port)
+        self.assertEqual('on', state)
+        self.assertEqual(2, bmc.sessions_opened)
+
+    @inlineCallbacks
+    def test_power_on_sets_pxe_boot_and_powers_on(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('off')
+        yield client.power_on('127.0.0.1', username, password, port=port)
+        self.assertEqual('on', bmc.power_state)
+        self.assertEqual(b'\x80\x04\x00\x00\x00', bmc.boot_flags)
+        self.assertEqual(
+            1, bmc.commands[NETFN.CHASSIS, COMMAND.CHASSIS_CONTROL])
+
+    @inlineCallbacks
+    def test_power_on_keeps_efi_boot_type(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('off')
+        bmc.boot_flags = b'\x20\x00\x00\x00\x00'
+        yield client.power_on('127.0.0.1', username, password, port=port)
+        self.assertEqual(b'\xa0\x04\x00\x00\x00', bmc.boot_flags)
+
+    @inlineCallbacks
+    def test_power_on_sets_legacy_boot_type(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('off')
+        bmc.boot_flags = b'\x20\x00\x00\x00\x00'
+        yield client.power_on(
+            '127.0.0.1', username, password, port=port, efi=False)
+        self.assertEqual(b'\x80\x04\x00\x00\x00', bmc.boot_flags)
+        self.assertEqual(
+            0, bmc.commands[NETFN.CHASSIS, COMMAND.GET_SYSTEM_BOOT_OPTIONS])
+
+    @inlineCallbacks
+    def test_power_on_cycles_when_on(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('on')
+        chassis_control = self.patch(client, '_chassis_control')
+        yield client.power_on('127.0.0.1', username, password, port=port)
+        self.assertThat(
+            chassis_control,
+            MockCalledOnceWith(ANY, CHASSIS_CONTROL.POWER_CYCLE))
+
+    @inlineCallbacks
+    def test_power_off(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc('on')
+        yield client.power_off(
+            '127.0.0.1', username, password, port=port, soft=True)
+        self.assertEqual('off', bmc.power_state)
+
+    @inlineCallbacks
+    def test_bad_password_raises_auth_error(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc()
+        with ExpectedException(IPMIAuthError, 'password invalid'):
+            yield client.get_power_state(
+                '127.0.0.1', username, factory.make_name('pass'), port=port)
+
+    @inlineCallbacks
+    def test_unknown_user_raises_auth_error(self):
+        client = self.make_client()
+        bmc, port, username, password = self.make_bmc()
+        with ExpectedException(IPMIAuthError, 'username invalid'):
+            yield client.get_power_state(
+                '127.0.0.1', factory.make_name('user'), password, port=port)
+
+    @inlineCallbacks
+    def test_silent_bmc_times_out(self):
+        client = self.make_client(timeouts=(0.1, 0.1))
+        port = reactor.listenUDP(0, DatagramProtocol(), interface='127.0.0.1')
+        self.addCleanup(port.stopListening)
+        with ExpectedException(IPMITimeout, 'connection timeout'):
+            yield client.get_power_state(
+                '127.0.0.1', 'user', 'pass', port=port.getHost().port)
+
+    @inlineCallbacks
+    def test_ipv6_is_not_supported(self):
+        client = self.make_client()
+        with ExpectedException(IPMIError):
+            yield client.get_power_state('::1', 'user', 'pass')
+
+    @inlineCallbacks
+    def test_expire_closes_idle_sessions(self):
+        client = self.make_client(idle_timeout=0)
+        bmc, port, username, password = self.make_bmc()
+        yield client.get_power_state(
+            '127.0.0.1', username, password, port=port)
+        client.expire()
+        self.assertEqual({}, client.sessions)
+        # Let the BMC process the close session request.
+        yield deferLater(reactor, 0.1, lambda: None)
+        self.assertEqual(
+            1, bmc.commands[NETFN.APP, COMMAND.CLOSE_SESSION])
@@ -332,6 +332,33 @@ class TestVMwarePyvmomi(MAASTestCase):
         with ExpectedException(VMwareVMNotFound):
             vmware.power_query_vmware(host, username, password, None, None)
 
+    def test_power_query_many(self):
+        mock_vmomi_api = self.configure_vmomi_api(servers=10)
+
+        host = factory.make_hostname()
+        username = factory.make_username()
+        password = factory.make_username()
+
+        search_index = (
+            mock_vmomi_api.SmartConnect.return_value.content.searchIndex)
+        uuids = list(search_index.vms_by_uuid)
+        for uuid in uuids:
+            vmware.power_control_vmware(
+                host, username, password, None, uuid, "on")
+
+        mock_vmomi_api.SmartConnect.reset_mock()
+        vms = {uuid: (None, uuid) for uuid in uuids}
+        vms['missing'] = (factory.make_name('vm'), None)
+        states = vmware.power_query_many_vmware(
+            host, username, password, vms)
+
+        self.assertEqual(
+            {uuid: "on" for uuid in uuids},
+            {key: state for key, state in states.items() if key in uuids})
+        self.assertThat(states['missing'], IsInstance(VMwareVMNotFound))
+        self.assertEqual(
+            1, mock_vmomi_api.SmartConnect.call_count)
+
     def test_power_control(self):
         mock_vmomi_api = self.configure_vmomi_api(servers=100)
 
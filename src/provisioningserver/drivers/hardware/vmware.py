@@ -3,6 +3,7 @@
 
 __all__ = [
     'power_control_vmware',
+    'power_query_many_vmware',
     'power_query_vmware',
     'probe_vmware_and_enlist',
     ]
@@ -532,3 +533,38 @@ def power_query_vmware(
                 .format(uuid=uuid), traceback.format_exc())
         finally:
             api.disconnect()
+
+
+def power_query_many_vmware(
+        host, username, password, vms, port=None, protocol=None):
+    """Return the power state for many VMs, using one connection to the
+    VMware API.
+
+    :param vms: `dict` mapping keys to `(vm_name, uuid)` tuples.
+    :return: `dict` mapping the same keys to power states, or to an
+        exception for VMs that could not be found or queried.
+    """
+    api = _get_vmware_api(
+        host, username, password, port=port, protocol=protocol)
+
+    states = {}
+    if api.connect():
+        try:
+            for key, (vm_name, uuid) in vms.items():
+                try:
+                    vm = _find_vm_by_uuid_or_name(api, uuid, vm_name)
+                    if vm is None:
+                        states[key] = VMwareVMNotFound(
+                            "Failed to find VM; uuid={uuid}, name={name}"
+                            .format(uuid=uuid, name=vm_name))
+                    else:
+                        states[key] = api.get_maas_power_state(vm)
+                except VMwareAPIException as error:
+                    states[key] = error
+                except:
+                    states[key] = VMwareAPIException(
+                        "Failed to get power state for uuid={uuid}"
+                        .format(uuid=uuid), traceback.format_exc())
+        finally:
+            api.disconnect()
+    return states
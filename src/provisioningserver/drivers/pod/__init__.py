@@ -14,6 +14,8 @@ __all__ = [
     ]
 
 from abc import abstractmethod
+from hashlib import sha256
+import json
 
 import attr
 from provisioningserver.drivers import (
@@ -234,6 +236,21 @@ class DiscoveredMachine(AttrHelperMixin):
     tags = attr.ib(converter=converter_list(str), default=attr.Factory(list))
     hostname = attr.ib(converter=str, default=None)
 
+    # Set by the rack controller once discovered, see `compute_fingerprint`.
+    fingerprint = attr.ib(
+        converter=converter_obj(str, optional=True), default=None)
+
+    def compute_fingerprint(self):
+        """Compute a fingerprint of everything discovered about the machine.
+
+        The region stores the fingerprint with the machine and skips syncing
+        it on the next refresh when the fingerprint has not changed.
+        """
+        data = self.asdict()
+        del data['fingerprint']
+        data = json.dumps(data, sort_keys=True).encode('utf-8')
+        return sha256(data).hexdigest()
+
 
 @attr.s
 class DiscoveredPodStoragePool(AttrHelperMixin):
@@ -8,6 +8,7 @@ __all__ = [
     ]
 
 from base64 import b64encode
+from functools import partial
 from http import HTTPStatus
 from io import BytesIO
 import json
@@ -34,6 +35,7 @@ from provisioningserver.logger import get_maas_logger
 from provisioningserver.rpc.exceptions import PodInvalidResources
 from provisioningserver.utils.twisted import (
     asynchronous,
+    gatherWithConcurrency,
     pause,
 )
 from twisted.internet import reactor
@@ -104,6 +106,10 @@ class RSDPodDriver(PodDriver):
     ]
     ip_extractor = make_ip_extractor('power_address')
 
+    # The maximum number of composed nodes to query at once when
+    # discovering the pod.
+    max_discovery_concurrency = 8
+
     def detect_missing_packages(self):
         # no required packages
         return []
@@ -225,9 +231,12 @@ class RSDPodDriver(PodDriver):
         targets = []
         nodes_uri = join(url, b"redfish/v1/Nodes")
         nodes = yield self.list_resources(nodes_uri, headers)
-        for node in nodes:
-            node_data, _ = yield self.redfish_request(
-                b"GET", join(url, node), headers)
+        responses = yield gatherWithConcurrency(
+            (
+                partial(self.redfish_request, b"GET", join(url, node), headers)
+                for node in nodes
+            ), self.max_discovery_concurrency)
+        for node_data, _ in responses:
             remote_drives = node_data.get('Links', {}).get('RemoteDrives', [])
             for remote_drive in remote_drives:
                 targets.append(remote_drive['@odata.id'])
@@ -726,15 +735,16 @@ class RSDPodDriver(PodDriver):
         discovered machines returned to the region.
         """
         # Get list of all composed nodes in the pod.
-        discovered_machines = []
         nodes_uri = join(url, b"redfish/v1/Nodes")
         nodes = yield self.list_resources(nodes_uri, headers)
-        # Iterate over all composed nodes in the pod.
-        for node in nodes:
-            discovered_machine = yield self.get_pod_machine(
-                node, url, headers, remote_drives,
-                logical_drives, targets, request)
-            discovered_machines.append(discovered_machine)
+        # Query the composed nodes in the pod concurrently.
+        discovered_machines = yield gatherWithConcurrency(
+            (
+                partial(
+                    self.get_pod_machine, node, url, headers, remote_drives,
+                    logical_drives, targets, request)
+                for node in nodes
+            ), self.max_discovery_concurrency)
         return discovered_machines
 
     def get_pod_hints(self, discovered_pod):
@@ -178,6 +178,36 @@ class TestDiscoveredClasses(MAASTestCase):
         self.assertEquals(block_devices, machine.block_devices)
         self.assertEquals(tags, machine.tags)
 
+    def make_machine(self):
+        return DiscoveredMachine(
+            hostname=factory.make_name('hostname'),
+            architecture='amd64/generic', cores=random.randint(1, 8),
+            cpu_speed=random.randint(1000, 2000),
+            memory=random.randint(4096, 8192),
+            interfaces=[
+                DiscoveredMachineInterface(
+                    mac_address=factory.make_mac_address()),
+            ],
+            block_devices=[
+                DiscoveredMachineBlockDevice(
+                    model=factory.make_name("model"),
+                    serial=factory.make_name("serial"),
+                    size=random.randint(512, 1024)),
+            ])
+
+    def test_machine_fingerprint_is_stable(self):
+        machine = self.make_machine()
+        fingerprint = machine.compute_fingerprint()
+        machine.fingerprint = fingerprint
+        copy = DiscoveredMachine.fromdict(machine.asdict())
+        self.assertEqual(fingerprint, copy.compute_fingerprint())
+
+    def test_machine_fingerprint_changes_with_machine(self):
+        machine = self.make_machine()
+        fingerprint = machine.compute_fingerprint()
+        machine.block_devices[0].size += 1
+        self.assertNotEqual(fingerprint, machine.compute_fingerprint())
+
     def test_pod_hints(self):
         cores = random.randint(1, 8)
         cpu_speed = random.randint(1000, 2000)
@@ -360,6 +390,7 @@ class TestDiscoveredClasses(MAASTestCase):
                     "memory": Equals(machine.memory),
                     "power_state": Equals(machine.power_state),
                     "power_parameters": Equals(machine.power_parameters),
+                    "fingerprint": Is(None),
                     "interfaces": MatchesListwise([
                         MatchesDict({
                             "mac_address": Equals(interface.mac_address),
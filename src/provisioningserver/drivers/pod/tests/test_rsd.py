@@ -15,6 +15,7 @@ import random
 from unittest.mock import (
     call,
     Mock,
+    sentinel,
 )
 
 from maastesting.factory import factory
@@ -59,6 +60,7 @@ from testtools.matchers import (
 )
 from twisted.internet._sslverify import ClientTLSOptions
 from twisted.internet.defer import (
+    Deferred,
     fail,
     inlineCallbacks,
     succeed,
@@ -1644,6 +1646,31 @@ class TestRSDPodDriver(MAASTestCase):
             b"redfish/v1/Nodes/1", url, headers,
             remote_drives, logical_drives, targets, None))
 
+    @inlineCallbacks
+    def test__get_pod_machines_queries_nodes_concurrently_in_order(self):
+        driver = RSDPodDriver()
+        driver.max_discovery_concurrency = 2
+        context = make_context()
+        url = driver.get_url(context)
+        headers = driver.make_auth_headers(**context)
+        nodes = [b"redfish/v1/Nodes/%d" % index for index in range(3)]
+        self.patch(driver, 'list_resources').return_value = nodes
+        queries = {node: Deferred() for node in nodes}
+        mock_get_pod_machine = self.patch(driver, 'get_pod_machine')
+        mock_get_pod_machine.side_effect = (
+            lambda node, *args: queries[node])
+
+        d = driver.get_pod_machines(url, headers, set(), {}, {})
+        self.assertEqual(2, mock_get_pod_machine.call_count)
+        queries[nodes[1]].callback(sentinel.machine1)
+        self.assertEqual(3, mock_get_pod_machine.call_count)
+        queries[nodes[2]].callback(sentinel.machine2)
+        queries[nodes[0]].callback(sentinel.machine0)
+        discovered_machines = yield d
+        self.assertEqual(
+            [sentinel.machine0, sentinel.machine1, sentinel.machine2],
+            discovered_machines)
+
     def test__get_pod_hints(self):
         driver = RSDPodDriver()
         discovered_pod = make_discovered_pod()
@@ -20,6 +20,7 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockCallsMatch,
+    MockNotCalled,
 )
 from maastesting.testcase import (
     MAASTestCase,
@@ -43,6 +44,7 @@ from provisioningserver.drivers.pod.virsh import (
     DOM_TEMPLATE_S390X,
     VirshPodDriver,
 )
+from provisioningserver.drivers.power.testing import patch_power_pool
 from provisioningserver.rpc.exceptions import PodInvalidResources
 from provisioningserver.utils.shell import (
     get_env_with_locale,
@@ -51,7 +53,11 @@ from provisioningserver.utils.shell import (
 from provisioningserver.utils.twisted import asynchronous
 from testtools.matchers import Equals
 from testtools.testcase import ExpectedException
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import (
+    inlineCallbacks,
+    maybeDeferred,
+)
+from twisted.internet.task import Clock
 from twisted.internet.threads import deferToThread
 
 
@@ -69,6 +75,34 @@ SAMPLE_DOMBLKLIST = dedent("""
     file       cdrom      hdb        -
     """)
 
+SAMPLE_DOMSTATS_BLOCK = dedent("""
+    Domain: 'example1'
+      block.count=3
+      block.0.name=vda
+      block.0.path=/var/lib/libvirt/images/example1.qcow2
+      block.0.allocation=5563392000
+      block.0.capacity=21474836480
+      block.0.physical=21478375424
+      block.1.name=vdb
+      block.1.capacity=10737418240
+      block.2.name=hdb
+
+    Domain: 'example2'
+      block.count=1
+      block.0.name=vda
+      block.0.capacity=5368709120
+
+    Domain: 'example3'
+    """)
+
+SAMPLE_LIST_ALL = dedent("""
+     Id    Name                           State
+    ----------------------------------------------------
+     1     example1                       running
+     -     example2                       shut off
+     3     example3                       in shutdown
+    """)
+
 SAMPLE_DOMINFO = dedent("""
     Id:             -
     Name:           example
@@ -407,6 +441,30 @@ class VirshRunFake:
         return POOLINFO_TEMPLATE.format(**pool)
 
 
+def make_domain_xml(
+        architecture, cores, memory, block_devices, mac_addresses):
+    """Return domain XML as output by `virsh dumpxml`.
+
+    :param memory: Memory in MiB.
+    :param block_devices: List of `(target, source)` tuples.
+    """
+    disks = ''.join(
+        "<disk type='file' device='disk'><source file='%s'/>"
+        "<target dev='%s' bus='virtio'/></disk>" % (source, target)
+        for target, source in block_devices)
+    interfaces = ''.join(
+        "<interface type='network'><mac address='%s'/>"
+        "<source network='default'/></interface>" % mac
+        for mac in mac_addresses)
+    return (
+        "<domain type='kvm'><name>test</name>"
+        "<memory unit='KiB'>%d</memory><vcpu placement='static'>%d</vcpu>"
+        "<os><type arch='%s'>hvm</type></os>"
+        "<devices><disk type='file' device='cdrom'><target dev='hdb'/>"
+        "</disk>%s%s</devices></domain>" % (
+            memory * 1024, cores, architecture, disks, interfaces))
+
+
 def make_requested_machine():
     block_devices = [
         RequestedMachineBlockDevice(
@@ -425,6 +483,37 @@ def make_requested_machine():
         interfaces=interfaces)
 
 
+class TestParseDomainXML(MAASTestCase):
+    """Tests for `parse_domain_xml`."""
+
+    def test_parses_domain(self):
+        devices = [
+            ('vda', '/var/lib/libvirt/images/vda.img'),
+            ('vdb', '/var/lib/libvirt/images/vdb.img'),
+        ]
+        macs = [factory.make_mac_address() for _ in range(2)]
+        domain = virsh.parse_domain_xml(
+            make_domain_xml('aarch64', 4, 2048, devices, macs))
+        self.assertEqual(
+            virsh.DomainInfo(
+                architecture='arm64/generic', cores=4, memory=2048,
+                block_devices=devices, mac_addresses=macs),
+            domain)
+
+    def test_converts_memory_units(self):
+        xml = (
+            "<domain><memory unit='GiB'>2</memory><vcpu>1</vcpu>"
+            "<os><type arch='x86_64'>hvm</type></os></domain>")
+        self.assertEqual(2048, virsh.parse_domain_xml(xml).memory)
+
+    def test_ignores_cdroms(self):
+        domain = virsh.parse_domain_xml(SAMPLE_DUMPXML % 'x86_64')
+        self.assertEqual([], domain.block_devices)
+        self.assertEqual([], domain.mac_addresses)
+        self.assertEqual(1, domain.cores)
+        self.assertEqual(4000, domain.memory)
+
+
 class TestVirshSSH(MAASTestCase):
     """Tests for `VirshSSH`."""
 
@@ -604,6 +693,35 @@ class TestVirshSSH(MAASTestCase):
         expected = conn.get_machine_state('')
         self.assertEqual(None, expected)
 
+    def test_get_machine_states(self):
+        conn = self.configure_virshssh(SAMPLE_LIST_ALL)
+        self.assertEqual({
+            'example1': 'running',
+            'example2': 'shut off',
+            'example3': 'in shutdown',
+        }, conn.get_machine_states())
+
+    def test_get_machine_states_with_dom_prefix(self):
+        conn = self.configure_virshssh(
+            SAMPLE_LIST_ALL, dom_prefix='example2')
+        self.assertEqual(
+            {'example2': 'shut off'}, conn.get_machine_states())
+
+    def test_get_machine_states_error(self):
+        conn = self.configure_virshssh('error:')
+        self.assertEqual({}, conn.get_machine_states())
+
+    def test_get_machines_block_capacity(self):
+        conn = self.configure_virshssh(SAMPLE_DOMSTATS_BLOCK)
+        self.assertEqual({
+            'example1': {'vda': 21474836480, 'vdb': 10737418240},
+            'example2': {'vda': 5368709120},
+        }, conn.get_machines_block_capacity())
+
+    def test_get_machines_block_capacity_error(self):
+        conn = self.configure_virshssh('error: unknown command')
+        self.assertEqual({}, conn.get_machines_block_capacity())
+
     def test_machine_mac_addresses_returns_list(self):
         macs = [factory.make_mac_address() for _ in range(2)]
         output = SAMPLE_IFLIST % (macs[0], macs[1])
@@ -852,28 +970,17 @@ class TestVirshSSH(MAASTestCase):
         ]
         mock_get_pod_storage_pools = self.patch(
             virsh.VirshSSH, 'get_pod_storage_pools')
-        mock_get_machine_arch = self.patch(
-            virsh.VirshSSH, 'get_machine_arch')
-        mock_get_machine_cpu_count = self.patch(
-            virsh.VirshSSH, 'get_machine_cpu_count')
-        mock_get_machine_memory = self.patch(
-            virsh.VirshSSH, 'get_machine_memory')
+        mock_get_machine_xml = self.patch(
+            virsh.VirshSSH, 'get_machine_xml')
         mock_get_machine_state = self.patch(
             virsh.VirshSSH, 'get_machine_state')
-        mock_list_machine_block_devices = self.patch(
-            virsh.VirshSSH, 'list_machine_block_devices')
         mock_get_machine_local_storage = self.patch(
             virsh.VirshSSH, 'get_machine_local_storage')
-        mock_list_machine_mac_addresses = self.patch(
-            virsh.VirshSSH, 'list_machine_mac_addresses')
         mock_get_pod_storage_pools.return_value = storage_pools
-        mock_get_machine_arch.return_value = architecture
-        mock_get_machine_cpu_count.return_value = cores
-        mock_get_machine_memory.return_value = memory
+        mock_get_machine_xml.return_value = make_domain_xml(
+            architecture, cores, memory, devices, mac_addresses)
         mock_get_machine_state.return_value = "shut off"
-        mock_list_machine_block_devices.return_value = devices
         mock_get_machine_local_storage.side_effect = local_storage
-        mock_list_machine_mac_addresses.return_value = mac_addresses
 
         block_devices = [
             RequestedMachineBlockDevice(
@@ -942,32 +1049,81 @@ class TestVirshSSH(MAASTestCase):
         ]
         mock_get_pod_storage_pools = self.patch(
             virsh.VirshSSH, 'get_pod_storage_pools')
-        mock_get_machine_arch = self.patch(
-            virsh.VirshSSH, 'get_machine_arch')
-        mock_get_machine_cpu_count = self.patch(
-            virsh.VirshSSH, 'get_machine_cpu_count')
-        mock_get_machine_memory = self.patch(
-            virsh.VirshSSH, 'get_machine_memory')
+        mock_get_machine_xml = self.patch(
+            virsh.VirshSSH, 'get_machine_xml')
         mock_get_machine_state = self.patch(
             virsh.VirshSSH, 'get_machine_state')
-        mock_list_machine_block_devices = self.patch(
-            virsh.VirshSSH, 'list_machine_block_devices')
         mock_get_machine_local_storage = self.patch(
             virsh.VirshSSH, 'get_machine_local_storage')
-        mock_list_machine_mac_addresses = self.patch(
-            virsh.VirshSSH, 'list_machine_mac_addresses')
         mock_get_pod_storage_pools.return_value = storage_pools
-        mock_get_machine_arch.return_value = architecture
-        mock_get_machine_cpu_count.return_value = cores
-        mock_get_machine_memory.return_value = memory
+        mock_get_machine_xml.return_value = make_domain_xml(
+            architecture, cores, memory, devices, mac_addresses)
         mock_get_machine_state.return_value = "shut off"
-        mock_list_machine_block_devices.return_value = devices
         mock_get_machine_local_storage.side_effect = local_storage
-        mock_list_machine_mac_addresses.return_value = mac_addresses
 
         discovered_machine = conn.get_discovered_machine(hostname)
         self.assertIsNone(discovered_machine)
 
+    def test__get_discovered_machine_uses_provided_state_and_capacity(self):
+        conn = self.configure_virshssh('')
+        pool = DiscoveredPodStoragePool(
+            id=factory.make_name('uuid'), type='dir', name='default',
+            storage=random.randint(4096, 8192),
+            path='/var/lib/libvirt/images')
+        devices = [('vda', '/var/lib/libvirt/images/vda.img')]
+        self.patch(
+            virsh.VirshSSH, 'get_machine_xml').return_value = (
+                make_domain_xml('x86_64', 2, 1024, devices, []))
+        mock_get_machine_state = self.patch(
+            virsh.VirshSSH, 'get_machine_state')
+        mock_get_machine_local_storage = self.patch(
+            virsh.VirshSSH, 'get_machine_local_storage')
+
+        discovered_machine = conn.get_discovered_machine(
+            factory.make_name('machine'), storage_pools=[pool],
+            state=virsh.VirshVMState.ON, capacities={'vda': 4096})
+        self.assertEqual('on', discovered_machine.power_state)
+        self.assertEqual('amd64/generic', discovered_machine.architecture)
+        self.assertEqual(
+            [4096], [bd.size for bd in discovered_machine.block_devices])
+        self.assertThat(mock_get_machine_state, MockNotCalled())
+        self.assertThat(mock_get_machine_local_storage, MockNotCalled())
+
+    def test__get_discovered_machine_returns_None_without_xml(self):
+        conn = self.configure_virshssh('')
+        self.patch(virsh.VirshSSH, 'get_machine_xml').return_value = None
+        self.assertIsNone(conn.get_discovered_machine(
+            factory.make_name('machine'), storage_pools=[]))
+
+    def test__get_discovered_machines_queries_in_bulk(self):
+        conn = self.configure_virshssh('')
+        states = {
+            'example1': virsh.VirshVMState.ON,
+            'example2': virsh.VirshVMState.OFF,
+        }
+        capacities = {'example1': {'vda': 4096}}
+        self.patch(
+            virsh.VirshSSH, 'get_machine_states').return_value = states
+        self.patch(
+            virsh.VirshSSH,
+            'get_machines_block_capacity').return_value = capacities
+        mock_get_discovered_machine = self.patch(
+            virsh.VirshSSH, 'get_discovered_machine')
+        mock_get_discovered_machine.side_effect = [sentinel.machine1, None]
+
+        machines = conn.get_discovered_machines(
+            storage_pools=sentinel.storage_pools)
+        self.assertEqual([sentinel.machine1], machines)
+        self.assertThat(
+            mock_get_discovered_machine, MockCallsMatch(
+                call(
+                    'example1', storage_pools=sentinel.storage_pools,
+                    state=virsh.VirshVMState.ON,
+                    capacities={'vda': 4096}),
+                call(
+                    'example2', storage_pools=sentinel.storage_pools,
+                    state=virsh.VirshVMState.OFF, capacities=None)))
+
     def test_poweron(self):
         conn = self.configure_virshssh('')
         expected = conn.poweron(factory.make_name('machine'))
@@ -1741,10 +1897,143 @@ class TestVirsh(MAASTestCase):
                 domain=factory.make_string())
 
 
+class TestVirshSessionPool(MAASTestCase):
+    """Tests for `VirshSessionPool`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestVirshSessionPool, self).setUp()
+        patch_power_pool(self)
+
+    def make_pool(self, **kwargs):
+        clock = Clock()
+        pool = virsh.VirshSessionPool(clock=clock, **kwargs)
+        return pool, clock
+
+    def patch_login(self, alive=True):
+        mock_login = self.patch(virsh.VirshSSH, 'login')
+        mock_login.return_value = True
+        self.patch(
+            virsh.VirshSessionPool, '_is_alive').return_value = alive
+        self.patch(virsh.VirshSSH, 'logout')
+        return mock_login
+
+    @inlineCallbacks
+    def test_acquire_raises_error_on_failed_login(self):
+        pool, _ = self.make_pool()
+        self.patch(virsh.VirshSSH, 'login').return_value = False
+        with ExpectedException(virsh.VirshError):
+            yield pool.acquire(factory.make_name('power_address'))
+
+    @inlineCallbacks
+    def test_reuses_released_session(self):
+        pool, _ = self.make_pool()
+        mock_login = self.patch_login()
+        power_address = factory.make_name('power_address')
+        conn = yield pool.acquire(power_address, sentinel.power_pass)
+        pool.release(conn)
+        conn_again = yield pool.acquire(power_address, sentinel.power_pass)
+        pool.release(conn_again)
+        self.assertIs(conn, conn_again)
+        self.assertThat(
+            mock_login,
+            MockCalledOnceWith(power_address, sentinel.power_pass))
+
+    @inlineCallbacks
+    def test_does_not_share_sessions_between_hosts(self):
+        pool, _ = self.make_pool()
+        mock_login = self.patch_login()
+        conn1 = yield pool.acquire(factory.make_name('power_address'))
+        pool.release(conn1)
+        conn2 = yield pool.acquire(factory.make_name('power_address'))
+        pool.release(conn2)
+        self.assertIsNot(conn1, conn2)
+        self.assertEqual(2, mock_login.call_count)
+
+    @inlineCallbacks
+    def test_discards_dead_sessions(self):
+        pool, _ = self.make_pool()
+        mock_login = self.patch_login(alive=False)
+        power_address = factory.make_name('power_address')
+        conn = yield pool.acquire(power_address)
+        pool.release(conn)
+        conn_again = yield pool.acquire(power_address)
+        pool.release(conn_again)
+        self.assertIsNot(conn, conn_again)
+        self.assertEqual(2, mock_login.call_count)
+
+    @inlineCallbacks
+    def test_release_clears_xml_cache(self):
+        pool, _ = self.make_pool()
+        self.patch_login()
+        conn = yield pool.acquire(factory.make_name('power_address'))
+        conn.xml['machine'] = sentinel.xml
+        pool.release(conn)
+        self.assertEqual({}, conn.xml)
+
+    @inlineCallbacks
+    def test_limits_sessions_per_host(self):
+        pool, _ = self.make_pool(max_sessions=1)
+        self.patch_login()
+        power_address = factory.make_name('power_address')
+        conn = yield pool.acquire(power_address)
+        d = pool.acquire(power_address)
+        self.assertFalse(d.called)
+        pool.release(conn)
+        conn_again = yield d
+        pool.release(conn_again)
+        self.assertIs(conn, conn_again)
+
+    @inlineCallbacks
+    def test_run_calls_function_with_session(self):
+        pool, _ = self.make_pool()
+        self.patch_login()
+        func = MagicMock(return_value=sentinel.result)
+        result = yield pool.run(
+            factory.make_name('power_address'), None, func, sentinel.arg)
+        self.assertEqual(sentinel.result, result)
+        self.assertThat(func, MockCalledOnceWith(ANY, sentinel.arg))
+
+    @inlineCallbacks
+    def test_run_discards_session_on_error(self):
+        pool, _ = self.make_pool()
+        mock_login = self.patch_login()
+        power_address = factory.make_name('power_address')
+        exception_type = factory.make_exception_type()
+        func = MagicMock(side_effect=exception_type())
+        with ExpectedException(exception_type):
+            yield pool.run(power_address, None, func)
+        yield pool.run(power_address, None, MagicMock())
+        self.assertEqual(2, mock_login.call_count)
+
+    @inlineCallbacks
+    def test_expires_idle_sessions(self):
+        pool, clock = self.make_pool(idle_timeout=60)
+        mock_login = self.patch_login()
+        # Log out synchronously so that it can be observed.
+        self.patch(
+            virsh, 'deferToPowerPool',
+            lambda name, func, *args: maybeDeferred(func, *args))
+        power_address = factory.make_name('power_address')
+        conn = yield pool.acquire(power_address)
+        pool.release(conn)
+        clock.advance(60)
+        conn_again = yield pool.acquire(power_address)
+        pool.release(conn_again)
+        self.assertIsNot(conn, conn_again)
+        self.assertEqual(2, mock_login.call_count)
+        self.assertThat(conn.logout, MockCalledOnceWith())
+
+
 class TestVirshPodDriver(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
 
+    def setUp(self):
+        super(TestVirshPodDriver, self).setUp()
+        patch_power_pool(self)
+
     def test_missing_packages(self):
         mock = self.patch(has_command_available)
         mock.return_value = False
@@ -1949,6 +2238,47 @@ class TestVirshPodDriver(MAASTestCase):
             yield driver.power_state_virsh(
                 power_address, power_id)
 
+    def test_power_query_many_calls_power_states_virsh(self):
+        contexts = {
+            factory.make_name('system_id'): self.make_context()
+            for _ in range(3)
+        }
+        context = next(iter(contexts.values()))
+        driver = VirshPodDriver()
+        power_states_virsh = self.patch(driver, 'power_states_virsh')
+        driver.power_query_many(contexts)
+
+        self.assertThat(
+            power_states_virsh, MockCalledOnceWith(
+                context['power_address'], contexts,
+                power_pass=context['power_pass']))
+
+    @inlineCallbacks
+    def test_power_states_lists_machines_once(self):
+        driver = VirshPodDriver()
+        mock_login = self.patch(virsh.VirshSSH, 'login')
+        mock_login.return_value = True
+        mock_states = self.patch(virsh.VirshSSH, 'get_machine_states')
+        mock_states.return_value = {
+            'on-vm': virsh.VirshVMState.ON,
+            'off-vm': virsh.VirshVMState.OFF,
+            'odd-vm': 'unknown',
+        }
+        contexts = {
+            'on': {'power_id': 'on-vm'},
+            'off': {'power_id': 'off-vm'},
+            'odd': {'power_id': 'odd-vm'},
+            'gone': {'power_id': 'gone-vm'},
+        }
+
+        power_address = factory.make_name('power_address')
+        states = yield driver.power_states_virsh(power_address, contexts)
+        self.assertThat(mock_states, MockCalledOnceWith())
+        self.assertEqual('on', states['on'])
+        self.assertEqual('off', states['off'])
+        self.assertIsInstance(states['odd'], virsh.VirshError)
+        self.assertIsInstance(states['gone'], virsh.VirshError)
+
     @inlineCallbacks
     def test_discover_errors_on_failed_login(self):
         driver = VirshPodDriver()
@@ -1971,7 +2301,7 @@ class TestVirshPodDriver(MAASTestCase):
             'power_pass': factory.make_name('power_pass'),
         }
         machines = [
-            factory.make_name('machine')
+            MagicMock()
             for _ in range(3)
         ]
         mock_pod = MagicMock()
@@ -1987,10 +2317,18 @@ class TestVirshPodDriver(MAASTestCase):
         mock_get_pod_resources.return_value = mock_pod
         mock_get_pod_hints = self.patch(
             virsh.VirshSSH, 'get_pod_hints')
-        mock_list_machines = self.patch(virsh.VirshSSH, 'list_machines')
-        mock_get_discovered_machine = self.patch(
-            virsh.VirshSSH, 'get_discovered_machine')
-        mock_list_machines.return_value = machines
+        states = {
+            factory.make_name('machine'): virsh.VirshVMState.OFF
+            for _ in range(3)
+        }
+        self.patch(
+            virsh.VirshSSH, 'get_machine_states').return_value = states
+        self.patch(
+            virsh.VirshSSH, 'get_machines_block_capacity').return_value = (
+                sentinel.capacities)
+        mock_get_discovered_machines = self.patch(
+            virsh.VirshSSH, 'get_discovered_machines')
+        mock_get_discovered_machines.return_value = machines
 
         discovered_pod = yield driver.discover(system_id, context)
         self.expectThat(mock_create_storage_pool, MockCalledOnceWith())
@@ -1999,14 +2337,54 @@ class TestVirshPodDriver(MAASTestCase):
         self.expectThat(
             mock_get_pod_hints, MockCalledOnceWith())
         self.expectThat(
-            mock_list_machines, MockCalledOnceWith())
+            mock_get_discovered_machines, MockCalledOnceWith(
+                storage_pools=sentinel.storage_pools, states=states,
+                capacities=sentinel.capacities))
+        self.expectThat(machines, Equals(discovered_pod.machines))
         self.expectThat(
-            mock_get_discovered_machine, MockCallsMatch(
-                call(machines[0], storage_pools=sentinel.storage_pools),
-                call(machines[1], storage_pools=sentinel.storage_pools),
-                call(machines[2], storage_pools=sentinel.storage_pools)))
+            [mock_pod.cpu_speed] * 3,
+            Equals([machine.cpu_speed for machine in machines]))
         self.expectThat(['virtual'], Equals(discovered_pod.tags))
 
+    @inlineCallbacks
+    def test_discover_discovers_machines_in_batches(self):
+        driver = VirshPodDriver()
+        driver.discovery_batch_size = 2
+        context = {
+            'power_address': factory.make_name('power_address'),
+            'power_pass': factory.make_name('power_pass'),
+        }
+        self.patch(virsh.VirshSSH, 'login').return_value = True
+        self.patch(virsh.VirshSSH, 'list_pools').return_value = ['default']
+        self.patch(virsh.VirshSSH, 'get_pod_resources').return_value = (
+            MagicMock())
+        self.patch(virsh.VirshSSH, 'get_pod_hints')
+        states = {
+            'machine%d' % index: virsh.VirshVMState.OFF
+            for index in range(5)
+        }
+        self.patch(
+            virsh.VirshSSH, 'get_machine_states').return_value = states
+        self.patch(virsh.VirshSSH, 'get_machines_block_capacity')
+        mock_get_discovered_machines = self.patch(
+            virsh.VirshSSH, 'get_discovered_machines')
+        mock_get_discovered_machines.side_effect = (
+            lambda storage_pools, states, capacities: [
+                MagicMock(hostname=name) for name in sorted(states)])
+
+        discovered_pod = yield driver.discover(
+            factory.make_name('system_id'), context)
+        self.assertEqual(
+            [['machine0', 'machine1'], ['machine2', 'machine3'],
+             ['machine4']],
+            sorted(
+                sorted(call[1]['states'])
+                for call in mock_get_discovered_machines.call_args_list
+            ))
+        self.assertEqual(
+            sorted(states),
+            [machine.hostname for machine in discovered_pod.machines])
+
     @inlineCallbacks
     def test_compose(self):
         driver = VirshPodDriver()
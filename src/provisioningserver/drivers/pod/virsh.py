@@ -6,8 +6,16 @@
 __all__ = [
     'probe_virsh_and_enlist',
     'VirshPodDriver',
+    'VirshSessionPool',
     ]
 
+from collections import (
+    defaultdict,
+    namedtuple,
+)
+from functools import partial
+from itertools import chain
+from math import ceil
 import string
 from tempfile import NamedTemporaryFile
 from textwrap import dedent
@@ -31,6 +39,7 @@ from provisioningserver.drivers.pod import (
     DiscoveredPodStoragePool,
     PodDriver,
 )
+from provisioningserver.drivers.power import deferToPowerPool
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.rpc.exceptions import PodInvalidResources
 from provisioningserver.rpc.utils import (
@@ -45,10 +54,14 @@ from provisioningserver.utils.network import generate_mac_address
 from provisioningserver.utils.shell import get_env_with_locale
 from provisioningserver.utils.twisted import (
     asynchronous,
+    gatherWithConcurrency,
     synchronous,
 )
-from twisted.internet.defer import inlineCallbacks
-from twisted.internet.threads import deferToThread
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    DeferredSemaphore,
+    inlineCallbacks,
+)
 
 
 maaslog = get_maas_logger("drivers.pod.virsh")
@@ -57,6 +70,10 @@ maaslog = get_maas_logger("drivers.pod.virsh")
 XPATH_ARCH = "/domain/os/type/@arch"
 XPATH_BOOT = "/domain/os/boot"
 XPATH_OS = "/domain/os"
+XPATH_VCPU = "/domain/vcpu"
+XPATH_MEMORY = "/domain/memory"
+XPATH_DISKS = "/domain/devices/disk[@device='disk']"
+XPATH_MACS = "/domain/devices/interface/mac/@address"
 
 XPATH_POOL_TYPE = "/pool/@type"
 XPATH_POOL_AVAILABLE = "/pool/available"
@@ -255,10 +272,77 @@ VM_STATE_TO_POWER_STATE = {
     }
 
 
+# Multipliers to convert the memory units used in domain XML into KiB.
+MEMORY_UNIT_TO_KIB = {
+    'b': 1 / 1024,
+    'bytes': 1 / 1024,
+    'KB': 1000 / 1024,
+    'k': 1,
+    'KiB': 1,
+    'MB': 1000 ** 2 / 1024,
+    'M': 1024,
+    'MiB': 1024,
+    'GB': 1000 ** 3 / 1024,
+    'G': 1024 ** 2,
+    'GiB': 1024 ** 2,
+    }
+
+
 class VirshError(Exception):
     """Failure communicating to virsh. """
 
 
+# Information about a domain gathered from a single parse of its XML.
+DomainInfo = namedtuple("DomainInfo", (
+    "architecture", "cores", "memory", "block_devices", "mac_addresses"))
+
+
+def parse_domain_xml(xml):
+    """Parse the output of `virsh dumpxml` into a `DomainInfo`.
+
+    Everything MAAS needs to know about a domain, except the capacity of
+    its disks, is in its XML, so this replaces individual `dominfo`,
+    `domblklist` and `domiflist` calls with one parse.
+
+    :return: `DomainInfo`, with memory in MiB and block devices as a list
+        of `(target, source)` tuples.
+    """
+    doc = etree.XML(xml)
+    evaluator = etree.XPathEvaluator(doc)
+
+    arch = str(evaluator(XPATH_ARCH)[0])
+    arch = ARCH_FIX.get(arch, arch)
+
+    vcpu = evaluator(XPATH_VCPU)
+    cores = int(vcpu[0].text) if vcpu else 0
+
+    memory = evaluator(XPATH_MEMORY)
+    if memory:
+        unit = memory[0].get('unit', 'KiB')
+        KiB = int(memory[0].text) * MEMORY_UNIT_TO_KIB.get(unit, 1)
+        # Memory in MiB.
+        memory = int(KiB / 1024)
+    else:
+        memory = 0
+
+    block_devices = []
+    for disk in evaluator(XPATH_DISKS):
+        target = disk.find('target')
+        if target is None:
+            continue
+        source = disk.find('source')
+        if source is None:
+            source = '-'
+        else:
+            source = (
+                source.get('file') or source.get('dev') or
+                source.get('volume') or '-')
+        block_devices.append((target.get('dev'), source))
+
+    mac_addresses = [str(mac) for mac in evaluator(XPATH_MACS)]
+    return DomainInfo(arch, cores, memory, block_devices, mac_addresses)
+
+
 class VirshSSH(pexpect.spawn):
 
     PROMPT = r"virsh \#"
@@ -438,6 +522,27 @@ class VirshSSH(pexpect.spawn):
             return None
         return state
 
+    def get_machine_states(self):
+        """Gets the state of every VM with a single `virsh list`.
+
+        :return: `dict` mapping VM name to its state.
+        """
+        output = self.run(['list', '--all']).strip()
+        if output.startswith('error:'):
+            maaslog.error("Failed to list machine states")
+            return {}
+        states = {}
+        # Skip first two header lines. The state is the last column and
+        # may contain spaces, e.g. "shut off".
+        for line in output.splitlines()[2:]:
+            values = line.split(None, 2)
+            if len(values) != 3:
+                continue
+            _, machine, state = values
+            if machine.startswith(self.dom_prefix):
+                states[machine] = state.strip()
+        return states
+
     def list_machine_mac_addresses(self, machine):
         """Gets list of mac addressess assigned to the VM."""
         output = self.run(['domiflist', machine]).strip()
@@ -545,6 +650,38 @@ class VirshSSH(pexpect.spawn):
         # Local storage in bytes.
         return local_storage
 
+    def get_machines_block_capacity(self):
+        """Gets the capacity of every VM's block devices at once.
+
+        Uses `virsh domstats --block`, which reports every domain in one
+        command. Older versions of libvirt may not support this or may not
+        report the capacity of inactive domains, so callers must fall back
+        to `get_machine_local_storage` for devices missing from the result.
+
+        :return: `dict` mapping VM name to a `dict` of device to capacity.
+        """
+        output = self.run(['domstats', '--block']).strip()
+        if output.startswith('error:'):
+            return {}
+        capacities = defaultdict(dict)
+        machine, names = None, {}
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith('Domain:'):
+                machine = line.split(':', 1)[1].strip().strip("'")
+                names = {}
+            elif machine is not None and '=' in line:
+                key, value = line.split('=', 1)
+                parts = key.split('.')
+                if len(parts) != 3 or parts[0] != 'block':
+                    continue
+                _, index, field = parts
+                if field == 'name':
+                    names[index] = value
+                elif field == 'capacity' and index in names:
+                    capacities[machine][names[index]] = int(value)
+        return dict(capacities)
+
     def get_machine_local_storage(self, machine, device):
         """Gets the VM local storage for device."""
         output = self.run(['domblkinfo', machine, device]).strip()
@@ -624,17 +761,30 @@ class VirshSSH(pexpect.spawn):
         return discovered_pod_hints
 
     def get_discovered_machine(
-            self, machine, request=None, storage_pools=None):
-        """Gets the discovered machine."""
+            self, machine, request=None, storage_pools=None, state=None,
+            capacities=None):
+        """Gets the discovered machine.
+
+        Everything except the state and block device capacity comes from a
+        single parse of the domain XML. `state` and `capacities` can be
+        provided when they've already been gathered in bulk, see
+        `get_discovered_machines`.
+        """
+        xml = self.get_machine_xml(machine)
+        if xml is None:
+            return None
+        domain = parse_domain_xml(xml)
+
         # Discovered machine.
         discovered_machine = DiscoveredMachine(
             architecture="", cores=0, cpu_speed=0, memory=0,
             interfaces=[], block_devices=[], tags=[])
         discovered_machine.hostname = machine
-        discovered_machine.architecture = self.get_machine_arch(machine)
-        discovered_machine.cores = self.get_machine_cpu_count(machine)
-        discovered_machine.memory = self.get_machine_memory(machine)
-        state = self.get_machine_state(machine)
+        discovered_machine.architecture = domain.architecture
+        discovered_machine.cores = domain.cores
+        discovered_machine.memory = domain.memory
+        if state is None:
+            state = self.get_machine_state(machine)
         discovered_machine.power_state = VM_STATE_TO_POWER_STATE[state]
         discovered_machine.power_parameters = {
             'power_id': machine,
@@ -643,11 +793,12 @@ class VirshSSH(pexpect.spawn):
         # Load storage pools if needed.
         if storage_pools is None:
             storage_pools = self.get_pod_storage_pools()
+        if capacities is None:
+            capacities = {}
 
         # Discover block devices.
         block_devices = []
-        devices = self.list_machine_block_devices(machine)
-        for idx, (device, source) in enumerate(devices):
+        for idx, (device, source) in enumerate(domain.block_devices):
             # Block device.
             # When request is provided map the tags from the request block
             # devices to the discovered block devices. This ensures that
@@ -655,7 +806,9 @@ class VirshSSH(pexpect.spawn):
             tags = []
             if request is not None:
                 tags = request.block_devices[idx].tags
-            size = self.get_machine_local_storage(machine, device)
+            size = capacities.get(device)
+            if size is None:
+                size = self.get_machine_local_storage(machine, device)
             if size is None:
                 # Bug lp:1690144 - When a domain has a block device where its
                 # storage path is no longer available. The domain cannot be
@@ -679,9 +832,8 @@ class VirshSSH(pexpect.spawn):
 
         # Discover interfaces.
         interfaces = []
-        mac_addresses = self.list_machine_mac_addresses(machine)
         boot = True
-        for mac in mac_addresses:
+        for mac in domain.mac_addresses:
             interfaces.append(
                 DiscoveredMachineInterface(
                     mac_address=mac, boot=boot))
@@ -689,6 +841,30 @@ class VirshSSH(pexpect.spawn):
         discovered_machine.interfaces = interfaces
         return discovered_machine
 
+    def get_discovered_machines(
+            self, storage_pools=None, states=None, capacities=None):
+        """Gets the discovered machines for every VM in the pod.
+
+        The state of every VM and the capacity of their block devices are
+        queried in bulk, leaving one `dumpxml` per VM. Pass `states` and
+        `capacities` when they have already been queried, to discover only
+        the VMs in `states`.
+        """
+        if storage_pools is None:
+            storage_pools = self.get_pod_storage_pools()
+        if states is None:
+            states = self.get_machine_states()
+        if capacities is None:
+            capacities = self.get_machines_block_capacity()
+        machines = []
+        for machine, state in sorted(states.items()):
+            discovered_machine = self.get_discovered_machine(
+                machine, storage_pools=storage_pools, state=state,
+                capacities=capacities.get(machine))
+            if discovered_machine is not None:
+                machines.append(discovered_machine)
+        return machines
+
     def set_machine_autostart(self, machine):
         """Set machine to autostart."""
         output = self.run(['autostart', machine]).strip()
@@ -990,6 +1166,156 @@ class VirshSSH(pexpect.spawn):
             'undefine', domain, '--remove-all-storage', '--managed-save'])
 
 
+class VirshSessionPool:
+    """Pool of logged in `VirshSSH` sessions, keyed by pod host.
+
+    Logging into virsh over SSH costs far more than the commands that
+    follow, so sessions are kept open and reused between power actions and
+    discovery. At most `max_sessions` sessions are in use per host at once;
+    idle sessions are closed after `idle_timeout` seconds.
+
+    A session is only used by one caller at a time, between `acquire` and
+    `release`; use `run` to call a function with a session in a thread.
+    """
+
+    def __init__(self, max_sessions=4, idle_timeout=300, clock=reactor):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._semaphores = {}
+        self._idle = defaultdict(list)
+        self._in_use = {}
+        self._expiry = None
+
+    def _get_semaphore(self, key):
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = DeferredSemaphore(self.max_sessions)
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    @asynchronous
+    @inlineCallbacks
+    def acquire(self, power_address, power_pass=None):
+        """Return a logged in session to `power_address`.
+
+        Reuses an idle session to the host when one is alive, otherwise
+        logs in a new one. The session must be passed to `release` once
+        the caller is done with it.
+        """
+        key = (power_address, power_pass)
+        semaphore = self._get_semaphore(key)
+        yield semaphore.acquire()
+        try:
+            conn = yield self._get_session(key)
+        except:
+            semaphore.release()
+            raise
+        self._in_use[conn] = key
+        return conn
+
+    @inlineCallbacks
+    def _get_session(self, key):
+        idle = self._idle[key]
+        while idle:
+            conn, _ = idle.pop()
+            if self._is_alive(conn):
+                return conn
+            else:
+                self._close(conn)
+        power_address, power_pass = key
+        conn = VirshSSH()
+        logged_in = yield deferToPowerPool(
+            'virsh', conn.login, power_address, power_pass)
+        if not logged_in:
+            raise VirshError('Failed to login to virsh console.')
+        return conn
+
+    def _is_alive(self, conn):
+        if conn.child_fd == -1:
+            # Never spawned, or already closed.
+            return False
+        return conn.isalive()
+
+    def _close(self, conn):
+        if conn.child_fd != -1:
+            conn.close()
+
+    @asynchronous
+    def release(self, conn, discard=False):
+        """Return `conn` to the pool.
+
+        :param discard: Close the session instead of keeping it for reuse,
+            e.g. after an error left it in an unknown state.
+        """
+        key = self._in_use.pop(conn)
+        try:
+            # The domain XML cache is only valid for a single use.
+            conn.xml.clear()
+            if discard or not self._is_alive(conn):
+                self._close(conn)
+            else:
+                self._idle[key].append((conn, self.clock.seconds()))
+                self._schedule_expiry()
+        finally:
+            self._semaphores[key].release()
+
+    def _schedule_expiry(self):
+        if self._expiry is None or not self._expiry.active():
+            self._expiry = self.clock.callLater(
+                self.idle_timeout, self.expire)
+
+    @asynchronous
+    def expire(self):
+        """Log out of sessions that have been idle for too long."""
+        now = self.clock.seconds()
+        stale = []
+        for key, idle in list(self._idle.items()):
+            keep = [
+                (conn, last_used)
+                for conn, last_used in idle
+                if now - last_used < self.idle_timeout
+            ]
+            stale.extend(
+                conn for conn, last_used in idle
+                if now - last_used >= self.idle_timeout)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        if self._idle:
+            self._schedule_expiry()
+        for conn in stale:
+            d = deferToPowerPool('virsh', conn.logout)
+            d.addErrback(
+                lambda failure: maaslog.warning(
+                    "Failed to log out of virsh session: %s",
+                    failure.getErrorMessage()))
+
+    @asynchronous
+    @inlineCallbacks
+    def run(self, power_address, power_pass, func, *args, **kwargs):
+        """Call `func(conn, *args, **kwargs)` in a thread with a session.
+
+        The session is discarded if `func` raises, since it may have been
+        left part way through a command.
+        """
+        conn = yield self.acquire(power_address, power_pass)
+        try:
+            result = yield deferToPowerPool(
+                'virsh', func, conn, *args, **kwargs)
+        except:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+            return result
+
+
+# Sessions shared by every use of the virsh pod driver in this process.
+virsh_sessions = VirshSessionPool()
+
+
 class VirshPodDriver(PodDriver):
 
     name = 'virsh'
@@ -1006,6 +1332,11 @@ class VirshPodDriver(PodDriver):
     ]
     ip_extractor = make_ip_extractor(
         'power_address', IP_EXTRACTOR_PATTERNS.URL)
+    can_query_many = True
+
+    # The smallest number of VMs to discover in each session when the VMs
+    # of a pod are discovered over several sessions at once.
+    discovery_batch_size = 16
 
     def detect_missing_packages(self):
         missing_packages = set()
@@ -1014,7 +1345,6 @@ class VirshPodDriver(PodDriver):
                 missing_packages.add(package)
         return list(missing_packages)
 
-    @inlineCallbacks
     def power_control_virsh(
             self, power_address, power_id, power_change,
             power_pass=None, **kwargs):
@@ -1025,27 +1355,24 @@ class VirshPodDriver(PodDriver):
         if power_pass == '':
             power_pass = None
 
-        conn = VirshSSH()
-        logged_in = yield deferToThread(conn.login, power_address, power_pass)
-        if not logged_in:
-            raise VirshError('Failed to login to virsh console.')
+        def power_control(conn):
+            state = conn.get_machine_state(power_id)
+            if state is None:
+                raise VirshError('%s: Failed to get power state' % power_id)
 
-        state = yield deferToThread(conn.get_machine_state, power_id)
-        if state is None:
-            raise VirshError('%s: Failed to get power state' % power_id)
-
-        if state == VirshVMState.OFF:
-            if power_change == 'on':
-                powered_on = yield deferToThread(conn.poweron, power_id)
-                if powered_on is False:
-                    raise VirshError('%s: Failed to power on VM' % power_id)
-        elif state == VirshVMState.ON:
-            if power_change == 'off':
-                powered_off = yield deferToThread(conn.poweroff, power_id)
-                if powered_off is False:
-                    raise VirshError('%s: Failed to power off VM' % power_id)
+            if state == VirshVMState.OFF:
+                if power_change == 'on':
+                    if conn.poweron(power_id) is False:
+                        raise VirshError(
+                            '%s: Failed to power on VM' % power_id)
+            elif state == VirshVMState.ON:
+                if power_change == 'off':
+                    if conn.poweroff(power_id) is False:
+                        raise VirshError(
+                            '%s: Failed to power off VM' % power_id)
+
+        return virsh_sessions.run(power_address, power_pass, power_control)
 
-    @inlineCallbacks
     def power_state_virsh(
             self, power_address, power_id, power_pass=None, **kwargs):
         """Return the power state for the VM using virsh."""
@@ -1055,19 +1382,43 @@ class VirshPodDriver(PodDriver):
         if power_pass == '':
             power_pass = None
 
-        conn = VirshSSH()
-        logged_in = yield deferToThread(conn.login, power_address, power_pass)
-        if not logged_in:
-            raise VirshError('Failed to login to virsh console.')
+        def power_state(conn):
+            state = conn.get_machine_state(power_id)
+            if state is None:
+                raise VirshError('Failed to get domain: %s' % power_id)
 
-        state = yield deferToThread(conn.get_machine_state, power_id)
-        if state is None:
-            raise VirshError('Failed to get domain: %s' % power_id)
+            try:
+                return VM_STATE_TO_POWER_STATE[state]
+            except KeyError:
+                raise VirshError('Unknown state: %s' % state)
 
-        try:
-            return VM_STATE_TO_POWER_STATE[state]
-        except KeyError:
-            raise VirshError('Unknown state: %s' % state)
+        return virsh_sessions.run(power_address, power_pass, power_state)
+
+    def power_states_virsh(self, power_address, contexts, power_pass=None):
+        """Return the power state for many VMs using one `virsh list`.
+
+        :param contexts: `dict` mapping system IDs to power settings.
+        """
+        if power_pass == '':
+            power_pass = None
+
+        def power_states(conn):
+            states = conn.get_machine_states()
+            power_states = {}
+            for system_id, context in contexts.items():
+                power_id = context.get('power_id')
+                state = states.get(power_id)
+                if state is None:
+                    power_states[system_id] = VirshError(
+                        'Failed to get domain: %s' % power_id)
+                elif state not in VM_STATE_TO_POWER_STATE:
+                    power_states[system_id] = VirshError(
+                        'Unknown state: %s' % state)
+                else:
+                    power_states[system_id] = VM_STATE_TO_POWER_STATE[state]
+            return power_states
+
+        return virsh_sessions.run(power_address, power_pass, power_states)
 
     @asynchronous
     def power_on(self, system_id, context):
@@ -1084,73 +1435,112 @@ class VirshPodDriver(PodDriver):
         """Power query Virsh node."""
         return self.power_state_virsh(**context)
 
-    @inlineCallbacks
-    def get_virsh_connection(self, context):
-        """Connect and return the virsh connection."""
+    @asynchronous
+    def power_query_many(self, contexts):
+        """Power query Virsh nodes on the same pod host."""
+        context = next(iter(contexts.values()))
+        return self.power_states_virsh(
+            context.get('power_address'), contexts,
+            power_pass=context.get('power_pass'))
+
+    def run_with_connection(self, context, func, *args, **kwargs):
+        """Call `func(conn, *args, **kwargs)` with a pooled connection.
+
+        `func` is called in a thread, so it may block on virsh.
+        """
         power_address = context.get('power_address')
         power_pass = context.get('power_pass')
-        # Login to Virsh console.
-        conn = VirshSSH()
-        logged_in = yield deferToThread(conn.login, power_address, power_pass)
-        if not logged_in:
-            raise VirshError('Failed to login to virsh console.')
-        return conn
+        if power_pass == '':
+            power_pass = None
+        return virsh_sessions.run(
+            power_address, power_pass, func, *args, **kwargs)
 
+    @asynchronous
     @inlineCallbacks
     def discover(self, system_id, context):
         """Discover all resources.
 
+        The pod's resources and the state of every VM are discovered in one
+        session. The VMs themselves are then discovered in batches of at
+        least `discovery_batch_size`, over as many pooled sessions at once.
+
         Returns a defer to a DiscoveredPod object.
         """
-        conn = yield self.get_virsh_connection(context)
 
-        # Check that we have at least one storage pool.  If not, create it.
-        pools = yield deferToThread(conn.list_pools)
-        if not len(pools):
-            yield deferToThread(conn.create_storage_pool)
+        def discover_pod(conn):
+            # Check that we have at least one storage pool.  If not, create
+            # it.
+            pools = conn.list_pools()
+            if not len(pools):
+                conn.create_storage_pool()
+
+            # Discover pod resources.
+            discovered_pod = conn.get_pod_resources()
+
+            # Discovered pod hints.
+            discovered_pod.hints = conn.get_pod_hints()
+
+            # Set KVM Pod tags to 'virtual'.
+            discovered_pod.tags = ['virtual']
 
-        # Discover pod resources.
-        discovered_pod = yield deferToThread(conn.get_pod_resources)
+            # Discover the state of every VM, and the capacity of their
+            # block devices, in bulk.
+            states = conn.get_machine_states()
+            capacities = conn.get_machines_block_capacity()
+            return discovered_pod, states, capacities
 
-        # Discovered pod hints.
-        discovered_pod.hints = yield deferToThread(conn.get_pod_hints)
+        def discover_machines(conn, states, storage_pools, capacities):
+            return conn.get_discovered_machines(
+                storage_pools=storage_pools, states=states,
+                capacities=capacities)
+
+        discovered_pod, states, capacities = yield self.run_with_connection(
+            context, discover_pod)
 
         # Discover VMs.
-        machines = []
-        virtual_machines = yield deferToThread(conn.list_machines)
-        for vm in virtual_machines:
-            discovered_machine = yield deferToThread(
-                conn.get_discovered_machine, vm,
-                storage_pools=discovered_pod.storage_pools)
-            if discovered_machine is not None:
-                discovered_machine.cpu_speed = discovered_pod.cpu_speed
-                machines.append(discovered_machine)
+        names = sorted(states)
+        batch_size = max(
+            self.discovery_batch_size,
+            ceil(len(names) / virsh_sessions.max_sessions))
+        batches = [
+            {name: states[name] for name in names[index:index + batch_size]}
+            for index in range(0, len(names), batch_size)
+        ]
+        discovered = yield gatherWithConcurrency(
+            (
+                partial(
+                    self.run_with_connection, context, discover_machines,
+                    batch, discovered_pod.storage_pools, capacities)
+                for batch in batches
+            ), virsh_sessions.max_sessions)
+        machines = list(chain.from_iterable(discovered))
+        for discovered_machine in machines:
+            discovered_machine.cpu_speed = discovered_pod.cpu_speed
         discovered_pod.machines = machines
 
-        # Set KVM Pod tags to 'virtual'.
-        discovered_pod.tags = ['virtual']
-
         # Return the DiscoveredPod
         return discovered_pod
 
-    @inlineCallbacks
     def compose(self, system_id, context, request):
         """Compose machine."""
-        conn = yield self.get_virsh_connection(context)
         default_pool = context.get(
             'default_storage_pool_id', context.get('default_storage_pool'))
-        created_machine = yield deferToThread(
-            conn.create_domain, request, default_pool)
-        hints = yield deferToThread(conn.get_pod_hints)
-        return created_machine, hints
 
-    @inlineCallbacks
+        def compose_machine(conn):
+            created_machine = conn.create_domain(request, default_pool)
+            hints = conn.get_pod_hints()
+            return created_machine, hints
+
+        return self.run_with_connection(context, compose_machine)
+
     def decompose(self, system_id, context):
         """Decompose machine."""
-        conn = yield self.get_virsh_connection(context)
-        yield deferToThread(conn.delete_domain, context['power_id'])
-        hints = yield deferToThread(conn.get_pod_hints)
-        return hints
+
+        def decompose_machine(conn):
+            conn.delete_domain(context['power_id'])
+            return conn.get_pod_hints()
+
+        return self.run_with_connection(context, decompose_machine)
 
 
 @synchronous
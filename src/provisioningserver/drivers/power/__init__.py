@@ -4,6 +4,8 @@
 """Base power driver."""
 
 __all__ = [
+    "deferToPowerPool",
+    "get_power_pool",
     "is_power_parameter_set",
     "POWER_QUERY_TIMEOUT",
     "PowerActionError",
@@ -32,6 +34,7 @@ from provisioningserver.drivers import (
 )
 from provisioningserver.utils.twisted import (
     IAsynchronous,
+    MeteredThreadPool,
     pause,
 )
 from twisted.internet import reactor
@@ -39,7 +42,6 @@ from twisted.internet.defer import (
     inlineCallbacks,
     returnValue,
 )
-from twisted.internet.threads import deferToThread
 
 # We specifically declare this here so that a node not knowing its own
 # powertype won't fail to enlist. However, we don't want it in the list
@@ -50,6 +52,12 @@ UNKNOWN_POWER_TYPE = ''
 # A policy used when waiting between retries of power changes.
 DEFAULT_WAITING_POLICY = (1, 2, 2, 4, 6, 8, 12)
 
+# Maximum number of threads for blocking power driver calls. These calls
+# spend nearly all their time waiting on BMCs, so this pool is sized
+# separately from, and kept apart from, the reactor's thread-pool; that way
+# power I/O neither starves, nor is starved by, TFTP and DHCP in boot storms.
+max_threads_for_power_pool = 20
+
 # JSON schema for what a power driver definition should look like
 JSON_POWER_DRIVER_SCHEMA = {
     'title': "Power driver setting set",
@@ -149,6 +157,34 @@ class PowerActionError(PowerError):
     or `off`."""
 
 
+def make_power_pool(maxthreads=max_threads_for_power_pool):
+    """Create a thread-pool for blocking power driver calls."""
+    return MeteredThreadPool(0, maxthreads, "power")
+
+
+def get_power_pool():
+    """Return the thread-pool for blocking power driver calls.
+
+    The pool is created, and arranged to start with the reactor, on first
+    use. Its statistics, by driver name, are available from `getStats`.
+    """
+    pool = getattr(reactor, "threadpoolForPower", None)
+    if pool is None:
+        pool = reactor.threadpoolForPower = make_power_pool()
+        reactor.callWhenRunning(pool.start)
+        reactor.addSystemEventTrigger("during", "shutdown", pool.stop)
+    return pool
+
+
+def deferToPowerPool(name, func, *args, **kwargs):
+    """Call blocking `func` in the power thread-pool.
+
+    :param name: The name of the power driver making the call, under which
+        the pool records statistics.
+    """
+    return get_power_pool().deferToThread(name, func, *args, **kwargs)
+
+
 class PowerDriverBase(metaclass=ABCMeta):
     """Base driver for a power driver."""
 
@@ -229,6 +265,26 @@ class PowerDriverBase(metaclass=ABCMeta):
             calling function should ignore this error, and continue on.
         """
 
+    # Whether or not the power driver implements `query_many`.
+    can_query_many = False
+
+    def query_many(self, contexts):
+        """Perform the query action for many nodes sharing one endpoint.
+
+        This is only used when `can_query_many` is set, for nodes which
+        share all of their BMC-scoped settings, i.e. nodes behind the same
+        BMC, chassis, or pod host.
+
+        :param contexts: `dict` mapping `Node.system_id` to the power
+            settings for that node.
+        :return: `dict` mapping `Node.system_id` to the status of power on
+            the BMC, `on` or `off`, or to an exception when the status for
+            just that node could not be found.
+        :raises PowerError: states unable to get status from the endpoint,
+            which is then treated as a failure for every node.
+        """
+        raise NotImplementedError()
+
     def get_schema(self, detect_missing_packages=True):
         """Returns the JSON schema for the driver.
 
@@ -325,6 +381,39 @@ class PowerDriver(PowerDriverBase):
             yield self.perform_power(self.power_off, "off", system_id, context)
         yield self.perform_power(self.power_on, "on", system_id, context)
 
+    def power_query_many(self, contexts):
+        """Implement this method, and set `can_query_many`, to query the
+        power state of many nodes sharing one endpoint at once.
+
+        See `PowerDriverBase.query_many`."""
+        raise NotImplementedError()
+
+    @inlineCallbacks
+    def query_many(self, contexts):
+        """Performs the power query action for all nodes in `contexts`.
+
+        Retries in the same way as `query`.
+        """
+        exc_info = None, None, None
+        for waiting_time in self.wait_time:
+            try:
+                if IAsynchronous.providedBy(self.power_query_many):
+                    # The @asynchronous decorator will DTRT.
+                    states = yield self.power_query_many(contexts)
+                else:
+                    states = yield deferToPowerPool(
+                        self.name, self.power_query_many, contexts)
+            except PowerFatalError:
+                raise  # Don't retry.
+            except PowerError:
+                exc_info = sys.exc_info()
+                # Wait before retrying.
+                yield pause(waiting_time, self.clock)
+            else:
+                returnValue(states)
+        else:
+            raise exc_info[0](exc_info[1]).with_traceback(exc_info[2])
+
     @inlineCallbacks
     def query(self, system_id, context):
         """Performs the power query action for `system_id`."""
@@ -338,8 +427,8 @@ class PowerDriver(PowerDriverBase):
                     # The @asynchronous decorator will DTRT.
                     state = yield self.power_query(system_id, context)
                 else:
-                    state = yield deferToThread(
-                        self.power_query, system_id, context)
+                    state = yield deferToPowerPool(
+                        self.name, self.power_query, system_id, context)
             except PowerFatalError:
                 raise  # Don't retry.
             except PowerError:
@@ -375,8 +464,8 @@ class PowerDriver(PowerDriverBase):
                     # The @asynchronous decorator will DTRT.
                     yield power_func(system_id, context)
                 else:
-                    yield deferToThread(
-                        power_func, system_id, context)
+                    yield deferToPowerPool(
+                        self.name, power_func, system_id, context)
             except PowerFatalError:
                 raise  # Don't retry.
             except PowerError:
@@ -399,8 +488,8 @@ class PowerDriver(PowerDriverBase):
                         # The @asynchronous decorator will DTRT.
                         state = yield self.power_query(system_id, context)
                     else:
-                        state = yield deferToThread(
-                            self.power_query, system_id, context)
+                        state = yield deferToPowerPool(
+                            self.name, self.power_query, system_id, context)
                 except PowerFatalError:
                     raise  # Don't retry.
                 except PowerError:
@@ -17,7 +17,13 @@ from provisioningserver.drivers import (
     make_setting_field,
     SETTING_SCOPE,
 )
+from provisioningserver.drivers.hardware.ipmi import (
+    ipmi_client,
+    IPMIAuthError,
+    IPMIError,
+)
 from provisioningserver.drivers.power import (
+    deferToPowerPool,
     is_power_parameter_set,
     PowerAuthError,
     PowerConnError,
@@ -29,6 +35,11 @@ from provisioningserver.drivers.power import (
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils import shell
 from provisioningserver.utils.network import find_ip_via_arp
+from provisioningserver.utils.twisted import asynchronous
+from twisted.internet.defer import (
+    inlineCallbacks,
+    returnValue,
+)
 
 
 IPMI_CONFIG = """\
@@ -329,11 +340,70 @@ class IPMIPowerDriver(PowerDriver):
         return self._issue_ipmipower_command(
             ipmipower_command, power_change, power_address)
 
+    def _can_issue_native_command(
+            self, power_address=None, power_driver=None, **extra):
+        """Whether the BMC may be driven by the native RMCP+ client.
+
+        Only IPMI 2.0 BMCs with a known address qualify; finding the
+        address of a BMC by its MAC is left to the FreeIPMI path.
+        """
+        return (
+            power_driver == IPMI_DRIVER.LAN_2_0 and
+            is_power_parameter_set(power_address))
+
+    def _issue_native_command(
+            self, power_change, power_address=None, power_user=None,
+            power_pass=None, power_off_mode=None, power_boot_type=None,
+            **extra):
+        """Issue the power command with the native RMCP+ client."""
+        if power_change == 'on':
+            efi = {
+                IPMI_BOOT_TYPE.EFI: True,
+                IPMI_BOOT_TYPE.LEGACY: False,
+            }.get(power_boot_type)
+            return ipmi_client.power_on(
+                power_address, power_user, power_pass, efi=efi)
+        elif power_change == 'off':
+            return ipmi_client.power_off(
+                power_address, power_user, power_pass,
+                soft=(power_off_mode == 'soft'))
+        else:
+            return ipmi_client.get_power_state(
+                power_address, power_user, power_pass)
+
+    @inlineCallbacks
+    def _issue_power_command(self, power_change, context):
+        """Issue the power command, natively when possible.
+
+        BMCs that the native client cannot drive, e.g. those without
+        cipher suite 3, are driven with FreeIPMI in a thread instead.
+        """
+        if self._can_issue_native_command(**context):
+            try:
+                result = yield self._issue_native_command(
+                    power_change, **context)
+            except IPMIAuthError as error:
+                error_info = IPMI_ERRORS[str(error)]
+                raise error_info.get('exception')(error_info.get('message'))
+            except IPMIError as error:
+                maaslog.debug(
+                    "Native IPMI power %s of %s failed, falling back to "
+                    "FreeIPMI: %s" % (
+                        power_change, context.get('power_address'), error))
+            else:
+                returnValue(result)
+        result = yield deferToPowerPool(
+            self.name, self._issue_ipmi_command, power_change, **context)
+        returnValue(result)
+
+    @asynchronous
     def power_on(self, system_id, context):
-        self._issue_ipmi_command('on', **context)
+        return self._issue_power_command('on', context)
 
+    @asynchronous
     def power_off(self, system_id, context):
-        self._issue_ipmi_command('off', **context)
+        return self._issue_power_command('off', context)
 
+    @asynchronous
     def power_query(self, system_id, context):
-        return self._issue_ipmi_command('query', **context)
+        return self._issue_power_command('query', context)
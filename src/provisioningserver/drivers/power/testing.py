@@ -0,0 +1,26 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Test helpers for `provisioningserver.drivers.power`."""
+
+__all__ = [
+    "patch_power_pool",
+]
+
+from provisioningserver.drivers.power import make_power_pool
+from twisted.internet import reactor
+
+
+def patch_power_pool(testcase):
+    """Give `testcase` a power thread-pool of its own, and return it.
+
+    The pool is patched in as the reactor's `threadpoolForPower`, so that
+    `get_power_pool` does not create the pool rackd uses. It is started now
+    and stopped at the end of the test; its threads would otherwise keep the
+    test process from exiting.
+    """
+    pool = make_power_pool()
+    pool.start()
+    testcase.addCleanup(pool.stop)
+    testcase.patch(reactor, "threadpoolForPower", pool)
+    return pool
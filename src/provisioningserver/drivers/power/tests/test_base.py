@@ -7,6 +7,7 @@ __all__ = []
 
 import random
 from unittest.mock import (
+    ANY,
     call,
     sentinel,
 )
@@ -25,7 +26,9 @@ from provisioningserver.drivers import (
     power,
 )
 from provisioningserver.drivers.power import (
+    deferToPowerPool,
     get_error_message,
+    get_power_pool,
     JSON_POWER_DRIVER_SCHEMA,
     PowerActionError,
     PowerAuthError,
@@ -37,7 +40,11 @@ from provisioningserver.drivers.power import (
     PowerSettingError,
     PowerToolError,
 )
-from provisioningserver.utils.twisted import asynchronous
+from provisioningserver.drivers.power.testing import patch_power_pool
+from provisioningserver.utils.twisted import (
+    asynchronous,
+    MeteredThreadPool,
+)
 from testtools.matchers import Equals
 from testtools.testcase import ExpectedException
 from twisted.internet import reactor
@@ -308,6 +315,10 @@ class TestPowerDriverPowerAction(MAASTestCase):
             action='off', action_func='power_off', bad_state='on')),
         ]
 
+    def setUp(self):
+        super(TestPowerDriverPowerAction, self).setUp()
+        patch_power_pool(self)
+
     def make_error_message(self):
         error = factory.make_name('msg')
         self.patch(power, 'get_error_message').return_value = error
@@ -328,7 +339,7 @@ class TestPowerDriverPowerAction(MAASTestCase):
     def test_success_async(self):
         system_id = factory.make_name('system_id')
         context = {'context': factory.make_name('context')}
-        mock_deferToThread = self.patch(power, "deferToThread")
+        mock_deferToPowerPool = self.patch(power, "deferToPowerPool")
         driver = make_async_power_driver(
             wait_time=[0], query_result=self.action)
         method = getattr(driver, self.action)
@@ -336,7 +347,7 @@ class TestPowerDriverPowerAction(MAASTestCase):
         self.assertEqual(result, None)
         call_count = getattr(driver, "%s_called" % self.action_func)
         self.assertEqual(1, call_count)
-        self.assertThat(mock_deferToThread, MockNotCalled())
+        self.assertThat(mock_deferToPowerPool, MockNotCalled())
 
     @inlineCallbacks
     def test_handles_fatal_error_on_first_call(self):
@@ -420,6 +431,10 @@ class TestPowerDriverCycle(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
 
+    def setUp(self):
+        super(TestPowerDriverCycle, self).setUp()
+        patch_power_pool(self)
+
     @inlineCallbacks
     def test_cycles_power_when_node_is_powered_on(self):
         system_id = factory.make_name('system_id')
@@ -446,12 +461,115 @@ class TestPowerDriverCycle(MAASTestCase):
                 driver.power_on, "on", system_id, context))
 
 
+class TestPowerDriverQueryMany(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestPowerDriverQueryMany, self).setUp()
+        patch_power_pool(self)
+        self.patch(power, "pause")
+
+    def test_base_does_not_query_many(self):
+        driver = make_power_driver_base()
+        self.assertFalse(driver.can_query_many)
+        self.assertRaises(
+            NotImplementedError, driver.query_many, sentinel.contexts)
+
+    @inlineCallbacks
+    def test_returns_states(self):
+        contexts = {
+            factory.make_name('system_id'): {
+                'context': factory.make_name('context')}
+            for _ in range(3)
+        }
+        states = {
+            system_id: random.choice(['on', 'off'])
+            for system_id in contexts
+        }
+        driver = make_power_driver()
+        power_query_many = self.patch(driver, 'power_query_many')
+        power_query_many.return_value = states
+        output = yield driver.query_many(contexts)
+        self.assertEqual(states, output)
+        self.assertThat(power_query_many, MockCalledOnceWith(contexts))
+
+    @inlineCallbacks
+    def test_returns_states_from_async_query(self):
+        driver = make_power_driver()
+        driver.power_query_many = asynchronous(
+            lambda contexts: succeed(sentinel.states))
+        output = yield driver.query_many(sentinel.contexts)
+        self.assertEqual(sentinel.states, output)
+
+    @inlineCallbacks
+    def test_retries_on_failure_then_returns_states(self):
+        driver = make_power_driver()
+        self.patch(driver, 'power_query_many').side_effect = [
+            PowerError("one"), PowerError("two"), sentinel.states]
+        output = yield driver.query_many(sentinel.contexts)
+        self.assertEqual(sentinel.states, output)
+
+    @inlineCallbacks
+    def test_raises_last_exception_after_all_retries_fail(self):
+        wait_time = [random.randrange(1, 10) for _ in range(3)]
+        driver = make_power_driver(wait_time=wait_time)
+        exception_types = list(
+            factory.make_exception_type((PowerError,))
+            for _ in wait_time)
+        self.patch(driver, 'power_query_many').side_effect = exception_types
+        with ExpectedException(exception_types[-1]):
+            yield driver.query_many(sentinel.contexts)
+
+    @inlineCallbacks
+    def test_does_not_retry_fatal_errors(self):
+        driver = make_power_driver()
+        power_query_many = self.patch(driver, 'power_query_many')
+        power_query_many.side_effect = PowerFatalError
+        with ExpectedException(PowerFatalError):
+            yield driver.query_many(sentinel.contexts)
+        self.assertThat(power_query_many, MockCalledOnceWith(ANY))
+
+
+class TestPowerPool(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_get_power_pool_returns_same_metered_pool(self):
+        reactor = self.patch(power, "reactor")
+        reactor.threadpoolForPower = None
+        pool = get_power_pool()
+        self.assertIsInstance(pool, MeteredThreadPool)
+        self.assertEqual("power", pool.name)
+        self.assertEqual(power.max_threads_for_power_pool, pool.max)
+        self.assertIs(pool, get_power_pool())
+
+    def test_get_power_pool_starts_and_stops_pool_with_reactor(self):
+        reactor = self.patch(power, "reactor")
+        reactor.threadpoolForPower = None
+        pool = get_power_pool()
+        self.assertThat(
+            reactor.callWhenRunning, MockCalledOnceWith(pool.start))
+        self.assertThat(
+            reactor.addSystemEventTrigger,
+            MockCalledOnceWith("during", "shutdown", pool.stop))
+
+    @inlineCallbacks
+    def test_deferToPowerPool_records_stats_under_name(self):
+        pool = patch_power_pool(self)
+        name = factory.make_name('driver')
+        result = yield deferToPowerPool(name, lambda: sentinel.result)
+        self.assertIs(sentinel.result, result)
+        self.assertEqual(1, pool.getStats()[name]["calls"])
+
+
 class TestPowerDriverQuery(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
 
     def setUp(self):
         super(TestPowerDriverQuery, self).setUp()
+        patch_power_pool(self)
         self.patch(power, "pause")
 
     @inlineCallbacks
@@ -472,6 +590,14 @@ class TestPowerDriverQuery(MAASTestCase):
         output = yield driver.query(sentinel.system_id, sentinel.context)
         self.assertEqual(sentinel.state, output)
 
+    @inlineCallbacks
+    def test_queries_in_power_pool(self):
+        driver = make_power_driver(name=factory.make_name('driver'))
+        self.patch(driver, 'power_query').return_value = sentinel.state
+        yield driver.query(sentinel.system_id, sentinel.context)
+        stats = get_power_pool().getStats()
+        self.assertEqual(1, stats[driver.name]["calls"])
+
     @inlineCallbacks
     def test_raises_last_exception_after_all_retries_fail(self):
         wait_time = [random.randrange(1, 10) for _ in range(3)]
@@ -17,8 +17,16 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockCallsMatch,
+    MockNotCalled,
+)
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from provisioningserver.drivers.hardware.ipmi import (
+    IPMIAuthError,
+    IPMIError,
 )
-from maastesting.testcase import MAASTestCase
 from provisioningserver.drivers.power import (
     ipmi as ipmi_module,
     PowerAuthError,
@@ -29,17 +37,25 @@ from provisioningserver.drivers.power.ipmi import (
     IPMI_BOOT_TYPE_MAPPING,
     IPMI_CONFIG,
     IPMI_CONFIG_WITH_BOOT_TYPE,
+    IPMI_DRIVER,
     IPMI_ERRORS,
     IPMIPowerDriver,
 )
+from provisioningserver.drivers.power.testing import patch_power_pool
 from provisioningserver.utils.shell import (
     get_env_with_locale,
     has_command_available,
 )
+from testtools import ExpectedException
 from testtools.matchers import (
     Contains,
     Equals,
 )
+from twisted.internet.defer import (
+    fail,
+    inlineCallbacks,
+    succeed,
+)
 
 
 def make_context():
@@ -78,6 +94,12 @@ def make_ipmipower_command(
 
 class TestIPMIPowerDriver(MAASTestCase):
 
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestIPMIPowerDriver, self).setUp()
+        patch_power_pool(self)
+
     def test_missing_packages(self):
         mock = self.patch(has_command_available)
         mock.return_value = False
@@ -277,39 +299,135 @@ class TestIPMIPowerDriver(MAASTestCase):
                 stderr=PIPE, env=env))
         self.expectThat(result, Equals('other'))
 
+    @inlineCallbacks
     def test_power_on_calls__issue_ipmi_command(self):
         context = make_context()
         ipmi_power_driver = IPMIPowerDriver()
         _issue_ipmi_command_mock = self.patch(
             ipmi_power_driver, '_issue_ipmi_command')
         system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_on(system_id, context)
+        yield ipmi_power_driver.power_on(system_id, context)
 
         self.assertThat(
             _issue_ipmi_command_mock, MockCalledOnceWith('on', **context))
 
+    @inlineCallbacks
     def test_power_off_calls__issue_ipmi_command(self):
         context = make_context()
         ipmi_power_driver = IPMIPowerDriver()
         _issue_ipmi_command_mock = self.patch(
             ipmi_power_driver, '_issue_ipmi_command')
         system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_off(system_id, context)
+        yield ipmi_power_driver.power_off(system_id, context)
 
         self.assertThat(
             _issue_ipmi_command_mock, MockCalledOnceWith('off', **context))
 
+    @inlineCallbacks
     def test_power_query_calls__issue_ipmi_command(self):
         context = make_context()
         ipmi_power_driver = IPMIPowerDriver()
         _issue_ipmi_command_mock = self.patch(
             ipmi_power_driver, '_issue_ipmi_command')
         system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_query(system_id, context)
+        yield ipmi_power_driver.power_query(system_id, context)
+
+        self.assertThat(
+            _issue_ipmi_command_mock, MockCalledOnceWith('query', **context))
+
+    def test__can_issue_native_command_only_for_lan_2_0(self):
+        driver = IPMIPowerDriver()
+        power_address = factory.make_ipv4_address()
+        self.assertTrue(driver._can_issue_native_command(
+            power_address=power_address, power_driver=IPMI_DRIVER.LAN_2_0))
+        self.assertFalse(driver._can_issue_native_command(
+            power_address=power_address, power_driver=IPMI_DRIVER.LAN))
+        self.assertFalse(driver._can_issue_native_command(
+            power_address='', power_driver=IPMI_DRIVER.LAN_2_0))
+
+    @inlineCallbacks
+    def test_power_query_uses_native_client_for_lan_2_0(self):
+        context = make_context()
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        driver = IPMIPowerDriver()
+        get_power_state = self.patch(
+            ipmi_module.ipmi_client, 'get_power_state')
+        get_power_state.return_value = succeed('on')
+        _issue_ipmi_command_mock = self.patch(driver, '_issue_ipmi_command')
+
+        state = yield driver.power_query(
+            factory.make_name('system_id'), context)
+
+        self.assertEqual('on', state)
+        self.assertThat(get_power_state, MockCalledOnceWith(
+            context['power_address'], context['power_user'],
+            context['power_pass']))
+        self.assertThat(_issue_ipmi_command_mock, MockNotCalled())
+
+    @inlineCallbacks
+    def test_power_on_passes_boot_type_to_native_client(self):
+        context = make_context()
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        context['power_boot_type'] = IPMI_BOOT_TYPE.EFI
+        driver = IPMIPowerDriver()
+        power_on = self.patch(ipmi_module.ipmi_client, 'power_on')
+        power_on.return_value = succeed(None)
 
+        yield driver.power_on(factory.make_name('system_id'), context)
+
+        self.assertThat(power_on, MockCalledOnceWith(
+            context['power_address'], context['power_user'],
+            context['power_pass'], efi=True))
+
+    @inlineCallbacks
+    def test_power_off_passes_soft_mode_to_native_client(self):
+        context = make_context()
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        context['power_off_mode'] = 'soft'
+        driver = IPMIPowerDriver()
+        power_off = self.patch(ipmi_module.ipmi_client, 'power_off')
+        power_off.return_value = succeed(None)
+
+        yield driver.power_off(factory.make_name('system_id'), context)
+
+        self.assertThat(power_off, MockCalledOnceWith(
+            context['power_address'], context['power_user'],
+            context['power_pass'], soft=True))
+
+    @inlineCallbacks
+    def test_power_query_falls_back_to_freeipmi(self):
+        context = make_context()
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        driver = IPMIPowerDriver()
+        get_power_state = self.patch(
+            ipmi_module.ipmi_client, 'get_power_state')
+        get_power_state.return_value = fail(
+            IPMIError('cipher suite id unavailable'))
+        _issue_ipmi_command_mock = self.patch(driver, '_issue_ipmi_command')
+        _issue_ipmi_command_mock.return_value = 'off'
+
+        state = yield driver.power_query(
+            factory.make_name('system_id'), context)
+
+        self.assertEqual('off', state)
         self.assertThat(
             _issue_ipmi_command_mock, MockCalledOnceWith('query', **context))
 
+    @inlineCallbacks
+    def test_power_query_raises_auth_errors_from_native_client(self):
+        context = make_context()
+        context['power_driver'] = IPMI_DRIVER.LAN_2_0
+        driver = IPMIPowerDriver()
+        get_power_state = self.patch(
+            ipmi_module.ipmi_client, 'get_power_state')
+        get_power_state.return_value = fail(IPMIAuthError('password invalid'))
+        _issue_ipmi_command_mock = self.patch(driver, '_issue_ipmi_command')
+
+        with ExpectedException(
+                PowerAuthError, IPMI_ERRORS['password invalid']['message']):
+            yield driver.power_query(factory.make_name('system_id'), context)
+        self.assertThat(_issue_ipmi_command_mock, MockNotCalled())
+
     def test__issue_ipmi_chassis_config_with_power_boot_type(self):
         context = make_context()
         driver = IPMIPowerDriver()
@@ -115,3 +115,27 @@ class TestVMwarePowerDriver(MAASTestCase):
             power_query_vmware, MockCalledOnceWith(
                 host, username, password, vm_name, uuid, port, protocol))
         self.expectThat(expected_result, Equals('off'))
+
+    def test_power_query_many_calls_power_query_many_vmware(self):
+        (system_id, host, username, password,
+         vm_name, uuid, port, protocol, context) = self.make_parameters()
+        other_context = dict(
+            context, power_vm_name=factory.make_name('power_vm_name'),
+            power_uuid=factory.make_name('power_uuid'))
+        vmware_power_driver = VMwarePowerDriver()
+        power_query_many_vmware = self.patch(
+            vmware_module, 'power_query_many_vmware')
+        power_query_many_vmware.return_value = {
+            system_id: 'on', 'other': 'off'}
+        states = vmware_power_driver.power_query_many(
+            {system_id: context, 'other': other_context})
+
+        self.expectThat(
+            power_query_many_vmware, MockCalledOnceWith(
+                host, username, password, {
+                    system_id: (vm_name, uuid),
+                    'other': (
+                        other_context['power_vm_name'],
+                        other_context['power_uuid']),
+                }, port, protocol))
+        self.expectThat(states, Equals({system_id: 'on', 'other': 'off'}))
@@ -13,6 +13,7 @@ from provisioningserver.drivers import (
 from provisioningserver.drivers.hardware import vmware
 from provisioningserver.drivers.hardware.vmware import (
     power_control_vmware,
+    power_query_many_vmware,
     power_query_vmware,
 )
 from provisioningserver.drivers.power import PowerDriver
@@ -57,6 +58,7 @@ class VMwarePowerDriver(PowerDriver):
             required=False),
     ]
     ip_extractor = make_ip_extractor('power_address')
+    can_query_many = True
 
     def detect_missing_packages(self):
         if not vmware.try_pyvmomi_import():
@@ -87,3 +89,13 @@ class VMwarePowerDriver(PowerDriver):
             extract_vmware_parameters(context))
         return power_query_vmware(
             host, username, password, vm_name, uuid, port, protocol)
+
+    def power_query_many(self, contexts):
+        """Power query VMware nodes through the same VMware host."""
+        vms = {}
+        for system_id, context in contexts.items():
+            host, username, password, vm_name, uuid, port, protocol = (
+                extract_vmware_parameters(context))
+            vms[system_id] = vm_name, uuid
+        return power_query_many_vmware(
+            host, username, password, vms, port, protocol)
@@ -32,6 +32,7 @@ from provisioningserver.rpc.region import (
     RegisterEventType,
     SendEvent,
     SendEventMACAddress,
+    SendEvents,
 )
 from provisioningserver.utils.env import get_maas_id
 from provisioningserver.utils.twisted import (
@@ -42,9 +43,16 @@ from provisioningserver.utils.twisted import (
     suppress,
 )
 from twisted.internet.defer import (
+    Deferred,
+    DeferredList,
     maybeDeferred,
     succeed,
 )
+from twisted.protocols.amp import (
+    TooLong,
+    UnhandledCommand,
+)
+from twisted.python.failure import Failure
 
 
 maaslog = get_maas_logger("events")
@@ -402,12 +410,21 @@ class NodeEventHub:
 
     This automatically ensures that the event type is registered before
     sending logs to the region.
+
+    Events are sent one at a time while the region keeps up. Events logged
+    while a send is in flight are queued, and are then sent together with
+    a single `SendEvents` call, up to `batch_size` at a time.
     """
 
+    # The most events sent to the region in one call.
+    batch_size = 100
+
     def __init__(self):
         super(NodeEventHub, self).__init__()
         self._types_registering = dict()
         self._types_registered = set()
+        self._events_pending = []
+        self._events_sending = False
 
     @asynchronous
     def registerEventType(self, event_type):
@@ -480,6 +497,79 @@ class NodeEventHub:
             self._types_registered.discard(event_type)
         return failure
 
+    def _queueEvent(self, event):
+        """Queue `event` to be sent to the region.
+
+        The event is sent straight away if nothing else is being sent,
+        otherwise it's sent in a batch once the send in flight is done.
+
+        :return: :class:`Deferred` that fires when the event has been sent.
+        """
+        d = Deferred()
+        self._events_pending.append((event, d))
+        if not self._events_sending:
+            self._sendPendingEvents()
+        return d
+
+    def _sendPendingEvents(self):
+        """Send up to `batch_size` pending events to the region."""
+        pending = self._events_pending[:self.batch_size]
+        del self._events_pending[:self.batch_size]
+        self._events_sending = True
+        d = maybeDeferred(self._sendEvents, [event for event, _ in pending])
+        d.addBoth(self._sentPendingEvents, pending)
+
+    def _sentPendingEvents(self, results, pending):
+        """Report `results` to the waiters in `pending`, then carry on.
+
+        :param results: A list of ``(success, result)`` tuples, one for each
+            of the `pending` events, or a :class:`Failure` for them all.
+        """
+        self._events_sending = False
+        if len(self._events_pending) > 0:
+            self._sendPendingEvents()
+        if isinstance(results, Failure):
+            results = [(False, results)] * len(pending)
+        for (_, waiter), (success, result) in zip(pending, results):
+            if success:
+                waiter.callback(result)
+            else:
+                waiter.errback(result)
+
+    def _sendEvents(self, events):
+        """Send `events` to the region.
+
+        A single event is sent with `SendEvent` or `SendEventMACAddress`,
+        several with one `SendEvents` call. Regions that do not support
+        `SendEvents`, or batches too long to send in one go, fall back to
+        sending each event separately.
+
+        :return: :class:`Deferred` that fires with a list of ``(success,
+            result)`` tuples, one for each event.
+        """
+        client = getRegionClient()
+        if len(events) == 1:
+            return self._sendEventsSeparately(client, events)
+
+        def sendSeparately(failure):
+            failure.trap(TooLong, UnhandledCommand)
+            return self._sendEventsSeparately(client, events)
+
+        d = maybeDeferred(client, SendEvents, events=events)
+        d.addCallback(lambda response: [(True, response)] * len(events))
+        d.addErrback(sendSeparately)
+        return d
+
+    def _sendEventsSeparately(self, client, events):
+        """Send each of `events` to the region in its own call."""
+        return DeferredList([
+            maybeDeferred(
+                client, SendEventMACAddress
+                if event.get("system_id") is None else SendEvent,
+                **event)
+            for event in events
+        ], consumeErrors=True)
+
     @asynchronous
     def logByID(self, event_type, system_id, description=""):
         """Send the given node event to the region.
@@ -493,13 +583,12 @@ class NodeEventHub:
         :param description: An optional description of the event.
         :type description: unicode
         """
-        def send(_):
-            client = getRegionClient()
-            return client(
-                SendEvent, system_id=system_id, type_name=event_type,
-                description=description)
-
-        d = self.ensureEventTypeRegistered(event_type).addCallback(send)
+        event = {
+            "system_id": system_id, "type_name": event_type,
+            "description": description,
+        }
+        d = self.ensureEventTypeRegistered(event_type)
+        d.addCallback(lambda _: self._queueEvent(event))
         d.addErrback(self._checkEventTypeRegistered, event_type)
         return d
 
@@ -516,13 +605,12 @@ class NodeEventHub:
         :param description: An optional description of the event.
         :type description: unicode
         """
-        def send(_):
-            client = getRegionClient()
-            return client(
-                SendEventMACAddress, mac_address=mac_address,
-                type_name=event_type, description=description)
-
-        d = self.ensureEventTypeRegistered(event_type).addCallback(send)
+        event = {
+            "mac_address": mac_address, "type_name": event_type,
+            "description": description,
+        }
+        d = self.ensureEventTypeRegistered(event_type)
+        d.addCallback(lambda _: self._queueEvent(event))
         d.addErrback(self._checkEventTypeRegistered, event_type)
 
         # Suppress NoSuchNode. This happens during enlistment because the
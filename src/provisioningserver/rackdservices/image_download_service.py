@@ -15,7 +15,10 @@ from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
 )
-from provisioningserver.rpc.boot_images import import_boot_images
+from provisioningserver.rpc.boot_images import (
+    import_boot_images,
+    report_boot_images,
+)
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.rpc.region import (
     GetBootSources,
@@ -114,10 +117,21 @@ class ImageDownloadService(TimerService, object):
             sources.get("sources"), get_proxy_url("http"),
             get_proxy_url("https"))
 
+    def _report_boot_images(self):
+        """Report the boot images to the region, if it is connected.
+
+        Imports report the boot images too, so this keeps the region's cache
+        of them fresh between imports.
+        """
+        d = self.client_service.getClientNow()
+        d.addCallback(report_boot_images)
+        d.addErrback(lambda failure: failure.trap(NoConnectionsAvailable))
+        return d
+
     @inlineCallbacks
     def maybe_start_download(self):
         """Check the time the last image refresh happened and initiate a new
-        one if older than 15 minutes.
+        one if older than 15 minutes, otherwise report the boot images.
         """
         last_modified = tftppath.maas_meta_last_modified(self.tftp_root)
         if last_modified is None:
@@ -126,3 +140,5 @@ class ImageDownloadService(TimerService, object):
             age_in_seconds = self.clock.seconds() - last_modified
             if age_in_seconds >= timedelta(minutes=15).total_seconds():
                 yield self._start_download()
+            else:
+                yield self._report_boot_images()
@@ -10,6 +10,7 @@ __all__ = [
 
 from datetime import timedelta
 
+from provisioningserver.drivers.power import get_power_pool
 from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
@@ -72,6 +73,22 @@ class NodePowerMonitorService(TimerService, object):
                     clock=self.clock)
             else:
                 break
+        self.log_power_pool_stats()
+
+    def log_power_pool_stats(self):
+        """Log the power thread-pool's statistics for each power driver.
+
+        These are for tuning `max_threads_for_power_pool`: queued calls and
+        long waits show the pool is too small for the drivers in use.
+        """
+        stats = get_power_pool().getStats()
+        for name, driver_stats in sorted(stats.items()):
+            log.debug(
+                "Power thread-pool [{name}]: {queued} queued, {running} "
+                "running, {calls} calls ({failures} failed); average wait "
+                "{wait_time_avg:.3f}s (max {wait_time_max:.3f}s), average "
+                "latency {latency_avg:.3f}s (max {latency_max:.3f}s).",
+                name=name, **driver_stats)
 
     def query_nodes_failed(self, failure, localIdent):
         if failure.check(NoSuchCluster):
@@ -30,6 +30,7 @@ from maastesting.twisted import (
     TwistedLoggerFixture,
 )
 from provisioningserver.boot import tftppath
+from provisioningserver.rackdservices import image_download_service
 from provisioningserver.rackdservices.image_download_service import (
     ImageDownloadService,
 )
@@ -121,6 +122,8 @@ class TestPeriodicImageDownloadService(MAASTestCase):
         service = ImageDownloadService(
             sentinel.service, sentinel.tftp_root, clock)
         _start_download = self.patch_download(service, None)
+        _report_boot_images = self.patch(service, '_report_boot_images')
+        _report_boot_images.return_value = defer.succeed(None)
         one_week = timedelta(minutes=15).total_seconds()
         self.patch(
             tftppath,
@@ -128,6 +131,30 @@ class TestPeriodicImageDownloadService(MAASTestCase):
         clock.advance(one_week - 1)
         service.startService()
         self.assertThat(_start_download, MockNotCalled())
+        self.assertThat(_report_boot_images, MockCalledOnceWith())
+
+    def test__report_boot_images_reports_with_client(self):
+        rpc_client = Mock()
+        rpc_client.getClientNow.return_value = defer.succeed(sentinel.client)
+        report_boot_images = self.patch(
+            image_download_service, 'report_boot_images')
+        report_boot_images.return_value = defer.succeed({})
+        service = ImageDownloadService(
+            rpc_client, sentinel.tftp_root, Clock())
+        extract_result(service._report_boot_images())
+        self.assertThat(
+            report_boot_images, MockCalledOnceWith(sentinel.client))
+
+    def test__report_boot_images_ignores_no_rpc_connections(self):
+        rpc_client = Mock()
+        rpc_client.getClientNow.return_value = defer.fail(
+            NoConnectionsAvailable())
+        report_boot_images = self.patch(
+            image_download_service, 'report_boot_images')
+        service = ImageDownloadService(
+            rpc_client, sentinel.tftp_root, Clock())
+        self.assertIsNone(extract_result(service._report_boot_images()))
+        self.assertThat(report_boot_images, MockNotCalled())
 
     def test_download_is_initiated_in_new_thread(self):
         clock = Clock()
@@ -26,6 +26,7 @@ from provisioningserver.rackdservices.networks_monitoring_service import (
 from provisioningserver.rpc import region
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
 from provisioningserver.utils import services as services_module
+from provisioningserver.utils.network import annotate_with_interface_hashes
 from twisted.internet.defer import (
     inlineCallbacks,
     maybeDeferred,
@@ -91,7 +92,8 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         self.assertThat(
             protocol.UpdateInterfaces, MockCalledOnceWith(
                 protocol, system_id=rpc_service.getClient().localIdent,
-                interfaces=interfaces, topology_hints=None))
+                interfaces=annotate_with_interface_hashes(interfaces),
+                topology_hints=None))
 
     @inlineCallbacks
     def test_reports_interfaces_with_hints_if_beaconing_enabled(self):
@@ -129,7 +131,8 @@ class TestRackNetworksMonitoringService(MAASTestCase):
         self.assertThat(
             protocol.UpdateInterfaces, MockCalledOnceWith(
                 protocol, system_id=rpc_service.getClient().localIdent,
-                interfaces=interfaces, topology_hints=[]))
+                interfaces=annotate_with_interface_hashes(interfaces),
+                topology_hints=[]))
         # The service should have sent out beacons, waited three seconds,
         # solicited for more beacons, then waited another three seconds before
         # deciding that beaconing is complete.
@@ -23,6 +23,7 @@ from maastesting.twisted import (
     extract_result,
     TwistedLoggerFixture,
 )
+from provisioningserver.drivers.power.testing import patch_power_pool
 from provisioningserver.rackdservices import (
     node_power_monitor_service as npms,
 )
@@ -45,6 +46,10 @@ class TestNodePowerMonitorService(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
 
+    def setUp(self):
+        super(TestNodePowerMonitorService, self).setUp()
+        patch_power_pool(self)
+
     def test_init_sets_up_timer_correctly(self):
         service = npms.NodePowerMonitorService()
         self.assertThat(service, MatchesStructure.byEquality(
@@ -156,3 +161,22 @@ class TestNodePowerMonitorService(MAASTestCase):
             "Failed to query nodes' power status: "
             "Such a shame I can't divide by zero",
             maaslog.output)
+
+    def test_log_power_pool_stats_logs_stats_for_each_driver(self):
+        service = self.make_monitor_service()
+        get_power_pool = self.patch(npms, "get_power_pool")
+        get_power_pool.return_value.getStats.return_value = {
+            "ipmi": {
+                "queued": 2, "running": 3, "calls": 40, "failures": 1,
+                "wait_time_avg": 0.5, "wait_time_max": 1.25,
+                "latency_avg": 2.0, "latency_max": 4.0,
+            },
+        }
+
+        with TwistedLoggerFixture() as logger:
+            service.log_power_pool_stats()
+
+        self.assertDocTestMatches(
+            "Power thread-pool [ipmi]: 2 queued, 3 running, 40 calls "
+            "(1 failed); average wait 0.500s (max 1.250s), average "
+            "latency 2.000s (max 4.000s).", logger.output)
@@ -7,6 +7,7 @@ __all__ = [
     "import_boot_images",
     "list_boot_images",
     "is_import_boot_images_running",
+    "report_boot_images",
     ]
 
 from urllib.parse import urlparse
@@ -18,7 +19,11 @@ from provisioningserver.config import ClusterConfiguration
 from provisioningserver.import_images import boot_resources
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc import getRegionClient
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rpc.osystems import gen_operating_systems
+from provisioningserver.rpc.region import (
+    ReportBootImages,
+    UpdateLastImageSync,
+)
 from provisioningserver.utils.env import (
     environment_variables,
     get_maas_id,
@@ -151,6 +156,8 @@ def _import_boot_images(sources, http_proxy=None, https_proxy=None):
     yield deferToThread(_run_import, sources, **proxies)
     yield touch_last_image_sync_timestamp().addErrback(
         log.err, "Failure touching last image sync timestamp.")
+    yield report_boot_images().addErrback(
+        log.err, "Failure reporting boot images.")
 
 
 def is_import_boot_images_running():
@@ -170,3 +177,27 @@ def touch_last_image_sync_timestamp():
         return fail()
     else:
         return client(UpdateLastImageSync, system_id=get_maas_id())
+
+
+def report_boot_images(client=None):
+    """Tell the region which boot images and operating systems are available.
+
+    The region caches these, so that it does not need to ask every rack
+    controller for them whenever they are needed.
+
+    :param client: The region client to use, or `None` to pick one.
+    :return: :class:`Deferred` that can fail with `NoConnectionsAvailable` or
+        any exception arising from a `ReportBootImages` RPC.
+    """
+    if client is None:
+        try:
+            client = getRegionClient()
+        except:
+            return fail()
+    osystems = [
+        dict(osystem, releases=list(osystem["releases"]))
+        for osystem in gen_operating_systems()
+    ]
+    return client(
+        ReportBootImages, uuid=get_maas_id(), images=list_boot_images(),
+        osystems=osystems)
@@ -24,7 +24,9 @@ __all__ = [
     "PowerCycle",
     "PowerDriverCheck",
     "PowerOff",
+    "PowerOffMany",
     "PowerOn",
+    "PowerOnMany",
     "PowerQuery",
     "ScanNetworks",
     "ValidateDHCPv4Config",
@@ -312,6 +314,50 @@ class PowerCycle(_Power):
     """
 
 
+class _PowerMany(amp.Command):
+    """Base class for power control commands for many nodes at once.
+
+    The power of each node is changed as by the corresponding `_Power`
+    command. A failure to change the power of one node does not prevent the
+    others from being changed; it is returned in ``failures`` instead.
+
+    :since: 2.5
+    """
+
+    arguments = [
+        (b"nodes", CompressedAmpList([
+            (b"system_id", amp.Unicode()),
+            (b"hostname", amp.Unicode()),
+            (b"power_type", amp.Unicode()),
+            (b"context", StructureAsJSON()),
+        ])),
+    ]
+    response = [
+        # The error is the name of the exception that the corresponding
+        # `_Power` command would have failed with.
+        (b"failures", CompressedAmpList([
+            (b"system_id", amp.Unicode()),
+            (b"error", amp.Unicode()),
+            (b"message", amp.Unicode()),
+        ])),
+    ]
+    errors = {}
+
+
+class PowerOnMany(_PowerMany):
+    """Turn the power of many nodes on.
+
+    :since: 2.5
+    """
+
+
+class PowerOffMany(_PowerMany):
+    """Turn the power of many nodes off.
+
+    :since: 2.5
+    """
+
+
 class _ConfigureDHCP(amp.Command):
     """Configure a DHCP server.
 
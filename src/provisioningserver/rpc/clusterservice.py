@@ -403,6 +403,39 @@ class Cluster(RPCProtocol):
         d.addCallback(lambda _: {})
         return d
 
+    def _power_many(self, nodes, power_change):
+        """Change the power of each of `nodes`, collecting failures."""
+        failures = []
+
+        def eb_power_change(failure, system_id):
+            failures.append({
+                "system_id": system_id,
+                "error": failure.type.__name__,
+                "message": failure.getErrorMessage(),
+            })
+
+        ds = []
+        for node in nodes:
+            d = maybeDeferred(
+                maybe_change_power_state, node["system_id"],
+                node["hostname"], node["power_type"],
+                power_change=power_change, context=node["context"])
+            d.addErrback(eb_power_change, node["system_id"])
+            ds.append(d)
+        d = DeferredList(ds)
+        d.addCallback(lambda _: {"failures": failures})
+        return d
+
+    @cluster.PowerOnMany.responder
+    def power_on_many(self, nodes):
+        """Turn many nodes on."""
+        return self._power_many(nodes, "on")
+
+    @cluster.PowerOffMany.responder
+    def power_off_many(self, nodes):
+        """Turn many nodes off."""
+        return self._power_many(nodes, "off")
+
     @cluster.PowerCycle.responder
     def power_cycle(self, system_id, hostname, power_type, context):
         """Power cycle a node."""
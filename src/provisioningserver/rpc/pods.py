@@ -57,6 +57,8 @@ def discover_pod(pod_type, context, pod_id=None, name=None):
                 "bad pod driver '%s'; 'discover' returned invalid result." % (
                     pod_type))
         else:
+            for machine in result.machines:
+                machine.fingerprint = machine.compute_fingerprint()
             return {
                 "pod": result
             }
@@ -106,6 +108,7 @@ def compose_machine(pod_type, context, request, pod_id, name):
                     len(result) == 2 and
                     isinstance(result[0], DiscoveredMachine) and
                     isinstance(result[1], DiscoveredPodHints)):
+                result[0].fingerprint = result[0].compute_fingerprint()
                 return {
                     "machine": result[0],
                     "hints": result[1],
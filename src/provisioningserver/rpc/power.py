@@ -13,6 +13,7 @@ from datetime import timedelta
 from functools import partial
 import sys
 
+from provisioningserver.drivers import SETTING_SCOPE
 from provisioningserver.drivers.power import (
     get_error_message,
     PowerError,
@@ -45,6 +46,7 @@ from provisioningserver.utils.twisted import (
 from twisted.internet import reactor
 from twisted.internet.defer import (
     CancelledError,
+    Deferred,
     DeferredList,
     DeferredSemaphore,
     inlineCallbacks,
@@ -52,6 +54,7 @@ from twisted.internet.defer import (
     succeed,
 )
 from twisted.internet.task import deferLater
+from twisted.python.failure import Failure
 
 
 maaslog = get_maas_logger("power")
@@ -359,6 +362,28 @@ def get_power_state(system_id, hostname, power_type, context, clock=reactor):
     raise exc_type(exc_value).with_traceback(exc_trace)
 
 
+@asynchronous
+def get_power_states(power_type, contexts):
+    """Return the power states of many nodes sharing one endpoint.
+
+    :param contexts: `dict` mapping system IDs to power settings. All nodes
+        must share the BMC-scoped settings of `power_type`.
+    :return: `dict` mapping system IDs to "on", "off" or "unknown", or to
+        an exception for nodes whose state could not be found.
+    :raises PowerActionFail: When the endpoint cannot be queried at all.
+    """
+    power_driver = PowerDriverRegistry.get_item(power_type)
+    if power_driver is None:
+        raise PowerActionFail(
+            "Unknown power_type '%s'" % power_type)
+    missing_packages = power_driver.detect_missing_packages()
+    if len(missing_packages):
+        raise PowerActionFail(
+            "'%s' package(s) are not installed" % ", ".join(
+                missing_packages))
+    return power_driver.query_many(contexts)
+
+
 @inlineCallbacks
 def power_query_success(system_id, hostname, state):
     """Report a node that for which power querying has succeeded."""
@@ -431,38 +456,147 @@ def maaslog_report_failure(node, failure):
         # log.err(failure, "Failed to refresh power state.")
 
 
-def query_node(node, clock):
-    """Calls `get_power_state` on the given node.
+def report_node_power_state(d, node):
+    """Report and log the result of a power query for `node`."""
+    d = report_power_state(d, node['system_id'], node['hostname'])
+    d.addCallbacks(
+        partial(maaslog_report_success, node),
+        partial(maaslog_report_failure, node))
+    return d
 
-    Logs to maaslog as errors and power states change.
-    """
+
+def skip_node_in_action(node):
+    """Return True when a power action is in progress for `node`."""
     if node['system_id'] in power_action_registry:
         log.debug(
             "{hostname}: Skipping query power status, "
             "power action already in progress.",
             hostname=node['hostname'])
+        return True
+    else:
+        return False
+
+
+def query_node(node, clock):
+    """Calls `get_power_state` on the given node.
+
+    Logs to maaslog as errors and power states change.
+    """
+    if skip_node_in_action(node):
         return succeed(None)
     else:
         d = get_power_state(
             node['system_id'], node['hostname'], node['power_type'],
             node['context'], clock=clock)
-        d = report_power_state(d, node['system_id'], node['hostname'])
-        d.addCallbacks(
-            partial(maaslog_report_success, node),
-            partial(maaslog_report_failure, node))
-        return d
+        return report_node_power_state(d, node)
+
+
+def query_nodes(nodes, semaphore):
+    """Calls `get_power_states` once for nodes sharing one endpoint.
+
+    Logs to maaslog as errors and power states change, as `query_node`.
+
+    :return: A list of deferreds, one for each node in `nodes`, each firing
+        with that node's power state.
+    """
+    contexts = {
+        node['system_id']: node['context']
+        for node in nodes
+        if not skip_node_in_action(node)
+    }
+    if len(contexts) == 0:
+        return [succeed(None) for node in nodes]
+
+    power_type = nodes[0]['power_type']
+    d = semaphore.run(get_power_states, power_type, contexts)
+
+    def get_state(states, system_id):
+        if isinstance(states, Failure):
+            # The whole endpoint failed; so has each node.
+            return states
+        state = states.get(system_id)
+        if state is None:
+            return Failure(PowerActionFail(
+                "No power state returned for %s" % system_id))
+        elif isinstance(state, (Exception, Failure)):
+            return Failure(state)
+        elif state not in ("on", "off", "unknown"):
+            return Failure(PowerActionFail(state))
+        else:
+            return state
+
+    def distribute(states):
+        for system_id, waiting in node_queries.items():
+            result = get_state(states, system_id)
+            if isinstance(result, Failure):
+                waiting.errback(result)
+            else:
+                waiting.callback(result)
+
+    node_queries = {system_id: Deferred() for system_id in contexts}
+    d.addBoth(distribute)
+    d.addErrback(log.err, "Failed to distribute power states.")
+
+    queries = []
+    for node in nodes:
+        query = node_queries.get(node['system_id'])
+        if query is None:
+            queries.append(succeed(None))
+        else:
+            queries.append(report_node_power_state(query, node))
+    return queries
+
+
+def get_endpoint_key(node):
+    """Return a key identifying the endpoint `node` is controlled through.
+
+    Nodes controlled by the same power type with the same BMC-scoped
+    settings, e.g. power address and credentials, share an endpoint.
+    """
+    power_driver = PowerDriverRegistry.get_item(node['power_type'])
+    context = node['context']
+    return node['power_type'], tuple(
+        (setting['name'], repr(context.get(setting['name'])))
+        for setting in power_driver.settings
+        if setting.get('scope', SETTING_SCOPE.BMC) == SETTING_SCOPE.BMC)
 
 
 def query_all_nodes(nodes, max_concurrency=5, clock=reactor):
     """Queries the given nodes for their power state.
 
+    Nodes whose power driver can query many nodes at once, and that share
+    an endpoint with other nodes, are queried together with one batched
+    query for that endpoint. Other nodes are queried one by one.
+
     Nodes' states are reported back to the region.
 
     :return: A deferred, which fires once all nodes have been queried,
         successfully or not.
     """
     semaphore = DeferredSemaphore(tokens=max_concurrency)
-    queries = (
-        semaphore.run(query_node, node, clock)
-        for node in nodes if node['power_type'] in PowerDriverRegistry)
-    return DeferredList(queries, consumeErrors=True)
+    nodes = [
+        node for node in nodes
+        if node['power_type'] in PowerDriverRegistry
+    ]
+
+    # Group nodes by endpoint, where the driver supports batched queries.
+    batches = {}
+    for node in nodes:
+        power_driver = PowerDriverRegistry.get_item(node['power_type'])
+        if power_driver.can_query_many:
+            key = get_endpoint_key(node)
+            batches.setdefault(key, []).append(node)
+
+    queries = {}
+    for batch in batches.values():
+        if len(batch) > 1:
+            for node, query in zip(batch, query_nodes(batch, semaphore)):
+                queries[node['system_id']] = query
+    for node in nodes:
+        if node['system_id'] not in queries:
+            queries[node['system_id']] = semaphore.run(
+                query_node, node, clock)
+
+    return DeferredList(
+        (queries[node['system_id']] for node in nodes),
+        consumeErrors=True)
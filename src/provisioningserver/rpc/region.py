@@ -30,6 +30,7 @@ __all__ = [
     "RequestNodeInfoByMACAddress",
     "SendEvent",
     "SendEventMACAddress",
+    "SendEvents",
     "UpdateInterfaces",
     "UpdateLastImageSync",
     "UpdateNodePowerState",
@@ -38,6 +39,7 @@ __all__ = [
 from provisioningserver.rpc.arguments import (
     AmpList,
     Bytes,
+    CompressedAmpList,
     ParsedURL,
     StructureAsJSON,
 )
@@ -89,19 +91,29 @@ class RegisterRackController(amp.Command):
 
 
 class ReportBootImages(amp.Command):
-    """Report boot images available on the invoking cluster controller.
+    """Report boot images available on the invoking rack controller.
+
+    The region caches the boot images and operating systems so that it does
+    not need to ask every rack controller for them when they are needed.
 
     :since: 1.5
+    :since: 2.5 the images are described as for `ListBootImagesV2`, and the
+        operating systems as for `ListOperatingSystems`.
     """
 
     arguments = [
-        # The cluster UUID.
+        # The rack controller's system_id.
         (b"uuid", amp.Unicode()),
-        (b"images", AmpList(
-            [(b"architecture", amp.Unicode()),
+        (b"images", CompressedAmpList(
+            [(b"osystem", amp.Unicode()),
+             (b"architecture", amp.Unicode()),
              (b"subarchitecture", amp.Unicode()),
              (b"release", amp.Unicode()),
-             (b"purpose", amp.Unicode())])),
+             (b"label", amp.Unicode()),
+             (b"purpose", amp.Unicode()),
+             (b"xinstall_type", amp.Unicode()),
+             (b"xinstall_path", amp.Unicode())])),
+        (b"osystems", StructureAsJSON(optional=True)),
     ]
     response = []
     errors = []
@@ -371,6 +383,27 @@ class SendEventMACAddress(amp.Command):
     }
 
 
+class SendEvents(amp.Command):
+    """Send a batch of events.
+
+    Each event identifies its node by `system_id` or, failing that, by
+    `mac_address`, as for `SendEvent` and `SendEventMACAddress`. The region
+    does not wait for the events to be written before returning.
+
+    :since: 2.5
+    """
+
+    arguments = [
+        (b"events", CompressedAmpList(
+            [(b"system_id", amp.Unicode(optional=True)),
+             (b"mac_address", amp.Unicode(optional=True)),
+             (b"type_name", amp.Unicode()),
+             (b"description", amp.Unicode())])),
+    ]
+    response = []
+    errors = []
+
+
 class ReportForeignDHCPServer(amp.Command):
     """Report a foreign DHCP server on a rack controller's interface.
 
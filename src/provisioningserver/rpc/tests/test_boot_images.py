@@ -9,6 +9,7 @@ import os
 from random import randint
 from unittest.mock import (
     ANY,
+    Mock,
     sentinel,
 )
 
@@ -37,13 +38,18 @@ from provisioningserver.rpc.boot_images import (
     list_boot_images,
     reload_boot_images,
 )
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from provisioningserver.rpc.region import (
+    ReportBootImages,
+    UpdateLastImageSync,
+)
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
 from provisioningserver.testing.config import (
     BootSourcesFixture,
     ClusterConfigurationFixture,
 )
 from provisioningserver.utils.twisted import pause
+from testtools.deferredruntest import assert_fails_with
 from testtools.matchers import (
     Equals,
     Is,
@@ -318,6 +324,7 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "report_boot_images")
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = True
         yield boot_images._import_boot_images(sentinel.sources)
@@ -335,6 +342,7 @@ class TestImportBootImages(MAASTestCase):
         get_maas_id = self.patch(boot_images, "get_maas_id")
         get_maas_id.return_value = factory.make_string()
         getRegionClient = self.patch(boot_images, "getRegionClient")
+        self.patch(boot_images, "report_boot_images")
         _run_import = self.patch_autospec(boot_images, '_run_import')
         _run_import.return_value = False
         yield boot_images._import_boot_images(sentinel.sources)
@@ -347,6 +355,15 @@ class TestImportBootImages(MAASTestCase):
             client, MockCalledOnceWith(
                 UpdateLastImageSync, system_id=get_maas_id()))
 
+    @inlineCallbacks
+    def test_reports_boot_images(self):
+        self.patch(boot_images, "touch_last_image_sync_timestamp")
+        report_boot_images = self.patch(boot_images, "report_boot_images")
+        _run_import = self.patch_autospec(boot_images, '_run_import')
+        _run_import.return_value = False
+        yield boot_images._import_boot_images(sentinel.sources)
+        self.assertThat(report_boot_images, MockCalledOnceWith())
+
     @inlineCallbacks
     def test_update_last_image_sync_end_to_end(self):
         get_maas_id = self.patch(boot_images, "get_maas_id")
@@ -354,8 +371,9 @@ class TestImportBootImages(MAASTestCase):
         self.useFixture(ClusterConfigurationFixture())
         fixture = self.useFixture(MockLiveClusterToRegionRPCFixture())
         protocol, connecting = fixture.makeEventLoop(
-            region.UpdateLastImageSync)
+            region.UpdateLastImageSync, region.ReportBootImages)
         protocol.UpdateLastImageSync.return_value = succeed({})
+        protocol.ReportBootImages.return_value = succeed({})
         self.addCleanup((yield connecting))
         self.patch_autospec(boot_resources, 'import_images')
         boot_resources.import_images.return_value = True
@@ -367,6 +385,10 @@ class TestImportBootImages(MAASTestCase):
         self.assertThat(
             protocol.UpdateLastImageSync,
             MockCalledOnceWith(protocol, system_id=get_maas_id()))
+        self.assertThat(
+            protocol.ReportBootImages,
+            MockCalledOnceWith(
+                protocol, uuid=get_maas_id(), images=ANY, osystems=ANY))
 
     @inlineCallbacks
     def test_update_last_image_sync_end_to_end_import_not_performed(self):
@@ -388,6 +410,54 @@ class TestImportBootImages(MAASTestCase):
             MockNotCalled())
 
 
+class TestReportBootImages(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test__reports_boot_images_and_operating_systems(self):
+        get_maas_id = self.patch(boot_images, "get_maas_id")
+        get_maas_id.return_value = factory.make_string()
+        getRegionClient = self.patch(boot_images, "getRegionClient")
+        images = [{"osystem": factory.make_name("os")}]
+        self.patch(boot_images, "list_boot_images").return_value = images
+        osystem = {
+            "name": factory.make_name("os"),
+            "releases": iter([{"name": factory.make_name("release")}]),
+        }
+        self.patch(
+            boot_images, "gen_operating_systems").return_value = [osystem]
+        boot_images.report_boot_images()
+        client = getRegionClient.return_value
+        self.assertThat(
+            client, MockCalledOnceWith(
+                ReportBootImages, uuid=get_maas_id(), images=images,
+                osystems=[{
+                    "name": osystem["name"],
+                    "releases": [{"name": ANY}],
+                }]))
+
+    def test__reports_with_the_given_client(self):
+        get_maas_id = self.patch(boot_images, "get_maas_id")
+        get_maas_id.return_value = factory.make_string()
+        getRegionClient = self.patch(boot_images, "getRegionClient")
+        images = [{"osystem": factory.make_name("os")}]
+        self.patch(boot_images, "list_boot_images").return_value = images
+        self.patch(boot_images, "gen_operating_systems").return_value = []
+        client = Mock()
+        boot_images.report_boot_images(client)
+        self.assertThat(
+            client, MockCalledOnceWith(
+                ReportBootImages, uuid=get_maas_id(), images=images,
+                osystems=[]))
+        self.assertThat(getRegionClient, MockNotCalled())
+
+    def test__fails_when_not_connected(self):
+        getRegionClient = self.patch(boot_images, "getRegionClient")
+        getRegionClient.side_effect = NoConnectionsAvailable()
+        d = boot_images.report_boot_images()
+        return assert_fails_with(d, NoConnectionsAvailable)
+
+
 class TestIsImportBootImagesRunning(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
@@ -1927,6 +1927,72 @@ class TestClusterProtocol_PowerOn_PowerOff_PowerCycle(MAASTestCase):
         return d.addErrback(check)
 
 
+class TestClusterProtocol_PowerOnMany_PowerOffMany(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    scenarios = (
+        ("power-on", {
+            "command": cluster.PowerOnMany,
+            "expected_power_change": "on",
+        }),
+        ("power-off", {
+            "command": cluster.PowerOffMany,
+            "expected_power_change": "off",
+        }),
+    )
+
+    def make_node(self):
+        return {
+            "system_id": factory.make_name("system_id"),
+            "hostname": factory.make_name("hostname"),
+            "power_type": factory.make_name("power_type"),
+            "context": {
+                factory.make_name("name"): factory.make_name("value"),
+            },
+        }
+
+    def test_is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(self.command.commandName)
+        self.assertIsNotNone(responder)
+
+    @inlineCallbacks
+    def test_executes_maybe_change_power_state_for_each_node(self):
+        maybe_change_power_state = self.patch(
+            clusterservice, "maybe_change_power_state")
+        nodes = [self.make_node() for _ in range(3)]
+        response = yield call_responder(
+            Cluster(), self.command, {"nodes": nodes})
+        self.assertEqual({"failures": []}, response)
+        self.assertThat(
+            maybe_change_power_state, MockCallsMatch(*(
+                call(
+                    node["system_id"], node["hostname"], node["power_type"],
+                    power_change=self.expected_power_change,
+                    context=node["context"])
+                for node in nodes
+            )))
+
+    @inlineCallbacks
+    def test_returns_failures_without_stopping_other_nodes(self):
+        failed, succeeded = self.make_node(), self.make_node()
+        maybe_change_power_state = self.patch(
+            clusterservice, "maybe_change_power_state")
+        maybe_change_power_state.side_effect = [
+            exceptions.PowerActionAlreadyInProgress("In progress."),
+            None,
+        ]
+        response = yield call_responder(
+            Cluster(), self.command, {"nodes": [failed, succeeded]})
+        self.assertEqual({"failures": [{
+            "system_id": failed["system_id"],
+            "error": "PowerActionAlreadyInProgress",
+            "message": "In progress.",
+        }]}, response)
+        self.assertThat(maybe_change_power_state.call_count, Equals(2))
+
+
 class TestClusterProtocol_PowerQuery(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
@@ -108,6 +108,34 @@ class TestDiscoverPod(MAASTestCase):
             "pod": discovered_pod,
         }, result)
 
+    @inlineCallbacks
+    def test_sets_fingerprint_on_discovered_machines(self):
+        fake_driver = MagicMock()
+        fake_driver.name = factory.make_name("pod")
+        machine = DiscoveredMachine(
+            hostname=factory.make_name('hostname'),
+            architecture='amd64/generic',
+            cores=random.randint(1, 8),
+            cpu_speed=random.randint(1000, 3000),
+            memory=random.randint(1024, 8192),
+            block_devices=[], interfaces=[])
+        discovered_pod = DiscoveredPod(
+            architectures=['amd64/generic'],
+            cores=random.randint(1, 8),
+            cpu_speed=random.randint(1000, 3000),
+            memory=random.randint(1024, 8192),
+            local_storage=0,
+            hints=DiscoveredPodHints(
+                cores=random.randint(1, 8),
+                cpu_speed=random.randint(1000, 2000),
+                memory=random.randint(1024, 8192), local_storage=0),
+            machines=[machine])
+        fake_driver.discover.return_value = succeed(discovered_pod)
+        self.patch(
+            PodDriverRegistry, "get_item").return_value = fake_driver
+        yield pods.discover_pod(fake_driver.name, {})
+        self.assertEqual(machine.compute_fingerprint(), machine.fingerprint)
+
     @inlineCallbacks
     def test_handles_driver_raising_NotImplementedError(self):
         fake_driver = MagicMock()
@@ -259,6 +287,7 @@ class TestComposeMachine(MAASTestCase):
             "machine": machine,
             "hints": hints,
         }, result)
+        self.assertEqual(machine.compute_fingerprint(), machine.fingerprint)
 
     @inlineCallbacks
     def test_handles_driver_raising_NotImplementedError(self):
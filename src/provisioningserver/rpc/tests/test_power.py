@@ -32,9 +32,14 @@ from maastesting.twisted import (
     extract_result,
     TwistedLoggerFixture,
 )
+from provisioningserver.drivers import (
+    make_setting_field,
+    SETTING_SCOPE,
+)
 from provisioningserver.drivers.power import (
     DEFAULT_WAITING_POLICY,
     get_error_message as get_driver_error_message,
+    PowerDriver,
     PowerError,
 )
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
@@ -970,10 +975,12 @@ class TestPowerQueryAsync(MAASTestCase):
         system_id = factory.make_name('system_id')
         hostname = factory.make_name('hostname')
         if power_type is None:
+            # Nodes of drivers that can query many nodes at once would be
+            # batched together, see TestPowerQueryMany.
             power_type = random.choice([
                 driver.name
                 for _, driver in PowerDriverRegistry
-                if driver.queryable
+                if driver.queryable and not driver.can_query_many
             ])
         state = random.choice(['on', 'off', 'unknown', 'error'])
         context = {
@@ -1179,3 +1186,188 @@ class TestPowerQueryAsync(MAASTestCase):
         self.assertEqual(
             [(True, node1['power_state']), (True, node2['power_state'])],
             results)
+
+
+class FakeQueryManyPowerDriver(PowerDriver):
+
+    name = "fake-query-many"
+    description = "Fake driver that can query many nodes."
+    settings = [
+        make_setting_field('power_address', "Power address"),
+        make_setting_field(
+            'power_id', "Power ID", scope=SETTING_SCOPE.NODE),
+    ]
+    ip_extractor = None
+    can_query_many = True
+
+    def detect_missing_packages(self):
+        return []
+
+    def power_on(self, system_id, context):
+        raise NotImplementedError
+
+    def power_off(self, system_id, context):
+        raise NotImplementedError
+
+    def power_query(self, system_id, context):
+        raise NotImplementedError
+
+    def power_query_many(self, contexts):
+        raise NotImplementedError
+
+
+class TestPowerQueryMany(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestPowerQueryMany, self).setUp()
+        self.driver = FakeQueryManyPowerDriver()
+        PowerDriverRegistry.register_item(self.driver.name, self.driver)
+        self.addCleanup(
+            PowerDriverRegistry.unregister_item, self.driver.name)
+
+    def make_node(self, power_address):
+        return {
+            'context': {
+                'power_address': power_address,
+                'power_id': factory.make_name('power_id'),
+            },
+            'hostname': factory.make_name('hostname'),
+            'power_state': random.choice(['on', 'off']),
+            'power_type': self.driver.name,
+            'system_id': factory.make_name('system_id'),
+        }
+
+    def make_nodes(self, count=3, power_address=None):
+        if power_address is None:
+            power_address = factory.make_ip_address()
+        return [self.make_node(power_address) for _ in range(count)]
+
+    def test_get_endpoint_key_ignores_node_settings(self):
+        node1, node2 = self.make_nodes(2)
+        self.assertEqual(
+            power.get_endpoint_key(node1), power.get_endpoint_key(node2))
+
+    def test_get_endpoint_key_differs_by_bmc_settings(self):
+        [node1] = self.make_nodes(1)
+        [node2] = self.make_nodes(1)
+        self.assertNotEqual(
+            power.get_endpoint_key(node1), power.get_endpoint_key(node2))
+
+    @inlineCallbacks
+    def test_get_power_states_calls_query_many(self):
+        query_many = self.patch(self.driver, 'query_many')
+        query_many.return_value = succeed(sentinel.states)
+        states = yield power.get_power_states(
+            self.driver.name, sentinel.contexts)
+        self.assertEqual(sentinel.states, states)
+        self.assertThat(query_many, MockCalledOnceWith(sentinel.contexts))
+
+    @inlineCallbacks
+    def test_get_power_states_fails_for_missing_packages(self):
+        self.patch(self.driver, 'detect_missing_packages').return_value = [
+            factory.make_name('package')]
+        with ExpectedException(exceptions.PowerActionFail):
+            yield power.get_power_states(self.driver.name, {})
+
+    @inlineCallbacks
+    def test_query_all_nodes_queries_each_endpoint_once(self):
+        nodes = self.make_nodes(3) + self.make_nodes(2)
+        get_power_states = self.patch(power, 'get_power_states')
+        get_power_states.side_effect = lambda power_type, contexts: succeed({
+            system_id: 'on' for system_id in contexts})
+        get_power_state = self.patch(power, 'get_power_state')
+        suppress_reporting(self)
+
+        results = yield power.query_all_nodes(nodes)
+        self.assertThat(get_power_state, MockNotCalled())
+        self.assertThat(get_power_states, MockCallsMatch(
+            call(self.driver.name, {
+                node['system_id']: node['context'] for node in nodes[:3]}),
+            call(self.driver.name, {
+                node['system_id']: node['context'] for node in nodes[3:]}),
+        ))
+        self.assertEqual([(True, 'on')] * 5, results)
+
+    @inlineCallbacks
+    def test_query_all_nodes_queries_single_node_endpoints_alone(self):
+        nodes = self.make_nodes(1)
+        get_power_states = self.patch(power, 'get_power_states')
+        get_power_state = self.patch(power, 'get_power_state')
+        get_power_state.return_value = succeed('off')
+        suppress_reporting(self)
+
+        results = yield power.query_all_nodes(nodes)
+        self.assertThat(get_power_states, MockNotCalled())
+        self.assertThat(get_power_state, MockCalledOnceWith(
+            nodes[0]['system_id'], nodes[0]['hostname'],
+            nodes[0]['power_type'], nodes[0]['context'], clock=reactor))
+        self.assertEqual([(True, 'off')], results)
+
+    @inlineCallbacks
+    def test_query_all_nodes_reports_each_node(self):
+        nodes = self.make_nodes(2)
+        self.patch(power, 'get_power_states').return_value = succeed({
+            node['system_id']: node['power_state'] for node in nodes})
+        report_power_state = self.patch(power, 'report_power_state')
+        report_power_state.side_effect = lambda d, sid, hn: d
+
+        yield power.query_all_nodes(nodes)
+        self.assertThat(report_power_state, MockCallsMatch(*(
+            call(ANY, node['system_id'], node['hostname'])
+            for node in nodes
+        )))
+
+    @inlineCallbacks
+    def test_query_all_nodes_fails_only_nodes_with_errors(self):
+        nodes = self.make_nodes(3)
+        error_message = factory.make_name('error')
+        self.patch(power, 'get_power_states').return_value = succeed({
+            nodes[0]['system_id']: 'on',
+            nodes[1]['system_id']: PowerError(error_message),
+        })
+        suppress_reporting(self)
+
+        with FakeLogger("maas.power", level=logging.DEBUG) as maaslog:
+            results = yield power.query_all_nodes(nodes)
+
+        self.assertEqual((True, 'on'), results[0])
+        self.assertFalse(results[1][0])
+        self.assertFalse(results[2][0])
+        self.assertDocTestMatches(
+            """\
+            ...
+            %s: Could not query power state: %s.
+            %s: Could not query power state: No power state returned ...
+            """ % (nodes[1]['hostname'], error_message, nodes[2]['hostname']),
+            maaslog.output)
+
+    @inlineCallbacks
+    def test_query_all_nodes_fails_all_nodes_when_endpoint_fails(self):
+        nodes = self.make_nodes(2)
+        self.patch(power, 'get_power_states').return_value = fail(
+            PowerError(factory.make_name('error')))
+        suppress_reporting(self)
+
+        with FakeLogger("maas.power"):
+            results = yield power.query_all_nodes(nodes)
+
+        self.assertEqual([False, False], [ok for ok, _ in results])
+
+    @inlineCallbacks
+    def test_query_all_nodes_skips_batched_nodes_in_action_registry(self):
+        nodes = self.make_nodes(3)
+        power.power_action_registry[nodes[0]['system_id']] = sentinel.action
+        self.addCleanup(
+            power.power_action_registry.pop, nodes[0]['system_id'], None)
+        get_power_states = self.patch(power, 'get_power_states')
+        get_power_states.return_value = succeed({
+            node['system_id']: 'on' for node in nodes[1:]})
+        suppress_reporting(self)
+
+        results = yield power.query_all_nodes(nodes)
+        self.assertThat(get_power_states, MockCalledOnceWith(
+            self.driver.name, {
+                node['system_id']: node['context'] for node in nodes[1:]}))
+        self.assertEqual([(True, None), (True, 'on'), (True, 'on')], results)
@@ -0,0 +1,200 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Simulated IPMI 2.0 BMC, for testing and benchmarking the IPMI client."""
+
+__all__ = [
+    'SimulatedBMC',
+    ]
+
+from collections import Counter
+import hmac
+import os
+import random
+import struct
+
+from provisioningserver.drivers.hardware.ipmi import (
+    BMC_ADDRESS,
+    BOOT_FLAGS_PARAMETER,
+    CHASSIS_CONTROL,
+    COMMAND,
+    CONSOLE_ADDRESS,
+    derive_session_keys,
+    hmac_sha1,
+    IPMIPacketError,
+    NETFN,
+    pack_ipmi_message,
+    pack_rmcp_plus,
+    PAYLOAD,
+    PRIVILEGE_OPERATOR,
+    RMCP_HEADER,
+    unpack_ipmi_message,
+    unpack_rmcp_plus,
+)
+from twisted.internet.protocol import DatagramProtocol
+
+
+class SimulatedBMC(DatagramProtocol):
+    """A BMC that supports cipher suite 3 and the chassis commands.
+
+    Listen on a UDP port with ``reactor.listenUDP(0, SimulatedBMC(...))``.
+    Handled commands are counted in `commands`, and the number of sessions
+    opened in `sessions_opened`.
+    """
+
+    def __init__(self, username, password, power_state='off'):
+        super(SimulatedBMC, self).__init__()
+        self.username = username.encode('utf-8')
+        self.password = password.encode('utf-8')
+        self.power_state = power_state
+        self.boot_flags = bytes(5)
+        self.guid = os.urandom(16)
+        self.sessions = {}
+        self.sessions_opened = 0
+        self.commands = Counter()
+
+    def datagramReceived(self, datagram, addr):
+        if datagram[:4] != RMCP_HEADER or len(datagram) < 16:
+            return
+        if datagram[4] == 0x00:
+            self.handleIPMI15(datagram, addr)
+            return
+        payload_type = datagram[5] & 0x3f
+        try:
+            if payload_type == PAYLOAD.IPMI:
+                managed_id = struct.unpack('<I', datagram[6:10])[0]
+                session = self.sessions.get(managed_id)
+                if session is not None and 'k1' in session:
+                    self.handleMessage(session, datagram, addr)
+            else:
+                _, _, _, payload = unpack_rmcp_plus(datagram)
+                handler = {
+                    PAYLOAD.OPEN_SESSION_REQUEST: self.handleOpenSession,
+                    PAYLOAD.RAKP_1: self.handleRAKP1,
+                    PAYLOAD.RAKP_3: self.handleRAKP3,
+                }.get(payload_type)
+                if handler is not None:
+                    handler(payload, addr)
+        except IPMIPacketError:
+            pass
+
+    def handleIPMI15(self, datagram, addr):
+        """Answer Get Channel Authentication Capabilities, as FreeIPMI
+        asks for it before opening an RMCP+ session."""
+        message = unpack_ipmi_message(datagram[14:])
+        if message.netfn != NETFN.APP or message.command != 0x38:
+            return
+        # Channel 1, IPMI 2.0 extended capabilities, RMCP+ supported.
+        data = bytes((0x00, 0x01, 0x80, 0x00, 0x02, 0, 0, 0, 0))
+        response = pack_ipmi_message(
+            CONSOLE_ADDRESS, message.netfn + 1, BMC_ADDRESS, message.seq,
+            message.command, data)
+        self.transport.write(
+            datagram[:5] + bytes(8) + bytes((len(response),)) + response,
+            addr)
+
+    def reply(self, payload_type, payload, addr):
+        self.transport.write(pack_rmcp_plus(payload_type, 0, 0, payload), addr)
+
+    def handleOpenSession(self, payload, addr):
+        tag, console_id = payload[0], payload[4:8]
+        managed_id = random.randint(1, 0xffffffff)
+        self.sessions[managed_id] = {'console_id': console_id}
+        response = (
+            bytes((tag, 0, PRIVILEGE_OPERATOR, 0)) + console_id +
+            struct.pack('<I', managed_id) + payload[8:32])
+        self.reply(PAYLOAD.OPEN_SESSION_RESPONSE, response, addr)
+
+    def handleRAKP1(self, payload, addr):
+        managed_id = struct.unpack('<I', payload[4:8])[0]
+        session = self.sessions.get(managed_id)
+        if session is None:
+            return
+        console_id = session['console_id']
+        rm, role, length = payload[8:24], payload[24], payload[27]
+        username = payload[28:28 + length]
+        if username != self.username:
+            self.reply(
+                PAYLOAD.RAKP_2, bytes((payload[0], 0x0d, 0, 0)) + console_id,
+                addr)
+            return
+        rc = os.urandom(16)
+        session.update(rm=rm, rc=rc, role=role, username=username)
+        auth_code = hmac_sha1(
+            self.password, console_id, payload[4:8], rm, rc, self.guid,
+            bytes((role, length)), username)
+        self.reply(
+            PAYLOAD.RAKP_2, bytes((payload[0], 0, 0, 0)) + console_id + rc +
+            self.guid + auth_code, addr)
+
+    def handleRAKP3(self, payload, addr):
+        managed_id = struct.unpack('<I', payload[4:8])[0]
+        session = self.sessions.get(managed_id)
+        if session is None or 'rc' not in session:
+            return
+        console_id = session['console_id']
+        expected = hmac_sha1(
+            self.password, session['rc'], console_id,
+            bytes((session['role'], len(session['username']))),
+            session['username'])
+        if not hmac.compare_digest(payload[8:28], expected):
+            self.reply(
+                PAYLOAD.RAKP_4, bytes((payload[0], 0x0f, 0, 0)) + console_id,
+                addr)
+            return
+        sik, k1, k2 = derive_session_keys(
+            self.password, session['rm'], session['rc'], session['role'],
+            session['username'])
+        session.update(k1=k1, k2=k2, sequence=0)
+        self.sessions_opened += 1
+        icv = hmac_sha1(sik, session['rm'], payload[4:8], self.guid)[:12]
+        self.reply(
+            PAYLOAD.RAKP_4, bytes((payload[0], 0, 0, 0)) + console_id + icv,
+            addr)
+
+    def handleMessage(self, session, datagram, addr):
+        _, _, _, payload = unpack_rmcp_plus(
+            datagram, session['k1'], session['k2'])
+        request = unpack_ipmi_message(payload)
+        self.commands[request.netfn, request.command] += 1
+        data = self.handleCommand(request)
+        if data is None:
+            data = b'\xc1'  # Invalid command.
+        response = pack_ipmi_message(
+            CONSOLE_ADDRESS, request.netfn + 1, BMC_ADDRESS, request.seq,
+            request.command, data)
+        session['sequence'] += 1
+        console_id = struct.unpack('<I', session['console_id'])[0]
+        self.transport.write(
+            pack_rmcp_plus(
+                PAYLOAD.IPMI, console_id, session['sequence'], response,
+                session['k1'], session['k2']), addr)
+        if (request.netfn, request.command) == (
+                NETFN.APP, COMMAND.CLOSE_SESSION):
+            self.sessions.pop(struct.unpack('<I', request.data[:4])[0], None)
+
+    def handleCommand(self, request):
+        """Return the response data, including the completion code."""
+        command = request.netfn, request.command
+        if command == (NETFN.APP, COMMAND.SET_SESSION_PRIVILEGE_LEVEL):
+            return bytes((0, request.data[0]))
+        elif command == (NETFN.APP, COMMAND.CLOSE_SESSION):
+            return b'\x00'
+        elif command == (NETFN.CHASSIS, COMMAND.GET_CHASSIS_STATUS):
+            return bytes((0, 1 if self.power_state == 'on' else 0, 0, 0))
+        elif command == (NETFN.CHASSIS, COMMAND.CHASSIS_CONTROL):
+            control = request.data[0]
+            if control in (
+                    CHASSIS_CONTROL.POWER_DOWN, CHASSIS_CONTROL.SOFT_SHUTDOWN):
+                self.power_state = 'off'
+            else:
+                self.power_state = 'on'
+            return b'\x00'
+        elif command == (NETFN.CHASSIS, COMMAND.GET_SYSTEM_BOOT_OPTIONS):
+            return bytes((0, 1, BOOT_FLAGS_PARAMETER)) + self.boot_flags
+        elif command == (NETFN.CHASSIS, COMMAND.SET_SYSTEM_BOOT_OPTIONS):
+            if request.data[0] == BOOT_FLAGS_PARAMETER:
+                self.boot_flags = request.data[1:6]
+            return b'\x00'
+        else:
+            return None
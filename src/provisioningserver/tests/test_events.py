@@ -22,6 +22,7 @@ from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
 )
+from provisioningserver import events
 from provisioningserver.events import (
     EVENT_DETAILS,
     EVENT_TYPES,
@@ -49,10 +50,13 @@ from testtools.matchers import (
     IsInstance,
 )
 from twisted.internet.defer import (
+    Deferred,
     fail,
     inlineCallbacks,
     succeed,
 )
+from twisted.protocols.amp import UnhandledCommand
+from twisted.python.failure import Failure
 
 
 class TestEvents(MAASTestCase):
@@ -278,3 +282,87 @@ class TestSendEventMACAddress(MAASTestCase):
             yield event_hub.logByMAC(event_name, mac_address, description)
         # The event has been removed from the cache.
         self.assertThat(event_hub._types_registered, HasLength(0))
+
+
+class TestNodeEventHubBatching(MAASTestCase):
+    """Tests for the batching of events by `NodeEventHub`."""
+
+    def setUp(self):
+        super(TestNodeEventHubBatching, self).setUp()
+        self.calls = []
+        self.sends = []
+        self.patch(events, "getRegionClient").return_value = self.client
+        self.event_hub = NodeEventHub()
+        self.event_hub._types_registered.update(EVENT_DETAILS)
+
+    def client(self, command, **kwargs):
+        self.calls.append((command, kwargs))
+        d = Deferred()
+        self.sends.append(d)
+        return d
+
+    def log(self, count):
+        event_name = random.choice(list(map_enum(EVENT_TYPES)))
+        results = []
+        system_ids = [factory.make_name('system_id') for _ in range(count)]
+        for system_id in system_ids:
+            d = self.event_hub.logByID(event_name, system_id, "")
+            d.addBoth(results.append)
+        return [
+            {"system_id": system_id, "type_name": event_name,
+             "description": ""}
+            for system_id in system_ids
+        ], results
+
+    def test__sends_first_event_straight_away(self):
+        sent, results = self.log(1)
+        self.assertThat(self.calls, Equals([(region.SendEvent, sent[0])]))
+        self.sends.pop().callback({})
+        self.assertThat(results, Equals([{}]))
+
+    def test__sends_events_queued_meanwhile_in_one_batch(self):
+        sent, results = self.log(4)
+        self.sends.pop().callback({})
+        self.assertThat(self.calls, Equals([
+            (region.SendEvent, sent[0]),
+            (region.SendEvents, {"events": sent[1:]}),
+        ]))
+        self.assertThat(results, Equals([{}]))
+        self.sends.pop().callback({})
+        self.assertThat(results, Equals([{}] * 4))
+        self.assertThat(self.event_hub._events_sending, Is(False))
+
+    def test__batches_are_no_larger_than_batch_size(self):
+        self.event_hub.batch_size = 2
+        sent, results = self.log(4)
+        self.sends.pop().callback({})
+        self.sends.pop().callback({})
+        self.assertThat(self.calls, Equals([
+            (region.SendEvent, sent[0]),
+            (region.SendEvents, {"events": sent[1:3]}),
+            (region.SendEvent, sent[3]),
+        ]))
+
+    def test__sends_events_separately_if_region_is_too_old(self):
+        sent, results = self.log(3)
+        self.sends.pop().callback({})
+        self.sends.pop().errback(UnhandledCommand())
+        self.assertThat(self.calls, Equals([
+            (region.SendEvent, sent[0]),
+            (region.SendEvents, {"events": sent[1:]}),
+            (region.SendEvent, sent[1]),
+            (region.SendEvent, sent[2]),
+        ]))
+        for d in list(self.sends):
+            d.callback({})
+        self.assertThat(results, Equals([{}] * 3))
+
+    def test__failure_is_reported_to_every_event_in_batch(self):
+        sent, results = self.log(3)
+        self.sends.pop().callback({})
+        self.sends.pop().errback(ZeroDivisionError())
+        self.assertThat(results, HasLength(3))
+        self.assertThat(results[0], Equals({}))
+        self.assertThat(results[1:], AllMatch(IsInstance(Failure)))
+        for failure in results[1:]:
+            self.assertTrue(failure.check(ZeroDivisionError))
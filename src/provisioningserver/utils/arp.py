@@ -27,7 +27,9 @@ from provisioningserver.path import get_path
 from provisioningserver.utils import sudo
 from provisioningserver.utils.ethernet import (
     Ethernet,
+    ETHERNET_HEADER_LEN,
     ETHERTYPE,
+    VLAN_HEADER_LEN,
 )
 from provisioningserver.utils.network import (
     bytes_to_int,
@@ -101,6 +103,23 @@ class ARP_OPERATION:
 class ARP:
     """Representation of an ARP packet."""
 
+    __slots__ = (
+        'packet',
+        'time',
+        '_src_mac',
+        '_dst_mac',
+        'vid',
+        'hardware_type',
+        'protocol_type',
+        'hardware_length',
+        'protocol_length',
+        'operation',
+        'sender_hardware_bytes',
+        'sender_protocol_bytes',
+        'target_hardware_bytes',
+        'target_protocol_bytes',
+    )
+
     def __init__(
             self, pkt_bytes, time=None, src_mac=None, dst_mac=None, vid=None):
         """
@@ -120,14 +139,9 @@ class ARP:
             struct.unpack(ARP_PACKET, pkt_bytes[0:SIZEOF_ARP_PACKET]))
         self.packet = packet
         self.time = time
-        if src_mac is not None:
-            self.src_mac = EUI(bytes_to_int(src_mac))
-        else:
-            self.src_mac = None
-        if dst_mac is not None:
-            self.dst_mac = EUI(bytes_to_int(dst_mac))
-        else:
-            self.dst_mac = None
+        # These are converted to EUIs only when needed; that is expensive.
+        self._src_mac = src_mac
+        self._dst_mac = dst_mac
         self.vid = vid
         self.hardware_type = packet.hardware_type
         self.protocol_type = packet.protocol
@@ -139,6 +153,22 @@ class ARP:
         self.target_hardware_bytes = packet.target_mac
         self.target_protocol_bytes = packet.target_ip
 
+    @property
+    def src_mac(self):
+        """Returns a netaddr.EUI representing the Ethernet source MAC."""
+        if self._src_mac is None:
+            return None
+        else:
+            return EUI(bytes_to_int(self._src_mac))
+
+    @property
+    def dst_mac(self):
+        """Returns a netaddr.EUI representing the Ethernet destination MAC."""
+        if self._dst_mac is None:
+            return None
+        else:
+            return EUI(bytes_to_int(self._dst_mac))
+
     @property
     def source_eui(self):
         """Returns a netaddr.EUI representing the source MAC address."""
@@ -181,25 +211,25 @@ class ARP:
         if not self.is_valid():
             return
 
+        # Check for null addresses before creating any objects for them.
+        # (The protocol addresses are unpacked as integers.)
+        null_ip, null_mac = 0, b'\0' * 6
         if self.operation == 1:
             # This is an ARP request.
             # We can find a binding in the (source_eui, source_ip)
-            source_ip = self.source_ip
-            source_eui = self.source_eui
-            if int(source_ip) != 0 and int(source_eui) != 0:
-                yield (source_ip, self.source_eui)
+            if (self.sender_protocol_bytes != null_ip and
+                    self.sender_hardware_bytes != null_mac):
+                yield (self.source_ip, self.source_eui)
         elif self.operation == 2:
             # This is an ARP reply.
             # We can find a binding in both the (source_eui, source_ip) and
             # the (target_eui, target_ip).
-            source_ip = self.source_ip
-            source_eui = self.source_eui
-            target_ip = self.target_ip
-            target_eui = self.target_eui
-            if int(source_ip) != 0 and int(source_eui) != 0:
-                yield (source_ip, self.source_eui)
-            if int(target_ip) != 0 and int(target_eui) != 0:
-                yield (target_ip, self.target_eui)
+            if (self.sender_protocol_bytes != null_ip and
+                    self.sender_hardware_bytes != null_mac):
+                yield (self.source_ip, self.source_eui)
+            if (self.target_protocol_bytes != null_ip and
+                    self.target_hardware_bytes != null_mac):
+                yield (self.target_ip, self.target_eui)
 
     def write(self, out=sys.stdout):
         """Output text-based details about this ARP packet to the specified
@@ -233,6 +263,24 @@ class ARP:
         out.write("\n")
 
 
+def is_arp_frame(buffer, start, end):
+    """Returns True if `buffer[start:end]` is an Ethernet frame that is long
+    enough to hold an ARP packet and has the ARP Ethertype, either directly
+    or within an 802.1q VLAN header.
+
+    This looks at the raw bytes so that other frames can be skipped without
+    creating any objects for them.
+    """
+    ethertype = start + ETHERNET_HEADER_LEN - 2
+    if end - ethertype < 2 + SIZEOF_ARP_PACKET:
+        return False
+    if buffer[ethertype] == 0x81 and buffer[ethertype + 1] == 0x00:
+        ethertype += VLAN_HEADER_LEN
+        if end - ethertype < 2 + SIZEOF_ARP_PACKET:
+            return False
+    return buffer[ethertype] == 0x08 and buffer[ethertype + 1] == 0x06
+
+
 def update_bindings_and_get_event(bindings, vid, ip, mac, time):
     """Update the specified bindings dictionary and returns a dictionary if the
     information resulted in an update to the bindings. (otherwise, returns
@@ -314,8 +362,8 @@ def observe_arp_packets(
             # Not an Ethernet interface. Need to exit here, because our
             # assumptions about the link layer header won't be correct.
             return 4
-        for header, packet in pcap:
-            ethernet = Ethernet(packet, time=header.timestamp_seconds)
+        for packet in pcap.packets(match=is_arp_frame):
+            ethernet = Ethernet(packet.data, time=packet.timestamp_seconds)
             if not ethernet.is_valid():
                 # Ignore packets with a truncated Ethernet header.
                 continue
@@ -6,6 +6,7 @@
 __all__ = [
     "BeaconingPacket",
     "BeaconPayload",
+    "BeaconQueue",
     "ReceivedBeacon",
     "InvalidBeaconingPacket",
     "TopologyHint",
@@ -15,7 +16,11 @@ __all__ = [
     "run"
 ]
 
-from collections import namedtuple
+from collections import (
+    namedtuple,
+    OrderedDict,
+)
+from collections.abc import MutableMapping
 from gzip import (
     compress,
     decompress,
@@ -67,6 +72,12 @@ BEACON_TYPE_VALUES = {
     value: name for name, value in BEACON_TYPES.items()
 }
 
+# Beacons are remembered for two minutes (by the time in their UUID), in
+# buckets of ten seconds, and no more than this many at once.
+BEACON_QUEUE_THRESHOLD = 120.0
+BEACON_QUEUE_BUCKET_WIDTH = 10.0
+BEACON_QUEUE_MAX_ENTRIES = 10000
+
 PROTOCOL_VERSION = 1
 BEACON_HEADER_FORMAT_V1 = "!BBH"
 BEACON_HEADER_LENGTH_V1 = 4
@@ -145,6 +156,97 @@ def age_out_uuid_queue(queue, threshold=120.0):
         queue.pop(uuid_to_remove, None)
 
 
+class BeaconQueue(MutableMapping):
+    """Beacons (or data about beacons) keyed by UUID, with bounded size.
+
+    Entries are grouped into buckets by the time encoded in their UUID, so
+    `age_out` only needs to look at each bucket, not at each entry, and
+    entries from a peer with a skewed clock do not hold up the removal of
+    others. Once the queue holds `max_entries` entries, the least-recently
+    added entry is removed to make room for each new one.
+
+    :param on_remove: Called with the key and value of each entry removed
+        from the queue, however it was removed.
+    """
+
+    def __init__(
+            self, threshold=BEACON_QUEUE_THRESHOLD,
+            max_entries=BEACON_QUEUE_MAX_ENTRIES,
+            bucket_width=BEACON_QUEUE_BUCKET_WIDTH, on_remove=None):
+        super().__init__()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bucket_width = bucket_width
+        self.on_remove = on_remove
+        self._entries = OrderedDict()
+        self._buckets = {}
+
+    def _get_bucket(self, key):
+        return int(uuid_to_timestamp(key) // self.bucket_width)
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __setitem__(self, key, value):
+        if key not in self._entries:
+            bucket = self._get_bucket(key)
+            self._buckets.setdefault(bucket, set()).add(key)
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self.popitem(last=False)
+
+    def __delitem__(self, key):
+        value = self._entries.pop(key)
+        bucket = self._get_bucket(key)
+        keys = self._buckets.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._buckets[bucket]
+        if self.on_remove is not None:
+            self.on_remove(key, value)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, list(self.items()))
+
+    def popitem(self, last=True):
+        """Remove and return the most (or least) recently added entry."""
+        if len(self._entries) == 0:
+            raise KeyError("popitem(): queue is empty")
+        if last:
+            key = next(reversed(self._entries))
+        else:
+            key = next(iter(self._entries))
+        value = self._entries[key]
+        del self[key]
+        return key, value
+
+    def age_out(self):
+        """Remove entries older (or newer) than the threshold.
+
+        Entries are removed a bucket at a time, so an entry can outlive the
+        threshold by up to the width of a bucket.
+        """
+        current_time = time.time()
+        for bucket in list(self._buckets):
+            start = bucket * self.bucket_width
+            end = start + self.bucket_width
+            # Don't leave beacons from the future in the queue if the clock
+            # suddenly changes.
+            if (end <= current_time - self.threshold or
+                    start > current_time + self.threshold):
+                for key in self._buckets.pop(bucket):
+                    value = self._entries.pop(key)
+                    if self.on_remove is not None:
+                        self.on_remove(key, value)
+
+
 def beacon_to_json(beacon_payload):
     """Converts the specified beacon into a format suitable for JSON."""
     return {
@@ -43,6 +43,17 @@ class ETHERTYPE:
 class Ethernet:
     """Representation of an Ethernet packet."""
 
+    __slots__ = (
+        'valid',
+        'packet',
+        'payload',
+        'src_mac',
+        'dst_mac',
+        'vid',
+        'ethertype',
+        'time',
+    )
+
     def __init__(self, pkt_bytes, time=None):
         """Decodes the specified Ethernet packet.
 
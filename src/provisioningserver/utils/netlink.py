@@ -0,0 +1,216 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Utilities for watching network configuration changes with rtnetlink.
+
+The kernel multicasts a message on a `NETLINK_ROUTE` socket whenever a link,
+address, or route changes. Listening for these is far cheaper than scanning
+the whole network configuration periodically to find out if anything
+changed.
+"""
+
+__all__ = [
+    "NetlinkMonitor",
+    "parse_netlink_messages",
+]
+
+from collections import namedtuple
+import errno
+import socket
+import struct
+
+from provisioningserver.logger import LegacyLogger
+from twisted.internet.interfaces import IReadDescriptor
+from zope.interface import implementer
+
+
+log = LegacyLogger()
+
+# struct nlmsghdr: length, type, flags, sequence number, port ID.
+NLMSG_HEADER = '=LHHLL'
+NLMSG_HEADER_LEN = struct.calcsize(NLMSG_HEADER)
+
+# struct ifinfomsg: family, type, index, flags, change.
+IFINFOMSG = '=BxHiII'
+IFINFOMSG_LEN = struct.calcsize(IFINFOMSG)
+
+# struct ifaddrmsg: family, prefix length, flags, scope, index.
+IFADDRMSG = '=BBBBI'
+IFADDRMSG_LEN = struct.calcsize(IFADDRMSG)
+
+# struct rtattr: length, type.
+RTATTR_HEADER = '=HH'
+RTATTR_HEADER_LEN = struct.calcsize(RTATTR_HEADER)
+
+IFLA_IFNAME = 3
+
+
+class RTM:
+    """rtnetlink message types that MAAS needs to understand."""
+    NEWLINK = 16
+    DELLINK = 17
+    NEWADDR = 20
+    DELADDR = 21
+    NEWROUTE = 24
+    DELROUTE = 25
+
+
+class RTMGRP:
+    """rtnetlink multicast groups."""
+    LINK = 0x1
+    IPV4_IFADDR = 0x10
+    IPV4_ROUTE = 0x40
+    IPV6_IFADDR = 0x100
+    IPV6_ROUTE = 0x400
+
+
+# Message types for links, addresses, and routes.
+RTM_INTERFACE_CHANGES = frozenset(
+    value for name, value in vars(RTM).items() if not name.startswith('_'))
+
+# Groups for link, address, and route changes.
+RTMGRP_INTERFACE_CHANGES = (
+    RTMGRP.LINK | RTMGRP.IPV4_IFADDR | RTMGRP.IPV4_ROUTE |
+    RTMGRP.IPV6_IFADDR | RTMGRP.IPV6_ROUTE)
+
+
+NetlinkMessage = namedtuple("NetlinkMessage", (
+    "type",
+    "index",
+    "ifname",
+))
+
+
+def _align(length):
+    """Round `length` up to a 4-byte boundary, as netlink does."""
+    return (length + 3) & ~3
+
+
+def _get_ifname(attributes):
+    """Return the IFLA_IFNAME attribute in `attributes`, or None."""
+    offset = 0
+    while offset + RTATTR_HEADER_LEN <= len(attributes):
+        length, type = struct.unpack_from(RTATTR_HEADER, attributes, offset)
+        if length < RTATTR_HEADER_LEN:
+            break
+        if type == IFLA_IFNAME:
+            value = attributes[offset + RTATTR_HEADER_LEN:offset + length]
+            return value.rstrip(b'\0').decode("utf-8", "replace")
+        offset += _align(length)
+    return None
+
+
+def parse_netlink_messages(data):
+    """Parse the rtnetlink messages in `data`, read from a netlink socket.
+
+    Messages other than link, address, and route changes are ignored, as are
+    truncated messages.
+
+    :return: A list of `NetlinkMessage`. `index` is the interface index, if
+        the message is about a link or address; `ifname` is the interface
+        name, if the message is about a link.
+    """
+    messages = []
+    offset = 0
+    while offset + NLMSG_HEADER_LEN <= len(data):
+        length, type, _, _, _ = struct.unpack_from(NLMSG_HEADER, data, offset)
+        if length < NLMSG_HEADER_LEN or offset + length > len(data):
+            break
+        payload = data[offset + NLMSG_HEADER_LEN:offset + length]
+        if type in (RTM.NEWLINK, RTM.DELLINK):
+            if len(payload) >= IFINFOMSG_LEN:
+                _, _, index, _, _ = struct.unpack_from(IFINFOMSG, payload)
+                messages.append(NetlinkMessage(
+                    type, index, _get_ifname(payload[IFINFOMSG_LEN:])))
+        elif type in (RTM.NEWADDR, RTM.DELADDR):
+            if len(payload) >= IFADDRMSG_LEN:
+                _, _, _, _, index = struct.unpack_from(IFADDRMSG, payload)
+                messages.append(NetlinkMessage(type, index, None))
+        elif type in RTM_INTERFACE_CHANGES:
+            messages.append(NetlinkMessage(type, None, None))
+        offset += _align(length)
+    return messages
+
+
+@implementer(IReadDescriptor)
+class NetlinkMonitor:
+    """Call `callback` when the kernel reports a network configuration change.
+
+    `callback` is called with a list of `NetlinkMessage`. If the kernel had
+    to drop messages because they were not read quickly enough, it is called
+    with an empty list: something changed, but it is not known what.
+    """
+
+    def __init__(
+            self, callback, groups=RTMGRP_INTERFACE_CHANGES, reactor=None):
+        super().__init__()
+        self.callback = callback
+        self.groups = groups
+        self.reactor = reactor
+        if self.reactor is None:
+            from twisted.internet import reactor
+            self.reactor = reactor
+        self._socket = None
+
+    def startMonitoring(self):
+        """Open the netlink socket and start reading from it.
+
+        :raise OSError: If the netlink socket cannot be opened, e.g. because
+            this is not Linux.
+        """
+        if self._socket is None:
+            sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK,
+                socket.NETLINK_ROUTE)
+            try:
+                sock.bind((0, self.groups))
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+            self.reactor.addReader(self)
+
+    def stopMonitoring(self):
+        """Stop reading from and close the netlink socket."""
+        if self._socket is not None:
+            self.reactor.removeReader(self)
+            self._socket.close()
+            self._socket = None
+
+    @property
+    def monitoring(self):
+        return self._socket is not None
+
+    def fileno(self):
+        if self._socket is None:
+            return -1
+        else:
+            return self._socket.fileno()
+
+    def doRead(self):
+        messages, overrun = [], False
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                if error.errno == errno.ENOBUFS:
+                    overrun = True
+                else:
+                    log.err(None, "Failed to read from netlink socket.")
+                    break
+            else:
+                if len(data) == 0:
+                    break
+                messages.extend(parse_netlink_messages(data))
+        if overrun:
+            self.callback([])
+        elif len(messages) > 0:
+            self.callback(messages)
+
+    def connectionLost(self, reason):
+        self.stopMonitoring()
+
+    def logPrefix(self):
+        return "netlink"
@@ -21,6 +21,8 @@ __all__ = [
 
 import codecs
 from collections import namedtuple
+from hashlib import sha256
+import json
 from operator import attrgetter
 import random
 import re
@@ -893,7 +895,7 @@ def bytes_to_hex(byte_string):
 def bytes_to_int(byte_string):
     """Utility function to convert the specified string of bytes into
     an `int`."""
-    return int(bytes_to_hex(byte_string), 16)
+    return int.from_bytes(byte_string, "big")
 
 
 def hex_str_to_bytes(data):
@@ -1211,6 +1213,30 @@ def get_all_interfaces_definition(annotate_with_monitored: bool=True) -> dict:
     return interfaces
 
 
+def get_interface_hash(interface: dict) -> str:
+    """Return a hash of the definition of `interface`.
+
+    The definition is one of the values returned by
+    `get_all_interfaces_definition`. Its "hash" key, if any, is ignored.
+    """
+    definition = {
+        key: value for key, value in interface.items() if key != "hash"}
+    encoded = json.dumps(definition, sort_keys=True).encode("utf-8")
+    return sha256(encoded).hexdigest()
+
+
+def annotate_with_interface_hashes(interfaces: dict) -> dict:
+    """Return a copy of `interfaces` with the hash of each definition added.
+
+    The region skips interfaces whose "hash" is the same as when they were
+    last recorded, so it only has to update the interfaces that changed.
+    """
+    return {
+        name: dict(interface, hash=get_interface_hash(interface))
+        for name, interface in interfaces.items()
+    }
+
+
 def get_all_interface_subnets():
     """Returns all subnets that this machine has access to.
 
@@ -7,6 +7,7 @@ __all__ = [
     "PCAP",
     "PCAPError",
     "PCAPHeader",
+    "PCAPPacket",
     "PCAPPacketHeader"
 ]
 
@@ -21,6 +22,10 @@ PCAP_NATIVE_BYTE_ORDER_MAGIC_NUMBER = 0xa1b2c3d4
 PCAP_HEADER_SIZE = 24
 PCAP_PACKET_HEADER_SIZE = 16
 
+# The most capture output to read at once when iterating. Reads return what
+# is available (up to this amount) so this does not hold up live captures.
+PCAP_READ_SIZE = 65536
+
 PCAPHeader = namedtuple('PCAPHeader', (
     'magic_number',
     'pcap_version_major',
@@ -44,6 +49,32 @@ class PCAPError(IOError):
     pass
 
 
+class PCAPPacket:
+    """A packet read from a PCAP stream, along with its PCAP packet header."""
+
+    __slots__ = (
+        'timestamp_seconds',
+        'timestamp_microseconds',
+        'original_packet_length',
+        'data',
+    )
+
+    def __init__(
+            self, timestamp_seconds, timestamp_microseconds,
+            original_packet_length, data):
+        self.timestamp_seconds = timestamp_seconds
+        self.timestamp_microseconds = timestamp_microseconds
+        self.original_packet_length = original_packet_length
+        self.data = data
+
+    @property
+    def header(self):
+        """Returns the PCAP packet header as a `PCAPPacketHeader`."""
+        return PCAPPacketHeader(
+            self.timestamp_seconds, self.timestamp_microseconds,
+            len(self.data), self.original_packet_length)
+
+
 class PCAP:
     """Class to encapsulate reading from a stream of PCAP capture output.
 
@@ -113,15 +144,55 @@ class PCAP:
             raise PCAPError("Unexpected end of PCAP stream: invalid packet.")
         return pcap_packet_header, packet
 
-    def __iter__(self):
-        """Iterate this PCAP stream.
+    def packets(self, match=None, size=PCAP_READ_SIZE):
+        """Yields each packet from the PCAP stream as a `PCAPPacket`.
+
+        Rather than reading each packet header and packet separately, this
+        reads whatever is available from the stream, up to `size` bytes at a
+        time, and parses every whole packet in it. Do not mix this with calls
+        to `read`.
 
-         Stops when EOF is encountered."""
+        :param match: If given, a callable taking a buffer and the start and
+            end offsets of a packet in it. Packets for which it returns False
+            are skipped before anything is copied out of the buffer.
+        :raise PCAPError: If the PCAP stream ends part way through a packet.
+        """
+        read = getattr(self.stream, "read1", self.stream.read)
+        buffer = bytearray()
         while True:
-            try:
-                yield self.read()
-            except EOFError:
+            data = read(size)
+            if len(data) == 0:
                 break
+            buffer += data
+            offset = 0
+            with memoryview(buffer) as view:
+                while offset + PCAP_PACKET_HEADER_SIZE <= len(view):
+                    seconds, microseconds, captured, original = (
+                        struct.unpack_from('IIII', view, offset))
+                    start = offset + PCAP_PACKET_HEADER_SIZE
+                    end = start + captured
+                    if end > len(view):
+                        break
+                    offset = end
+                    if match is None or match(view, start, end):
+                        yield PCAPPacket(
+                            seconds, microseconds, original,
+                            view[start:end].tobytes())
+            del buffer[:offset]
+        if len(buffer) >= PCAP_PACKET_HEADER_SIZE:
+            raise PCAPError("Unexpected end of PCAP stream: invalid packet.")
+        elif len(buffer) != 0:
+            raise PCAPError(
+                "Unexpected end of PCAP stream: invalid packet header.")
+
+    def __iter__(self):
+        """Iterate this PCAP stream.
+
+        Yields the same (pcap_packet_header, packet) tuples as `read`, and
+        stops when EOF is encountered.
+        """
+        for packet in self.packets():
+            yield packet.header, packet.data
 
 
 def main():
@@ -8,21 +8,39 @@ __all__ = [
     "run"
 ]
 
-from collections import namedtuple
+from collections import (
+    namedtuple,
+    OrderedDict,
+)
+import errno
 import json
 from multiprocessing import cpu_count
 from multiprocessing.pool import ThreadPool
 import os
+import select
+import socket
+import struct
 import subprocess
 import sys
 from textwrap import dedent
 import time
 
 from netaddr import (
+    IPAddress,
     IPNetwork,
     IPSet,
 )
 from netaddr.core import AddrFormatError
+from provisioningserver.utils.arp import (
+    ARP,
+    ARP_OPERATION,
+    ARP_PACKET,
+    SIZEOF_ARP_PACKET,
+)
+from provisioningserver.utils.ethernet import (
+    Ethernet,
+    ETHERTYPE,
+)
 from provisioningserver.utils.network import get_all_interfaces_definition
 from provisioningserver.utils.script import ActionScriptError
 from provisioningserver.utils.shell import (
@@ -37,6 +55,25 @@ PingParameters = namedtuple('PingParameters', ('interface', 'ip'))
 NmapParameters = namedtuple('NmapParameters', ('interface', 'cidr', 'slow'))
 
 
+# Packets per second to send when sweeping a network with ARP requests. The
+# slow rate is the same as nmap's when --slow is given.
+ARP_SCAN_RATE = 1000
+ARP_SCAN_SLOW_RATE = 9
+
+# The most ARP requests to send at once when the sweep falls behind.
+ARP_SCAN_BATCH = 64
+
+# Number of requests to send to each address that does not reply.
+ARP_SCAN_ATTEMPTS = 2
+
+# Seconds to wait for replies after sending the last request of each attempt.
+ARP_SCAN_WINDOW = 1.0
+
+ETH_P_ARP = 0x0806
+
+BROADCAST_MAC = b'\xff' * 6
+
+
 def add_arguments(parser):
     """Add this command's options to the `ArgumentParser`.
 
@@ -53,23 +90,28 @@ def add_arguments(parser):
         If no arguments are provided, checks all IPv4 addresses on all
         configured CIDRs on each interface.
 
-        If nmap is not installed, this command could take a very long time if
-        there are a large amount of hosts connected directly to any attached
-        networks.
+        When run as root, hosts are found by broadcasting ARP requests from
+        this process, at a limited rate. Otherwise nmap is used, if it is
+        installed. If nmap is not installed either, this command could take a
+        very long time if there are a large amount of hosts connected
+        directly to any attached networks.
 
         This command only considers IPv4 CIDRs. (IPv6 CIDRs are excluded.)
         """)
     parser.add_argument(
         '-s', '--slow', action='store_true', required=False,
-        help='Scan slower. Only applies to nmap scans; ping is slow already.')
+        help='Scan slower. Only applies to ARP and nmap scans; ping is slow '
+             'already.')
     parser.add_argument(
         '-t', '--threads', required=False, type=int,
         help='Number of concurrent threads to spawn during a scan. '
              'Default is to spawn four times the number of CPUs when using '
-             'ping, or one times the number of CPUs when using nmap.')
+             'ping, or one times the number of CPUs when using nmap. Not '
+             'used by ARP scans.')
     parser.add_argument(
         '-p', '--ping', action='store_true', required=False,
-        help='Scan using ping. (Default is to scan with nmap, if installed.)')
+        help='Scan using ping. (Default is to scan with ARP requests if '
+             'running as root, or else with nmap, if installed.)')
     parser.add_argument(
         'interface', type=str, nargs='?',
         help="Ethernet interface to ping from. Optional if all interfaces are "
@@ -331,6 +373,210 @@ def ping_scan(to_scan: dict, threads=None, threads_per_cpu=4):
             yield from pool.imap(run_ping, jobs)
 
 
+def has_raw_socket_access():
+    """Return True if this process can send and receive raw Ethernet frames.
+
+    This is needed for `arp_scan`; usually it means running as root.
+    """
+    try:
+        sock = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+    except OSError:
+        return False
+    else:
+        sock.close()
+        return True
+
+
+class ARPScanner:
+    """Sweep networks attached to an interface with ARP requests.
+
+    Requests are broadcast from a raw socket at no more than `rate` packets
+    per second, and replies are collected in between. Addresses that do not
+    reply are tried again, up to `attempts` times in all, and after each
+    attempt replies are awaited for `window` seconds.
+    """
+
+    def __init__(
+            self, ifname, rate=ARP_SCAN_RATE, attempts=ARP_SCAN_ATTEMPTS,
+            window=ARP_SCAN_WINDOW, clock=time.monotonic):
+        super().__init__()
+        self.ifname = ifname
+        self.rate = rate
+        self.attempts = attempts
+        self.window = window
+        self.clock = clock
+        self._socket = None
+        self._mac = None
+
+    def open(self):
+        """Open a raw socket on the interface.
+
+        :raise OSError: If the socket cannot be opened, e.g. if this process
+            is not running as root, or the interface does not exist.
+        """
+        sock = socket.socket(
+            socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        try:
+            sock.bind((self.ifname, ETH_P_ARP))
+            sock.setblocking(False)
+            # The hardware address is the last element of the address.
+            self._mac = sock.getsockname()[4]
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def makeRequest(self, source_ip, target_ip):
+        """Return an Ethernet frame with an ARP request for `target_ip`.
+
+        :param source_ip: The sender's IPv4 address, as an integer. Zero
+            makes the request an ARP probe (RFC 5227).
+        :param target_ip: The IPv4 address to look up, as an integer.
+        """
+        arp = struct.pack(
+            ARP_PACKET, 1, 0x0800, 6, 4, ARP_OPERATION.REQUEST, self._mac,
+            source_ip, b'\0' * 6, target_ip)
+        frame = BROADCAST_MAC + self._mac + ETHERTYPE.ARP + arp
+        # Pad to the minimum Ethernet frame size, less the FCS.
+        return frame.ljust(60, b'\0')
+
+    def scan(self, targets):
+        """Send ARP requests for each of `targets`.
+
+        :param targets: A mapping from each IPv4 address to look up to the
+            sender address to use in its request, both as integers.
+        :return: The set of addresses in `targets` that replied.
+        """
+        replied = set()
+        for _ in range(self.attempts):
+            remaining = [ip for ip in targets if ip not in replied]
+            if len(remaining) == 0:
+                break
+            self._sendRequests(targets, remaining, replied)
+            # Collect replies until the window closes.
+            deadline = self.clock() + self.window
+            while self.clock() < deadline:
+                timeout = deadline - self.clock()
+                if not self._receiveReplies(targets, replied, timeout):
+                    break
+        return replied
+
+    def _sendRequests(self, targets, remaining, replied):
+        start = self.clock()
+        sent = 0
+        while sent < len(remaining):
+            # Send the requests that are due by now, but not too many at once.
+            now = self.clock()
+            limit = min(len(remaining), sent + ARP_SCAN_BATCH)
+            resume = now
+            while sent < limit and start + sent / self.rate <= now:
+                ip = remaining[sent]
+                try:
+                    self._socket.send(self.makeRequest(targets[ip], ip))
+                except OSError as error:
+                    if error.errno in (errno.EAGAIN, errno.ENOBUFS):
+                        # The transmit queue is full; back off a little.
+                        resume = now + 0.01
+                        break
+                    else:
+                        raise
+                else:
+                    sent += 1
+            # Collect replies until the next request is due. Other traffic
+            # can wake us at any time, so wait on the clock, not on the
+            # first frame to arrive.
+            due = max(start + sent / self.rate, resume)
+            while self.clock() < due:
+                self._receiveReplies(targets, replied, due - self.clock())
+
+    def _receiveReplies(self, targets, replied, timeout):
+        """Wait up to `timeout` seconds for replies and record them.
+
+        :return: False if nothing arrived before the timeout, else True.
+        """
+        readable, _, _ = select.select([self._socket], [], [], max(timeout, 0))
+        if len(readable) == 0:
+            return False
+        while True:
+            try:
+                frame = self._socket.recv(2048)
+            except BlockingIOError:
+                break
+            ethernet = Ethernet(frame)
+            if not ethernet.is_valid() or ethernet.ethertype != ETHERTYPE.ARP:
+                continue
+            if len(ethernet.payload) < SIZEOF_ARP_PACKET:
+                continue
+            arp = ARP(ethernet.payload)
+            if arp.operation == ARP_OPERATION.REPLY:
+                ip = arp.packet.sender_ip
+                if ip in targets:
+                    replied.add(ip)
+        return True
+
+
+def get_source_address(cidr: IPNetwork, ifname: str, interfaces: dict):
+    """Return the address on `ifname` to send ARP requests into `cidr` from.
+
+    :return: An IPv4 address as an integer, or zero (for ARP probes) if
+        `ifname` has no address in `cidr`.
+    """
+    for address in yield_ipv4_networks_on_link(ifname, interfaces):
+        network = IPNetwork(address)
+        if cidr in network.cidr or network.cidr in cidr:
+            return int(network.ip)
+    return 0
+
+
+def arp_scan(to_scan: dict, interfaces: dict, slow=False):
+    """Scans the specified networks by sending ARP requests from this process.
+
+    The `to_scan` dictionary must be in the format:
+
+        {<interface_name>: <iterable-of-cidr-strings>, ...}
+
+    and `interfaces` is the output of `get_all_interfaces_definition()`. Each
+    interface is swept in turn. This needs raw socket access; see
+    `has_raw_socket_access`.
+
+    :return: An iterable of events, one for each address scanned, like those
+        from `ping_scan`.
+    """
+    rate = ARP_SCAN_SLOW_RATE if slow else ARP_SCAN_RATE
+    for ifname, cidrs in to_scan.items():
+        targets = OrderedDict()
+        for cidr in cidrs:
+            ipnetwork = IPNetwork(cidr)
+            if ipnetwork.version == 4:
+                source = get_source_address(ipnetwork, ifname, interfaces)
+                for ip in ipnetwork.iter_hosts():
+                    targets.setdefault(int(ip), source)
+        if len(targets) == 0:
+            continue
+        with ARPScanner(ifname, rate=rate) as scanner:
+            replied = scanner.scan(targets)
+        for ip in targets:
+            yield {
+                "scan_type": "arp",
+                "interface": ifname,
+                "ip": str(IPAddress(ip)),
+                "result": ip in replied,
+            }
+
+
 def write_event(event, output=sys.stdout):
     """Writes an event dictionary to the specified stream in JSON format.
 
@@ -396,11 +642,30 @@ def scan_networks(args, to_scan, stderr, stdout):
     """
     # Start the clock. (We want to measure how long the scan takes.)
     clock = time.monotonic()
-    # The user must explicitly opt out of using `nmap` by selecting --ping,
-    # unless `nmap` is not installed.
-    use_nmap = has_command_available('nmap')
+    # The user must explicitly opt out of scanning with ARP requests or
+    # `nmap` by selecting --ping. ARP requests can only be sent as root, and
+    # `nmap` may not be installed.
     use_ping = args.ping
-    if use_nmap and not use_ping:
+    use_arp = not use_ping and has_raw_socket_access()
+    use_nmap = not use_arp and has_command_available('nmap')
+    if use_arp:
+        tool = 'arp'
+        interfaces = get_all_interfaces_definition(
+            annotate_with_monitored=False)
+        count = 0
+        hosts = 0
+        for event in arp_scan(to_scan, interfaces, slow=args.slow):
+            count += 1
+            if event['result'] is True:
+                hosts += 1
+            write_event(event, stdout)
+        clock_diff = time.monotonic() - clock
+        if count > 0:
+            stderr.write(
+                "Sent ARP requests to %d hosts (%d up) in %d second(s).\n" % (
+                    count, hosts, clock_diff))
+            stderr.flush()
+    elif use_nmap and not use_ping:
         tool = 'nmap'
         scanner = nmap_scan(to_scan, slow=args.slow, threads=args.threads)
         count = 0
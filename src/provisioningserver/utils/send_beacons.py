@@ -114,7 +114,9 @@ def run(args, stdout=sys.stdout):
         print("Interface dictionary:\n%s" % pformat(interfaces), file=stdout)
     protocol = do_beaconing(args, interfaces=interfaces)
     if args.verbose:
-        print("Transmit queue:\n%s" % pformat(protocol.tx_queue), file=stdout)
-        print("Receive queue:\n%s" % pformat(protocol.rx_queue), file=stdout)
+        print("Transmit queue:\n%s" % pformat(
+            dict(protocol.tx_queue)), file=stdout)
+        print("Receive queue:\n%s" % pformat(
+            dict(protocol.rx_queue)), file=stdout)
         print("Topology hints:\n%s" % pformat(
-            protocol.topology_hints), file=stdout)
+            dict(protocol.topology_hints)), file=stdout)
@@ -11,7 +11,10 @@ from abc import (
     ABCMeta,
     abstractmethod,
 )
-from collections import OrderedDict
+from collections import (
+    Counter,
+    OrderedDict,
+)
 from datetime import timedelta
 import json
 from json.decoder import JSONDecodeError
@@ -29,11 +32,11 @@ from provisioningserver.logger import (
     LegacyLogger,
 )
 from provisioningserver.utils.beaconing import (
-    age_out_uuid_queue,
     BEACON_IPV4_MULTICAST,
     BEACON_IPV6_MULTICAST,
     BEACON_PORT,
     beacon_to_json,
+    BeaconQueue,
     create_beacon_payload,
     read_beacon_payload,
     ReceivedBeacon,
@@ -43,6 +46,7 @@ from provisioningserver.utils.fs import (
     get_maas_common_command,
     NamedLock,
 )
+from provisioningserver.utils.netlink import NetlinkMonitor
 from provisioningserver.utils.network import (
     enumerate_ipv4_addresses,
     get_all_interfaces_definition,
@@ -60,6 +64,7 @@ from twisted.internet.defer import (
     Deferred,
     inlineCallbacks,
     maybeDeferred,
+    succeed,
 )
 from twisted.internet.error import (
     ProcessDone,
@@ -79,46 +84,122 @@ maaslog = get_maas_logger("networks.monitor")
 log = LegacyLogger()
 
 
+class LineBuffer:
+    """Split a stream of bytes into lines, in linear time.
+
+    Bytes are held only until the end of the line they belong to is seen,
+    and each byte is examined a constant number of times, however the stream
+    is chunked. Lines longer than `max_line_length` bytes are discarded, so
+    that a misbehaving process cannot exhaust memory.
+    """
+
+    def __init__(self, max_line_length):
+        super().__init__()
+        self.max_line_length = max_line_length
+        self.discarded = 0
+        self._buffer = bytearray()
+        self._discarding = False
+
+    def feed(self, data):
+        """Add `data` to the buffer.
+
+        :return: A list of the lines completed by `data`, without their
+            terminating newlines.
+        """
+        end = data.rfind(b'\n')
+        if end == -1:
+            if not self._discarding:
+                self._buffer += data
+                if len(self._buffer) > self.max_line_length:
+                    self._discardPartialLine()
+            return []
+        if self._discarding:
+            # Skip the rest of the line that was too long.
+            start = data.index(b'\n') + 1
+            self._discarding = False
+            complete = data[start:end] if start <= end else None
+        else:
+            self._buffer += data[:end]
+            complete = bytes(self._buffer)
+        self._buffer[:] = data[end + 1:]
+        if len(self._buffer) > self.max_line_length:
+            self._discardPartialLine()
+        if complete is None:
+            return []
+        lines = complete.split(b'\n')
+        if len(complete) > self.max_line_length:
+            within_limit = [
+                line for line in lines
+                if len(line) <= self.max_line_length]
+            self.discarded += len(lines) - len(within_limit)
+            return within_limit
+        else:
+            return lines
+
+    def _discardPartialLine(self):
+        self._buffer.clear()
+        self._discarding = True
+        self.discarded += 1
+
+    @property
+    def remaining(self):
+        """The bytes of the incomplete last line, if any."""
+        return bytes(self._buffer)
+
+
 class JSONPerLineProtocol(ProcessProtocol):
     """ProcessProtocol which parses a single JSON object per line of text.
 
     This expects that a UTF-8 locale is used, i.e. that text written to stdout
     and stderr by the spawned process uses the UTF-8 character set.
+
+    All the objects parsed from one chunk of output are passed to the
+    callback together, so a busy process costs one callback per read rather
+    than one per line.
     """
 
+    # The longest line that will be buffered. The observe-* commands write
+    # lines of a few hundred bytes at most.
+    max_line_length = 64 * 1024
+
     def __init__(self, callback):
         super().__init__()
         self._callback = callback
+        self._objects = None
         self.done = Deferred()
 
     def connectionMade(self):
         super().connectionMade()
-        self._outbuf = b''
-        self._errbuf = b''
+        self._outbuf = LineBuffer(self.max_line_length)
+        self._errbuf = LineBuffer(self.max_line_length)
 
     def outReceived(self, data):
-        lines, self._outbuf = self.splitLines(self._outbuf + data)
-        for line in lines:
-            self.outLineReceived(line)
+        lines = self._feed(self._outbuf, data, "stdout")
+        if len(lines) == 0:
+            return
+        self._objects = []
+        try:
+            for line in lines:
+                self.outLineReceived(line)
+            objects = self._objects
+        finally:
+            self._objects = None
+        if len(objects) != 0:
+            self.objectsReceived(objects)
 
     def errReceived(self, data):
-        lines, self._errbuf = self.splitLines(self._errbuf + data)
-        for line in lines:
+        for line in self._feed(self._errbuf, data, "stderr"):
             self.errLineReceived(line)
 
-    @staticmethod
-    def splitLines(data):
-        lines = data.splitlines(True)
-        if len(lines) == 0:
-            # Nothing to do.
-            remaining = b''
-        elif lines[-1].endswith(b'\n'):
-            # All lines are complete.
-            remaining = b''
-        else:
-            # The last line is incomplete.
-            remaining = lines.pop()
-        return lines, remaining
+    def _feed(self, buffer, data, name):
+        discarded = buffer.discarded
+        lines = buffer.feed(data)
+        if buffer.discarded != discarded:
+            log.msg(
+                "Discarded %d line(s) longer than %d bytes from %s." % (
+                    buffer.discarded - discarded, buffer.max_line_length,
+                    name))
+        return lines
 
     def outLineReceived(self, line):
         line = line.decode("utf-8")
@@ -130,15 +211,22 @@ class JSONPerLineProtocol(ProcessProtocol):
             self.objectReceived(obj)
 
     def objectReceived(self, obj):
-        self._callback([obj])
+        if self._objects is None:
+            self.objectsReceived([obj])
+        else:
+            self._objects.append(obj)
+
+    def objectsReceived(self, objs):
+        self._callback(objs)
 
     def errLineReceived(self, line):
         line = line.decode("utf-8")
         log.msg(line.rstrip())
 
     def processEnded(self, reason):
-        if len(self._errbuf) != 0:
-            self.errLineReceived(self._errbuf)
+        remaining = self._errbuf.remaining
+        if len(remaining) != 0:
+            self.errLineReceived(remaining)
         # If the process finished normally, fire _done with
         # None. Otherwise, pass the reason through.
         if reason.check(ProcessDone):
@@ -477,12 +565,16 @@ class BeaconingSocketProtocol(DatagramProtocol):
         self.process_incoming = process_incoming
         self.debug = debug
         # These queues keep track of beacons that have recently been sent
-        # or received by the protocol. Ordering is needed here so that we can
-        # later age out the least-recently-added packets without traversing the
-        # entire dictionary.
-        self.tx_queue = OrderedDict()
-        self.rx_queue = OrderedDict()
-        self.topology_hints = OrderedDict()
+        # or received by the protocol, and the topology hints inferred from
+        # each received beacon. They age out old beacons and are bounded in
+        # size, so a busy network cannot exhaust memory.
+        self.tx_queue = BeaconQueue()
+        self.rx_queue = BeaconQueue()
+        self.topology_hints = BeaconQueue(on_remove=self._forget_hints)
+        # The number of beacons in `topology_hints` supporting each hint.
+        # Hints are counted as they are inferred and uncounted as beacons age
+        # out, so the set of all hints need not be recomputed every time.
+        self._hint_counts = Counter()
         self.listen_port = None
         self.mcast_requested = False
         self.mcast_solicitation = False
@@ -533,10 +625,14 @@ class BeaconingSocketProtocol(DatagramProtocol):
         # When beaconing runs, hints attached to individual packets might
         # come to the same conclusion about the implied fabric connectivity.
         # Use a set to prevent the region from processing duplicate hints.
-        all_hints = set()
-        for hints in self.topology_hints.values():
-            all_hints |= hints
-        return all_hints
+        return set(self._hint_counts)
+
+    def _forget_hints(self, uuid, hints):
+        """Uncount `hints` when the beacon they were inferred from ages out."""
+        for hint in hints:
+            self._hint_counts[hint] -= 1
+            if self._hint_counts[hint] <= 0:
+                del self._hint_counts[hint]
 
     def getJSONTopologyHints(self):
         """Returns all topology hints as a list of dictionaries.
@@ -578,7 +674,7 @@ class BeaconingSocketProtocol(DatagramProtocol):
             # actually send.
             uuid = beacon.payload['uuid']
             self.tx_queue[uuid] = beacon
-            age_out_uuid_queue(self.tx_queue)
+            self.tx_queue.age_out()
             return True
         except OSError as e:
             if self.debug:
@@ -724,8 +820,9 @@ class BeaconingSocketProtocol(DatagramProtocol):
 
         :param rx: The `ReceivedBeacon` namedtuple.
         """
-        age_out_uuid_queue(self.topology_hints)
-        hints = self.topology_hints.get(rx.uuid, set())
+        self.topology_hints.age_out()
+        known_hints = self.topology_hints.get(rx.uuid, set())
+        hints = set(known_hints)
         # From what we know so far, we can infer some facts about the network,
         # assuming we received a multicast beacon. (Unicast beacons cannot
         # be used to infer fabric connectivity, since they could have been
@@ -744,8 +841,10 @@ class BeaconingSocketProtocol(DatagramProtocol):
         remote_ifinfo = rx.json.get('payload', {}).get('remote', None)
         if remote_ifinfo is not None and not own_beacon:
             self._add_remote_fabric_hints(hints, remote_ifinfo, rx)
-        if len(hints) > 0:
+        new_hints = hints - known_hints
+        if len(new_hints) > 0:
             self.topology_hints[rx.uuid] = hints
+            self._hint_counts.update(new_hints)
             if self.debug:
                 all_hints = self.getAllTopologyHints()
                 log.msg("Topology hint summary:\n%s" % pformat(all_hints))
@@ -770,23 +869,24 @@ class BeaconingSocketProtocol(DatagramProtocol):
         """Adds hints regarding duplicate beacons received.
 
         If a duplicate beacon is received, we can infer that each interface
-        that received the beacon is on the same fabric.
+        that received the beacon is on the same fabric. Hints relating the
+        interfaces that received the beacon earlier were added back then, so
+        only those relating the receiving interface to the others are added.
         """
         if rx.ifname is not None:
             received_beacons = self.rx_queue.get(rx.uuid, [])
-            duplicate_interfaces = set()
             for beacon in received_beacons:
-                if beacon.ifname is not None:
-                    duplicate_interfaces.add((beacon.ifname, beacon.vid))
-                if len(duplicate_interfaces) > 1:
-                    # The same beacon was received on more than one interface.
-                    for ifname1, vid1 in duplicate_interfaces:
-                        for ifname2, vid2 in duplicate_interfaces:
-                            if ifname1 == ifname2 and vid1 == vid2:
-                                continue
-                            hints.add(TopologyHint(
-                                ifname1, vid1, "same_local_fabric_as", ifname2,
-                                vid2, None))
+                if beacon.ifname is None:
+                    continue
+                if beacon.ifname == rx.ifname and beacon.vid == rx.vid:
+                    continue
+                # The same beacon was received on more than one interface.
+                hints.add(TopologyHint(
+                    rx.ifname, rx.vid, "same_local_fabric_as", beacon.ifname,
+                    beacon.vid, None))
+                hints.add(TopologyHint(
+                    beacon.ifname, beacon.vid, "same_local_fabric_as",
+                    rx.ifname, rx.vid, None))
 
     def _add_own_beacon_hints(self, hints, rx):
         """Adds hints regarding own beacons received.
@@ -887,7 +987,9 @@ class BeaconingSocketProtocol(DatagramProtocol):
         """Records an incoming beacon based on its UUID and JSON.
 
         Organizes incoming beacons in the `rx_queue` by creating a list of
-        beacons received [on different interfaces] per UUID.
+        beacons received on different interfaces per UUID. Only the first
+        beacon received on each interface is kept; later ones add nothing to
+        what can be inferred about the network topology.
 
         :param beacon: The incoming beacon (a ReceivedBeacon namedtuple).
         :return: True if the beacon was a duplicate, otherwise False.
@@ -895,11 +997,14 @@ class BeaconingSocketProtocol(DatagramProtocol):
         duplicate_received = False
         # Need to age out before doing anything else; we don't want to match
         # a duplicate packet and then delete it immediately after.
-        age_out_uuid_queue(self.rx_queue)
+        self.rx_queue.age_out()
         rx_packets_for_uuid = self.rx_queue.get(beacon.uuid, [])
         if len(rx_packets_for_uuid) > 0:
             duplicate_received = True
-        rx_packets_for_uuid.append(beacon)
+        if not any(
+                rx.ifname == beacon.ifname and rx.vid == beacon.vid
+                for rx in rx_packets_for_uuid):
+            rx_packets_for_uuid.append(beacon)
         self.rx_queue[beacon.uuid] = rx_packets_for_uuid
         return duplicate_received
 
@@ -940,6 +1045,75 @@ class BeaconingSocketProtocol(DatagramProtocol):
             self.beaconReceived(beacon_json)
 
 
+class NeighbourTable:
+    """Table of the neighbours observed on this host.
+
+    Neighbour events from `observe-arp` are held here until they are
+    reported, so that many are reported at once rather than each in its own
+    report. A binding that has been reported and is seen again -- with the
+    same MAC address -- within `horizon` seconds is suppressed.
+
+    :ivar suppressed: The number of neighbour events suppressed.
+    :ivar sent: The number of neighbour events handed out for reporting.
+    """
+
+    def __init__(self, horizon, clock=None):
+        super().__init__()
+        self.horizon = horizon
+        self.clock = clock
+        if self.clock is None:
+            from twisted.internet import reactor
+            self.clock = reactor
+        # Keyed by (interface, ip, vid).
+        self._pending = OrderedDict()
+        self._reported = {}
+        self.suppressed = 0
+        self.sent = 0
+
+    def observe(self, neighbours):
+        """Record newly observed neighbours."""
+        now = self.clock.seconds()
+        for neighbour in neighbours:
+            key = (
+                neighbour['interface'], neighbour['ip'],
+                neighbour.get('vid', None))
+            if key in self._pending:
+                # Only the latest observation of each binding is reported.
+                del self._pending[key]
+                self.suppressed += 1
+            elif key in self._reported:
+                mac, reported = self._reported[key]
+                if mac == neighbour['mac'] and now - reported < self.horizon:
+                    self.suppressed += 1
+                    continue
+            self._pending[key] = neighbour
+
+    def takePending(self):
+        """Return the neighbours observed since the last call.
+
+        Call `reported` once they have been successfully reported.
+        """
+        neighbours = list(self._pending.values())
+        self._pending.clear()
+        self.sent += len(neighbours)
+        return neighbours
+
+    def reported(self, neighbours):
+        """Note that `neighbours` have been reported.
+
+        This also forgets reported bindings older than the horizon.
+        """
+        now = self.clock.seconds()
+        for key, (mac, reported) in list(self._reported.items()):
+            if now - reported >= self.horizon:
+                del self._reported[key]
+        for neighbour in neighbours:
+            key = (
+                neighbour['interface'], neighbour['ip'],
+                neighbour.get('vid', None))
+            self._reported[key] = neighbour['mac'], now
+
+
 class NetworksMonitoringLock(NamedLock):
     """Host scoped lock to ensure only one network monitoring service runs."""
 
@@ -958,8 +1132,22 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
 
     interval = timedelta(seconds=30).total_seconds()
 
+    # When the kernel reports changes to links, addresses, and routes over
+    # netlink, the interfaces are only scanned when something has changed,
+    # and otherwise every `reconcile_interval` seconds in case something was
+    # missed (e.g. a DHCP lease was renewed).
+    reconcile_interval = timedelta(minutes=10).total_seconds()
+
+    # Neighbours observed on this host are reported every
+    # `neighbour_report_interval` seconds. A binding that was reported and is
+    # seen again within `neighbour_report_horizon` seconds is not reported
+    # again.
+    neighbour_report_interval = timedelta(seconds=5).total_seconds()
+    neighbour_report_horizon = timedelta(minutes=10).total_seconds()
+
     def __init__(
-            self, clock=None, enable_monitoring=True, enable_beaconing=True):
+            self, clock=None, enable_monitoring=True, enable_beaconing=True,
+            enable_netlink=True):
         # Order is very important here. First we set the clock to the passed-in
         # reactor, so that unit tests can fake out the clock if necessary.
         # Then we call super(). The superclass will set up the structures
@@ -978,6 +1166,15 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         self._monitoring_state = {}
         self._monitoring_mdns = False
         self._locked = False
+        # The last scanned interfaces, when they were scanned, and whether
+        # netlink has reported a change since.
+        self._scanned = None
+        self._scanned_at = None
+        self._changed = True
+        if enable_netlink:
+            self._netlink = NetlinkMonitor(self._interfacesChanged)
+        else:
+            self._netlink = None
         # Use a named filesystem lock to prevent more than one monitoring
         # service running on each host machine. This service attempts to
         # acquire this lock on each loop, and then it holds the lock until the
@@ -989,6 +1186,14 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         self.interface_monitor.setName("updateInterfaces")
         self.interface_monitor.clock = self.clock
         self.interface_monitor.setServiceParent(self)
+        # Set up child service to report observed neighbours.
+        self.neighbours = NeighbourTable(
+            self.neighbour_report_horizon, clock=self.clock)
+        self.neighbour_reporter = TimerService(
+            self.neighbour_report_interval, self._reportPendingNeighbours)
+        self.neighbour_reporter.setName("reportNeighbours")
+        self.neighbour_reporter.clock = self.clock
+        self.neighbour_reporter.setServiceParent(self)
         self.beaconing_protocol = None
 
     @inlineCallbacks
@@ -1002,7 +1207,7 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         if responsible:
             interfaces = None
             try:
-                interfaces = yield maybeDeferred(self.getInterfaces)
+                interfaces = yield self._scanInterfaces()
                 yield self._updateInterfaces(interfaces)
             except BaseException as e:
                 msg = (
@@ -1018,6 +1223,56 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         """
         return deferToThread(get_all_interfaces_definition)
 
+    def _scanInterfaces(self):
+        """Get the interfaces, unless netlink says nothing has changed.
+
+        The first call starts watching for changes over netlink. If that is
+        not possible the interfaces are scanned every time.
+        """
+        if self._netlink is not None and not self._netlink.monitoring:
+            try:
+                self._netlink.startMonitoring()
+            except OSError as error:
+                log.msg(
+                    "Cannot watch for network interface changes over "
+                    "netlink (%s); scanning every %d seconds instead." % (
+                        error, self.interval))
+                self._netlink = None
+            else:
+                # Changes may have been missed while not watching.
+                self._changed = True
+        clock = self._getClock()
+        if self._netlink is not None and not self._changed:
+            if clock.seconds() - self._scanned_at < self.reconcile_interval:
+                return succeed(self._scanned)
+        # Clear the flag first so that changes while scanning are not lost.
+        self._changed = False
+        scanned_at = clock.seconds()
+
+        def scanned(interfaces):
+            self._scanned = interfaces
+            self._scanned_at = scanned_at
+            return interfaces
+
+        def failed(failure):
+            self._changed = True
+            return failure
+
+        d = maybeDeferred(self.getInterfaces)
+        d.addCallbacks(scanned, failed)
+        return d
+
+    def _interfacesChanged(self, messages):
+        """Called by the netlink monitor when the kernel reports changes."""
+        self._changed = True
+
+    def _getClock(self):
+        if self.clock is None:
+            from twisted.internet import reactor
+            return reactor
+        else:
+            return self.clock
+
     @abstractmethod
     def getDiscoveryState(self):
         """Record the interfaces information.
@@ -1046,6 +1301,33 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         This MUST be overridden in subclasses.
         """
 
+    def getNeighbourStats(self):
+        """Return the counts of suppressed and sent neighbour events."""
+        return {
+            "suppressed": self.neighbours.suppressed,
+            "sent": self.neighbours.sent,
+        }
+
+    def _reportPendingNeighbours(self):
+        """Report the neighbours observed since the last report, if any.
+
+        Neighbours that could not be reported are not suppressed when they
+        are next observed.
+        """
+        neighbours = self.neighbours.takePending()
+        if len(neighbours) == 0:
+            return None
+        d = maybeDeferred(self.reportNeighbours, neighbours)
+        d.addCallback(callOut, self.neighbours.reported, neighbours)
+        d.addCallback(callOut, self._logNeighbourStats)
+        d.addErrback(log.err, "Failed to report neighbours.")
+        return d
+
+    def _logNeighbourStats(self):
+        log.debug(
+            "Neighbours: {sent} events reported, {suppressed} suppressed.",
+            **self.getNeighbourStats())
+
     def reportBeacons(self, beacons):
         """Receives a report of an observed beacon packet."""
         for beacon in beacons:
@@ -1094,6 +1376,10 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         if self._locked:
             self._lock.release()
             self._locked = False
+            # Stop watching for changes; another process is responsible.
+            if self._netlink is not None:
+                self._netlink.stopMonitoring()
+            self._changed = True
             # If we were monitoring neighbours on any interfaces, we need to
             # stop the monitoring services.
             self._configureNetworkDiscovery({})
@@ -1166,7 +1452,7 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
 
     def _startNeighbourDiscovery(self, ifname):
         """"Start neighbour discovery service on the specified interface."""
-        service = NeighbourDiscoveryService(ifname, self.reportNeighbours)
+        service = NeighbourDiscoveryService(ifname, self.neighbours.observe)
         service.clock = self.clock
         service.setName("neighbour_discovery:" + ifname)
         service.setServiceParent(self)
@@ -27,8 +27,10 @@ from provisioningserver.utils.arp import (
     add_arguments,
     ARP,
     ARP_OPERATION,
+    is_arp_frame,
     run,
     SEEN_AGAIN_THRESHOLD,
+    SIZEOF_ARP_PACKET,
     update_and_print_bindings,
     update_bindings_and_get_event,
 )
@@ -253,6 +255,41 @@ class TestARP(MAASTestCase):
             arp.bindings(), [(IPAddress(pkt_sender_ip), EUI(pkt_sender_mac))])
 
 
+class TestIsARPFrame(MAASTestCase):
+
+    def make_frame(self, ethertype, payload, vid=None):
+        frame = b'\xff' * 6 + b'\x00\x24\xa5\xaf\x24\x85'
+        if vid is not None:
+            frame += b'\x81\x00' + vid.to_bytes(2, "big")
+        return frame + ethertype + payload
+
+    def assertIsARPFrame(self, expected, frame):
+        buffer = memoryview(b'\0' * 5 + frame + b'\0' * 7)
+        self.assertThat(
+            is_arp_frame(buffer, 5, 5 + len(frame)), Equals(expected))
+
+    def test__true_for_arp_frame(self):
+        arp = make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2')
+        self.assertIsARPFrame(True, self.make_frame(b'\x08\x06', arp))
+        self.assertIsARPFrame(
+            True, self.make_frame(b'\x08\x06', arp, vid=100))
+
+    def test__false_for_other_frames(self):
+        payload = b'\0' * SIZEOF_ARP_PACKET
+        self.assertIsARPFrame(False, self.make_frame(b'\x08\x00', payload))
+        self.assertIsARPFrame(
+            False, self.make_frame(b'\x86\xdd', payload, vid=100))
+
+    def test__false_for_truncated_frames(self):
+        arp = make_arp_packet(
+            '192.168.0.1', '01:02:03:04:05:06', '192.168.0.2')
+        self.assertIsARPFrame(False, self.make_frame(b'\x08\x06', arp[:-1]))
+        self.assertIsARPFrame(
+            False, self.make_frame(b'\x08\x06', arp[:-1], vid=100))
+        self.assertIsARPFrame(False, b'\xff' * 13)
+
+
 class TestUpdateBindingsAndGetEvent(MAASTestCase):
 
     def test__new_binding(self):
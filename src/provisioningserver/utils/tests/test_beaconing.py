@@ -15,14 +15,20 @@ import struct
 import subprocess
 from tempfile import NamedTemporaryFile
 import time
-from unittest.mock import Mock
+from unittest.mock import (
+    call,
+    Mock,
+)
 from uuid import (
     UUID,
     uuid1,
 )
 
 from maastesting.factory import factory
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+)
 from maastesting.testcase import MAASTestCase
 from provisioningserver.security import (
     fernet_encrypt_psk,
@@ -38,6 +44,7 @@ from provisioningserver.utils.beaconing import (
     BEACON_TYPES,
     BeaconingPacket,
     BeaconPayload,
+    BeaconQueue,
     create_beacon_payload,
     InvalidBeaconingPacket,
     read_beacon_payload,
@@ -396,3 +403,70 @@ class TestAgeOutUUIDQueue(MAASTestCase):
         self.assertThat(queue, HasLength(1))
         age_out_uuid_queue(queue)
         self.assertThat(queue, HasLength(0))
+
+
+class TestBeaconQueue(MAASTestCase):
+    """Tests for `BeaconQueue`."""
+
+    def make_uuid(self, age=0.0):
+        return factory.make_UUID_with_timestamp(time.time() - age)
+
+    def test__behaves_like_an_ordered_mapping(self):
+        queue = BeaconQueue()
+        uuids = [self.make_uuid() for _ in range(3)]
+        for index, uuid in enumerate(uuids):
+            queue[uuid] = index
+        self.assertThat(list(queue), Equals(uuids))
+        self.assertThat(queue[uuids[1]], Equals(1))
+        self.assertThat(queue.pop(uuids[1]), Equals(1))
+        self.assertThat(queue.popitem(), Equals((uuids[2], 2)))
+        self.assertThat(queue.popitem(last=False), Equals((uuids[0], 0)))
+        self.assertThat(queue, HasLength(0))
+        self.assertRaises(KeyError, queue.popitem)
+
+    def test__removes_least_recently_added_entries_beyond_max_entries(self):
+        on_remove = Mock()
+        queue = BeaconQueue(max_entries=2, on_remove=on_remove)
+        uuids = [self.make_uuid() for _ in range(3)]
+        for index, uuid in enumerate(uuids):
+            queue[uuid] = index
+        self.assertThat(list(queue), Equals(uuids[1:]))
+        self.assertThat(on_remove, MockCalledOnceWith(uuids[0], 0))
+
+    def test__age_out_keeps_fresh_entries(self):
+        queue = BeaconQueue()
+        queue[self.make_uuid()] = {}
+        queue[self.make_uuid(age=60.0)] = {}
+        queue[self.make_uuid(age=-60.0)] = {}
+        queue.age_out()
+        self.assertThat(queue, HasLength(3))
+
+    def test__age_out_removes_entries_from_the_past_and_future(self):
+        on_remove = Mock()
+        queue = BeaconQueue(on_remove=on_remove)
+        uuid_now = self.make_uuid()
+        uuid_from_the_past = self.make_uuid(age=140.0)
+        uuid_from_the_future = self.make_uuid(age=-140.0)
+        queue[uuid_from_the_past] = 1
+        queue[uuid_now] = 2
+        queue[uuid_from_the_future] = 3
+        queue.age_out()
+        self.assertThat(list(queue), Equals([uuid_now]))
+        self.assertThat(on_remove, MockCallsMatch(
+            call(uuid_from_the_past, 1), call(uuid_from_the_future, 3)))
+
+    def test__age_out_is_not_held_up_by_fresh_entries(self):
+        queue = BeaconQueue()
+        uuid_now = self.make_uuid()
+        queue[uuid_now] = {}
+        queue[self.make_uuid(age=140.0)] = {}
+        queue.age_out()
+        self.assertThat(list(queue), Equals([uuid_now]))
+
+    def test__age_out_forgets_removed_entries(self):
+        queue = BeaconQueue()
+        uuid = self.make_uuid(age=140.0)
+        queue[uuid] = {}
+        del queue[uuid]
+        queue.age_out()
+        self.assertThat(queue._buckets, Equals({}))
@@ -0,0 +1,119 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.utils.netlink`."""
+
+__all__ = []
+
+import errno
+import struct
+from unittest.mock import Mock
+
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from provisioningserver.utils.netlink import (
+    IFADDRMSG,
+    IFINFOMSG,
+    IFLA_IFNAME,
+    NetlinkMessage,
+    NetlinkMonitor,
+    NLMSG_HEADER,
+    parse_netlink_messages,
+    RTATTR_HEADER,
+    RTM,
+)
+from testtools.matchers import Equals
+
+
+def make_message(type, payload):
+    length = struct.calcsize(NLMSG_HEADER) + len(payload)
+    message = struct.pack(NLMSG_HEADER, length, type, 0, 0, 0) + payload
+    # Pad to a 4-byte boundary.
+    return message + b'\0' * (-len(message) % 4)
+
+
+def make_link_message(type, index, ifname):
+    name = ifname.encode("utf-8") + b'\0'
+    attribute = struct.pack(
+        RTATTR_HEADER, struct.calcsize(RTATTR_HEADER) + len(name),
+        IFLA_IFNAME) + name
+    return make_message(
+        type, struct.pack(IFINFOMSG, 0, 1, index, 0, 0) + attribute)
+
+
+def make_addr_message(type, index):
+    return make_message(type, struct.pack(IFADDRMSG, 2, 24, 0, 0, index))
+
+
+class TestParseNetlinkMessages(MAASTestCase):
+
+    def test__parses_link_address_and_route_messages(self):
+        data = (
+            make_link_message(RTM.NEWLINK, 3, "eth0.100") +
+            make_addr_message(RTM.DELADDR, 4) +
+            make_message(RTM.NEWROUTE, b'\0' * 12))
+        self.assertThat(parse_netlink_messages(data), Equals([
+            NetlinkMessage(RTM.NEWLINK, 3, "eth0.100"),
+            NetlinkMessage(RTM.DELADDR, 4, None),
+            NetlinkMessage(RTM.NEWROUTE, None, None),
+        ]))
+
+    def test__ignores_other_messages(self):
+        # NLMSG_DONE.
+        data = make_message(3, b'\0' * 4)
+        self.assertThat(parse_netlink_messages(data), Equals([]))
+
+    def test__ignores_truncated_messages(self):
+        data = make_link_message(RTM.DELLINK, 3, "eth0")
+        self.assertThat(
+            parse_netlink_messages(data[:-4]), Equals([]))
+        self.assertThat(
+            parse_netlink_messages(data + data[:8]),
+            Equals([NetlinkMessage(RTM.DELLINK, 3, "eth0")]))
+
+
+class TestNetlinkMonitor(MAASTestCase):
+
+    def make_monitor(self, *recv):
+        callback = Mock()
+        monitor = NetlinkMonitor(callback, reactor=Mock())
+        monitor._socket = Mock()
+        monitor._socket.recv.side_effect = list(recv) + [BlockingIOError()]
+        return monitor, callback
+
+    def test_doRead_calls_callback_with_all_messages(self):
+        monitor, callback = self.make_monitor(
+            make_addr_message(RTM.NEWADDR, 2),
+            make_link_message(RTM.DELLINK, 3, "br0"))
+        monitor.doRead()
+        self.assertThat(callback, MockCalledOnceWith([
+            NetlinkMessage(RTM.NEWADDR, 2, None),
+            NetlinkMessage(RTM.DELLINK, 3, "br0"),
+        ]))
+
+    def test_doRead_ignores_uninteresting_messages(self):
+        monitor, callback = self.make_monitor(make_message(3, b'\0' * 4))
+        monitor.doRead()
+        self.assertThat(callback, MockNotCalled())
+
+    def test_doRead_reports_overrun_as_unknown_change(self):
+        monitor, callback = self.make_monitor(
+            OSError(errno.ENOBUFS, "No buffer space available"))
+        monitor.doRead()
+        self.assertThat(callback, MockCalledOnceWith([]))
+
+    def test_start_and_stop_monitoring(self):
+        monitor = NetlinkMonitor(Mock(), reactor=Mock())
+        monitor.startMonitoring()
+        self.addCleanup(monitor.stopMonitoring)
+        self.assertTrue(monitor.monitoring)
+        self.assertThat(
+            monitor.reactor.addReader, MockCalledOnceWith(monitor))
+        monitor.stopMonitoring()
+        self.assertFalse(monitor.monitoring)
+        self.assertThat(
+            monitor.reactor.removeReader, MockCalledOnceWith(monitor))
+        self.assertThat(monitor.fileno(), Equals(-1))
@@ -44,6 +44,7 @@ import provisioningserver.utils
 from provisioningserver.utils import network as network_module
 from provisioningserver.utils.network import (
     annotate_with_default_monitored_interfaces,
+    annotate_with_interface_hashes,
     bytes_to_hex,
     bytes_to_int,
     clean_up_netifaces_address,
@@ -63,6 +64,7 @@ from provisioningserver.utils.network import (
     get_eui_organization,
     get_ifname_ifdata_for_destination,
     get_interface_children,
+    get_interface_hash,
     get_mac_organization,
     get_source_address,
     has_ipv4_address,
@@ -1987,6 +1989,55 @@ class TestAnnotateWithDefaultMonitoredInterfaces(MAASTestCase):
             })
 
 
+class TestGetInterfaceHash(MAASTestCase):
+    """Tests for `get_interface_hash()`."""
+
+    def make_interface(self):
+        return {
+            'type': 'physical',
+            'mac_address': factory.make_mac_address(),
+            'parents': [],
+            'links': [{'mode': 'static', 'address': '192.168.0.2/24'}],
+            'enabled': True,
+        }
+
+    def test__is_the_same_for_the_same_definition(self):
+        interface = self.make_interface()
+        self.assertThat(
+            get_interface_hash(interface),
+            Equals(get_interface_hash(dict(reversed(list(
+                interface.items()))))))
+
+    def test__changes_when_definition_changes(self):
+        interface = self.make_interface()
+        changed = dict(interface, links=[])
+        self.assertThat(
+            get_interface_hash(interface),
+            Not(Equals(get_interface_hash(changed))))
+
+    def test__ignores_hash_key(self):
+        interface = self.make_interface()
+        self.assertThat(
+            get_interface_hash(dict(interface, hash="foo")),
+            Equals(get_interface_hash(interface)))
+
+
+class TestAnnotateWithInterfaceHashes(MAASTestCase):
+    """Tests for `annotate_with_interface_hashes()`."""
+
+    def test__returns_copy_with_hash_of_each_interface(self):
+        interfaces = {
+            'eth0': {'parents': [], 'type': 'physical', 'enabled': False},
+            'eth1': {'parents': [], 'type': 'physical', 'enabled': True},
+        }
+        annotated = annotate_with_interface_hashes(interfaces)
+        self.assertThat(annotated, Equals({
+            name: dict(interface, hash=get_interface_hash(interface))
+            for name, interface in interfaces.items()
+        }))
+        self.assertThat(interfaces['eth0'], Not(Contains('hash')))
+
+
 class TestIsLoopbackAddress(MAASTestCase):
 
     def test_handles_ipv4_loopback(self):
@@ -11,9 +11,13 @@ from maastesting.testcase import MAASTestCase
 from provisioningserver.utils.pcap import (
     PCAP,
     PCAPError,
+    PCAPPacket,
 )
 from testtools import ExpectedException
-from testtools.matchers import Equals
+from testtools.matchers import (
+    Equals,
+    HasLength,
+)
 
 # Created with:
 # $ sudo tcpdump -i eth0 -U --immediate-mode -s 64 -n -c 2 -w - arp \
@@ -121,3 +125,46 @@ class TestPCAP(MAASTestCase):
                 PCAPError,
                 "Unexpected end of PCAP stream: invalid packet."):
             pcap.read()
+
+    def test__packets_match_read(self):
+        expected = []
+        pcap = PCAP(io.BytesIO(TESTDATA))
+        for _ in range(2):
+            expected.append(pcap.read())
+        pcap = PCAP(io.BytesIO(TESTDATA))
+        packets = list(pcap.packets())
+        self.assertThat(
+            [(packet.header, packet.data) for packet in packets],
+            Equals(expected))
+        self.assertIsInstance(packets[0], PCAPPacket)
+
+    def test__packets_parses_packets_split_across_reads(self):
+        expected = list(PCAP(io.BytesIO(TESTDATA)))
+        for size in (1, 7, 16, 77):
+            pcap = PCAP(io.BytesIO(TESTDATA))
+            self.assertThat(
+                [(packet.header, packet.data)
+                 for packet in pcap.packets(size=size)],
+                Equals(expected))
+
+    def test__packets_skips_packets_not_matched(self):
+        pcap = PCAP(io.BytesIO(TESTDATA))
+        # Only the second packet is not sent to the broadcast address.
+        packets = list(pcap.packets(
+            match=lambda buffer, start, end: buffer[start] != 0xff))
+        self.assertThat(packets, HasLength(1))
+        self.assertThat(packets[0].timestamp_seconds, Equals(1467058715))
+
+    def test__iterator_raises_PCAPError_for_invalid_packet_header(self):
+        pcap = PCAP(io.BytesIO(TESTDATA_INVALID_PACKET_HEADER))
+        with ExpectedException(
+                PCAPError,
+                "Unexpected end of PCAP stream: invalid packet header."):
+            list(pcap)
+
+    def test__iterator_raises_PCAPError_for_invalid_packet(self):
+        pcap = PCAP(io.BytesIO(TESTDATA_INVALID_PACKET))
+        with ExpectedException(
+                PCAPError,
+                "Unexpected end of PCAP stream: invalid packet."):
+            list(pcap)
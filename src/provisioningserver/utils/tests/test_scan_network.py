@@ -7,8 +7,10 @@ __all__ = []
 
 from argparse import ArgumentParser
 import io
+import math
 import os
 import random
+import struct
 import subprocess
 from unittest.mock import (
     ANY,
@@ -18,16 +20,32 @@ from unittest.mock import (
 from maastesting.factory import factory
 from maastesting.matchers import (
     DocTestMatches,
+    HasLength,
     Matches,
     MockCalledOnceWith,
 )
 from maastesting.testcase import MAASTestCase
-from netaddr import IPNetwork
+from netaddr import (
+    IPAddress,
+    IPNetwork,
+)
 from provisioningserver.utils import scan_network as scan_network_module
+from provisioningserver.utils.arp import (
+    ARP,
+    ARP_OPERATION,
+    ARP_PACKET,
+)
+from provisioningserver.utils.ethernet import (
+    Ethernet,
+    ETHERTYPE,
+)
 from provisioningserver.utils.scan_network import (
     add_arguments,
+    arp_scan,
+    ARPScanner,
     get_nmap_arguments,
     get_ping_arguments,
+    get_source_address,
     NmapParameters,
     PingParameters,
     run,
@@ -163,6 +181,9 @@ class TestScanNetworkCommandEndToEnd(MAASTestCase):
             scan_network_module, 'get_all_interfaces_definition')
         self.has_command_available_mock = self.patch(
             scan_network_module, 'has_command_available')
+        self.has_raw_socket_access_mock = self.patch(
+            scan_network_module, 'has_raw_socket_access')
+        self.has_raw_socket_access_mock.return_value = False
         self.all_interfaces_mock.return_value = TEST_INTERFACES
         self.popen = self.patch(scan_network_module.subprocess, 'Popen')
         self.popen.return_value.poll = Mock()
@@ -258,6 +279,29 @@ class TestScanNetworkCommandEndToEnd(MAASTestCase):
         self.assertThat(self.error_output.getvalue(), DocTestMatches(
             "...scan...completed...second..."))
 
+    def test__runs_arp_scan_when_raw_sockets_are_available(self):
+        self.has_raw_socket_access_mock.return_value = True
+        self.has_command_available_mock.return_value = True
+        scan = self.patch(ARPScanner, 'scan')
+        scan.return_value = {int(IPAddress('192.168.0.2'))}
+        self.patch(ARPScanner, 'open')
+        self.run_command('eth1', '192.168.0.0/30')
+        self.assertThat(self.popen.call_count, Equals(0))
+        self.assertThat(self.output.getvalue(), DocTestMatches(
+            '{"scan_type": "arp", ..."ip": "192.168.0.1", "result": false}\n'
+            '{"scan_type": "arp", ..."ip": "192.168.0.2", "result": true}\n'))
+        self.assertThat(self.error_output.getvalue(), DocTestMatches(
+            "...Sent ARP requests to 2 hosts (1 up) in...second(s)..."))
+
+    def test__runs_ping_instead_of_arp_scan_if_requested(self):
+        self.has_raw_socket_access_mock.return_value = True
+        ip = factory.make_ip_address(ipv6=False)
+        self.run_command('--ping', 'eth0', '%s/32' % ip)
+        self.assertThat(self.popen, MockCalledOnceWith(
+            get_ping_arguments(PingParameters(interface='eth0', ip=ip)),
+            stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, env=get_env_with_locale()))
+
     def test__prints_error_for_missing_cidr(self):
         self.run_command('8.8.8.0/24')
         self.assertThat(self.error_output.getvalue(), DocTestMatches(
@@ -335,3 +379,193 @@ class TestYieldPingParameters(MAASTestCase):
             PingParameters(interface='eth0', ip='192.168.0.1'),
             PingParameters(interface='eth0', ip='192.168.0.2'),
         }))
+
+
+SCANNER_MAC = b'\x52\x54\x00\x12\x34\x56'
+
+
+def make_arp_reply(sender_ip, target_ip=0):
+    sender_mac = b'\x52\x54\x00' + sender_ip.to_bytes(4, "big")[1:]
+    arp = struct.pack(
+        ARP_PACKET, 1, 0x0800, 6, 4, ARP_OPERATION.REPLY, sender_mac,
+        sender_ip, SCANNER_MAC, target_ip)
+    return SCANNER_MAC + sender_mac + ETHERTYPE.ARP + arp
+
+
+def make_arp_request(sender_ip, target_ip):
+    sender_mac = b'\x52\x54\x00' + sender_ip.to_bytes(4, "big")[1:]
+    arp = struct.pack(
+        ARP_PACKET, 1, 0x0800, 6, 4, ARP_OPERATION.REQUEST, sender_mac,
+        sender_ip, b'\0' * 6, target_ip)
+    return b'\xff' * 6 + sender_mac + ETHERTYPE.ARP + arp
+
+
+def ceil_microsecond(seconds):
+    # Ignore floating point error when rounding up, but never round down.
+    return max(seconds, math.ceil(round(seconds * 1e6, 3)) / 1e6)
+
+
+class FakeNetwork:
+    """A raw socket on a network where some hosts answer ARP requests.
+
+    Time passes only while waiting in `select`. It is rounded up to the
+    microsecond so that floating point error cannot stop it from passing.
+    If `chatter` is given, other hosts broadcast an ARP request every
+    `chatter` seconds while waiting.
+    """
+
+    def __init__(self, hosts=(), ignore_first=(), chatter=None):
+        self.hosts = {int(IPAddress(host)) for host in hosts}
+        self.ignore = {int(IPAddress(host)) for host in ignore_first}
+        self.chatter = chatter
+        self.now = 0.0
+        self.sent = []
+        self.received = []
+
+    def clock(self):
+        return self.now
+
+    def select(self, readers, writers, errors, timeout):
+        if len(self.received) == 0:
+            if self.chatter is not None and self.chatter < timeout:
+                self.now = ceil_microsecond(self.now + self.chatter)
+                self.received.append(make_arp_request(
+                    int(IPAddress('10.0.1.1')), int(IPAddress('10.0.1.2'))))
+                return readers, [], []
+            self.now = ceil_microsecond(self.now + timeout)
+            return [], [], []
+        else:
+            return readers, [], []
+
+    def send(self, frame):
+        self.sent.append((self.now, frame))
+        arp = ARP(Ethernet(frame).payload)
+        target = arp.packet.target_ip
+        if target in self.ignore:
+            self.ignore.remove(target)
+        elif target in self.hosts:
+            self.received.append(make_arp_reply(target, arp.packet.sender_ip))
+
+    def recv(self, size):
+        if len(self.received) == 0:
+            raise BlockingIOError()
+        return self.received.pop(0)
+
+
+class TestARPScanner(MAASTestCase):
+
+    def make_scanner(self, network, **kwargs):
+        self.patch(scan_network_module.select, 'select', network.select)
+        scanner = ARPScanner(
+            factory.make_name('eth'), clock=network.clock, **kwargs)
+        scanner._socket = network
+        scanner._mac = SCANNER_MAC
+        return scanner
+
+    def make_targets(self, cidr, source='0.0.0.0'):
+        return {
+            int(ip): int(IPAddress(source))
+            for ip in IPNetwork(cidr).iter_hosts()
+        }
+
+    def test__makeRequest_returns_broadcast_arp_request(self):
+        scanner = self.make_scanner(FakeNetwork())
+        frame = scanner.makeRequest(
+            int(IPAddress('10.0.0.1')), int(IPAddress('10.0.0.2')))
+        ethernet = Ethernet(frame)
+        arp = ARP(ethernet.payload)
+        self.expectThat(len(frame), Equals(60))
+        self.expectThat(ethernet.dst_mac, Equals(b'\xff' * 6))
+        self.expectThat(ethernet.src_mac, Equals(SCANNER_MAC))
+        self.expectThat(ethernet.ethertype, Equals(ETHERTYPE.ARP))
+        self.expectThat(arp.operation, Equals(ARP_OPERATION.REQUEST))
+        self.expectThat(arp.source_ip, Equals(IPAddress('10.0.0.1')))
+        self.expectThat(arp.target_ip, Equals(IPAddress('10.0.0.2')))
+
+    def test__scan_returns_addresses_that_replied(self):
+        network = FakeNetwork(hosts=['10.0.0.5', '10.0.0.9', '10.0.1.1'])
+        scanner = self.make_scanner(network)
+        replied = scanner.scan(self.make_targets('10.0.0.0/24'))
+        self.assertThat(replied, Equals({
+            int(IPAddress('10.0.0.5')), int(IPAddress('10.0.0.9'))}))
+
+    def test__scan_retries_addresses_that_did_not_reply(self):
+        network = FakeNetwork(
+            hosts=['10.0.0.1', '10.0.0.2'], ignore_first=['10.0.0.2'])
+        scanner = self.make_scanner(network, attempts=2)
+        replied = scanner.scan(self.make_targets('10.0.0.0/29'))
+        self.expectThat(replied, Equals({
+            int(IPAddress('10.0.0.1')), int(IPAddress('10.0.0.2'))}))
+        # All 6 addresses, then the 5 that did not reply.
+        self.expectThat(network.sent, HasLength(6 + 5))
+
+    def test__scan_limits_rate_and_waits_for_replies(self):
+        network = FakeNetwork()
+        scanner = self.make_scanner(network, rate=10, attempts=1, window=2.5)
+        scanner.scan(self.make_targets('10.0.0.0/27'))
+        times = [when for when, _ in network.sent]
+        self.expectThat(times, HasLength(30))
+        self.expectThat(times[-1], Equals(2.9))
+        self.expectThat(network.now, Equals(times[-1] + 0.1 + 2.5))
+
+    def test__scan_limits_rate_on_busy_network(self):
+        network = FakeNetwork(hosts=['10.0.0.5'], chatter=0.01)
+        scanner = self.make_scanner(network, rate=10, attempts=1, window=2.5)
+        replied = scanner.scan(self.make_targets('10.0.0.0/27'))
+        times = [when for when, _ in network.sent]
+        self.expectThat(times, Equals([round(i / 10, 6) for i in range(30)]))
+        self.expectThat(network.now, Equals(times[-1] + 0.1 + 2.5))
+        self.expectThat(replied, Equals({int(IPAddress('10.0.0.5'))}))
+
+    def test__scan_sends_requests_from_source_address(self):
+        network = FakeNetwork()
+        scanner = self.make_scanner(network, attempts=1)
+        scanner.scan(self.make_targets('10.0.0.0/30', source='10.0.0.1'))
+        sources = {
+            ARP(Ethernet(frame).payload).source_ip
+            for _, frame in network.sent
+        }
+        self.assertThat(sources, Equals({IPAddress('10.0.0.1')}))
+
+
+class TestGetSourceAddress(MAASTestCase):
+
+    def test__returns_address_on_interface_in_cidr(self):
+        self.assertThat(
+            get_source_address(
+                IPNetwork('192.168.3.0/28'), 'eth2', TEST_INTERFACES),
+            Equals(int(IPAddress('192.168.3.1'))))
+
+    def test__returns_zero_if_no_address_in_cidr(self):
+        self.assertThat(
+            get_source_address(
+                IPNetwork('172.16.0.0/24'), 'eth2', TEST_INTERFACES),
+            Equals(0))
+
+
+class TestARPScan(MAASTestCase):
+
+    def test__yields_event_for_each_address(self):
+        self.patch(ARPScanner, 'open')
+        scan = self.patch(ARPScanner, 'scan')
+        scan.return_value = {int(IPAddress('192.168.0.1'))}
+        events = list(arp_scan(
+            {'eth1': ['192.168.0.0/30', '2001:db8::/64']}, TEST_INTERFACES))
+        self.expectThat(scan, MockCalledOnceWith({
+            int(IPAddress('192.168.0.1')): int(IPAddress('192.168.0.1')),
+            int(IPAddress('192.168.0.2')): int(IPAddress('192.168.0.1')),
+        }))
+        self.expectThat(events, Equals([
+            {"scan_type": "arp", "interface": "eth1", "ip": "192.168.0.1",
+             "result": True},
+            {"scan_type": "arp", "interface": "eth1", "ip": "192.168.0.2",
+             "result": False},
+        ]))
+
+    def test__uses_slow_rate_if_requested(self):
+        scanner = self.patch(scan_network_module, 'ARPScanner')
+        scanner.return_value.__enter__.return_value.scan.return_value = set()
+        list(arp_scan(
+            {'eth1': ['192.168.0.0/30']}, TEST_INTERFACES, slow=True))
+        self.assertThat(scanner, MockCalledOnceWith(
+            'eth1', rate=scan_network_module.ARP_SCAN_SLOW_RATE))
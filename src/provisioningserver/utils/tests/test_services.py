@@ -40,8 +40,10 @@ from provisioningserver.utils.services import (
     BeaconingService,
     BeaconingSocketProtocol,
     JSONPerLineProtocol,
+    LineBuffer,
     MDNSResolverService,
     NeighbourDiscoveryService,
+    NeighbourTable,
     NetworksMonitoringLock,
     NetworksMonitoringService,
     ProcessProtocolService,
@@ -78,10 +80,11 @@ class StubNetworksMonitoringService(NetworksMonitoringService):
 
     def __init__(
             self, enable_monitoring=False, enable_beaconing=False,
-            *args, **kwargs):
+            enable_netlink=False, *args, **kwargs):
         super().__init__(
             *args, enable_monitoring=enable_monitoring,
-            enable_beaconing=enable_beaconing, **kwargs)
+            enable_beaconing=enable_beaconing, enable_netlink=enable_netlink,
+            **kwargs)
         self.iterations = DeferredQueue()
         self.interfaces = []
         self.update_interface__calls = 0
@@ -303,6 +306,287 @@ class TestNetworksMonitoringService(MAASTestCase):
         # ... interfaces ARE recorded.
         self.assertThat(service.interfaces, Not(Equals([])))
 
+    def patchNetlink(self, service):
+        """Pretend to watch for changes over netlink."""
+        netlink = service._netlink
+        self.patch(netlink, "startMonitoring").side_effect = (
+            lambda: setattr(netlink, "_socket", sentinel.socket))
+        self.patch(netlink, "stopMonitoring").side_effect = (
+            lambda: setattr(netlink, "_socket", None))
+        self.addCleanup(setattr, netlink, "_socket", None)
+
+    @inlineCallbacks
+    def test_scans_interfaces_only_when_netlink_reports_changes(self):
+        clock = Clock()
+        service = self.makeService(clock=clock, enable_netlink=True)
+        self.patchNetlink(service)
+        getInterfaces = self.patch(service, "getInterfaces")
+        getInterfaces.return_value = succeed({})
+        yield service.updateInterfaces()
+        yield service.updateInterfaces()
+        self.assertThat(getInterfaces, MockCalledOnceWith())
+        self.assertThat(service.interfaces, Equals([{}]))
+        service._netlink.callback([])
+        yield service.updateInterfaces()
+        self.assertThat(getInterfaces, MockCallsMatch(call(), call()))
+        # The interfaces are scanned again after the reconcile interval.
+        clock.advance(service.reconcile_interval)
+        yield service.updateInterfaces()
+        self.assertThat(getInterfaces, MockCallsMatch(call(), call(), call()))
+
+    @inlineCallbacks
+    def test_scans_interfaces_every_time_without_netlink(self):
+        service = self.makeService(clock=Clock(), enable_netlink=True)
+        startMonitoring = self.patch(service._netlink, "startMonitoring")
+        startMonitoring.side_effect = OSError("no netlink")
+        getInterfaces = self.patch(service, "getInterfaces")
+        getInterfaces.return_value = succeed({})
+        with TwistedLoggerFixture() as logger:
+            yield service.updateInterfaces()
+            yield service.updateInterfaces()
+        self.assertThat(getInterfaces, MockCallsMatch(call(), call()))
+        self.assertThat(service._netlink, Is(None))
+        self.assertThat(logger.output, DocTestMatches(
+            "Cannot watch for network interface changes over netlink..."))
+
+    @inlineCallbacks
+    def test_scans_interfaces_again_after_failed_scan(self):
+        service = self.makeService(clock=Clock(), enable_netlink=True)
+        self.patchNetlink(service)
+        getInterfaces = self.patch(service, "getInterfaces")
+        getInterfaces.side_effect = [Exception("boom"), succeed({})]
+        with TwistedLoggerFixture():
+            yield service.updateInterfaces()
+            yield service.updateInterfaces()
+        self.assertThat(getInterfaces, MockCallsMatch(call(), call()))
+        self.assertThat(service.interfaces, Equals([{}]))
+
+    @inlineCallbacks
+    def test_stops_netlink_monitor_when_stopped(self):
+        service = self.makeService(enable_netlink=True)
+        self.patch(service, "getInterfaces").return_value = succeed({})
+        yield service.updateInterfaces()
+        self.assertTrue(service._netlink.monitoring)
+        service._releaseSoleResponsibility()
+        self.assertFalse(service._netlink.monitoring)
+
+    def test_neighbour_discovery_records_neighbours_in_table(self):
+        service = self.makeService()
+        service._startNeighbourDiscovery("eth0")
+        discovery = service.getServiceNamed("neighbour_discovery:eth0")
+        self.assertThat(
+            discovery.callback, Equals(service.neighbours.observe))
+
+
+def make_neighbour(interface="eth0", **kwargs):
+    neighbour = {
+        "interface": interface,
+        "ip": factory.make_ipv4_address(),
+        "mac": factory.make_mac_address(),
+        "time": random.randint(0, 200000000),
+        "vid": None,
+    }
+    neighbour.update(kwargs)
+    return neighbour
+
+
+class TestNeighbourReporting(MAASTestCase):
+    """Tests of neighbour reporting in `NetworksMonitoringService`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def makeService(self, *args, **kwargs):
+        service = StubNetworksMonitoringService(*args, **kwargs)
+        self.addCleanup(service._releaseSoleResponsibility)
+        return service
+
+    def test_init(self):
+        service = self.makeService()
+        self.assertThat(
+            service.neighbour_reporter.step,
+            Equals(service.neighbour_report_interval))
+        self.assertThat(service.neighbour_reporter.call, Equals(
+            (service._reportPendingNeighbours, (), {})))
+        self.assertThat(
+            service.neighbours.horizon,
+            Equals(service.neighbour_report_horizon))
+
+    @inlineCallbacks
+    def test_reports_pending_neighbours_in_one_report(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        reportNeighbours.return_value = succeed(None)
+        neighbours = [make_neighbour() for _ in range(3)]
+        service.neighbours.observe(neighbours[:1])
+        service.neighbours.observe(neighbours[1:])
+        yield service._reportPendingNeighbours()
+        self.assertThat(reportNeighbours, MockCalledOnceWith(neighbours))
+        self.assertThat(service.getNeighbourStats(), Equals(
+            {"sent": 3, "suppressed": 0}))
+
+    @inlineCallbacks
+    def test_does_not_report_without_pending_neighbours(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        yield service._reportPendingNeighbours()
+        self.assertThat(reportNeighbours, MockNotCalled())
+
+    @inlineCallbacks
+    def test_suppresses_neighbours_reported_within_horizon(self):
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        reportNeighbours.return_value = succeed(None)
+        neighbour = make_neighbour()
+        service.neighbours.observe([neighbour])
+        yield service._reportPendingNeighbours()
+        reportNeighbours.reset_mock()
+        clock.advance(service.neighbour_report_horizon - 1)
+        service.neighbours.observe([neighbour])
+        yield service._reportPendingNeighbours()
+        self.assertThat(reportNeighbours, MockNotCalled())
+        self.assertThat(service.getNeighbourStats(), Equals(
+            {"sent": 1, "suppressed": 1}))
+
+    @inlineCallbacks
+    def test_does_not_suppress_neighbours_after_failed_report(self):
+        service = self.makeService(clock=Clock())
+        reportNeighbours = self.patch(service, "reportNeighbours")
+        reportNeighbours.side_effect = [Exception("boom"), succeed(None)]
+        neighbour = make_neighbour()
+        with TwistedLoggerFixture() as logger:
+            service.neighbours.observe([neighbour])
+            yield service._reportPendingNeighbours()
+            service.neighbours.observe([neighbour])
+            yield service._reportPendingNeighbours()
+        self.assertThat(reportNeighbours, MockCallsMatch(
+            call([neighbour]), call([neighbour])))
+        self.assertThat(logger.output, DocTestMatches(
+            "Failed to report neighbours.\n..."))
+
+
+class TestNeighbourTable(MAASTestCase):
+    """Tests for `NeighbourTable`."""
+
+    def test__returns_pending_neighbours_once(self):
+        table = NeighbourTable(600, clock=Clock())
+        neighbours = [make_neighbour(), make_neighbour(interface="eth1")]
+        table.observe(neighbours)
+        self.assertThat(table.takePending(), Equals(neighbours))
+        self.assertThat(table.takePending(), Equals([]))
+        self.assertThat(table.sent, Equals(2))
+
+    def test__keeps_latest_pending_observation_of_binding(self):
+        table = NeighbourTable(600, clock=Clock())
+        neighbour = make_neighbour()
+        moved = dict(neighbour, mac=factory.make_mac_address())
+        table.observe([neighbour, moved])
+        self.assertThat(table.takePending(), Equals([moved]))
+        self.assertThat(table.suppressed, Equals(1))
+
+    def test__suppresses_reported_binding_within_horizon(self):
+        clock = Clock()
+        table = NeighbourTable(600, clock=clock)
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        table.reported(table.takePending())
+        clock.advance(599)
+        table.observe([dict(neighbour, time=neighbour["time"] + 599)])
+        self.assertThat(table.takePending(), Equals([]))
+        self.assertThat(table.suppressed, Equals(1))
+
+    def test__reports_binding_again_after_horizon(self):
+        clock = Clock()
+        table = NeighbourTable(600, clock=clock)
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        table.reported(table.takePending())
+        clock.advance(600)
+        table.observe([neighbour])
+        self.assertThat(table.takePending(), Equals([neighbour]))
+
+    def test__reports_moved_binding_within_horizon(self):
+        table = NeighbourTable(600, clock=Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        table.reported(table.takePending())
+        moved = dict(neighbour, mac=factory.make_mac_address())
+        table.observe([moved])
+        self.assertThat(table.takePending(), Equals([moved]))
+        # Moving back again is reported too.
+        table.reported([moved])
+        table.observe([neighbour])
+        self.assertThat(table.takePending(), Equals([neighbour]))
+
+    def test__bindings_are_per_interface_and_vid(self):
+        table = NeighbourTable(600, clock=Clock())
+        neighbour = make_neighbour()
+        table.observe([neighbour])
+        table.reported(table.takePending())
+        others = [
+            dict(neighbour, interface="eth1"),
+            dict(neighbour, vid=100),
+        ]
+        table.observe(others)
+        self.assertThat(table.takePending(), Equals(others))
+
+    def test__forgets_reported_bindings_after_horizon(self):
+        clock = Clock()
+        table = NeighbourTable(600, clock=clock)
+        table.observe([make_neighbour()])
+        table.reported(table.takePending())
+        clock.advance(600)
+        table.reported([])
+        self.assertThat(table._reported, Equals({}))
+
+
+class TestLineBuffer(MAASTestCase):
+    """Tests for `LineBuffer`."""
+
+    def test__returns_complete_lines(self):
+        buffer = LineBuffer(100)
+        self.assertThat(buffer.feed(b"foo\nbar\nba"), Equals([b"foo", b"bar"]))
+        self.assertThat(buffer.remaining, Equals(b"ba"))
+
+    def test__joins_lines_split_across_chunks(self):
+        buffer = LineBuffer(100)
+        self.assertThat(buffer.feed(b"f"), Equals([]))
+        self.assertThat(buffer.feed(b"o"), Equals([]))
+        self.assertThat(buffer.feed(b"o\nb"), Equals([b"foo"]))
+        self.assertThat(buffer.feed(b"ar\n"), Equals([b"bar"]))
+        self.assertThat(buffer.remaining, Equals(b""))
+
+    def test__discards_long_partial_line(self):
+        buffer = LineBuffer(4)
+        self.assertThat(buffer.feed(b"foo"), Equals([]))
+        self.assertThat(buffer.feed(b"bar"), Equals([]))
+        self.assertThat(buffer.remaining, Equals(b""))
+        self.assertThat(buffer.feed(b"baz"), Equals([]))
+        self.assertThat(buffer.remaining, Equals(b""))
+        self.assertThat(buffer.feed(b"\nfoo\n"), Equals([b"foo"]))
+        self.assertThat(buffer.discarded, Equals(1))
+
+    def test__discards_rest_of_long_line_ending_in_chunk(self):
+        buffer = LineBuffer(4)
+        buffer.feed(b"foobar")
+        self.assertThat(buffer.feed(b"baz\nfo"), Equals([]))
+        self.assertThat(buffer.feed(b"o\n"), Equals([b"foo"]))
+
+    def test__discards_long_complete_lines(self):
+        buffer = LineBuffer(4)
+        self.assertThat(
+            buffer.feed(b"foo\nfoobar\nbar\nfoobarbaz"),
+            Equals([b"foo", b"bar"]))
+        self.assertThat(buffer.remaining, Equals(b""))
+        self.assertThat(buffer.discarded, Equals(2))
+
+    def test__is_linear_in_long_lines(self):
+        # Adding a byte at a time to a long line does not copy the buffer.
+        buffer = LineBuffer(1024 * 1024)
+        for _ in range(100000):
+            buffer.feed(b"x")
+        self.assertThat(buffer.feed(b"\n"), Equals([b"x" * 100000]))
+
 
 class TestJSONPerLineProtocol(MAASTestCase):
     """Tests for `JSONPerLineProtocol`."""
@@ -346,6 +630,26 @@ class TestJSONPerLineProtocol(MAASTestCase):
         proto.outReceived(b"{}\n")
         self.expectThat(callback, MockCallsMatch(call([{}]), call([{}])))
 
+    def test__passes_objects_from_one_chunk_together(self):
+        callback = Mock()
+        proto = JSONPerLineProtocol(callback=callback)
+        proto.connectionMade()
+        proto.outReceived(b'{"a": 1}\n{\n{"b": 2}\n{"c"')
+        proto.outReceived(b': 3}\n')
+        self.expectThat(callback, MockCallsMatch(
+            call([{"a": 1}, {"b": 2}]), call([{"c": 3}])))
+
+    def test__logs_and_discards_overlong_lines(self):
+        callback = Mock()
+        proto = JSONPerLineProtocol(callback=callback)
+        proto.max_line_length = 10
+        proto.connectionMade()
+        with TwistedLoggerFixture() as logger:
+            proto.outReceived(b'{"a": "%s"}\n{}\n' % (b"x" * 10))
+        self.expectThat(callback, MockCallsMatch(call([{}])))
+        self.expectThat(logger.output, Equals(
+            "Discarded 1 line(s) longer than 10 bytes from stdout."))
+
     def test__logs_non_json_output(self):
         callback = Mock()
         proto = JSONPerLineProtocol(callback=callback)
@@ -1046,6 +1350,77 @@ class TestBeaconingSocketProtocol(SharedSecretTestCase):
         self.assertThat(all_hints, Equals(expected_hints))
         yield protocol.stopProtocol()
 
+    @inlineCallbacks
+    def test__getAllTopologyHints_forgets_hints_from_removed_beacons(self):
+        # Note: Always use a random port for testing. (port=0)
+        protocol = BeaconingSocketProtocol(
+            reactor, port=0, process_incoming=False, loopback=True,
+            interface="::", debug=True)
+        # Don't try to send out any replies.
+        self.patch(services, 'create_beacon_payload')
+        self.patch(protocol, 'send_beacon')
+        uuids = [str(uuid1()), str(uuid1())]
+        tx_mac = factory.make_mac_address()
+        for uuid in uuids:
+            fake_tx_beacon = FakeBeaconPayload(
+                uuid, ifname='eth1', mac=tx_mac, vid=100)
+            protocol.beaconReceived({
+                "source_ip": "127.0.0.1",
+                "source_port": 5240,
+                "destination_ip": "224.0.0.118",
+                "interface": "eth0",
+                "type": "solicitation",
+                "payload": fake_tx_beacon.payload
+            })
+        expected_hints = {
+            TopologyHint(
+                ifname='eth0', vid=None, hint="on_remote_network",
+                related_ifname='eth1', related_vid=100,
+                related_mac=tx_mac),
+        }
+        self.assertThat(
+            protocol.getAllTopologyHints(), Equals(expected_hints))
+        # The hint is still supported by the other beacon.
+        del protocol.topology_hints[uuids[0]]
+        self.assertThat(
+            protocol.getAllTopologyHints(), Equals(expected_hints))
+        del protocol.topology_hints[uuids[1]]
+        self.assertThat(protocol.getAllTopologyHints(), Equals(set()))
+        yield protocol.stopProtocol()
+
+    @inlineCallbacks
+    def test__remembers_one_beacon_per_receive_interface(self):
+        # Note: Always use a random port for testing. (port=0)
+        protocol = BeaconingSocketProtocol(
+            reactor, port=0, process_incoming=False, loopback=True,
+            interface="::", debug=True)
+        # Don't try to send out any replies.
+        self.patch(services, 'create_beacon_payload')
+        self.patch(protocol, 'send_beacon')
+        uuid = str(uuid1())
+        fake_tx_beacon = FakeBeaconPayload(uuid, ifname='eth0')
+        for ifname in ['eth0', 'eth1', 'eth0', 'eth1', 'eth2']:
+            protocol.beaconReceived({
+                "source_ip": "127.0.0.1",
+                "source_port": 5240,
+                "destination_ip": "224.0.0.118",
+                "interface": ifname,
+                "type": "solicitation",
+                "payload": fake_tx_beacon.payload
+            })
+        received = protocol.rx_queue[uuid]
+        self.assertThat(
+            [beacon.ifname for beacon in received],
+            Equals(['eth0', 'eth1', 'eth2']))
+        self.assertThat(protocol.topology_hints[uuid], Equals({
+            TopologyHint(
+                ifname1, None, "same_local_fabric_as", ifname2, None, None)
+            for ifname1 in ['eth0', 'eth1', 'eth2']
+            for ifname2 in ['eth0', 'eth1', 'eth2']
+            if ifname1 != ifname2
+        }))
+        yield protocol.stopProtocol()
+
     @inlineCallbacks
     def test__queues_multicast_beacon_soliciations_upon_request(self):
         # Note: Always use a random port for testing. (port=0)
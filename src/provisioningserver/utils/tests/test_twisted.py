@@ -58,10 +58,12 @@ from provisioningserver.utils.twisted import (
     deferToNewThread,
     deferWithTimeout,
     FOREVER,
+    gatherWithConcurrency,
     IAsynchronous,
     ISynchronous,
     LONGTIME,
     makeDeferredWithProcessProtocol,
+    MeteredThreadPool,
     pause,
     reducedWebLogFormatter,
     retries,
@@ -79,7 +81,9 @@ from testtools.deferredruntest import assert_fails_with
 from testtools.matchers import (
     AfterPreprocessing,
     Contains,
+    ContainsDict,
     Equals,
+    GreaterThan,
     HasLength,
     Is,
     IsInstance,
@@ -101,6 +105,7 @@ from twisted.internet.defer import (
     CancelledError,
     Deferred,
     DeferredSemaphore,
+    fail,
     inlineCallbacks,
     succeed,
 )
@@ -639,6 +644,42 @@ class TestDeferWithTimeout(MAASTestCase):
         self.assertThat(clock.getDelayedCalls(), Equals([]))
 
 
+class TestGatherWithConcurrency(MAASTestCase):
+    """Tests for `gatherWithConcurrency`."""
+
+    def test__returns_results_in_order(self):
+        waiting = [Deferred() for _ in range(3)]
+        d = gatherWithConcurrency(
+            [lambda d=d: d for d in waiting], max_concurrency=3)
+        for index, waiter in reversed(list(enumerate(waiting))):
+            waiter.callback(index)
+        self.assertEqual([0, 1, 2], extract_result(d))
+
+    def test__limits_calls_in_progress(self):
+        waiting = [Deferred() for _ in range(3)]
+        started = []
+
+        def make_call(index):
+            def call():
+                started.append(index)
+                return waiting[index]
+            return call
+
+        d = gatherWithConcurrency(map(make_call, range(3)), max_concurrency=2)
+        self.assertEqual([0, 1], started)
+        waiting[1].callback(None)
+        self.assertEqual([0, 1, 2], started)
+        waiting[0].callback(None)
+        waiting[2].callback(None)
+        self.assertEqual([None, None, None], extract_result(d))
+
+    def test__fails_with_first_failure(self):
+        exception_type = factory.make_exception_type()
+        d = gatherWithConcurrency(
+            [lambda: succeed(None), lambda: fail(exception_type())], 2)
+        self.assertRaises(exception_type, extract_result, d)
+
+
 class TestCall(MAASTestCase):
     """Tests for `call`."""
 
@@ -1516,6 +1557,74 @@ def stop_pool_if_running(pool):
         pool.stop()
 
 
+class TestMeteredThreadPool(MAASTestCase):
+    """Tests for `MeteredThreadPool`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def make_pool(self, **kwargs):
+        pool = MeteredThreadPool(**kwargs)
+        self.addCleanup(stop_pool_if_running, pool)
+        pool.start()
+        return pool
+
+    @inlineCallbacks
+    def test__deferToThread_returns_result(self):
+        pool = self.make_pool(minthreads=1, maxthreads=1)
+        result = yield pool.deferToThread(
+            "label", lambda arg, kwarg: (arg, kwarg), sentinel.arg,
+            kwarg=sentinel.kwarg)
+        self.assertEqual((sentinel.arg, sentinel.kwarg), result)
+
+    @inlineCallbacks
+    def test__records_calls_and_failures_by_label(self):
+        pool = self.make_pool(minthreads=1, maxthreads=1)
+        exception_type = factory.make_exception_type()
+
+        def fail():
+            raise exception_type()
+
+        yield pool.deferToThread("foo", lambda: None)
+        yield pool.deferToThread("foo", lambda: None)
+        with ExpectedException(exception_type):
+            yield pool.deferToThread("bar", fail)
+
+        stats = pool.getStats()
+        self.assertEqual({"foo", "bar"}, set(stats))
+        self.assertThat(stats["foo"], ContainsDict({
+            "queued": Equals(0), "running": Equals(0),
+            "calls": Equals(2), "failures": Equals(0)}))
+        self.assertThat(stats["bar"], ContainsDict({
+            "calls": Equals(1), "failures": Equals(1)}))
+
+    @inlineCallbacks
+    def test__records_queue_depth_wait_time_and_latency(self):
+        pool = self.make_pool(minthreads=1, maxthreads=1)
+        release = threading.Event()
+        blocked = pool.deferToThread("label", release.wait)
+        waiting = pool.deferToThread("label", lambda: None)
+
+        # Wait for the first call to occupy the only worker.
+        for _ in range(100):
+            if pool.getStats()["label"]["running"] == 1:
+                break
+            yield pause(0.01)
+        self.assertThat(pool.getStats()["label"], ContainsDict({
+            "queued": Equals(1), "running": Equals(1)}))
+
+        yield pause(0.05)
+        release.set()
+        yield blocked
+        yield waiting
+
+        stats = pool.getStats()["label"]
+        self.assertEqual(0, stats["queued"])
+        self.assertEqual(0, stats["running"])
+        self.assertEqual(2, stats["calls"])
+        self.assertThat(stats["wait_time_max"], GreaterThan(0.04))
+        self.assertThat(stats["latency_max"], GreaterThan(0.04))
+
+
 class TestThreadPoolCommonBehaviour(MAASTestCase):
     """Tests for `ThreadPool`.
 
@@ -15,10 +15,12 @@ __all__ = [
     'deferToNewThread',
     'deferWithTimeout',
     'FOREVER',
+    'gatherWithConcurrency',
     'IAsynchronous',
     'ISynchronous',
     'LONGTIME',
     'makeDeferredWithProcessProtocol',
+    'MeteredThreadPool',
     'pause',
     'reducedWebLogFormatter',
     'retries',
@@ -51,6 +53,7 @@ from os import (
 )
 import signal
 import threading
+import time
 
 from crochet import run_in_reactor
 from netaddr import (
@@ -62,6 +65,9 @@ from twisted.internet.defer import (
     AlreadyCalledError,
     CancelledError,
     Deferred,
+    DeferredList,
+    DeferredSemaphore,
+    FirstError,
     maybeDeferred,
     succeed,
 )
@@ -364,6 +370,29 @@ def deferWithTimeout(timeout, func=None, *args, **kwargs):
     return d.addBoth(done)
 
 
+def gatherWithConcurrency(calls, max_concurrency):
+    """Call each of `calls`, with at most `max_concurrency` in progress.
+
+    :param calls: An iterable of no-argument callables, each of which may
+        return a `Deferred`.
+    :return: A `Deferred` that fires with a list of the results, in the same
+        order as `calls`, or fails with the first failure.
+    """
+    semaphore = DeferredSemaphore(max_concurrency)
+    d = DeferredList(
+        [semaphore.run(func) for func in calls],
+        fireOnOneErrback=True, consumeErrors=True)
+
+    def unwrap_first_error(failure):
+        failure.trap(FirstError)
+        return failure.value.subFailure
+
+    d.addCallbacks(
+        lambda results: [result for _, result in results],
+        unwrap_first_error)
+    return d
+
+
 def call(_, func, *args, **kwargs):
     """Call the given `func`, discarding the first argument.
 
@@ -886,6 +915,111 @@ class ThreadPool(threadpool.ThreadPool, object):
             onResult, callInContext, self.context, func, *args, **kwargs)
 
 
+class ThreadPoolCallStats:
+    """Queue depth, wait time, and latency of calls into a thread-pool.
+
+    Updated from both the reactor and worker threads, hence the lock.
+    """
+
+    def __init__(self):
+        super(ThreadPoolCallStats, self).__init__()
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.calls = 0
+        self.failures = 0
+        self.wait_time = 0.0
+        self.wait_time_max = 0.0
+        self.latency = 0.0
+        self.latency_max = 0.0
+
+    def queue(self):
+        """Record that a call is waiting for a worker."""
+        with self.lock:
+            self.queued += 1
+
+    def start(self, wait_time):
+        """Record that a call has started after waiting `wait_time`."""
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+            self.started += 1
+            self.wait_time += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def finish(self, latency, failed):
+        """Record that a call has finished after running for `latency`."""
+        with self.lock:
+            self.running -= 1
+            self.calls += 1
+            if failed:
+                self.failures += 1
+            self.latency += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        """Return the current statistics as a dict.
+
+        Times are in seconds.
+        """
+        with self.lock:
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "calls": self.calls,
+                "failures": self.failures,
+                "wait_time_avg": (
+                    self.wait_time / self.started if self.started else 0.0),
+                "wait_time_max": self.wait_time_max,
+                "latency_avg": (
+                    self.latency / self.calls if self.calls else 0.0),
+                "latency_max": self.latency_max,
+            }
+
+
+class MeteredThreadPool(ThreadPool):
+    """Thread-pool that records statistics about the calls made into it.
+
+    Calls are made with `deferToThread`, which groups the statistics by a
+    label, the name of the caller for example.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(MeteredThreadPool, self).__init__(*args, **kwargs)
+        self.stats = defaultdict(ThreadPoolCallStats)
+
+    def deferToThread(self, label, func, *args, **kwargs):
+        """Call `func` in this pool, recording statistics under `label`.
+
+        :return: A `Deferred` that fires with the result of `func`.
+        """
+        from twisted.internet import reactor, threads
+        stats = self.stats[label]
+        stats.queue()
+        queued_at = time.monotonic()
+
+        def call():
+            started_at = time.monotonic()
+            stats.start(started_at - queued_at)
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                stats.finish(time.monotonic() - started_at, failed)
+
+        return threads.deferToThreadPool(reactor, self, call)
+
+    def getStats(self):
+        """Return a dict of statistics dicts, keyed by label."""
+        return {
+            label: stats.snapshot()
+            for label, stats in self.stats.items()
+        }
+
+
 class ThreadWorkerContext(threading.local):
     """Helper to manage context in workers.
 